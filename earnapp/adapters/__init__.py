@@ -0,0 +1 @@
+"""UI adapters (Telegram bot, Web UI) on top of earnapp.core."""
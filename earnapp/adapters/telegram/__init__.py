@@ -0,0 +1 @@
+"""Telegram adapter helpers for earnapp_bot.py."""
@@ -0,0 +1,101 @@
+"""Run Telegram handlers off the polling thread with per-chat ordering."""
+
+from __future__ import absolute_import
+
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable
+
+HANDLER_MAX_WORKERS = 8
+ANSWERED_CALLBACK_LIMIT = 1024
+
+Task = Callable[[], Any]
+
+
+class ChatExecutor(object):
+    """Bounded pool where tasks for one chat run in submission order.
+
+    Each chat has its own FIFO; at most one task per chat is running, and a
+    worker runs one task before handing the chat back to the pool so a busy
+    chat cannot starve the others. ``submit`` never blocks and returns True
+    when the chat already had work running or queued.
+    """
+
+    def __init__(self, max_workers=HANDLER_MAX_WORKERS):  # type: (int) -> None
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers or 1)), thread_name_prefix="telegram-handler")
+        self._lock = threading.Lock()  # type: threading.Lock
+        self._queues = {}  # type: Dict[Hashable, Deque[Task]]
+
+    def busy(self, key):  # type: (Hashable) -> bool
+        with self._lock:
+            return key in self._queues
+
+    def submit(self, key, task):  # type: (Hashable, Task) -> bool
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                queue.append(task)
+                return True
+            self._queues[key] = deque([task])
+        try:
+            self._pool.submit(self._run_next, key)
+        except RuntimeError:
+            with self._lock:
+                self._queues.pop(key, None)
+            raise
+        return False
+
+    def shutdown(self, wait=True):  # type: (bool) -> None
+        self._pool.shutdown(wait=wait)
+
+    def _run_next(self, key):  # type: (Hashable) -> None
+        while True:
+            with self._lock:
+                task = self._queues[key][0]
+            try:
+                task()
+            except Exception as exc:
+                print("Error in Telegram handler for chat {0}: {1}".format(key, exc))
+            finally:
+                # Also on SystemExit and friends, or the chat stays busy forever.
+                run_inline = self._hand_off(key)
+            if not run_inline:
+                return
+
+    def _hand_off(self, key):  # type: (Hashable) -> bool
+        """Drop the finished task and schedule the chat's next one.
+
+        Returns True when the pool is shutting down and the caller has to
+        run the rest of the chat's queue itself.
+        """
+        with self._lock:
+            queue = self._queues[key]
+            queue.popleft()
+            if not queue:
+                del self._queues[key]
+                return False
+        try:
+            self._pool.submit(self._run_next, key)
+            return False
+        except RuntimeError:
+            return True
+
+
+class AnswerTracker(object):
+    """Remember recently answered callback ids; Telegram accepts one answer each."""
+
+    def __init__(self, limit=ANSWERED_CALLBACK_LIMIT):  # type: (int) -> None
+        self.limit = max(1, limit)
+        self._lock = threading.Lock()  # type: threading.Lock
+        self._answered = OrderedDict()  # type: OrderedDict[Hashable, bool]
+
+    def first(self, key):  # type: (Hashable) -> bool
+        """True the first time ``key`` is seen."""
+        with self._lock:
+            if key in self._answered:
+                return False
+            self._answered[key] = True
+            while len(self._answered) > self.limit:
+                self._answered.popitem(last=False)
+            return True
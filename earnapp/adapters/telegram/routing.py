@@ -0,0 +1,158 @@
+"""Dictionary-based dispatch for Telegram messages and callback queries."""
+
+from __future__ import absolute_import
+
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+Handler = Callable[[Any], Any]
+StateKey = Tuple[str, Optional[Hashable]]
+
+
+class Router(object):
+    """Resolve each update with a fixed number of dictionary lookups.
+
+    Messages are matched in this order:
+
+    1. ``/command`` (``command``),
+    2. exact button text (``text``),
+    3. the chat's conversation state (``state``), looked up once through
+       ``state_lookup(chat_id)`` which returns ``(name, step)`` or None;
+       a handler for ``(name, step)`` wins over one for ``(name, None)``,
+    4. ``text_match`` predicates (e.g. "text is a device name"), each of
+       which must itself be a constant-time check,
+    5. the ``default`` handler.
+
+    Callback data is matched exactly first, then by the prefix up to and
+    including the first ``:`` (``"confirm_remove:"``).
+    """
+
+    def __init__(self, state_lookup=None):  # type: (Optional[Callable[[Any], Optional[StateKey]]]) -> None
+        self.state_lookup = state_lookup
+        self.commands = {}  # type: Dict[str, Handler]
+        self.texts = {}  # type: Dict[str, Handler]
+        self.states = {}  # type: Dict[StateKey, Handler]
+        self.text_matchers = []  # type: List[Tuple[Callable[[Any], bool], Handler]]
+        self.callbacks = {}  # type: Dict[str, Handler]
+        self.callback_prefixes = {}  # type: Dict[str, Handler]
+        self.default_handler = None  # type: Optional[Handler]
+
+    @staticmethod
+    def _register(table, keys, kind):  # type: (Dict[Any, Handler], Tuple[Any, ...], str) -> Callable[[Handler], Handler]
+        def decorator(handler):  # type: (Handler) -> Handler
+            for key in keys:
+                if key in table and table[key] is not handler:
+                    raise ValueError("Duplicate {0} route: {1!r}".format(kind, key))
+                table[key] = handler
+            return handler
+        return decorator
+
+    def command(self, *names):  # type: (str) -> Callable[[Handler], Handler]
+        return self._register(self.commands, tuple(name.lstrip("/") for name in names), "command")
+
+    def text(self, *texts):  # type: (str) -> Callable[[Handler], Handler]
+        return self._register(self.texts, texts, "text")
+
+    def state(self, name, step=None):  # type: (str, Optional[Hashable]) -> Callable[[Handler], Handler]
+        return self._register(self.states, ((name, step),), "state")
+
+    def text_match(self, predicate):  # type: (Callable[[Any], bool]) -> Callable[[Handler], Handler]
+        def decorator(handler):  # type: (Handler) -> Handler
+            self.text_matchers.append((predicate, handler))
+            return handler
+        return decorator
+
+    def callback(self, *data):  # type: (str) -> Callable[[Handler], Handler]
+        return self._register(self.callbacks, data, "callback")
+
+    def callback_prefix(self, *prefixes):  # type: (str) -> Callable[[Handler], Handler]
+        for prefix in prefixes:
+            if not prefix.endswith(":") or prefix.count(":") != 1:
+                raise ValueError("Callback prefix must end with a single ':': {0!r}".format(prefix))
+        return self._register(self.callback_prefixes, prefixes, "callback prefix")
+
+    def default(self, handler):  # type: (Handler) -> Handler
+        self.default_handler = handler
+        return handler
+
+    @staticmethod
+    def command_name(text):  # type: (Optional[str]) -> Optional[str]
+        """``"/start@MyBot arg"`` -> ``"start"``; None when not a command."""
+        if not text or not text.startswith("/"):
+            return None
+        return text.split(None, 1)[0][1:].split("@", 1)[0]
+
+    def resolve_message(self, message):  # type: (Any) -> Optional[Handler]
+        text = getattr(message, "text", None)
+        command = self.command_name(text)
+        if command is not None and command in self.commands:
+            return self.commands[command]
+        if text in self.texts:
+            return self.texts[text]
+        if self.state_lookup is not None and self.states:
+            state = self.state_lookup(message.chat.id)
+            if state is not None:
+                handler = self.states.get(state) or self.states.get((state[0], None))
+                if handler is not None:
+                    return handler
+        for predicate, handler in self.text_matchers:
+            if predicate(message):
+                return handler
+        return self.default_handler
+
+    def resolve_callback(self, call):  # type: (Any) -> Optional[Handler]
+        data = getattr(call, "data", None)
+        if not data:
+            return None
+        if data in self.callbacks:
+            return self.callbacks[data]
+        prefix, separator, _ = data.partition(":")
+        if separator:
+            return self.callback_prefixes.get(prefix + separator)
+        return None
+
+    def dispatch_message(self, message):  # type: (Any) -> bool
+        handler = self.resolve_message(message)
+        if handler is None:
+            return False
+        handler(message)
+        return True
+
+    def dispatch_callback(self, call):  # type: (Any) -> bool
+        handler = self.resolve_callback(call)
+        if handler is None:
+            return False
+        handler(call)
+        return True
+
+    @staticmethod
+    def chat_key(update):  # type: (Any) -> Hashable
+        """Chat id of a message or callback query (user id if it has no message)."""
+        message = getattr(update, "message", None) if hasattr(update, "data") else update
+        if message is not None and getattr(message, "chat", None) is not None:
+            return message.chat.id
+        return update.from_user.id
+
+    def attach(self, bot, executor=None, on_busy=None):
+        # type: (Any, Optional[Any], Optional[Callable[[Any], Any]]) -> Router
+        """Register one catch-all message and callback handler on a TeleBot.
+
+        With an ``executor`` (``ChatExecutor``) the route is resolved and
+        run on its pool, in order per chat, so the polling thread never
+        waits on a handler. ``on_busy(update)`` is called right away when
+        the update has to queue behind earlier work from the same chat.
+        """
+        def handle(dispatch):  # type: (Callable[[Any], bool]) -> Callable[[Any], Any]
+            if executor is None:
+                return dispatch
+
+            def submit(update):  # type: (Any) -> None
+                if executor.submit(self.chat_key(update), lambda: dispatch(update)) and on_busy is not None:
+                    try:
+                        on_busy(update)
+                    except Exception as exc:
+                        print("Error sending busy acknowledgement: {0}".format(exc))
+            return submit
+
+        bot.message_handler(func=lambda message: True)(handle(self.dispatch_message))
+        bot.callback_query_handler(func=lambda call: True)(handle(self.dispatch_callback))
+        return self
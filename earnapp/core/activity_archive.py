@@ -0,0 +1,338 @@
+"""Gzip-compressed daily archive for activity log entries rolled out of the hot log."""
+
+from __future__ import absolute_import
+
+import errno
+import gzip
+import json
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .activity_log import DEFAULT_QUERY_LIMIT, _timestamp_of, day_key, page_payload
+from .errors import StorageError
+
+JsonDict = Dict[str, Any]
+JsonList = List[JsonDict]
+
+ARCHIVE_INDEX = "index.json"
+ARCHIVE_SEGMENT_PATTERN = "activity-{0}.jsonl.gz"
+ARCHIVE_SLACK_DIVISOR = 10
+ARCHIVE_SEGMENT_CACHE = 4
+
+
+def archive_slack(max_entries):  # type: (Optional[int]) -> int
+    """Extra hot entries allowed before a roll (10%), so rolls happen in batches."""
+    return int(max_entries or 0) // ARCHIVE_SLACK_DIVISOR
+
+
+def split_for_archive(entries, keep):  # type: (JsonList, int) -> Tuple[JsonList, JsonList]
+    """Split ``entries`` into ``(archived, retained)``, keeping the newest ``keep``.
+
+    Only entries strictly older than every kept entry are archived, so the
+    archive always ends before the hot log starts and a run of equal
+    timestamps is never split between the tiers.
+    """
+    if keep <= 0 or len(entries) <= keep:
+        return [], list(entries)
+    kept = entries[-keep:]
+    boundary = min(_timestamp_of(entry) for entry in kept)
+    archived = []  # type: JsonList
+    retained = []  # type: JsonList
+    for entry in entries[:-keep]:
+        (archived if _timestamp_of(entry) < boundary else retained).append(entry)
+    return archived, retained + kept
+
+
+def _take(entries, limit):  # type: (Iterator[JsonDict], int) -> Tuple[JsonList, bool]
+    """First ``limit`` entries plus the rest of the last timestamp run; True if more remain."""
+    taken = []  # type: JsonList
+    for entry in entries:
+        if len(taken) >= limit and _timestamp_of(entry) != _timestamp_of(taken[-1]):
+            return taken, True
+        taken.append(entry)
+    return taken, False
+
+
+def _window(since, until, before=None, after=None):
+    # type: (Optional[int], Optional[int], Optional[int], Optional[int]) -> Tuple[Optional[int], Optional[int]]
+    """Fold exclusive ``before``/``after`` cursors into an inclusive ``[since, until]``."""
+    if after is not None:
+        since = int(after) + 1 if since is None else max(since, int(after) + 1)
+    if before is not None:
+        until = int(before) - 1 if until is None else min(until, int(before) - 1)
+    return since, until
+
+
+class ActivityArchive(object):
+    """Cold tier of the activity log: one gzip segment per local day.
+
+    ``index.json`` records each segment's first/last timestamp and
+    per-device counts, so queries pick the overlapping segments (and counts
+    over whole days) from the index and only decompress the segments that
+    intersect the requested range. Appending to a day adds a new gzip
+    member to its segment instead of rewriting it. Writers must hold the
+    activity log's own lock; readers tolerate a segment being appended to.
+    """
+
+    def __init__(self, directory, cache_size=ARCHIVE_SEGMENT_CACHE):  # type: (str, int) -> None
+        self.directory = directory
+        self.cache_size = max(0, cache_size)
+        self._lock = threading.Lock()  # type: threading.Lock
+        self._index = None  # type: Optional[JsonDict]
+        self._index_signature = None  # type: Optional[tuple]
+        self._segments = OrderedDict()  # type: OrderedDict[str, Tuple[tuple, JsonList]]
+
+    @property
+    def index_path(self):  # type: () -> str
+        return os.path.join(self.directory, ARCHIVE_INDEX)
+
+    def segment_path(self, day):  # type: (str) -> str
+        return os.path.join(self.directory, ARCHIVE_SEGMENT_PATTERN.format(day))
+
+    def append(self, entries):  # type: (Iterable[JsonDict]) -> int
+        """Add entries to their day segments; returns how many were written."""
+        by_day = OrderedDict()  # type: OrderedDict[str, JsonList]
+        for entry in entries:
+            if isinstance(entry, dict):
+                by_day.setdefault(day_key(_timestamp_of(entry)), []).append(entry)
+        if not by_day:
+            return 0
+        self._ensure_directory()
+        index = dict(self._read_index())
+        for day, day_entries in by_day.items():
+            path = self.segment_path(day)
+            try:
+                with gzip.open(path, "ab") as handle:
+                    handle.write("".join(json.dumps(entry) + "\n" for entry in day_entries).encode("utf-8"))
+            except (IOError, OSError) as exc:
+                raise StorageError("Could not append {0}: {1}".format(path, exc))
+            meta = dict(index.get(day) or {"first": None, "last": None, "count": 0, "devices": {}})
+            devices = dict(meta.get("devices") or {})
+            timestamps = [_timestamp_of(entry) for entry in day_entries]
+            for entry in day_entries:
+                device = str(entry.get("device", ""))
+                devices[device] = devices.get(device, 0) + 1
+            meta["first"] = min(timestamps) if meta.get("first") is None else min(meta["first"], min(timestamps))
+            meta["last"] = max(timestamps) if meta.get("last") is None else max(meta["last"], max(timestamps))
+            meta["count"] = int(meta.get("count", 0)) + len(day_entries)
+            meta["devices"] = devices
+            index[day] = meta
+        self._write_index(index)
+        return sum(len(day_entries) for day_entries in by_day.values())
+
+    def clear(self):  # type: () -> int
+        """Delete every segment and the index; returns how many entries they held."""
+        index = self._read_index()
+        removed = sum(int(meta.get("count", 0)) for meta in index.values())
+        for day in index:
+            self._unlink(self.segment_path(day))
+        self._unlink(self.index_path)
+        with self._lock:
+            self._index = None
+            self._index_signature = None
+            self._segments.clear()
+        return removed
+
+    def segments(self, device=None, since=None, until=None):
+        # type: (Optional[str], Optional[int], Optional[int]) -> List[Tuple[str, JsonDict]]
+        """``(day, meta)`` of segments that may hold matches, oldest first."""
+        selected = []  # type: List[Tuple[str, JsonDict]]
+        for day, meta in self._read_index().items():
+            if since is not None and meta.get("last") is not None and meta["last"] < since:
+                continue
+            if until is not None and meta.get("first") is not None and meta["first"] > until:
+                continue
+            if device and not (meta.get("devices") or {}).get(device):
+                continue
+            selected.append((day, meta))
+        selected.sort(key=lambda item: (item[1].get("first") or 0, item[0]))
+        return selected
+
+    def iter_entries(self, device=None, since=None, until=None, reverse=False):
+        # type: (Optional[str], Optional[int], Optional[int], bool) -> Iterator[JsonDict]
+        """Matching entries oldest first (newest first with ``reverse``), one segment at a time."""
+        segments = self.segments(device, since, until)
+        if reverse:
+            segments.reverse()
+        for day, _meta in segments:
+            entries = self._load_segment(day)
+            for entry in (reversed(entries) if reverse else entries):
+                timestamp = _timestamp_of(entry)
+                if since is not None and timestamp < since:
+                    continue
+                if until is not None and timestamp > until:
+                    continue
+                if device and str(entry.get("device", "")) != device:
+                    continue
+                yield entry
+
+    def count(self, group_by="device", device=None, since=None, until=None):
+        # type: (str, Optional[str], Optional[int], Optional[int]) -> Dict[str, int]
+        """Counts per device or per day; whole days come from the index."""
+        counts = {}  # type: Dict[str, int]
+        for day, meta in self.segments(device, since, until):
+            covered = (since is None or (meta.get("first") is not None and meta["first"] >= since)) and (
+                until is None or (meta.get("last") is not None and meta["last"] <= until)
+            )
+            if covered:
+                devices = meta.get("devices") or {}
+                if group_by == "day":
+                    amount = int(devices.get(device, 0)) if device else int(meta.get("count", 0))
+                    if amount:
+                        counts[day] = counts.get(day, 0) + amount
+                else:
+                    for name, amount in devices.items():
+                        if not device or name == device:
+                            counts[name] = counts.get(name, 0) + int(amount)
+                continue
+            for entry in self.iter_entries(device, since, until):
+                key = day if group_by == "day" else str(entry.get("device", ""))
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def add_counts(self, payload, group_by="device", since=None, until=None):
+        # type: (JsonDict, str, Optional[int], Optional[int]) -> JsonDict
+        """Fold archive counts into a hot-log ``{"counts", "total"}`` payload."""
+        counts = payload["counts"]
+        for key, amount in self.count(group_by, None, since, until).items():
+            counts[key] = counts.get(key, 0) + amount
+        payload["total"] = sum(counts.values())
+        return payload
+
+    def query(self, hot_query, device=None, since=None, until=None, before=None, after=None, limit=DEFAULT_QUERY_LIMIT):
+        # type: (Callable[..., JsonDict], Optional[str], Optional[int], Optional[int], Optional[int], Optional[int], int) -> JsonDict
+        """One page across both tiers, same contract as ``ActivityLogIndex.query``.
+
+        ``hot_query`` answers the hot log. Archived entries are all older
+        than the hot log, so the archive is only read when a page runs past
+        the oldest hot entry (or, paging forward, starts before it).
+        """
+        limit = max(1, limit)
+        hot = hot_query(device, since, until, before, after, limit)
+        low, high = _window(since, until, before, after)
+        if not self.segments(device, low, high):
+            return hot
+        total = hot["total"] + sum(self.count("device", device, since, until).values())
+        if after is not None and before is None:
+            page, has_more = _take(self.iter_entries(device, low, high), limit)
+            if len(page) >= limit:
+                has_more = has_more or bool(hot["logs"])
+            else:
+                rest = hot_query(device, since, until, before, after, limit - len(page))
+                page, has_more = page + rest["logs"], rest["has_more"]
+            return page_payload(page, total, has_more)
+        if hot["has_more"]:
+            hot["total"] = total
+            return hot
+        page = hot["logs"]
+        if len(page) >= limit:
+            has_more = next(self.iter_entries(device, low, high, reverse=True), None) is not None
+        else:
+            older, has_more = _take(self.iter_entries(device, low, high, reverse=True), limit - len(page))
+            older.reverse()
+            page = older + page
+        return page_payload(page, total, has_more)
+
+    def _ensure_directory(self):  # type: () -> None
+        try:
+            os.makedirs(self.directory)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise StorageError("Could not create {0}: {1}".format(self.directory, exc))
+
+    @staticmethod
+    def _signature(path):  # type: (str) -> Optional[tuple]
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        return (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+    @staticmethod
+    def _unlink(path):  # type: (str) -> None
+        try:
+            os.unlink(path)
+        except OSError as exc:
+            if exc.errno != errno.ENOENT:
+                raise StorageError("Could not remove {0}: {1}".format(path, exc))
+
+    def _read_index(self):  # type: () -> JsonDict
+        signature = self._signature(self.index_path)
+        with self._lock:
+            if self._index is not None and signature == self._index_signature:
+                return self._index
+        if signature is None:
+            index = {}  # type: JsonDict
+        else:
+            try:
+                with open(self.index_path, "r") as handle:
+                    index = json.load(handle).get("segments", {})
+            except (IOError, OSError, ValueError, AttributeError) as exc:
+                raise StorageError("Could not read {0}: {1}".format(self.index_path, exc))
+        with self._lock:
+            self._index = index
+            self._index_signature = signature
+        return index
+
+    def _write_index(self, index):  # type: (JsonDict) -> None
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(prefix=".index.", suffix=".tmp", dir=self.directory)
+            with os.fdopen(fd, "w") as handle:
+                json.dump({"version": 1, "segments": index}, handle, indent=2, sort_keys=True)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temp_path, self.index_path)
+        except (IOError, OSError, TypeError) as exc:
+            raise StorageError("Could not write {0}: {1}".format(self.index_path, exc))
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+        with self._lock:
+            self._index = index
+            self._index_signature = self._signature(self.index_path)
+
+    def _load_segment(self, day):  # type: (str) -> JsonList
+        """Decompress one day, sorted by timestamp; recent segments stay cached."""
+        path = self.segment_path(day)
+        signature = self._signature(path)
+        if signature is None:
+            return []
+        with self._lock:
+            cached = self._segments.get(day)
+            if cached is not None and cached[0] == signature:
+                self._segments.move_to_end(day)
+                return cached[1]
+        entries = []  # type: JsonList
+        try:
+            with gzip.open(path, "rt") as handle:
+                for line in handle:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(entry, dict):
+                        entries.append(entry)
+        except (EOFError, zlib.error):
+            # A member still being appended by another process; keep what was read.
+            signature = None
+        except (IOError, OSError) as exc:
+            raise StorageError("Could not read {0}: {1}".format(path, exc))
+        entries.sort(key=_timestamp_of)
+        if signature is not None and self.cache_size:
+            with self._lock:
+                self._segments[day] = (signature, entries)
+                self._segments.move_to_end(day)
+                while len(self._segments) > self.cache_size:
+                    self._segments.popitem(last=False)
+        return entries
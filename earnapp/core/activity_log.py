@@ -0,0 +1,177 @@
+"""In-memory indexes for activity-log queries and aggregate counts."""
+
+from __future__ import absolute_import
+
+import bisect
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+JsonDict = Dict[str, Any]
+JsonList = List[JsonDict]
+
+DEFAULT_QUERY_LIMIT = 100
+COUNT_GROUPS = ("device", "day")
+
+
+def _timestamp_of(entry):  # type: (JsonDict) -> int
+    try:
+        return int(entry.get("timestamp", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def day_key(timestamp):  # type: (int) -> str
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+def format_timestamp(timestamp):  # type: (int) -> str
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def select_page(timestamps, lo, hi, limit, before=None, after=None):
+    # type: (List[int], int, int, int, Optional[int], Optional[int]) -> Tuple[int, int, bool]
+    """Pick ``[start, end)`` from the sorted ``timestamps[lo:hi]`` window.
+
+    Pages walk backwards from the newest entry unless only ``after`` is
+    given. A page never splits a run of equal timestamps, so the cursor
+    returned to the caller cannot skip rows that share the boundary second.
+    """
+    if before is not None:
+        hi = max(lo, min(hi, bisect.bisect_left(timestamps, before, lo, hi)))
+    if after is not None:
+        lo = min(hi, max(lo, bisect.bisect_right(timestamps, after, lo, hi)))
+    if after is not None and before is None:
+        end = min(hi, lo + limit)
+        while lo < end < hi and timestamps[end] == timestamps[end - 1]:
+            end += 1
+        return lo, end, end < hi
+    start = max(lo, hi - limit)
+    while lo < start < hi and timestamps[start - 1] == timestamps[start]:
+        start -= 1
+    return start, hi, start > lo
+
+
+def page_payload(entries, total, has_more):  # type: (JsonList, int, bool) -> JsonDict
+    """Shape a page (oldest first) the way ``/api/activity-logs`` returns it."""
+    logs = []  # type: JsonList
+    for entry in entries:
+        row = dict(entry)
+        row["formatted_time"] = format_timestamp(_timestamp_of(entry))
+        logs.append(row)
+    return {
+        "logs": logs,
+        "total": total,
+        "has_more": has_more,
+        "next_before": _timestamp_of(entries[0]) if entries and has_more else None,
+        "next_after": _timestamp_of(entries[-1]) if entries else None,
+    }
+
+
+class ActivityLogIndex(object):
+    """Sorted per-device and per-day views over one snapshot of the log.
+
+    Range filters and cursors are answered with ``bisect`` on the sorted
+    timestamp lists, so a query touches only the rows it returns plus two
+    binary searches instead of rescanning the full history.
+    """
+
+    def __init__(self, logs):  # type: (JsonList) -> None
+        valid = [entry for entry in logs if isinstance(entry, dict)]
+        order = sorted(range(len(valid)), key=lambda position: _timestamp_of(valid[position]))
+        self.entries = [valid[position] for position in order]  # type: JsonList
+        self.timestamps = [_timestamp_of(entry) for entry in self.entries]  # type: List[int]
+        self.days = [day_key(timestamp) for timestamp in self.timestamps]  # type: List[str]
+        self.device_timestamps = {}  # type: Dict[str, List[int]]
+        self.device_positions = {}  # type: Dict[str, List[int]]
+        self.day_counts = {}  # type: Dict[str, int]
+        for position, entry in enumerate(self.entries):
+            device = str(entry.get("device", ""))
+            self.device_timestamps.setdefault(device, []).append(self.timestamps[position])
+            self.device_positions.setdefault(device, []).append(position)
+            self.day_counts[self.days[position]] = self.day_counts.get(self.days[position], 0) + 1
+
+    def __len__(self):  # type: () -> int
+        return len(self.entries)
+
+    def _window(self, timestamps, since, until):  # type: (List[int], Optional[int], Optional[int]) -> Tuple[int, int]
+        lo = bisect.bisect_left(timestamps, since) if since is not None else 0
+        hi = bisect.bisect_right(timestamps, until) if until is not None else len(timestamps)
+        return lo, max(lo, hi)
+
+    def query(self, device=None, since=None, until=None, before=None, after=None, limit=DEFAULT_QUERY_LIMIT):
+        # type: (Optional[str], Optional[int], Optional[int], Optional[int], Optional[int], int) -> JsonDict
+        if device:
+            timestamps = self.device_timestamps.get(device, [])
+            positions = self.device_positions.get(device, [])  # type: Optional[List[int]]
+        else:
+            timestamps = self.timestamps
+            positions = None
+        lo, hi = self._window(timestamps, since, until)
+        start, end, has_more = select_page(timestamps, lo, hi, max(1, limit), before, after)
+        if positions is None:
+            page = self.entries[start:end]
+        else:
+            page = [self.entries[position] for position in positions[start:end]]
+        return page_payload(page, hi - lo, has_more)
+
+    def iter_entries(self, device=None, since=None, until=None):
+        # type: (Optional[str], Optional[int], Optional[int]) -> Iterator[JsonDict]
+        """Entries inside the window, oldest first, without copying it."""
+        if device:
+            timestamps = self.device_timestamps.get(device, [])
+            positions = self.device_positions.get(device, [])
+            lo, hi = self._window(timestamps, since, until)
+            for offset in range(lo, hi):
+                yield self.entries[positions[offset]]
+            return
+        lo, hi = self._window(self.timestamps, since, until)
+        for position in range(lo, hi):
+            yield self.entries[position]
+
+    def count(self, group_by="device", since=None, until=None):
+        # type: (str, Optional[int], Optional[int]) -> JsonDict
+        if group_by == "day":
+            if since is None and until is None:
+                counts = dict(self.day_counts)
+            else:
+                lo, hi = self._window(self.timestamps, since, until)
+                counts = {}
+                for day in self.days[lo:hi]:
+                    counts[day] = counts.get(day, 0) + 1
+        else:
+            counts = {}
+            for device, timestamps in self.device_timestamps.items():
+                lo, hi = self._window(timestamps, since, until)
+                if hi > lo:
+                    counts[device] = hi - lo
+        return {"counts": counts, "total": sum(counts.values())}
+
+
+class ActivityLogIndexCache(object):
+    """Rebuild an ``ActivityLogIndex`` only when the log version changes."""
+
+    def __init__(self, load_fn, version_fn):  # type: (Callable[[], JsonList], Callable[[], Any]) -> None
+        self.load_fn = load_fn
+        self.version_fn = version_fn
+        self._lock = threading.Lock()  # type: threading.Lock
+        self._version = None  # type: Any
+        self._index = None  # type: Optional[ActivityLogIndex]
+
+    def get(self):  # type: () -> ActivityLogIndex
+        # Take the version before loading: a write that lands in between
+        # leaves a stale version behind and forces a rebuild next time.
+        version = self.version_fn()
+        with self._lock:
+            if self._index is not None and version is not None and version == self._version:
+                return self._index
+            index = ActivityLogIndex(self.load_fn())
+            self._index = index
+            self._version = version
+            return index
+
+    def invalidate(self):  # type: () -> None
+        with self._lock:
+            self._index = None
+            self._version = None
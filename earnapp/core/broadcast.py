@@ -0,0 +1,216 @@
+"""Shared status collector that fans change events out to live subscribers."""
+
+from __future__ import absolute_import
+
+import itertools
+import json
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from earnapp.core.use_cases import get_all_device_statuses
+
+JsonDict = Dict[str, Any]
+
+STREAM_POLL_INTERVAL = 30.0
+STREAM_QUEUE_SIZE = 100
+STREAM_LOG_BATCH = 100
+STATUS_VOLATILE_KEYS = ("snapshot_age", "cached")
+
+
+class Subscription(object):
+    """One client's bounded event queue.
+
+    A client that stops draining its queue is closed instead of blocking the
+    collector; it reconnects and receives a fresh snapshot.
+    """
+
+    def __init__(self, maxsize=STREAM_QUEUE_SIZE):  # type: (int) -> None
+        self._queue = queue.Queue(maxsize)  # type: Any
+        self.closed = False  # type: bool
+
+    def put(self, event):  # type: (JsonDict) -> bool
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.closed = True
+            return False
+
+    def get(self, timeout=None):  # type: (Optional[float]) -> Optional[JsonDict]
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def _stable_status(payload):  # type: (JsonDict) -> JsonDict
+    return dict((key, value) for key, value in payload.items() if key not in STATUS_VOLATILE_KEYS)
+
+
+def _mapping_delta(previous, current):  # type: (JsonDict, JsonDict) -> Optional[JsonDict]
+    changed = dict((key, value) for key, value in current.items() if previous.get(key) != value)
+    removed = [key for key in previous if key not in current]
+    if not changed and not removed:
+        return None
+    return {"changed": changed, "removed": removed}
+
+
+class StatusBroadcaster(object):
+    """Poll devices once per interval for every connected client.
+
+    The collector thread only runs probes while at least one subscriber is
+    connected, and each cycle is shared by all of them, so N open tabs cost
+    one probe cycle. Subscribers receive ``status``, ``health``,
+    ``activity_log``, ``schedules`` and ``auto_restart`` events carrying
+    only what changed since the previous cycle.
+    """
+
+    def __init__(self, storage, interval=STREAM_POLL_INTERVAL, status_fn=None, queue_size=STREAM_QUEUE_SIZE, background=True):
+        # type: (Any, float, Optional[Callable[[], JsonDict]], int, bool) -> None
+        self.storage = storage
+        self.interval = interval  # type: float
+        self.status_fn = status_fn or (lambda: get_all_device_statuses(storage))
+        self.queue_size = queue_size  # type: int
+        self.background = background  # type: bool
+        self._lock = threading.Lock()  # type: threading.Lock
+        self._subscribers = []  # type: List[Subscription]
+        self._wake = threading.Event()  # type: threading.Event
+        self._stop = threading.Event()  # type: threading.Event
+        self._thread = None  # type: Optional[threading.Thread]
+        self._ids = itertools.count(1)
+        self._statuses = None  # type: Optional[Dict[str, JsonDict]]
+        self._mappings = {}  # type: Dict[str, JsonDict]
+        self._log_cursor = None  # type: Optional[int]
+        self._log_seen = set()  # type: set
+
+    def subscribe(self):  # type: () -> Subscription
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            self._subscribers.append(subscription)
+            if self._statuses is not None:
+                subscription.put(self._event("status", {"devices": list(self._statuses.values()), "removed": [], "full": True}))
+            for topic, snapshot in self._mappings.items():
+                subscription.put(self._event(topic, {"changed": snapshot, "removed": [], "full": True}))
+            needs_cycle = self._statuses is None
+        self._ensure_running()
+        if needs_cycle:
+            self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription):  # type: (Subscription) -> None
+        subscription.closed = True
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def subscriber_count(self):  # type: () -> int
+        with self._lock:
+            return len(self._subscribers)
+
+    def request_refresh(self):  # type: () -> None
+        """Run the next collection cycle now, e.g. after a device action."""
+        self._wake.set()
+
+    def stop(self):  # type: () -> None
+        self._stop.set()
+        self._wake.set()
+
+    def collect_once(self):  # type: () -> None
+        self._collect_mapping("schedules", self.storage.load_schedules)
+        self._collect_mapping("auto_restart", self.storage.load_auto_restart)
+        self._collect_activity_log()
+        self._collect_statuses()
+
+    def publish(self, topic, payload):  # type: (str, JsonDict) -> None
+        event = self._event(topic, payload)
+        with self._lock:
+            for subscription in list(self._subscribers):
+                if not subscription.put(event):
+                    self._subscribers.remove(subscription)
+
+    def _event(self, topic, payload):  # type: (str, JsonDict) -> JsonDict
+        return {"id": next(self._ids), "event": topic, "data": payload}
+
+    def _ensure_running(self):  # type: () -> None
+        if not self.background:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="status-broadcaster")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):  # type: () -> None
+        while not self._stop.is_set():
+            if self.subscriber_count():
+                try:
+                    self.collect_once()
+                except Exception as exc:
+                    print("Status stream collector error: {0}".format(exc))
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _collect_mapping(self, topic, load_fn):  # type: (str, Callable[[], JsonDict]) -> None
+        current = load_fn()
+        with self._lock:
+            previous = self._mappings.get(topic)
+            self._mappings[topic] = current
+        if previous is None:
+            self.publish(topic, {"changed": current, "removed": [], "full": True})
+            return
+        delta = _mapping_delta(previous, current)
+        if delta is not None:
+            delta["full"] = False
+            self.publish(topic, delta)
+
+    def _collect_activity_log(self):  # type: () -> None
+        if self._log_cursor is None:
+            page = self.storage.query_activity_log(limit=1)
+            self._log_cursor = page.get("next_after") or 0
+            self._log_seen = set(json.dumps(log, sort_keys=True) for log in page.get("logs", []))
+            return
+        # Re-read the cursor's own second: entries appended within it after
+        # the last cycle would otherwise fall behind an exclusive cursor.
+        page = self.storage.query_activity_log(after=self._log_cursor - 1, limit=STREAM_LOG_BATCH)
+        fresh = []
+        for log in page.get("logs", []):
+            key = json.dumps(log, sort_keys=True)
+            if key not in self._log_seen:
+                fresh.append(log)
+        if page.get("next_after") is not None and page["next_after"] != self._log_cursor:
+            self._log_seen = set()
+            self._log_cursor = page["next_after"]
+        for log in page.get("logs", []):
+            if log.get("timestamp") == self._log_cursor:
+                self._log_seen.add(json.dumps(log, sort_keys=True))
+        if fresh:
+            self.publish("activity_log", {"logs": fresh})
+
+    def _collect_statuses(self):  # type: () -> None
+        current = dict((payload["name"], payload) for payload in self.status_fn().get("devices", []))
+        previous = self._statuses
+        with self._lock:
+            self._statuses = current
+        if previous is None:
+            self.publish("status", {"devices": list(current.values()), "removed": [], "full": True})
+            return
+        changed = [
+            payload
+            for name, payload in current.items()
+            if name not in previous or _stable_status(previous[name]) != _stable_status(payload)
+        ]
+        removed = [name for name in previous if name not in current]
+        if changed or removed:
+            self.publish("status", {"devices": changed, "removed": removed, "full": False})
+        health = [
+            {"name": name, "health": payload.get("health")}
+            for name, payload in current.items()
+            if name in previous and previous[name].get("health") != payload.get("health")
+        ]
+        if health:
+            self.publish("health", {"devices": health})
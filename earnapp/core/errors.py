@@ -11,3 +11,7 @@ class RuntimeConfigError(EarnAppError):
 
 class StorageError(EarnAppError):
     """Raised when runtime storage cannot be read or written safely."""
+
+
+class SshPoolTimeout(EarnAppError):
+    """Raised when no pooled SSH channel frees up before the command timeout."""
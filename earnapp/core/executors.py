@@ -2,10 +2,19 @@
 
 from __future__ import absolute_import
 
+import asyncio
+import codecs
+import collections
+import contextlib
+import shutil
+import signal
 import subprocess
 import re
 import os
+import threading
+import time
 
+from earnapp.core.errors import SshPoolTimeout
 from earnapp.core.models import CommandResult
 
 try:
@@ -16,6 +25,21 @@ except ImportError:  # pragma: no cover - optional dependency
 
 UNKNOWN_DEVICE_TYPE_MESSAGE = "❌ Tipe device tidak dikenali."
 SSH_IMPORT_ERROR_MESSAGE = "❌ SSH error: paramiko tidak terinstall."
+SSH_POOL_IDLE_TIMEOUT = 300.0
+SSH_POOL_MAX_CHANNELS = 4
+ADB_STATE_TTL = 30.0
+# adb client errors raised before the shell command runs, so retrying after
+# a reconnect cannot execute the command twice.
+ADB_DISCONNECTED_MARKERS = ("error: device ", "error: no devices", "error: closed")
+ADB_CONNECT_FAILURE_MARKERS = ("failed to connect", "unable to connect", "cannot connect")
+FLEET_MAX_CONCURRENCY = 32
+STREAM_BUFFER_CHARS = 64 * 1024
+STREAM_CHUNK_SIZE = 4096
+STREAM_IDLE_POLL = 0.05
+
+# Python 3.6 has no get_running_loop; inside a coroutine get_event_loop
+# returns the running loop there.
+_running_loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)
 
 
 def _pipe():
@@ -29,6 +53,13 @@ def _read_stream(stream):
     return data or ""
 
 
+def _time_left(deadline, timeout):
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise TimeoutError("Command melebihi {0} detik".format(timeout))
+    return remaining
+
+
 def _combine_output(stdout, stderr):
     stdout = (stdout or "").strip()
     stderr = (stderr or "").strip()
@@ -37,6 +68,187 @@ def _combine_output(stdout, stderr):
     return stdout or stderr
 
 
+def _decode_output(data):
+    if isinstance(data, bytes):
+        return data.decode(errors="replace")
+    return data or ""
+
+
+async def _run_process_async(argv, timeout, cwd=None, merge_stderr=False):
+    """Async twin of ``subprocess.run`` for one argv; raises ``TimeoutExpired``.
+
+    The child gets its own session so a timeout kills the whole process
+    group (e.g. ``sh -c`` plus its children) and the pipes close promptly.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *argv,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT if merge_stderr else asyncio.subprocess.PIPE,
+        start_new_session=True
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        stdout, stderr = await process.communicate()
+        raise subprocess.TimeoutExpired(argv, timeout, output=_decode_output(stdout), stderr=_decode_output(stderr))
+    return subprocess.CompletedProcess(argv, process.returncode, _decode_output(stdout), _decode_output(stderr))
+
+
+def _kill_process_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+
+class OutputRingBuffer(object):
+    """Keep only the last ``limit`` characters written to it."""
+
+    def __init__(self, limit=STREAM_BUFFER_CHARS):
+        self.limit = max(1, int(limit))
+        self.dropped = 0
+        self._chunks = collections.deque()
+        self._size = 0
+
+    def append(self, text):
+        if not text:
+            return
+        self._chunks.append(text)
+        self._size += len(text)
+        while self._size > self.limit:
+            excess = self._size - self.limit
+            head = self._chunks[0]
+            if len(head) <= excess:
+                self._chunks.popleft()
+                self._size -= len(head)
+                self.dropped += len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                self._size -= excess
+                self.dropped += excess
+
+    def text(self):
+        return "".join(self._chunks)
+
+
+class CommandStream(object):
+    """Output of one running command, chunk by chunk.
+
+    Iterating yields text chunks as the device produces them; when the
+    command ends, ``result`` holds a ``CommandResult`` built from the ring
+    buffer (the last ``limit`` characters, ``extra["truncated"]`` if more
+    was dropped). Nothing runs until the first chunk is requested, and
+    closing the iterator early stops the command.
+    """
+
+    def __init__(self, producer, limit=STREAM_BUFFER_CHARS, error_format="{0}"):
+        self.buffer = OutputRingBuffer(limit)
+        self.result = None
+        self._producer = producer
+        self._error_format = error_format
+        self._guard = None
+
+    @classmethod
+    def from_result(cls, result):
+        stream = cls(iter(()))
+        stream.result = result
+        return stream
+
+    def hold(self, guard_factory):
+        """Run the command inside ``guard_factory()`` (e.g. a device lock)."""
+        self._guard = guard_factory
+        return self
+
+    def __iter__(self):
+        if self.result is not None:
+            return
+        guard = self._guard() if self._guard is not None else contextlib.ExitStack()
+        with guard:
+            try:
+                while True:
+                    try:
+                        chunk = next(self._producer)
+                    except StopIteration as stop:
+                        outcome = stop.value or (0, None)
+                        break
+                    if chunk:
+                        self.buffer.append(chunk)
+                        yield chunk
+            except Exception as exc:
+                outcome = (1, self._error_format.format(exc))
+            finally:
+                self._producer.close()
+        self.result = self._build_result(*outcome)
+
+    def wait(self):
+        for _chunk in self:
+            pass
+        return self.result
+
+    def _build_result(self, exit_code, failure_message):
+        output = self.buffer.text().strip()
+        if exit_code == 0:
+            message = output
+        else:
+            message = failure_message or output or "❌ Command gagal dengan exit code {0}".format(exit_code)
+        return CommandResult(
+            stdout=output,
+            stderr="",
+            exit_code=exit_code,
+            success=exit_code == 0,
+            message=message,
+            extra={"combined_output": output, "truncated": self.buffer.dropped > 0, "dropped_chars": self.buffer.dropped},
+        )
+
+
+def _stream_process(popen_fn, timeout, timeout_message):
+    """Yield lines from a child's merged stdout/stderr; return ``(exit_code, message)``."""
+    process = popen_fn()
+    timed_out = threading.Event()
+
+    def expire():
+        timed_out.set()
+        _kill_process_group(process)
+
+    timer = threading.Timer(timeout, expire)
+    timer.daemon = True
+    timer.start()
+    try:
+        for line in iter(process.stdout.readline, ""):
+            yield line
+        exit_code = process.wait()
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            _kill_process_group(process)
+            process.wait()
+        process.stdout.close()
+    if timed_out.is_set():
+        return 124, timeout_message
+    return exit_code, None
+
+
+def _line_buffered_popen(subprocess_module, command, shell=False, cwd=None):
+    return subprocess_module.Popen(
+        command,
+        shell=shell,
+        cwd=cwd,
+        stdout=subprocess_module.PIPE,
+        stderr=subprocess_module.STDOUT,
+        universal_newlines=True,
+        bufsize=1,
+        start_new_session=True,
+    )
+
+
 def _device_value(device, key, default=None):
     if hasattr(device, key):
         value = getattr(device, key)
@@ -72,11 +284,74 @@ def _validate_adb_host(host):
     return host
 
 
+class BinaryResolver(object):
+    """Cache ``shutil.which`` lookups keyed by name, ``PATH`` and base path.
+
+    A cached path is re-used while its inode and mtime are unchanged; a
+    replaced, upgraded or removed binary triggers a fresh lookup. Misses are
+    not cached so a later install is picked up on the next command.
+    """
+
+    def __init__(self, which_fn=None, environ=None):
+        self.which = which_fn if which_fn is not None else shutil.which
+        self.environ = environ if environ is not None else os.environ
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        return (stat_result.st_dev, stat_result.st_ino, stat_result.st_mtime_ns)
+
+    @staticmethod
+    def _search_path(path_env, base_path):
+        # The command runs with cwd=base_path, so relative PATH entries
+        # resolve there too, as they would for the shell.
+        if not base_path:
+            return path_env
+        entries = []
+        for entry in path_env.split(os.pathsep):
+            entries.append(entry if os.path.isabs(entry) else os.path.join(base_path, entry or "."))
+        return os.pathsep.join(entries)
+
+    def resolve(self, name, base_path=None):
+        path_env = self.environ.get("PATH", os.defpath)
+        key = (name, path_env, base_path or None)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None and self._signature(cached[0]) == cached[1]:
+            return cached[0]
+
+        resolved = self.which(name, path=self._search_path(path_env, base_path))
+        signature = self._signature(resolved) if resolved else None
+        with self._lock:
+            if signature is None:
+                self._cache.pop(key, None)
+                return None
+            self._cache[key] = (resolved, signature)
+        return resolved
+
+    def clear(self):
+        with self._lock:
+            self._cache = {}
+
+
+_BINARY_RESOLVER = BinaryResolver()
+
+
+def default_binary_resolver():
+    return _BINARY_RESOLVER
+
+
 class LocalExecutor(object):
-    def __init__(self, base_path=None, missing_earnapp_message=None, subprocess_module=None):
+    def __init__(self, base_path=None, missing_earnapp_message=None, subprocess_module=None, resolver=None):
         self.base_path = base_path
         self.missing_earnapp_message = missing_earnapp_message or "❌ EarnApp tidak ditemukan di sistem."
         self.subprocess = subprocess_module or subprocess
+        self.resolver = resolver if resolver is not None else default_binary_resolver()
 
     def _full_command(self, cmd):
         return cmd
@@ -96,45 +371,60 @@ class LocalExecutor(object):
         if not cmd.startswith("earnapp"):
             return cmd, None
 
-        which_result = self.subprocess.run(
-            ["which", "earnapp"],
-            stdout=_pipe(),
-            stderr=_pipe(),
-            universal_newlines=True,
-        )
-        if which_result.returncode != 0:
+        earnapp_path = self.resolver.resolve("earnapp", self._working_dir())
+        if not earnapp_path:
             return None, CommandResult(
                 stdout="",
-                stderr=(which_result.stderr or "").strip(),
-                exit_code=which_result.returncode,
+                stderr="",
+                exit_code=1,
                 success=False,
                 message=self.missing_earnapp_message,
             )
 
-        earnapp_path = (which_result.stdout or "").strip()
         if cmd.startswith("earnapp "):
             cmd = cmd.replace("earnapp ", "{0} ".format(earnapp_path), 1)
         elif cmd.strip() == "earnapp":
             cmd = earnapp_path
         return cmd, None
 
-    def execute_result(self, cmd, timeout=20):
+    def _prepare(self, cmd):
+        """Return ``(full_cmd, cwd, error_result)`` for one command."""
         full_cmd = self._full_command(cmd)
         full_cmd, error_result = self._rewrite_earnapp_command(full_cmd)
         if error_result is not None:
-            return error_result
+            return None, None, error_result
         if full_cmd is None:
-            return CommandResult(stdout="", stderr="", exit_code=1, success=False, message=self.missing_earnapp_message)
+            return None, None, CommandResult(stdout="", stderr="", exit_code=1, success=False, message=self.missing_earnapp_message)
 
         cwd = self._working_dir()
         if self.base_path and cwd is None:
-            return CommandResult(
+            return None, None, CommandResult(
                 stdout="",
                 stderr="",
                 exit_code=1,
                 success=False,
                 message="❌ Path local device tidak valid.",
             )
+        return full_cmd, cwd, None
+
+    @staticmethod
+    def _timeout_result(raw_output, timeout):
+        raw_output = raw_output or ""
+        if isinstance(raw_output, bytes):
+            raw_output = raw_output.decode(errors="replace")
+        message = "❌ Command timeout setelah {0} detik".format(timeout)
+        return CommandResult(
+            stdout=(raw_output or "").strip(),
+            stderr="",
+            exit_code=124,
+            success=False,
+            message=message,
+        )
+
+    def execute_result(self, cmd, timeout=20):
+        full_cmd, cwd, error_result = self._prepare(cmd)
+        if error_result is not None:
+            return error_result
 
         try:
             output = self.subprocess.check_output(  # pyright: ignore[reportCallIssue]
@@ -148,17 +438,7 @@ class LocalExecutor(object):
             output = (output or "").strip()
             return CommandResult(stdout=output, stderr="", exit_code=0, success=True, message=output)
         except self.subprocess.TimeoutExpired as exc:
-            raw_output = exc.output or ""
-            if isinstance(raw_output, bytes):
-                raw_output = raw_output.decode(errors="replace")
-            message = "❌ Command timeout setelah {0} detik".format(timeout)
-            return CommandResult(
-                stdout=(raw_output or "").strip(),
-                stderr="",
-                exit_code=124,
-                success=False,
-                message=message,
-            )
+            return self._timeout_result(exc.output, timeout)
         except self.subprocess.CalledProcessError as exc:
             raw_output = exc.output or ""
             message = (raw_output or str(exc)).strip()
@@ -170,6 +450,37 @@ class LocalExecutor(object):
                 message=message,
             )
 
+    def execute_stream(self, cmd, timeout=20, limit=STREAM_BUFFER_CHARS):
+        full_cmd, cwd, error_result = self._prepare(cmd)
+        if error_result is not None:
+            return CommandStream.from_result(error_result)
+        return CommandStream(
+            _stream_process(
+                lambda: _line_buffered_popen(self.subprocess, full_cmd, shell=True, cwd=cwd),
+                timeout,
+                "❌ Command timeout setelah {0} detik".format(timeout),
+            ),
+            limit,
+        )
+
+    async def execute_result_async(self, cmd, timeout=20):
+        """``execute_result`` on the running event loop via ``sh -c``."""
+        full_cmd, cwd, error_result = self._prepare(cmd)
+        if error_result is not None:
+            return error_result
+
+        try:
+            completed = await _run_process_async(["/bin/sh", "-c", full_cmd], timeout, cwd=cwd, merge_stderr=True)
+        except subprocess.TimeoutExpired as exc:
+            return self._timeout_result(exc.output, timeout)
+        except OSError as exc:
+            return CommandResult(stdout="", stderr="", exit_code=1, success=False, message=str(exc))
+        output = (completed.stdout or "").strip()
+        if completed.returncode == 0:
+            return CommandResult(stdout=output, stderr="", exit_code=0, success=True, message=output)
+        message = output or str(subprocess.CalledProcessError(completed.returncode, full_cmd))
+        return CommandResult(stdout=output, stderr="", exit_code=completed.returncode, success=False, message=message)
+
     def execute(self, cmd, timeout=20):
         result = self.execute_result(cmd, timeout=timeout)
         if result.success:
@@ -177,21 +488,221 @@ class LocalExecutor(object):
         return result.message.strip()
 
 
+class _PooledSshConnection(object):
+    def __init__(self, max_channels):
+        self.lock = threading.Lock()
+        self.channels = threading.BoundedSemaphore(max_channels)
+        self.client = None
+        self.password = None
+        self.last_used = 0.0
+        # Users of ``client``; replaced clients still in use move to
+        # ``retired`` with their own count and close when it reaches zero.
+        self.in_use = 0
+        self.retired = {}
+        # Threads between ``_entry_for`` and the end of ``connection``;
+        # guarded by the pool lock so ``prune`` never drops a live entry.
+        self.holders = 0
+
+
+class SshConnectionPool(object):
+    """Keep authenticated SSH transports warm, keyed by (host, port, user).
+
+    Each command opens a new channel on the pooled transport instead of
+    paying for TCP setup, key exchange and password auth again. Transports
+    idle longer than ``idle_timeout`` or no longer active are reconnected,
+    and at most ``max_channels`` commands share one transport at a time.
+    Entries for hosts with no transport and nobody waiting are pruned.
+    """
+
+    def __init__(self, idle_timeout=SSH_POOL_IDLE_TIMEOUT, max_channels=SSH_POOL_MAX_CHANNELS, time_fn=None):
+        self.idle_timeout = idle_timeout
+        self.max_channels = max_channels
+        self._time = time_fn if time_fn is not None else time.time
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @staticmethod
+    def key_for(host, port, username):
+        return (str(host), int(port), str(username))
+
+    def _entry_for(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _PooledSshConnection(self.max_channels)
+                self._entries[key] = entry
+            entry.holders += 1
+            return entry
+
+    def _release_entry(self, entry):
+        with self._lock:
+            entry.holders -= 1
+
+    @staticmethod
+    def _is_alive(client):
+        try:
+            transport = client.get_transport()
+        except Exception:
+            return False
+        return transport is not None and transport.is_active()
+
+    @staticmethod
+    def _close_client(client):
+        if client is None:
+            return
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    def _detach(self, entry):
+        """Drop ``entry.client`` from the pool; caller holds ``entry.lock``."""
+        client = entry.client
+        if client is not None:
+            if entry.in_use > 0:
+                entry.retired[client] = entry.retired.get(client, 0) + entry.in_use
+            else:
+                self._close_client(client)
+        entry.client = None
+        entry.in_use = 0
+
+    def _checkout(self, entry, password, connect_fn):
+        with entry.lock:
+            now = self._time()
+            client = entry.client
+            stale = (
+                client is None
+                or entry.password != password
+                or (entry.in_use == 0 and now - entry.last_used > self.idle_timeout)
+                or not self._is_alive(client)
+            )
+            if not stale:
+                entry.in_use += 1
+                entry.last_used = now
+                return client, True
+            self._detach(entry)
+        # Dial without the entry lock so checkins and prune for this host
+        # are not stuck behind a slow handshake.
+        client = connect_fn()
+        with entry.lock:
+            current = entry.client
+            if current is not None and entry.password == password and self._is_alive(current):
+                # Another thread dialed meanwhile; share its transport.
+                self._close_client(client)
+                client, reused = current, True
+            else:
+                self._detach(entry)
+                entry.client = client
+                entry.password = password
+                reused = False
+            entry.in_use += 1
+            entry.last_used = self._time()
+            return client, reused
+
+    def _checkin(self, entry, client, broken):
+        with entry.lock:
+            entry.last_used = self._time()
+            if entry.client is client:
+                entry.in_use -= 1
+                if broken:
+                    self._detach(entry)
+                return
+            remaining = entry.retired.get(client, 0) - 1
+            if remaining > 0:
+                entry.retired[client] = remaining
+            else:
+                entry.retired.pop(client, None)
+                self._close_client(client)
+
+    @contextlib.contextmanager
+    def connection(self, key, password, connect_fn, timeout=None):
+        """Yield ``(client, reused)`` for ``key``, dialing only when needed."""
+        self.prune()
+        entry = self._entry_for(key)
+        try:
+            if not entry.channels.acquire(timeout=timeout):
+                raise SshPoolTimeout("Semua channel SSH ke {0}:{1} sedang dipakai".format(key[0], key[1]))
+            try:
+                client, reused = self._checkout(entry, password, connect_fn)
+                broken = False
+                try:
+                    yield client, reused
+                except Exception:
+                    broken = not self._is_alive(client)
+                    raise
+                finally:
+                    self._checkin(entry, client, broken)
+            finally:
+                entry.channels.release()
+        finally:
+            self._release_entry(entry)
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return
+        with entry.lock:
+            self._detach(entry)
+
+    def prune(self):
+        now = self._time()
+        with self._lock:
+            entries = list(self._entries.items())
+        for _key, entry in entries:
+            with entry.lock:
+                if entry.client is not None and entry.in_use == 0 and now - entry.last_used > self.idle_timeout:
+                    self._close_client(entry.client)
+                    entry.client = None
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.holders:
+                    continue
+                with entry.lock:
+                    if entry.client is None and not entry.retired:
+                        del self._entries[key]
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries = {}
+        for entry in entries:
+            with entry.lock:
+                self._close_client(entry.client)
+                entry.client = None
+                entry.in_use = 0
+                for client in list(entry.retired):
+                    self._close_client(client)
+                entry.retired.clear()
+
+    def __len__(self):
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if entry.client is not None)
+
+
+_SSH_POOL = SshConnectionPool()
+
+
+def default_ssh_pool():
+    return _SSH_POOL
+
+
+def close_ssh_connections():
+    _SSH_POOL.close_all()
+
+
 class SshExecutor(object):
-    def __init__(self, host, port, username, password, paramiko_module=None):
+    def __init__(self, host, port, username, password, paramiko_module=None, pool=None):
         self.host = host
         self.port = port
         self.username = username
         self.password = password
         self.paramiko = paramiko_module if paramiko_module is not None else paramiko
+        self.pool = pool if pool is not None else default_ssh_pool()
 
-    def execute_result(self, cmd, timeout=20):
-        if self.paramiko is None:
-            return CommandResult(stdout="", stderr="", exit_code=1, success=False, message=SSH_IMPORT_ERROR_MESSAGE)
-
-        ssh = None
+    def _connect(self, timeout):
+        ssh = self.paramiko.SSHClient()
         try:
-            ssh = self.paramiko.SSHClient()
             ssh.set_missing_host_key_policy(self.paramiko.AutoAddPolicy())
             ssh.connect(
                 hostname=self.host,
@@ -200,7 +711,107 @@ class SshExecutor(object):
                 password=self.password,
                 timeout=timeout,
             )
-            stdin, stdout, stderr = ssh.exec_command(cmd, timeout=timeout)
+        except Exception:
+            try:
+                ssh.close()
+            except Exception:
+                pass
+            raise
+        return ssh
+
+    def _pool_key(self):
+        return SshConnectionPool.key_for(self.host, _validate_port(self.port, 22), self.username)
+
+    def execute_result(self, cmd, timeout=20):
+        if self.paramiko is None:
+            return CommandResult(stdout="", stderr="", exit_code=1, success=False, message=SSH_IMPORT_ERROR_MESSAGE)
+
+        try:
+            key = self._pool_key()
+            # Waiting for a channel, dialing and running share one budget.
+            deadline = time.time() + timeout
+            connect_fn = lambda: self._connect(_time_left(deadline, timeout))
+            for attempt in range(2):
+                with self.pool.connection(key, self.password, connect_fn, timeout=_time_left(deadline, timeout)) as (ssh, reused):
+                    try:
+                        stdin, stdout, stderr = ssh.exec_command(cmd, timeout=_time_left(deadline, timeout))
+                    except Exception:
+                        # A warm transport can die between the liveness check
+                        # and opening the channel; the command never ran, so
+                        # dial again once.
+                        if not reused or attempt:
+                            raise
+                        self.pool.discard(key)
+                        continue
+                    return self._read_result(stdout, stderr, _time_left(deadline, timeout))
+        except Exception as exc:
+            return CommandResult(stdout="", stderr="", exit_code=1, success=False, message="❌ SSH error: {0}".format(exc))
+
+    def execute_stream(self, cmd, timeout=20, limit=STREAM_BUFFER_CHARS):
+        if self.paramiko is None:
+            return CommandStream.from_result(
+                CommandResult(stdout="", stderr="", exit_code=1, success=False, message=SSH_IMPORT_ERROR_MESSAGE)
+            )
+        return CommandStream(self._stream_channel(cmd, timeout), limit, "❌ SSH error: {0}")
+
+    def _stream_channel(self, cmd, timeout):
+        key = self._pool_key()
+        deadline = time.time() + timeout
+        connect_fn = lambda: self._connect(_time_left(deadline, timeout))
+        for attempt in range(2):
+            with self.pool.connection(key, self.password, connect_fn, timeout=_time_left(deadline, timeout)) as (ssh, reused):
+                try:
+                    _stdin, stdout, _stderr = ssh.exec_command(cmd, timeout=_time_left(deadline, timeout))
+                except Exception:
+                    if not reused or attempt:
+                        raise
+                    self.pool.discard(key)
+                    continue
+                result = yield from self._drain_channel(stdout.channel, timeout, deadline)
+                return result
+        return 1, None
+
+    @staticmethod
+    def _drain_channel(channel, timeout, deadline):
+        # Poll the channel instead of blocking in read() so stdout and
+        # stderr chunks are forwarded in the order they arrive.
+        decoders = (codecs.getincrementaldecoder("utf-8")("replace"), codecs.getincrementaldecoder("utf-8")("replace"))
+        try:
+            while True:
+                progressed = False
+                if channel.recv_ready():
+                    data = channel.recv(STREAM_CHUNK_SIZE)
+                    progressed = bool(data)
+                    yield decoders[0].decode(data)
+                if channel.recv_stderr_ready():
+                    data = channel.recv_stderr(STREAM_CHUNK_SIZE)
+                    progressed = progressed or bool(data)
+                    yield decoders[1].decode(data)
+                if progressed:
+                    continue
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    break
+                if time.time() > deadline:
+                    return 124, "❌ SSH timeout: Command melebihi {0} detik".format(timeout)
+                time.sleep(STREAM_IDLE_POLL)
+            yield decoders[0].decode(b"", final=True) + decoders[1].decode(b"", final=True)
+            return channel.recv_exit_status(), None
+        finally:
+            # Like _stream_process killing its group: a consumer that stops
+            # early (GeneratorExit) must not leave the remote command running.
+            channel.close()
+
+    async def execute_result_async(self, cmd, timeout=20, executor=None):
+        """Run the blocking paramiko call on ``executor`` (default pool).
+
+        The pooled transport already multiplexes channels per host, so a
+        worker thread per in-flight SSH command is the cheap part here.
+        """
+        loop = _running_loop()
+        return await loop.run_in_executor(executor, self.execute_result, cmd, timeout)
+
+    def _read_result(self, stdout, stderr, timeout):
+        try:
             try:
                 stdout.channel.settimeout(timeout)
                 stderr.channel.settimeout(timeout)
@@ -209,23 +820,22 @@ class SshExecutor(object):
             out = _read_stream(stdout)
             err = _read_stream(stderr)
             exit_code = stdout.channel.recv_exit_status()
-            combined = _combine_output(out, err)
-            return CommandResult(
-                stdout=(out or "").strip(),
-                stderr=(err or "").strip(),
-                exit_code=exit_code,
-                success=exit_code == 0,
-                message=combined or "❌ SSH command failed with exit code {0}".format(exit_code),
-                extra={"combined_output": combined},
-            )
-        except Exception as exc:
-            return CommandResult(stdout="", stderr="", exit_code=1, success=False, message="❌ SSH error: {0}".format(exc))
         finally:
-            if ssh is not None:
-                try:
-                    ssh.close()
-                except Exception:
-                    pass
+            # The transport stays pooled, so a read that timed out must
+            # close the session or the remote command keeps running.
+            try:
+                stdout.channel.close()
+            except Exception:
+                pass
+        combined = _combine_output(out, err)
+        return CommandResult(
+            stdout=(out or "").strip(),
+            stderr=(err or "").strip(),
+            exit_code=exit_code,
+            success=exit_code == 0,
+            message=combined or "❌ SSH command failed with exit code {0}".format(exit_code),
+            extra={"combined_output": combined},
+        )
 
     def execute(self, cmd, timeout=20):
         result = self.execute_result(cmd, timeout=timeout)
@@ -236,11 +846,97 @@ class SshExecutor(object):
         return combined if combined else "(no output)"
 
 
+def _adb_output_has(result, markers):
+    text = _combine_output(result.stdout, result.stderr).lower()
+    return any(marker in text for marker in markers)
+
+
+def parse_adb_devices(output):
+    """Parse ``adb devices`` output into ``{serial: state}``."""
+    states = {}
+    for line in (output or "").splitlines():
+        line = line.strip()
+        if not line or line.startswith("List of devices") or line.startswith("*"):
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            states[parts[0]] = parts[1]
+    return states
+
+
+class AdbConnectionRegistry(object):
+    """Remember which ADB serials are connected so commands skip ``adb connect``.
+
+    A serial counts as connected when a connect or shell command succeeded
+    within ``ttl`` seconds, or when the shared ``adb devices`` snapshot
+    (itself refreshed at most once per ``ttl``) lists it in ``device`` state.
+    """
+
+    def __init__(self, ttl=ADB_STATE_TTL, time_fn=None):
+        self.ttl = ttl
+        self._time = time_fn if time_fn is not None else time.time
+        self._lock = threading.Lock()
+        self._confirmed = {}
+        self._snapshot = {}
+        self._snapshot_at = None
+
+    def is_connected(self, serial, list_devices_fn):
+        known = self.cached_state(serial)
+        if known is not None:
+            return known
+        return self.record_devices(serial, list_devices_fn())
+
+    def cached_state(self, serial):
+        """True/False from fresh state, or None when ``adb devices`` is needed."""
+        now = self._time()
+        with self._lock:
+            confirmed_at = self._confirmed.get(serial)
+            if confirmed_at is not None and now - confirmed_at <= self.ttl:
+                return True
+            snapshot_fresh = self._snapshot_at is not None and now - self._snapshot_at <= self.ttl
+            if snapshot_fresh:
+                return self._snapshot.get(serial) == "device"
+        return None
+
+    def record_devices(self, serial, output):
+        """Store an ``adb devices`` listing and report whether ``serial`` is in it."""
+        if output is None:
+            return False
+        snapshot = parse_adb_devices(output)
+        with self._lock:
+            self._snapshot = snapshot
+            self._snapshot_at = self._time()
+        return snapshot.get(serial) == "device"
+
+    def mark_connected(self, serial):
+        with self._lock:
+            self._confirmed[serial] = self._time()
+
+    def invalidate(self, serial):
+        with self._lock:
+            self._confirmed.pop(serial, None)
+            self._snapshot.pop(serial, None)
+
+    def clear(self):
+        with self._lock:
+            self._confirmed = {}
+            self._snapshot = {}
+            self._snapshot_at = None
+
+
+_ADB_REGISTRY = AdbConnectionRegistry()
+
+
+def default_adb_registry():
+    return _ADB_REGISTRY
+
+
 class AdbExecutor(object):
-    def __init__(self, host, port, subprocess_module=None):
+    def __init__(self, host, port, subprocess_module=None, registry=None):
         self.host = host
         self.port = port
         self.subprocess = subprocess_module or subprocess
+        self.registry = registry if registry is not None else default_adb_registry()
 
     def _run(self, command, timeout):
         return self.subprocess.run(
@@ -252,41 +948,78 @@ class AdbExecutor(object):
             timeout=timeout,
         )
 
+    async def _run_async(self, command, timeout):
+        return await _run_process_async(command, timeout)
+
+    def _list_devices(self, timeout):
+        result = self._run(["adb", "devices"], timeout)
+        if result.returncode != 0:
+            return None
+        return result.stdout or ""
+
+    def _connect(self, serial, timeout):
+        return self._connect_result(serial, self._run(["adb", "connect", serial], timeout))
+
+    def _connect_result(self, serial, connect_result):
+        if connect_result.returncode != 0:
+            self.registry.invalidate(serial)
+            combined = _combine_output(connect_result.stdout, connect_result.stderr)
+            return CommandResult(
+                stdout=(connect_result.stdout or "").strip(),
+                stderr=(connect_result.stderr or "").strip(),
+                exit_code=connect_result.returncode,
+                success=False,
+                message=combined or "❌ ADB connect gagal",
+                extra={"combined_output": combined},
+            )
+        if not _adb_output_has(connect_result, ADB_CONNECT_FAILURE_MARKERS):
+            self.registry.mark_connected(serial)
+        return None
+
+    @staticmethod
+    def _shell_command(serial, cmd):
+        if cmd.startswith("shell "):
+            return ["adb", "-s", serial] + cmd.split(" ", 1)
+        return ["adb", "-s", serial, "shell", cmd]
+
+    def _shell(self, serial, cmd, timeout):
+        return self._shell_result(self._run(self._shell_command(serial, cmd), timeout))
+
+    @staticmethod
+    def _shell_result(result):
+        stdout = (result.stdout or "").strip()
+        stderr = (result.stderr or "").strip()
+        combined = _combine_output(stdout, stderr)
+        return CommandResult(
+            stdout=stdout,
+            stderr=stderr,
+            exit_code=result.returncode,
+            success=result.returncode == 0,
+            message=combined,
+            extra={"combined_output": combined},
+        )
+
+    def _is_disconnected(self, result):
+        return not result.success and _adb_output_has(result, ADB_DISCONNECTED_MARKERS)
+
     def execute_result(self, cmd, timeout=20):
         try:
             host = _validate_adb_host(self.host)
             port = _validate_port(self.port, 5555)
             serial = "{0}:{1}".format(host, port)
 
-            connect_result = self._run(["adb", "connect", serial], timeout)
-            if connect_result.returncode != 0:
-                combined = _combine_output(connect_result.stdout, connect_result.stderr)
-                return CommandResult(
-                    stdout=(connect_result.stdout or "").strip(),
-                    stderr=(connect_result.stderr or "").strip(),
-                    exit_code=connect_result.returncode,
-                    success=False,
-                    message=combined or "❌ ADB connect gagal",
-                    extra={"combined_output": combined},
-                )
-
-            if cmd.startswith("shell "):
-                adb_cmd = ["adb", "-s", serial] + cmd.split(" ", 1)
-            else:
-                adb_cmd = ["adb", "-s", serial, "shell", cmd]
+            if self.registry.is_connected(serial, lambda: self._list_devices(timeout)):
+                result = self._shell(serial, cmd, timeout)
+                if not self._is_disconnected(result):
+                    if result.success:
+                        self.registry.mark_connected(serial)
+                    return result
+                self.registry.invalidate(serial)
 
-            result = self._run(adb_cmd, timeout)
-            stdout = (result.stdout or "").strip()
-            stderr = (result.stderr or "").strip()
-            combined = _combine_output(stdout, stderr)
-            return CommandResult(
-                stdout=stdout,
-                stderr=stderr,
-                exit_code=result.returncode,
-                success=result.returncode == 0,
-                message=combined,
-                extra={"combined_output": combined},
-            )
+            connect_error = self._connect(serial, timeout)
+            if connect_error is not None:
+                return connect_error
+            return self._shell(serial, cmd, timeout)
         except ValueError as exc:
             return CommandResult(
                 stdout="",
@@ -312,6 +1045,75 @@ class AdbExecutor(object):
                 message="❌ ADB error: {0}".format(exc),
             )
 
+    def execute_stream(self, cmd, timeout=20, limit=STREAM_BUFFER_CHARS):
+        """Connect if needed, then stream ``adb shell`` output line by line.
+
+        Unlike ``execute_result`` there is no retry after a disconnect error:
+        output may already have been forwarded by then.
+        """
+        try:
+            host = _validate_adb_host(self.host)
+            port = _validate_port(self.port, 5555)
+            serial = "{0}:{1}".format(host, port)
+            if not self.registry.is_connected(serial, lambda: self._list_devices(timeout)):
+                connect_error = self._connect(serial, timeout)
+                if connect_error is not None:
+                    return CommandStream.from_result(connect_error)
+        except self.subprocess.TimeoutExpired:
+            return CommandStream.from_result(
+                CommandResult(stdout="", stderr="", exit_code=1, success=False, message="❌ ADB timeout: Command melebihi {0} detik".format(timeout))
+            )
+        except Exception as exc:
+            return CommandStream.from_result(
+                CommandResult(stdout="", stderr="", exit_code=1, success=False, message="❌ ADB error: {0}".format(exc))
+            )
+        command = self._shell_command(serial, cmd)
+        return CommandStream(
+            _stream_process(
+                lambda: _line_buffered_popen(self.subprocess, command),
+                timeout,
+                "❌ ADB timeout: Command melebihi {0} detik".format(timeout),
+            ),
+            limit,
+            "❌ ADB error: {0}",
+        )
+
+    async def execute_result_async(self, cmd, timeout=20):
+        """Same connect/retry flow as ``execute_result`` without blocking the loop."""
+        try:
+            host = _validate_adb_host(self.host)
+            port = _validate_port(self.port, 5555)
+            serial = "{0}:{1}".format(host, port)
+
+            connected = self.registry.cached_state(serial)
+            if connected is None:
+                listing = await self._run_async(["adb", "devices"], timeout)
+                connected = self.registry.record_devices(serial, (listing.stdout or "") if listing.returncode == 0 else None)
+            if connected:
+                result = self._shell_result(await self._run_async(self._shell_command(serial, cmd), timeout))
+                if not self._is_disconnected(result):
+                    if result.success:
+                        self.registry.mark_connected(serial)
+                    return result
+                self.registry.invalidate(serial)
+
+            connect_error = self._connect_result(serial, await self._run_async(["adb", "connect", serial], timeout))
+            if connect_error is not None:
+                return connect_error
+            return self._shell_result(await self._run_async(self._shell_command(serial, cmd), timeout))
+        except ValueError as exc:
+            return CommandResult(stdout="", stderr="", exit_code=1, success=False, message="❌ ADB error: {0}".format(exc))
+        except subprocess.TimeoutExpired:
+            return CommandResult(
+                stdout="",
+                stderr="",
+                exit_code=1,
+                success=False,
+                message="❌ ADB timeout: Command melebihi {0} detik".format(timeout),
+            )
+        except Exception as exc:
+            return CommandResult(stdout="", stderr="", exit_code=1, success=False, message="❌ ADB error: {0}".format(exc))
+
     def execute(self, cmd, timeout=20):
         result = self.execute_result(cmd, timeout=timeout)
         if not result.success:
@@ -354,3 +1156,69 @@ def run_device_command(device, cmd, timeout=20):
     except ValueError as exc:
         return str(exc)
     return executor.execute(cmd, timeout=timeout)
+
+
+def run_device_command_stream(device, cmd, timeout=20, limit=STREAM_BUFFER_CHARS):
+    try:
+        executor = executor_for_device(device)
+    except ValueError as exc:
+        return CommandStream.from_result(CommandResult(stdout="", stderr="", exit_code=1, success=False, message=str(exc)))
+    return executor.execute_stream(cmd, timeout=timeout, limit=limit)
+
+
+async def run_device_command_result_async(device, cmd, timeout=20):
+    try:
+        executor = executor_for_device(device)
+    except ValueError as exc:
+        return CommandResult(stdout="", stderr="", exit_code=1, success=False, message=str(exc))
+    return await executor.execute_result_async(cmd, timeout=timeout)
+
+
+async def iter_fleet_commands(devices, cmd, timeout=20, limit=FLEET_MAX_CONCURRENCY, executor_factory=None):
+    """Run ``cmd`` on every device in ``devices`` (name -> device) concurrently.
+
+    Async generator yielding ``(name, CommandResult)`` as each device
+    finishes, with at most ``limit`` commands in flight. Failures,
+    including unexpected exceptions, come back as unsuccessful
+    ``CommandResult`` values. Closing the generator early cancels the
+    commands still pending.
+    """
+    factory = executor_factory or executor_for_device
+    semaphore = asyncio.Semaphore(max(1, int(limit or 1)))
+
+    async def run_one(name, device):
+        async with semaphore:
+            try:
+                executor = factory(device)
+                result = await executor.execute_result_async(cmd, timeout=timeout)
+            except Exception as exc:
+                result = CommandResult(stdout="", stderr="", exit_code=1, success=False, message=str(exc))
+        return name, result
+
+    tasks = [asyncio.ensure_future(run_one(name, device)) for name, device in devices.items()]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_fleet_commands(devices, cmd, timeout=20, limit=FLEET_MAX_CONCURRENCY, on_result=None, executor_factory=None):
+    """Collect ``iter_fleet_commands`` into a dict in completion order.
+
+    ``on_result(name, result)`` is called as each device finishes; if it
+    raises, the commands still pending are cancelled before the error
+    propagates.
+    """
+    results = {}
+    fleet = iter_fleet_commands(devices, cmd, timeout, limit, executor_factory)
+    try:
+        async for name, result in fleet:
+            results[name] = result
+            if on_result is not None:
+                on_result(name, result)
+    finally:
+        await fleet.aclose()
+    return results
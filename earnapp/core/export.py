@@ -0,0 +1,143 @@
+"""Streaming CSV/JSON export of the activity log."""
+
+from __future__ import absolute_import
+
+import csv
+import io
+import json
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+JsonDict = Dict[str, Any]
+
+EXPORT_FORMATS = ("csv", "json")
+EXPORT_MIMETYPES = {"csv": "text/csv", "json": "application/json"}
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_SPOOL_BYTES = 1024 * 1024
+CSV_HEADER = ("Timestamp", "Date", "Time", "Device", "Action", "Type", "User", "Result")
+CSV_RESULT_CHARS = 200
+
+
+def _timestamp(entry):  # type: (JsonDict) -> int
+    try:
+        return int(entry.get("timestamp", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _csv_row(entry):  # type: (JsonDict) -> List[Any]
+    timestamp = _timestamp(entry)
+    moment = datetime.fromtimestamp(timestamp)
+    return [
+        timestamp,
+        moment.strftime("%Y-%m-%d"),
+        moment.strftime("%H:%M:%S"),
+        entry.get("device", ""),
+        entry.get("action", ""),
+        entry.get("type", ""),
+        entry.get("user", ""),
+        str(entry.get("result", "") or "")[:CSV_RESULT_CHARS],
+    ]
+
+
+def iter_csv(entries):  # type: (Iterable[JsonDict]) -> Iterator[str]
+    """One CSV line per entry, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue()
+    for entry in entries:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(_csv_row(entry))
+        yield buffer.getvalue()
+
+
+def iter_json(entries):  # type: (Iterable[JsonDict]) -> Iterator[str]
+    """A JSON array written one entry at a time."""
+    yield "["
+    separator = "\n"
+    for entry in entries:
+        yield separator + json.dumps(entry, ensure_ascii=False)
+        separator = ",\n"
+    yield "\n]\n"
+
+
+def iter_export(entries, fmt="csv", compress=False, chunk_bytes=EXPORT_CHUNK_BYTES):
+    # type: (Iterable[JsonDict], str, bool, int) -> Iterator[bytes]
+    """Encode the export as UTF-8 chunks of about ``chunk_bytes``, gzip optional."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError("format harus salah satu dari: {0}".format(", ".join(EXPORT_FORMATS)))
+    lines = iter_csv(entries) if fmt == "csv" else iter_json(entries)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    pending = []  # type: List[bytes]
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        if compressor is not None:
+            data = compressor.compress(data)
+            if not data:
+                continue
+        pending.append(data)
+        size += len(data)
+        if size >= chunk_bytes:
+            yield b"".join(pending)
+            pending = []
+            size = 0
+    if compressor is not None:
+        pending.append(compressor.flush())
+    tail = b"".join(pending)
+    if tail:
+        yield tail
+
+
+class CountingIterator(object):
+    """Pass entries through while counting them."""
+
+    def __init__(self, entries):  # type: (Iterable[JsonDict]) -> None
+        self._entries = iter(entries)
+        self.count = 0  # type: int
+
+    def __iter__(self):  # type: () -> CountingIterator
+        return self
+
+    def __next__(self):  # type: () -> JsonDict
+        entry = next(self._entries)
+        self.count += 1
+        return entry
+
+
+def write_export(entries, fmt="csv", compress=False, spool_bytes=EXPORT_SPOOL_BYTES):
+    # type: (Iterable[JsonDict], str, bool, int) -> Tuple[Any, int]
+    """Write the export into a spooled temp file (RAM up to ``spool_bytes``).
+
+    Returns ``(file, rows)`` with the file rewound; the caller closes it.
+    """
+    counted = CountingIterator(entries)
+    handle = tempfile.SpooledTemporaryFile(max_size=spool_bytes, mode="w+b")
+    try:
+        for chunk in iter_export(counted, fmt, compress):
+            handle.write(chunk)
+        handle.seek(0)
+    except Exception:
+        handle.close()
+        raise
+    return handle, counted.count
+
+
+def export_filename(fmt, device=None, since=None, until=None, compress=False, now=None):
+    # type: (str, Optional[str], Optional[int], Optional[int], bool, Optional[float]) -> str
+    parts = ["activity_log"]
+    if device:
+        parts.append("".join(char if char.isalnum() or char in "-_" else "_" for char in device))
+    if since is not None or until is not None:
+        parts.append("{0}_{1}".format(
+            time.strftime("%Y%m%d", time.localtime(since)) if since is not None else "awal",
+            time.strftime("%Y%m%d", time.localtime(until)) if until is not None else "sekarang",
+        ))
+    else:
+        parts.append(time.strftime("%Y%m%d-%H%M%S", time.localtime(now if now is not None else time.time())))
+    return "_".join(parts) + "." + fmt + (".gz" if compress else "")
@@ -0,0 +1,174 @@
+"""Bounded background runner for bulk device actions started from the Web UI."""
+
+from __future__ import absolute_import
+
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+JsonDict = Dict[str, Any]
+
+JOB_MAX_WORKERS = 2
+JOB_RETENTION = 50
+JOB_RETENTION_SECONDS = 3600
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class Job(object):
+    """One bulk action: per-device results fill in while it runs."""
+
+    def __init__(self, job_id, kind, devices, created_at, sequence):
+        # type: (str, str, List[str], float, int) -> None
+        self.id = job_id  # type: str
+        self.kind = kind  # type: str
+        self.devices = list(devices)  # type: List[str]
+        self.created_at = created_at  # type: float
+        self.sequence = sequence  # type: int
+        self.started_at = None  # type: Optional[float]
+        self.finished_at = None  # type: Optional[float]
+        self.status = JOB_QUEUED  # type: str
+        self.error = None  # type: Optional[str]
+        self.cancel_event = threading.Event()  # type: threading.Event
+        self._lock = threading.Lock()  # type: threading.Lock
+        self._results = {}  # type: Dict[str, JsonDict]
+
+    @property
+    def finished(self):  # type: () -> bool
+        return self.status in FINISHED_STATES
+
+    def record(self, item):  # type: (JsonDict) -> None
+        """``on_result`` callback handed to the bulk use case."""
+        with self._lock:
+            self._results[str(item.get("device"))] = dict(item)
+
+    def to_dict(self):  # type: () -> JsonDict
+        with self._lock:
+            results = dict(self._results)
+        progress = {}
+        for device_name in self.devices:
+            item = results.get(device_name)
+            if item is None:
+                progress[device_name] = JOB_RUNNING if self.status == JOB_RUNNING else "pending"
+            elif item.get("cancelled"):
+                progress[device_name] = JOB_CANCELLED
+            elif item.get("skipped"):
+                progress[device_name] = "skipped"
+            else:
+                progress[device_name] = "done" if item.get("success") else JOB_FAILED
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "total": len(self.devices),
+            "completed": len(results),
+            "progress": progress,
+            "results": [results[name] for name in self.devices if name in results],
+            "success": self.status == JOB_SUCCEEDED,
+            "cancel_requested": self.cancel_event.is_set(),
+            "error": self.error,
+        }
+
+
+class JobRunner(object):
+    """Run bulk jobs on ``max_workers`` threads and keep recent results.
+
+    ``submit`` returns at once with a queued ``Job``; the job function is
+    called as ``fn(on_result, cancel_event)`` and returns the usual bulk
+    payload. At most ``retention`` finished jobs are kept, none older than
+    ``max_age`` seconds.
+    """
+
+    def __init__(self, max_workers=JOB_MAX_WORKERS, retention=JOB_RETENTION, max_age=JOB_RETENTION_SECONDS, time_fn=None):
+        # type: (int, int, float, Optional[Callable[[], float]]) -> None
+        self.retention = retention  # type: int
+        self.max_age = max_age  # type: float
+        self.time_fn = time_fn or time.time
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers or 1)))
+        self._lock = threading.Lock()  # type: threading.Lock
+        self._jobs = {}  # type: Dict[str, Job]
+        self._sequence = itertools.count()
+
+    def submit(self, kind, devices, fn, on_finish=None):
+        # type: (str, List[str], Callable[[Any, threading.Event], JsonDict], Optional[Callable[[Job], None]]) -> Job
+        job = Job(uuid.uuid4().hex[:12], kind, devices, self.time_fn(), next(self._sequence))
+        with self._lock:
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, on_finish)
+        return job
+
+    def get(self, job_id):  # type: (str) -> Optional[Job]
+        self.prune()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):  # type: () -> List[Job]
+        self.prune()
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.sequence, reverse=True)
+
+    def cancel(self, job_id):  # type: (str) -> Optional[Job]
+        """Stop devices that have not started yet; running devices finish."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        return job
+
+    def prune(self):  # type: () -> None
+        now = self.time_fn()
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished),
+                key=lambda job: job.sequence,
+                reverse=True,
+            )
+            for position, job in enumerate(finished):
+                expired = job.finished_at is not None and now - job.finished_at > self.max_age
+                if position >= self.retention or expired:
+                    del self._jobs[job.id]
+
+    def shutdown(self, wait=True):  # type: (bool) -> None
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_event.set()
+        self._pool.shutdown(wait=wait)
+
+    def _run(self, job, fn, on_finish):
+        # type: (Job, Callable[[Any, threading.Event], JsonDict], Optional[Callable[[Job], None]]) -> None
+        job.started_at = self.time_fn()
+        if job.cancel_event.is_set():
+            job.status = JOB_CANCELLED
+        else:
+            job.status = JOB_RUNNING
+            try:
+                payload = fn(job.record, job.cancel_event)
+                for item in payload.get("results", []) if isinstance(payload, dict) else []:
+                    job.record(item)
+                if job.cancel_event.is_set():
+                    job.status = JOB_CANCELLED
+                elif isinstance(payload, dict) and payload.get("success"):
+                    job.status = JOB_SUCCEEDED
+                else:
+                    job.status = JOB_FAILED
+            except Exception as exc:
+                job.error = str(exc)
+                job.status = JOB_FAILED
+        job.finished_at = self.time_fn()
+        if on_finish is not None:
+            try:
+                on_finish(job)
+            except Exception as exc:
+                print("Error in job finish callback: {0}".format(exc))
+        self.prune()
@@ -0,0 +1,284 @@
+"""Outbound notification queue: one sender thread, rate limited and coalesced."""
+
+from __future__ import absolute_import
+
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+NOTIFY_RATE = 1.0
+NOTIFY_BURST = 3
+NOTIFY_COALESCE_WINDOW = 2.0
+NOTIFY_MAX_PENDING = 500
+NOTIFY_MAX_CHARS = 4000
+NOTIFY_MAX_ATTEMPTS = 3
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+DIGEST_HEADER = "📬 *{0} notifikasi*"
+DROPPED_NOTICE = "⚠️ {0} notifikasi lama dibuang karena antrian penuh"
+TRUNCATED_SUFFIX = "\n\n…(dipotong)"
+CODE_FENCE_CLOSE = "\n```"
+
+_RETRY_AFTER_RE = re.compile(r"retry after (\d+)", re.IGNORECASE)
+
+
+def retry_after_seconds(exc):  # type: (BaseException) -> Optional[float]
+    """``retry_after`` from a Telegram 429 error, or None for other errors.
+
+    Understands pyTelegramBotAPI's ``ApiTelegramException`` (``error_code``
+    and ``result_json``) without importing it, plus the "retry after N"
+    text used in its message.
+    """
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        result_json = getattr(exc, "result_json", None)
+        if isinstance(result_json, dict):
+            value = (result_json.get("parameters") or {}).get("retry_after")
+    if value is None and (getattr(exc, "error_code", None) == 429 or "Too Many Requests" in str(exc)):
+        match = _RETRY_AFTER_RE.search(str(exc))
+        value = match.group(1) if match else 1
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket(object):
+    """``rate`` tokens per second up to ``capacity``; ``pause`` empties it."""
+
+    def __init__(self, rate=NOTIFY_RATE, capacity=NOTIFY_BURST, time_fn=None):
+        # type: (float, int, Optional[Callable[[], float]]) -> None
+        self.rate = float(rate)
+        self.capacity = float(max(1, capacity))
+        self.time_fn = time_fn or time.monotonic
+        self.tokens = self.capacity
+        self.updated = self.time_fn()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):  # type: (float) -> None
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self):  # type: () -> float
+        """Seconds until a token is available (0 when one is ready now)."""
+        now = self.time_fn()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+    def acquire(self, sleep_fn):  # type: (Callable[[float], Any]) -> None
+        while True:
+            wait_seconds = self.delay()
+            if wait_seconds <= 0:
+                self.tokens -= 1
+                return
+            sleep_fn(wait_seconds)
+
+    def pause(self, seconds):  # type: (float) -> None
+        now = self.time_fn()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = max(self.updated, self.blocked_until)
+
+
+def _truncate(part, max_chars):  # type: (str, int) -> str
+    if len(part) <= max_chars:
+        return part
+    head = part[:max_chars - len(TRUNCATED_SUFFIX) - len(CODE_FENCE_CLOSE)].rstrip("`")
+    if head.count("```") % 2:
+        # The cut landed inside a code block; close it so Markdown still parses.
+        head += CODE_FENCE_CLOSE
+    return head + TRUNCATED_SUFFIX
+
+
+def _group_digests(messages, dropped, max_chars):
+    # type: (List[str], int, int) -> List[List[str]]
+    parts = ([DROPPED_NOTICE.format(dropped)] if dropped else []) + list(messages)
+    parts = [_truncate(part, max_chars) for part in parts]
+    groups = []  # type: List[List[str]]
+    size = 0
+    header_room = len(DIGEST_HEADER.format(len(parts))) + len(DIGEST_SEPARATOR)
+    for part in parts:
+        added = len(part) + len(DIGEST_SEPARATOR)
+        if not groups or size + added + header_room > max_chars:
+            groups.append([])
+            size = 0
+        groups[-1].append(part)
+        size += added
+    return groups
+
+
+def _render_digest(group):  # type: (List[str]) -> str
+    if len(group) == 1:
+        return group[0]
+    return DIGEST_HEADER.format(len(group)) + DIGEST_SEPARATOR + DIGEST_SEPARATOR.join(group)
+
+
+def build_digests(messages, dropped=0, max_chars=NOTIFY_MAX_CHARS):
+    # type: (List[str], int, int) -> List[str]
+    """Join queued messages into as few texts of at most ``max_chars`` as possible."""
+    return [_render_digest(group) for group in _group_digests(messages, dropped, max_chars)]
+
+
+def _is_client_error(exc):  # type: (BaseException) -> bool
+    try:
+        code = int(getattr(exc, "error_code", 0) or 0)
+    except (TypeError, ValueError):
+        return False
+    return 400 <= code < 500
+
+
+class NotificationQueue(object):
+    """Deliver notifications from one thread so callers never block on I/O.
+
+    ``enqueue`` only appends to an in-memory queue. The sender waits
+    ``coalesce_window`` seconds after the first pending message so bursts
+    (several schedules firing together, bulk actions) go out as one digest,
+    then sends through a token bucket. A 429 pauses the bucket for the
+    ``retry_after`` Telegram asked for and retries the same text without
+    counting an attempt. Other errors are retried up to ``max_attempts``
+    times, except 4xx errors (a 400 will fail the same way again). When a
+    digest still fails, its messages are sent one by one, and a message
+    that fails on its own is tried once more through ``plain_send_fn``
+    (no Markdown) before it is dropped. When more than ``max_pending``
+    messages wait, the oldest are dropped and the next digest says how many.
+    """
+
+    def __init__(self, send_fn, rate=NOTIFY_RATE, burst=NOTIFY_BURST, coalesce_window=NOTIFY_COALESCE_WINDOW,
+                 max_pending=NOTIFY_MAX_PENDING, max_chars=NOTIFY_MAX_CHARS, max_attempts=NOTIFY_MAX_ATTEMPTS,
+                 time_fn=None, sleep_fn=None, plain_send_fn=None):
+        # type: (Callable[[str], Any], float, int, float, int, int, int, Optional[Callable[[], float]], Optional[Callable[[float], Any]], Optional[Callable[[str], Any]]) -> None
+        self.send_fn = send_fn
+        self.plain_send_fn = plain_send_fn
+        self.coalesce_window = coalesce_window  # type: float
+        self.max_pending = max(1, max_pending)  # type: int
+        self.max_chars = max_chars  # type: int
+        self.max_attempts = max(1, max_attempts)  # type: int
+        self.time_fn = time_fn or time.monotonic
+        self.bucket = TokenBucket(rate, burst, self.time_fn)
+        self.sent = 0  # type: int
+        self.failed = 0  # type: int
+        self._sleep_fn = sleep_fn
+        self._cond = threading.Condition()
+        self._pending = deque()  # type: Deque[Tuple[float, str]]
+        self._dropped = 0  # type: int
+        self._stopping = False  # type: bool
+        self._stop_event = threading.Event()  # type: threading.Event
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def __len__(self):  # type: () -> int
+        with self._cond:
+            return len(self._pending)
+
+    def enqueue(self, message):  # type: (str) -> None
+        if not message:
+            return
+        with self._cond:
+            self._pending.append((self.time_fn(), message))
+            while len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self._dropped += 1
+            self._cond.notify()
+
+    def drain(self):  # type: () -> int
+        """Send everything pending now (as digests); return the texts delivered."""
+        with self._cond:
+            messages = [message for _, message in self._pending]
+            dropped = self._dropped
+            self._pending.clear()
+            self._dropped = 0
+        if not messages:
+            return 0
+        delivered = 0
+        for group in _group_digests(messages, dropped, self.max_chars):
+            delivered += self._deliver(group)
+        return delivered
+
+    def start(self):  # type: () -> NotificationQueue
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        with self._cond:
+            self._stopping = False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-sender")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):  # type: (float) -> None
+        """Flush what is pending (without waiting for the window) and stop."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._stop_event.set()
+
+    def _sleep(self, seconds):  # type: (float) -> None
+        if self._sleep_fn is not None:
+            self._sleep_fn(seconds)
+        else:
+            self._stop_event.wait(seconds)
+
+    def _send(self, send_fn, text, max_attempts):  # type: (Callable[[str], Any], str, int) -> Optional[Exception]
+        """Send ``text``; return None on success or the last error."""
+        attempt = 0
+        while True:
+            self.bucket.acquire(self._sleep)
+            try:
+                send_fn(text)
+                return None
+            except Exception as exc:
+                retry_after = retry_after_seconds(exc)
+                if retry_after is not None:
+                    # Telegram's retry_after applies to the whole bot, so
+                    # every later message waits as well.
+                    self.bucket.pause(retry_after)
+                    continue
+                attempt += 1
+                if attempt >= max_attempts or _is_client_error(exc):
+                    return exc
+                self._sleep(float(attempt))
+
+    def _deliver(self, group):  # type: (List[str]) -> int
+        """Send one digest group; return how many texts got through."""
+        text = _render_digest(group)
+        error = self._send(self.send_fn, text, self.max_attempts)
+        if error is None:
+            self.sent += 1
+            return 1
+        if len(group) > 1:
+            # One message with broken Markdown must not sink the others.
+            return sum(self._deliver([part]) for part in group)
+        if self.plain_send_fn is not None:
+            error = self._send(self.plain_send_fn, text, 1)
+            if error is None:
+                self.sent += 1
+                return 1
+        self.failed += 1
+        print("Error sending notification (dropped): {0}".format(error))
+        return 0
+
+    def _run(self):  # type: () -> None
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                deadline = self._pending[0][0] + self.coalesce_window
+                while not self._stopping:
+                    remaining = deadline - self.time_fn()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            try:
+                self.drain()
+            except Exception as exc:
+                print("Error in notification sender: {0}".format(exc))
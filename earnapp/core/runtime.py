@@ -9,6 +9,10 @@ from .errors import RuntimeConfigError
 
 
 EARNAPP_DATA_DIR_ENV = "EARNAPP_DATA_DIR"
+EARNAPP_ACTIVITY_LOG_FORMAT_ENV = "EARNAPP_ACTIVITY_LOG_FORMAT"
+EARNAPP_STORAGE_BACKEND_ENV = "EARNAPP_STORAGE_BACKEND"
+ACTIVITY_LOG_FORMATS = ("json", "jsonl")
+STORAGE_BACKENDS = ("json", "sqlite")
 
 
 class RuntimeConfig(object):
@@ -19,17 +23,34 @@ class RuntimeConfig(object):
     SCHEDULES = "schedules.json"  # type: str
     AUTO_RESTART = "auto_restart.json"  # type: str
     ACTIVITY_LOG = "activity_log.json"  # type: str
+    ACTIVITY_LOG_JSONL = "activity_log.jsonl"  # type: str
+    ACTIVITY_ARCHIVE_DIR = "activity_archive"  # type: str
+    SQLITE_DATABASE = "earnapp.db"  # type: str
+    SCHEDULER_STATE = "scheduler_state.json"  # type: str
 
-    def __init__(self, data_dir=None):  # type: (Optional[str]) -> None
+    def __init__(self, data_dir=None, activity_log_format=None, storage_backend=None):
+        # type: (Optional[str], Optional[str], Optional[str]) -> None
         self.data_dir = ""  # type: str
         self.data_dir = os.path.abspath(data_dir or self.default_data_dir())
         if not self.data_dir:
             raise RuntimeConfigError("Data directory could not be resolved")
+        self.activity_log_format = (activity_log_format or "json").strip().lower()  # type: str
+        if self.activity_log_format not in ACTIVITY_LOG_FORMATS:
+            raise RuntimeConfigError("Unknown activity log format: {0}".format(activity_log_format))
+        self.storage_backend = (storage_backend or "json").strip().lower()  # type: str
+        if self.storage_backend not in STORAGE_BACKENDS:
+            raise RuntimeConfigError("Unknown storage backend: {0}".format(storage_backend))
 
     @classmethod
     def from_env(cls):  # type: () -> RuntimeConfig
         env_data_dir = os.environ.get(EARNAPP_DATA_DIR_ENV)
-        return cls(env_data_dir if env_data_dir else None)
+        env_log_format = os.environ.get(EARNAPP_ACTIVITY_LOG_FORMAT_ENV)
+        env_backend = os.environ.get(EARNAPP_STORAGE_BACKEND_ENV)
+        return cls(
+            env_data_dir if env_data_dir else None,
+            env_log_format if env_log_format else None,
+            env_backend if env_backend else None,
+        )
 
     @staticmethod
     def project_root():  # type: () -> str
@@ -63,3 +84,15 @@ class RuntimeConfig(object):
     @property
     def activity_log_path(self):  # type: () -> str
         return self.path_for(self.ACTIVITY_LOG)
+
+    @property
+    def activity_log_jsonl_path(self):  # type: () -> str
+        return self.path_for(self.ACTIVITY_LOG_JSONL)
+
+    @property
+    def activity_archive_path(self):  # type: () -> str
+        return self.path_for(self.ACTIVITY_ARCHIVE_DIR)
+
+    @property
+    def sqlite_path(self):  # type: () -> str
+        return self.path_for(self.SQLITE_DATABASE)
@@ -0,0 +1,477 @@
+"""SQLite runtime storage with the same public surface as JsonStorage."""
+
+from __future__ import absolute_import
+
+import contextlib
+import copy
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from .activity_archive import archive_slack
+from .activity_log import DEFAULT_QUERY_LIMIT, page_payload
+from .errors import StorageError
+from .runtime import RuntimeConfig
+from .storage import (
+    DEFAULT_ACTIVITY_LOG,
+    DEFAULT_AUTO_RESTART,
+    DEFAULT_DEVICES,
+    DEFAULT_SCHEDULES,
+    JsonDict,
+    JsonList,
+    JsonStorage,
+)
+
+
+MAPPING_DEFAULTS = {
+    RuntimeConfig.DEVICES: DEFAULT_DEVICES,
+    RuntimeConfig.SCHEDULES: DEFAULT_SCHEDULES,
+    RuntimeConfig.AUTO_RESTART: DEFAULT_AUTO_RESTART,
+}  # type: Dict[str, Any]
+
+ACTIVITY_COLUMNS = ("timestamp", "device", "action", "type", "user")
+ACTIVITY_EXPORT_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (collection, key)
+);
+CREATE TABLE IF NOT EXISTS activity_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp INTEGER NOT NULL DEFAULT 0,
+    device TEXT NOT NULL DEFAULT '',
+    action TEXT NOT NULL DEFAULT '',
+    type TEXT NOT NULL DEFAULT '',
+    user TEXT NOT NULL DEFAULT '',
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS activity_log_device_timestamp ON activity_log (device, timestamp);
+CREATE INDEX IF NOT EXISTS activity_log_timestamp ON activity_log (timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _dump(value):  # type: (Any) -> str
+    return json.dumps(value, sort_keys=True)
+
+
+def _activity_row(entry):  # type: (JsonDict) -> List[Any]
+    timestamp = entry.get("timestamp", 0)
+    try:
+        timestamp = int(timestamp)
+    except (TypeError, ValueError):
+        timestamp = 0
+    row = [timestamp]  # type: List[Any]
+    for column in ACTIVITY_COLUMNS[1:]:
+        value = entry.get(column, "")
+        row.append("" if value is None else str(value))
+    row.append(json.dumps(entry))
+    return row
+
+
+class SqliteStorage(object):
+    """Store devices, schedules, auto-restart and activity log in SQLite.
+
+    Mapping files become one row per key, so ``update_json`` only rewrites
+    the rows its mutator touched. The database runs in WAL mode, letting the
+    bot and Web UI read while the other writes. ``config.json`` stays a
+    plain JSON file because it is edited by hand. Existing JSON runtime
+    files are imported once when the database is first created. Activity
+    rows trimmed from the table go to the same ``activity_archive/`` tier
+    as with JsonStorage.
+    """
+
+    def __init__(self, runtime_config=None, lock_timeout=5.0, cache=True, archive=True):
+        # type: (Optional[RuntimeConfig], float, bool, bool) -> None
+        self.runtime_config = runtime_config or RuntimeConfig.from_env()  # type: RuntimeConfig
+        self.lock_timeout = lock_timeout  # type: float
+        self.file_storage = JsonStorage(self.runtime_config, lock_timeout=lock_timeout, cache=cache, archive=archive)  # type: JsonStorage
+        self.activity_archive = self.file_storage.activity_archive
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()  # type: threading.Lock
+        self._schema_ready = False  # type: bool
+        # Shared with file_storage so config.json writes reach the same listeners.
+        self.change_listeners = self.file_storage.change_listeners  # type: List[Any]
+
+    @property
+    def database_path(self):  # type: () -> str
+        return self.runtime_config.sqlite_path
+
+    def load_config(self):  # type: () -> JsonDict
+        return self.file_storage.load_config()
+
+    def save_config(self, config):  # type: (JsonDict) -> None
+        self.file_storage.save_config(config)
+
+    def load_devices(self):  # type: () -> JsonDict
+        return self.read_json(RuntimeConfig.DEVICES, DEFAULT_DEVICES)
+
+    def save_devices(self, devices):  # type: (JsonDict) -> None
+        self.write_json(RuntimeConfig.DEVICES, devices)
+
+    def load_schedules(self):  # type: () -> JsonDict
+        return self.read_json(RuntimeConfig.SCHEDULES, DEFAULT_SCHEDULES)
+
+    def save_schedules(self, schedules):  # type: (JsonDict) -> None
+        self.write_json(RuntimeConfig.SCHEDULES, schedules)
+
+    def load_auto_restart(self):  # type: () -> JsonDict
+        return self.read_json(RuntimeConfig.AUTO_RESTART, DEFAULT_AUTO_RESTART)
+
+    def save_auto_restart(self, auto_restart):  # type: (JsonDict) -> None
+        self.write_json(RuntimeConfig.AUTO_RESTART, auto_restart)
+
+    def load_activity_log(self):  # type: () -> JsonList
+        return self.read_json(RuntimeConfig.ACTIVITY_LOG, DEFAULT_ACTIVITY_LOG)
+
+    def save_activity_log(self, logs):  # type: (JsonList) -> None
+        self.write_json(RuntimeConfig.ACTIVITY_LOG, logs)
+
+    def append_activity_log(self, entry, max_entries=None):  # type: (JsonDict, Optional[int]) -> None
+        """Insert one row; returns None like the JSON Lines backend."""
+        with self._transaction() as conn:
+            self._insert_activity(conn, [entry])
+            if max_entries:
+                self._roll_activity(conn, int(max_entries))
+        self.file_storage._notify_change(RuntimeConfig.ACTIVITY_LOG)
+        return None
+
+    def clear_activity_log(self):  # type: () -> None
+        self.save_activity_log([])
+        self.clear_activity_archive()
+
+    def clear_activity_archive(self):  # type: () -> int
+        return self.file_storage.clear_activity_archive()
+
+    def query_activity_log(self, device=None, since=None, until=None, before=None, after=None, limit=DEFAULT_QUERY_LIMIT):
+        # type: (Optional[str], Optional[int], Optional[int], Optional[int], Optional[int], int) -> JsonDict
+        """Same contract as ``ActivityLogIndex.query``, answered from SQL indexes."""
+        if self.activity_archive is None:
+            return self._query_activity(device, since, until, before, after, limit)
+        return self.activity_archive.query(self._query_activity, device, since, until, before, after, limit)
+
+    def _query_activity(self, device, since, until, before, after, limit):
+        # type: (Optional[str], Optional[int], Optional[int], Optional[int], Optional[int], int) -> JsonDict
+        limit = max(1, limit)
+        conn = self._connection()
+        where, params = self._activity_filters(device, since, until)
+        total = conn.execute("SELECT COUNT(*) FROM activity_log" + self._where(where), params).fetchone()[0]
+        if before is not None:
+            where, params = where + ["timestamp < ?"], params + [int(before)]
+        if after is not None:
+            where, params = where + ["timestamp > ?"], params + [int(after)]
+        forward = after is not None and before is None
+        direction, beyond = ("ASC", ">") if forward else ("DESC", "<")
+        select = "SELECT id, timestamp, body FROM activity_log"
+        order = " ORDER BY timestamp {0}, id {0}".format(direction)
+        rows = conn.execute(select + self._where(where) + order + " LIMIT ?", params + [limit + 1]).fetchall()
+        has_more = len(rows) > limit
+        page = rows[:limit]
+        if has_more and rows[limit][1] == page[-1][1]:
+            boundary = page[-1][1]
+            run = conn.execute(select + self._where(where + ["timestamp = ?"]) + order, params + [boundary]).fetchall()
+            page = [row for row in page if row[1] != boundary] + run
+            more = where + ["timestamp {0} ?".format(beyond)]
+            has_more = conn.execute("SELECT 1 FROM activity_log" + self._where(more) + " LIMIT 1", params + [boundary]).fetchone() is not None
+        if not forward:
+            page.reverse()
+        return page_payload([json.loads(row[2]) for row in page], total, has_more)
+
+    def count_activity_logs(self, group_by="device", since=None, until=None):
+        # type: (str, Optional[int], Optional[int]) -> JsonDict
+        if group_by == "day":
+            column = "strftime('%Y-%m-%d', timestamp, 'unixepoch', 'localtime')"
+        else:
+            column = "device"
+        where, params = self._activity_filters(None, since, until)
+        rows = self._connection().execute(
+            "SELECT {0}, COUNT(*) FROM activity_log{1} GROUP BY 1".format(column, self._where(where)),
+            params,
+        ).fetchall()
+        counts = dict((key, count) for key, count in rows)
+        payload = {"counts": counts, "total": sum(counts.values())}
+        if self.activity_archive is not None:
+            self.activity_archive.add_counts(payload, group_by, since, until)
+        return payload
+
+    def iter_activity_log(self, device=None, since=None, until=None):
+        # type: (Optional[str], Optional[int], Optional[int]) -> Iterator[JsonDict]
+        """Matching entries oldest first: archive, then the table.
+
+        Table rows come in keyset-paginated batches; each batch is a
+        separate short query, so no cursor stays open while the caller
+        consumes rows (possibly from another thread).
+        """
+        hot = self._iter_activity(device, since, until)
+        if self.activity_archive is None:
+            return hot
+        return itertools.chain(self.activity_archive.iter_entries(device, since, until), hot)
+
+    def _iter_activity(self, device, since, until):
+        # type: (Optional[str], Optional[int], Optional[int]) -> Iterator[JsonDict]
+        where, params = self._activity_filters(device, since, until)
+        last = None  # type: Optional[Any]
+        while True:
+            clauses, values = list(where), list(params)
+            if last is not None:
+                clauses.append("(timestamp > ? OR (timestamp = ? AND id > ?))")
+                values.extend([last[0], last[0], last[1]])
+            rows = self._connection().execute(
+                "SELECT id, timestamp, body FROM activity_log" + self._where(clauses)
+                + " ORDER BY timestamp, id LIMIT ?",
+                values + [ACTIVITY_EXPORT_BATCH],
+            ).fetchall()
+            for _, _, body in rows:
+                yield json.loads(body)
+            if len(rows) < ACTIVITY_EXPORT_BATCH:
+                return
+            last = (rows[-1][1], rows[-1][0])
+
+    def read_json(self, filename, default):  # type: (str, Any) -> Any
+        if filename in MAPPING_DEFAULTS:
+            return self._read_mapping(self._connection(), filename, default)
+        if filename == RuntimeConfig.ACTIVITY_LOG:
+            return self._read_activity(self._connection())
+        return self.file_storage.read_json(filename, default)
+
+    def write_json(self, filename, data):  # type: (str, Any) -> None
+        if filename in MAPPING_DEFAULTS:
+            with self._transaction() as conn:
+                current = self._read_mapping(conn, filename, {})
+                self._write_mapping(conn, filename, current, data)
+        elif filename == RuntimeConfig.ACTIVITY_LOG:
+            with self._transaction() as conn:
+                self._replace_activity(conn, data)
+        else:
+            self.file_storage.write_json(filename, data)
+            return
+        self.file_storage._notify_change(filename)
+
+    def update_json(self, filename, default, mutator):  # type: (str, Any, Any) -> Any
+        if filename in MAPPING_DEFAULTS:
+            with self._transaction() as conn:
+                data = self._read_mapping(conn, filename, default)
+                original = dict((key, _dump(value)) for key, value in data.items())
+                result = mutator(data)
+                if result is not False:
+                    self._write_mapping(conn, filename, original, data, dumped=True)
+        elif filename == RuntimeConfig.ACTIVITY_LOG:
+            with self._transaction() as conn:
+                logs = self._read_activity(conn)
+                result = mutator(logs)
+                if result is not False:
+                    self._replace_activity(conn, logs)
+        else:
+            return self.file_storage.update_json(filename, default, mutator)
+        if result is not False:
+            self.file_storage._notify_change(filename)
+        return result
+
+    def watched_files(self):  # type: () -> Dict[str, tuple]
+        """Every collection lives in one database, so any write to it marks them all."""
+        collections = tuple(MAPPING_DEFAULTS.keys()) + (RuntimeConfig.ACTIVITY_LOG,)
+        database = os.path.basename(self.database_path)
+        return {
+            RuntimeConfig.CONFIG: (RuntimeConfig.CONFIG,),
+            database: collections,
+            database + "-wal": collections,
+        }
+
+    def path_for(self, filename):  # type: (str) -> str
+        return self.runtime_config.path_for(filename)
+
+    def close(self):  # type: () -> None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _connection(self):  # type: () -> sqlite3.Connection
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        directory = os.path.dirname(self.database_path)
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as exc:
+                raise StorageError("Could not create {0}: {1}".format(directory, exc))
+        try:
+            is_new = not os.path.exists(self.database_path)
+            conn = sqlite3.connect(self.database_path, timeout=self.lock_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout={0}".format(int(self.lock_timeout * 1000)))
+        except sqlite3.Error as exc:
+            raise StorageError("Could not open {0}: {1}".format(self.database_path, exc))
+        self._local.conn = conn
+        self._ensure_schema(conn, is_new)
+        return conn
+
+    def _ensure_schema(self, conn, is_new):  # type: (sqlite3.Connection, bool) -> None
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            try:
+                conn.executescript(SCHEMA)
+            except sqlite3.Error as exc:
+                raise StorageError("Could not prepare {0}: {1}".format(self.database_path, exc))
+            self._schema_ready = True
+        if is_new:
+            self._import_json_files()
+
+    def _import_json_files(self):  # type: () -> None
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+                return
+            for filename in MAPPING_DEFAULTS:
+                if os.path.exists(self.path_for(filename)):
+                    data = self.file_storage.read_json(filename, {})
+                    if isinstance(data, dict):
+                        self._write_mapping(conn, filename, {}, data)
+            if os.path.exists(self.path_for(RuntimeConfig.ACTIVITY_LOG)):
+                logs = self.file_storage.read_json(RuntimeConfig.ACTIVITY_LOG, [])
+                if isinstance(logs, list):
+                    self._insert_activity(conn, logs)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', '1')")
+
+    @contextlib.contextmanager
+    def _transaction(self):  # type: () -> Iterator[sqlite3.Connection]
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as exc:
+            raise StorageError("Could not lock {0}: {1}".format(self.database_path, exc))
+        try:
+            yield conn
+        except BaseException:
+            # Also on KeyboardInterrupt/SystemExit: an open BEGIN would keep
+            # the write lock and break every later BEGIN on this thread.
+            conn.execute("ROLLBACK")
+            raise
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as exc:
+            raise StorageError("Could not write {0}: {1}".format(self.database_path, exc))
+
+    def _read_mapping(self, conn, collection, default):  # type: (sqlite3.Connection, str, Any) -> Any
+        try:
+            known = conn.execute("SELECT 1 FROM collections WHERE name = ?", (collection,)).fetchone()
+            if not known:
+                return copy.deepcopy(default)
+            rows = conn.execute(
+                "SELECT key, body FROM documents WHERE collection = ? ORDER BY position, key",
+                (collection,),
+            ).fetchall()
+        except sqlite3.Error as exc:
+            raise StorageError("Could not read {0} from {1}: {2}".format(collection, self.database_path, exc))
+        data = {}  # type: JsonDict
+        for key, body in rows:
+            try:
+                data[key] = json.loads(body)
+            except ValueError as exc:
+                raise StorageError("Invalid JSON for {0}/{1}: {2}".format(collection, key, exc))
+        return data
+
+    def _write_mapping(self, conn, collection, original, data, dumped=False):
+        # type: (sqlite3.Connection, str, JsonDict, Any, bool) -> None
+        if not isinstance(data, dict):
+            raise StorageError("{0} must contain a JSON object".format(collection))
+        if not dumped:
+            original = dict((key, _dump(value)) for key, value in original.items())
+        removed = [key for key in original if key not in data]
+        if removed:
+            conn.executemany(
+                "DELETE FROM documents WHERE collection = ? AND key = ?",
+                [(collection, key) for key in removed],
+            )
+        row = conn.execute("SELECT MAX(position) FROM documents WHERE collection = ?", (collection,)).fetchone()
+        next_position = (row[0] if row and row[0] is not None else -1) + 1
+        for key, value in data.items():
+            body = _dump(value)
+            if key not in original:
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (collection, key, position, body) VALUES (?, ?, ?, ?)",
+                    (collection, str(key), next_position, body),
+                )
+                next_position += 1
+            elif original[key] != body:
+                conn.execute(
+                    "UPDATE documents SET body = ? WHERE collection = ? AND key = ?",
+                    (body, collection, str(key)),
+                )
+        conn.execute("INSERT OR IGNORE INTO collections (name) VALUES (?)", (collection,))
+
+    @staticmethod
+    def _activity_filters(device, since, until):  # type: (Optional[str], Optional[int], Optional[int]) -> Any
+        where = []  # type: List[str]
+        params = []  # type: List[Any]
+        if device:
+            where.append("device = ?")
+            params.append(device)
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(int(since))
+        if until is not None:
+            where.append("timestamp <= ?")
+            params.append(int(until))
+        return where, params
+
+    @staticmethod
+    def _where(clauses):  # type: (List[str]) -> str
+        return " WHERE " + " AND ".join(clauses) if clauses else ""
+
+    def _read_activity(self, conn):  # type: (sqlite3.Connection) -> JsonList
+        try:
+            rows = conn.execute("SELECT body FROM activity_log ORDER BY id").fetchall()
+        except sqlite3.Error as exc:
+            raise StorageError("Could not read activity log from {0}: {1}".format(self.database_path, exc))
+        return [json.loads(body) for (body,) in rows]
+
+    def _insert_activity(self, conn, entries):  # type: (sqlite3.Connection, JsonList) -> None
+        conn.executemany(
+            "INSERT INTO activity_log (timestamp, device, action, type, user, body) VALUES (?, ?, ?, ?, ?, ?)",
+            [_activity_row(entry) for entry in entries if isinstance(entry, dict)],
+        )
+
+    def _roll_activity(self, conn, max_entries):  # type: (sqlite3.Connection, int) -> None
+        """Trim to the newest ``max_entries`` rows, archiving in 10% batches when enabled."""
+        if self.activity_archive is None:
+            conn.execute(
+                "DELETE FROM activity_log WHERE id <= "
+                "(SELECT id FROM activity_log ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (max_entries,),
+            )
+            return
+        total = conn.execute("SELECT COUNT(*) FROM activity_log").fetchone()[0]
+        if total <= max_entries + archive_slack(max_entries):
+            return
+        cutoff = conn.execute(
+            "SELECT id FROM activity_log ORDER BY id DESC LIMIT 1 OFFSET ?", (max_entries,)
+        ).fetchone()[0]
+        # Like split_for_archive: only rows older than every kept row move.
+        boundary = conn.execute("SELECT MIN(timestamp) FROM activity_log WHERE id > ?", (cutoff,)).fetchone()[0]
+        rows = conn.execute(
+            "SELECT body FROM activity_log WHERE id <= ? AND timestamp < ? ORDER BY id", (cutoff, boundary)
+        ).fetchall()
+        self.activity_archive.append(json.loads(body) for (body,) in rows)
+        conn.execute("DELETE FROM activity_log WHERE id <= ? AND timestamp < ?", (cutoff, boundary))
+
+    def _replace_activity(self, conn, logs):  # type: (sqlite3.Connection, Any) -> None
+        if not isinstance(logs, list):
+            raise StorageError("activity log must be a JSON list")
+        conn.execute("DELETE FROM activity_log")
+        self._insert_activity(conn, logs)
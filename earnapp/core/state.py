@@ -0,0 +1,86 @@
+"""Versioned in-memory views of the runtime collections."""
+
+from __future__ import absolute_import
+
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .runtime import RuntimeConfig
+from .watch import ChangeTracker
+
+STATE_COLLECTIONS = (
+    (RuntimeConfig.DEVICES, "load_devices", dict),
+    (RuntimeConfig.SCHEDULES, "load_schedules", dict),
+    (RuntimeConfig.AUTO_RESTART, "load_auto_restart", dict),
+    (RuntimeConfig.ACTIVITY_LOG, "load_activity_log", list),
+)
+
+
+class StateStore(object):
+    """Hold devices, schedules, auto restart settings and the activity log.
+
+    Each collection is read from storage once and then only again after a
+    change event for it (from a ``ChangeNotifier`` or, without one, from
+    the storage's own writes). Every reload replaces the value with a new
+    object and bumps that collection's version, so readers can keep a
+    reference or compare versions instead of copying. Values are shared:
+    callers must not mutate them. A failed reload keeps the previous
+    value and retries on the next read.
+    """
+
+    def __init__(self, storage, notifier=None, collections=STATE_COLLECTIONS):
+        # type: (Any, Optional[Any], Tuple[Tuple[str, str, type], ...]) -> None
+        self.storage = storage
+        self._loaders = {}  # type: Dict[str, Tuple[Callable[[], Any], type]]
+        for name, loader, kind in collections:
+            self._loaders[name] = (getattr(storage, loader), kind)
+        if notifier is not None:
+            self.tracker = notifier.tracker(self._loaders)  # type: ChangeTracker
+        else:
+            self.tracker = ChangeTracker(self._loaders)
+            storage.change_listeners.append(self.tracker.mark)
+        self._lock = threading.RLock()
+        self._values = dict((name, kind()) for name, (_, kind) in self._loaders.items())  # type: Dict[str, Any]
+        self._versions = dict((name, 0) for name in self._loaders)  # type: Dict[str, int]
+
+    def get(self, name):  # type: (str) -> Any
+        return self.snapshot(name)[1]
+
+    def version(self, name):  # type: (str) -> int
+        return self.snapshot(name)[0]
+
+    def snapshot(self, name):  # type: (str) -> Tuple[int, Any]
+        """``(version, value)`` for ``name``, reloading first if it changed."""
+        with self._lock:
+            if self.tracker.consume(name):
+                self._reload(name)
+            return self._versions[name], self._values[name]
+
+    def put(self, name, value):  # type: (str, Any) -> int
+        """Adopt a value just written through storage without reading it back."""
+        with self._lock:
+            self.tracker.consume(name)
+            self._values[name] = value
+            self._versions[name] += 1
+            return self._versions[name]
+
+    def invalidate(self, name=None):  # type: (Optional[str]) -> None
+        for key in ([name] if name is not None else list(self._loaders)):
+            self.tracker.mark(key)
+
+    def _reload(self, name):  # type: (str) -> None
+        load_fn, kind = self._loaders[name]
+        try:
+            loaded = load_fn()
+        except Exception as exc:
+            print("Error loading {0}: {1}".format(name, exc))
+            self.tracker.mark(name)
+            return
+        if loaded is None:
+            loaded = kind()
+        if not isinstance(loaded, kind):
+            print("Error loading {0}: expected {1}".format(name, "object" if kind is dict else "list"))
+            self.tracker.mark(name)
+            return
+        self._values[name] = loaded
+        self._versions[name] += 1
@@ -0,0 +1,195 @@
+"""Per-device status snapshots, cached in memory per process."""
+
+from __future__ import absolute_import
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from earnapp.core.use_cases import (
+    FANOUT_MAX_WORKERS,
+    FANOUT_TIMEOUT_MESSAGE,
+    STATUS_FANOUT_DEADLINE,
+    _device_status,
+    _fan_out,
+    _format_status_payload,
+    add_device_operation_listener,
+    remove_device_operation_listener,
+)
+
+JsonDict = Dict[str, Any]
+
+DEFAULT_STATUS_TTL = 30.0
+
+
+class StatusSnapshot(object):
+    def __init__(self, is_healthy, earnapp_status, captured_at):  # type: (bool, str, float) -> None
+        self.is_healthy = is_healthy  # type: bool
+        self.earnapp_status = earnapp_status  # type: str
+        self.captured_at = captured_at  # type: float
+        self.expires_at = None  # type: Optional[float]
+
+
+class _Flight(object):
+    def __init__(self):  # type: () -> None
+        self.done = threading.Event()  # type: threading.Event
+        self.snapshot = None  # type: Optional[StatusSnapshot]
+        self.error = None  # type: Optional[BaseException]
+
+
+class StatusSnapshotService(object):
+    """Cache device status for ``ttl`` seconds and coalesce concurrent probes.
+
+    Readers get a snapshot younger than ``max_age`` (default ``ttl``) or wait
+    on the single probe already running for that device. Every payload
+    carries ``snapshot_age`` in seconds and ``cached`` so callers can tell
+    a stored answer from a fresh one; ``fresh=True`` forces a new probe.
+    Start/stop/restart through the use cases drops the device's snapshot.
+    Snapshots fed by the background monitor stay valid until its next probe
+    of that device (``keep_until``) unless the caller passes ``max_age``.
+    Snapshots live in this process only; the bot and the Web UI each keep
+    their own service.
+    """
+
+    def __init__(
+        self,
+        storage,
+        ttl=DEFAULT_STATUS_TTL,
+        runner=None,
+        probe=True,
+        time_fn=None,
+        max_workers=FANOUT_MAX_WORKERS,
+        deadline=STATUS_FANOUT_DEADLINE,
+        invalidate_on_actions=True,
+    ):
+        # type: (Any, float, Any, bool, Optional[Callable[[], float]], int, float, bool) -> None
+        self.storage = storage
+        self.ttl = ttl  # type: float
+        self.runner = runner
+        self.probe = probe  # type: bool
+        self.time_fn = time_fn or time.time
+        self.max_workers = max_workers  # type: int
+        self.deadline = deadline  # type: float
+        self._lock = threading.Lock()  # type: threading.Lock
+        self._snapshots = {}  # type: Dict[str, StatusSnapshot]
+        self._flights = {}  # type: Dict[str, _Flight]
+        self._generations = {}  # type: Dict[str, int]
+        self._listening = invalidate_on_actions  # type: bool
+        if invalidate_on_actions:
+            add_device_operation_listener(self.invalidate)
+
+    def close(self):  # type: () -> None
+        if self._listening:
+            remove_device_operation_listener(self.invalidate)
+            self._listening = False
+
+    def get_status(self, device_name, max_age=None, fresh=False):  # type: (str, Optional[float], bool) -> Tuple[JsonDict, int]
+        devices = self.storage.load_devices()
+        if device_name not in devices:
+            return {"error": "Device tidak ditemukan"}, 404
+        dev = devices[device_name]
+        snapshot, cached = self._resolve(device_name, dev, max_age, fresh)
+        return self._payload(device_name, dev, snapshot, cached, False), 200
+
+    def get_all_statuses(self, max_age=None, fresh=False):  # type: (Optional[float], bool) -> JsonDict
+        devices = self.storage.load_devices()
+        self._forget_missing(devices)
+
+        def status_for(device_name):
+            dev = devices[device_name]
+            snapshot, cached = self._resolve(device_name, dev, max_age, fresh)
+            return self._payload(device_name, dev, snapshot, cached, True)
+
+        def timed_out(device_name):
+            payload = _format_status_payload(
+                device_name, devices[device_name], False, FANOUT_TIMEOUT_MESSAGE.format(self.deadline), True
+            )
+            payload["timeout"] = True
+            return payload
+
+        return {"devices": _fan_out(devices.keys(), status_for, timed_out, self.max_workers, self.deadline)}
+
+    def probe_health(self, device_name):  # type: (str) -> JsonDict
+        """Probe one device now, store the snapshot and return its health."""
+        payload, code = self.get_status(device_name, fresh=True)
+        if code != 200:
+            return {"healthy": False, "error": payload.get("error")}
+        if payload.get("health") == "online":
+            return {"healthy": True, "error": None}
+        return {"healthy": False, "error": "Command failed or no response"}
+
+    def record(self, device_name, is_healthy, earnapp_status, captured_at=None):
+        # type: (str, bool, str, Optional[float]) -> StatusSnapshot
+        snapshot = StatusSnapshot(bool(is_healthy), earnapp_status, captured_at if captured_at is not None else self.time_fn())
+        with self._lock:
+            self._snapshots[device_name] = snapshot
+        return snapshot
+
+    def keep_until(self, device_name, expires_at):  # type: (str, float) -> None
+        """Keep the current snapshot past ``ttl`` until the monitor's next probe."""
+        with self._lock:
+            snapshot = self._snapshots.get(device_name)
+            if snapshot is not None:
+                snapshot.expires_at = expires_at
+
+    def invalidate(self, device_name=None):  # type: (Optional[str]) -> None
+        with self._lock:
+            names = list(self._flights.keys()) + list(self._snapshots.keys()) if device_name is None else [device_name]
+            for name in names:
+                self._snapshots.pop(name, None)
+                self._generations[name] = self._generations.get(name, 0) + 1
+
+    def _resolve(self, device_name, dev, max_age, fresh):  # type: (str, JsonDict, Optional[float], bool) -> Tuple[StatusSnapshot, bool]
+        limit = self.ttl if max_age is None else max_age
+        with self._lock:
+            snapshot = self._snapshots.get(device_name)
+            if not fresh and snapshot is not None and self._is_current(snapshot, limit, max_age is None):
+                return snapshot, True
+            flight = self._flights.get(device_name)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[device_name] = flight
+            generation = self._generations.get(device_name, 0)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.snapshot, False
+
+        try:
+            is_healthy, earnapp_status = _device_status(self.storage, device_name, dev, self.runner, self.probe)
+            flight.snapshot = StatusSnapshot(bool(is_healthy), earnapp_status, self.time_fn())
+            with self._lock:
+                # An action that finished mid-probe makes this result stale.
+                if self._generations.get(device_name, 0) == generation:
+                    self._snapshots[device_name] = flight.snapshot
+            return flight.snapshot, False
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(device_name, None)
+            flight.done.set()
+
+    def _is_current(self, snapshot, limit, allow_hold):  # type: (StatusSnapshot, float, bool) -> bool
+        now = self.time_fn()
+        if now - snapshot.captured_at <= limit:
+            return True
+        return allow_hold and snapshot.expires_at is not None and now <= snapshot.expires_at
+
+    def _forget_missing(self, devices):  # type: (JsonDict) -> None
+        with self._lock:
+            for device_name in list(self._snapshots.keys()):
+                if device_name not in devices:
+                    del self._snapshots[device_name]
+                    self._generations.pop(device_name, None)
+
+    def _payload(self, device_name, dev, snapshot, cached, include_name):
+        # type: (str, JsonDict, StatusSnapshot, bool, bool) -> JsonDict
+        payload = _format_status_payload(device_name, dev, snapshot.is_healthy, snapshot.earnapp_status, include_name)
+        payload["snapshot_age"] = round(max(0.0, self.time_fn() - snapshot.captured_at), 1)
+        payload["cached"] = cached
+        return payload
@@ -8,10 +8,13 @@ import errno
 import json
 import os
 import tempfile
+import itertools
 import threading
 import time
 from typing import Any, Dict, Iterator, List, Optional, TextIO, cast
 
+from .activity_archive import ActivityArchive, archive_slack, split_for_archive
+from .activity_log import DEFAULT_QUERY_LIMIT, ActivityLogIndexCache
 from .errors import StorageError
 from .runtime import RuntimeConfig
 
@@ -29,15 +32,60 @@ DEFAULT_DEVICES = {"Local": {"type": "local", "path": "/usr/bin"}}  # type: Json
 DEFAULT_SCHEDULES = {}  # type: JsonDict
 DEFAULT_AUTO_RESTART = {}  # type: JsonDict
 DEFAULT_ACTIVITY_LOG = []  # type: JsonList
+DEFAULT_MAX_ACTIVITY_ENTRIES = 1000
+
+
+def _copy_json(value):  # type: (Any) -> Any
+    """Copy a parsed JSON document; cheaper than ``copy.deepcopy`` for plain JSON."""
+    if isinstance(value, dict):
+        return dict((key, _copy_json(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+def _stat_signature(stat_result):  # type: (os.stat_result) -> tuple
+    return (stat_result.st_ino, stat_result.st_dev, stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ctime_ns)
+
+
+def open_storage(runtime_config=None, **kwargs):  # type: (Optional[RuntimeConfig], Any) -> Any
+    """Build the storage backend selected by ``EARNAPP_STORAGE_BACKEND``."""
+    runtime_config = runtime_config or RuntimeConfig.from_env()
+    if runtime_config.storage_backend == "sqlite":
+        from .sqlite_storage import SqliteStorage
+
+        return SqliteStorage(runtime_config, **kwargs)
+    return JsonStorage(runtime_config, **kwargs)
 
 
 class JsonStorage(object):
-    """Read and write EarnApp runtime JSON files."""
+    """Read and write EarnApp runtime JSON files.
+
+    With ``cache`` enabled, parsed documents are kept per file and revalidated
+    with a single ``os.stat`` (inode, size, mtime, ctime) on each read, so hot
+    paths skip the lock + parse. Readers always get their own copy.
 
-    def __init__(self, runtime_config=None, lock_timeout=5.0):  # type: (Optional[RuntimeConfig], float) -> None
+    With ``archive`` enabled, activity log entries trimmed from the hot log
+    are rolled into ``activity_archive/`` instead of being dropped, and
+    queries, counts and exports cover both tiers.
+    """
+
+    def __init__(self, runtime_config=None, lock_timeout=5.0, cache=True, archive=True):
+        # type: (Optional[RuntimeConfig], float, bool, bool) -> None
         self.runtime_config = runtime_config or RuntimeConfig.from_env()  # type: RuntimeConfig
         self.lock_timeout = lock_timeout  # type: float
+        self.cache_enabled = cache  # type: bool
         self._thread_lock = threading.RLock()  # type: threading.RLock
+        self._cache_lock = threading.Lock()  # type: threading.Lock
+        self._cache = {}  # type: Dict[str, Any]
+        self.activity_archive = None  # type: Optional[ActivityArchive]
+        if archive:
+            self.activity_archive = ActivityArchive(self.runtime_config.activity_archive_path)
+        self.activity_log_backend = None  # type: Optional[JsonLinesActivityLog]
+        if self.runtime_config.activity_log_format == "jsonl":
+            self.activity_log_backend = JsonLinesActivityLog(self)
+        self.activity_log_index = ActivityLogIndexCache(self.load_activity_log, self.activity_log_version)
+        self.change_listeners = []  # type: List[Any]
 
     def load_config(self):  # type: () -> JsonDict
         return self.read_json(RuntimeConfig.CONFIG, DEFAULT_CONFIG)
@@ -69,7 +117,12 @@ class JsonStorage(object):
     def save_activity_log(self, logs):  # type: (JsonList) -> None
         self.write_json(RuntimeConfig.ACTIVITY_LOG, logs)
 
-    def append_activity_log(self, entry, max_entries=None):  # type: (JsonDict, Optional[int]) -> JsonList
+    def append_activity_log(self, entry, max_entries=None):  # type: (JsonDict, Optional[int]) -> Optional[JsonList]
+        """Append one entry; returns the trimmed log, or None for the JSON Lines backend."""
+        if self.activity_log_backend is not None:
+            self.activity_log_backend.append(entry, max_entries)
+            self._notify_change(RuntimeConfig.ACTIVITY_LOG)
+            return None
         with self._locked(RuntimeConfig.ACTIVITY_LOG, exclusive=True):
             logs = self._read_json_unlocked(RuntimeConfig.ACTIVITY_LOG, DEFAULT_ACTIVITY_LOG)
             if not isinstance(logs, list):
@@ -77,40 +130,168 @@ class JsonStorage(object):
             typed_logs = cast(JsonList, logs)
             typed_logs.append(entry)
             if max_entries and len(typed_logs) > max_entries:
-                typed_logs = typed_logs[-max_entries:]
+                typed_logs = self.roll_activity_log(typed_logs, max_entries)
             self._write_json_unlocked(RuntimeConfig.ACTIVITY_LOG, typed_logs)
-            return typed_logs
+        self._notify_change(RuntimeConfig.ACTIVITY_LOG)
+        return typed_logs
+
+    def roll_activity_log(self, logs, max_entries):  # type: (JsonList, int) -> JsonList
+        """Trim the hot log to ``max_entries``; callers hold the activity log lock.
+
+        Without an archive the oldest entries are dropped right away. With
+        one, nothing happens until the log passes ``max_entries`` plus 10%,
+        then the overflow is archived in one batch.
+        """
+        if self.activity_archive is None:
+            return logs[-max_entries:]
+        if len(logs) <= max_entries + archive_slack(max_entries):
+            return logs
+        archived, retained = split_for_archive(logs, max_entries)
+        self.activity_archive.append(archived)
+        return retained
 
     def clear_activity_log(self):  # type: () -> None
         self.save_activity_log([])
+        self.clear_activity_archive()
+
+    def clear_activity_archive(self):  # type: () -> int
+        """Delete archived entries; returns how many there were."""
+        if self.activity_archive is None:
+            return 0
+        return self.activity_archive.clear()
+
+    def activity_log_version(self):  # type: () -> Optional[tuple]
+        """Stat signature of the activity log file, or None when it is missing."""
+        if self.activity_log_backend is not None:
+            path = self.activity_log_backend.path
+        else:
+            path = self.path_for(RuntimeConfig.ACTIVITY_LOG)
+        try:
+            return _stat_signature(os.stat(path))
+        except OSError:
+            return None
+
+    def query_activity_log(self, device=None, since=None, until=None, before=None, after=None, limit=DEFAULT_QUERY_LIMIT):
+        # type: (Optional[str], Optional[int], Optional[int], Optional[int], Optional[int], int) -> JsonDict
+        index = self.activity_log_index.get()
+        if self.activity_archive is None:
+            return index.query(device, since, until, before, after, limit)
+        return self.activity_archive.query(index.query, device, since, until, before, after, limit)
+
+    def count_activity_logs(self, group_by="device", since=None, until=None):
+        # type: (str, Optional[int], Optional[int]) -> JsonDict
+        payload = self.activity_log_index.get().count(group_by, since, until)
+        if self.activity_archive is not None:
+            self.activity_archive.add_counts(payload, group_by, since, until)
+        return payload
+
+    def iter_activity_log(self, device=None, since=None, until=None):
+        # type: (Optional[str], Optional[int], Optional[int]) -> Iterator[JsonDict]
+        """Matching entries oldest first: archive, then the cached index snapshot."""
+        hot = self.activity_log_index.get().iter_entries(device, since, until)
+        if self.activity_archive is None:
+            return hot
+        return itertools.chain(self.activity_archive.iter_entries(device, since, until), hot)
 
     def read_json(self, filename, default):  # type: (str, Any) -> Any
+        if filename == RuntimeConfig.ACTIVITY_LOG and self.activity_log_backend is not None:
+            return self.activity_log_backend.load()
+        if self.cache_enabled:
+            cached = self._cached_document(filename)
+            if cached is not None:
+                return _copy_json(cached[1])
         with self._locked(filename, exclusive=False):
             return self._read_json_unlocked(filename, default)
 
     def write_json(self, filename, data):  # type: (str, Any) -> None
-        with self._locked(filename, exclusive=True):
-            self._write_json_unlocked(filename, data)
+        if filename == RuntimeConfig.ACTIVITY_LOG and self.activity_log_backend is not None:
+            self.activity_log_backend.save(data)
+        else:
+            with self._locked(filename, exclusive=True):
+                self._write_json_unlocked(filename, data)
+        self._notify_change(filename)
 
     def update_json(self, filename, default, mutator):  # type: (str, Any, Any) -> Any
-        with self._locked(filename, exclusive=True):
-            data = self._read_json_unlocked(filename, default)
-            result = mutator(data)
-            if result is not False:
-                self._write_json_unlocked(filename, data)
-            return result
+        if filename == RuntimeConfig.ACTIVITY_LOG and self.activity_log_backend is not None:
+            result = self.activity_log_backend.update(mutator)
+        else:
+            with self._locked(filename, exclusive=True):
+                data = self._read_json_unlocked(filename, default)
+                result = mutator(data)
+                if result is not False:
+                    self._write_json_unlocked(filename, data)
+        if result is not False:
+            self._notify_change(filename)
+        return result
+
+    def watched_files(self):  # type: () -> Dict[str, tuple]
+        """Files on disk mapped to the logical names a change notifier reports."""
+        activity_file = RuntimeConfig.ACTIVITY_LOG
+        if self.activity_log_backend is not None:
+            activity_file = self.activity_log_backend.filename
+        return {
+            RuntimeConfig.CONFIG: (RuntimeConfig.CONFIG,),
+            RuntimeConfig.DEVICES: (RuntimeConfig.DEVICES,),
+            RuntimeConfig.SCHEDULES: (RuntimeConfig.SCHEDULES,),
+            RuntimeConfig.AUTO_RESTART: (RuntimeConfig.AUTO_RESTART,),
+            activity_file: (RuntimeConfig.ACTIVITY_LOG,),
+        }
 
     def path_for(self, filename):  # type: (str) -> str
         return self.runtime_config.path_for(filename)
 
+    def invalidate_cache(self, filename=None):  # type: (Optional[str]) -> None
+        with self._cache_lock:
+            if filename is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(filename, None)
+
+    def _notify_change(self, filename):  # type: (str) -> None
+        for listener in list(self.change_listeners):
+            try:
+                listener(filename)
+            except Exception as exc:
+                print("Error in storage change listener: {0}".format(exc))
+
+    def _cached_document(self, filename):  # type: (str) -> Optional[Any]
+        with self._cache_lock:
+            cached = self._cache.get(filename)
+        if cached is None:
+            return None
+        try:
+            signature = _stat_signature(os.stat(self.path_for(filename)))
+        except OSError:
+            return None
+        if signature != cached[0]:
+            return None
+        return cached
+
+    def _remember(self, filename, signature, data):  # type: (str, tuple, Any) -> None
+        if not self.cache_enabled:
+            return
+        with self._cache_lock:
+            self._cache[filename] = (signature, data)
+
     def _read_json_unlocked(self, filename, default):  # type: (str, Any) -> Any
         path = self.path_for(filename)
+        if self.cache_enabled:
+            cached = self._cached_document(filename)
+            if cached is not None:
+                return _copy_json(cached[1])
         if not os.path.exists(path):
+            self.invalidate_cache(filename)
             return copy.deepcopy(default)
 
         try:
             with open(path, "r") as handle:
-                return json.load(handle)
+                # fstat the handle we parse so the signature always matches
+                # the content, even if the file is replaced meanwhile.
+                signature = _stat_signature(os.fstat(handle.fileno()))
+                data = json.load(handle)
+            if self.cache_enabled:
+                self._remember(filename, signature, _copy_json(data))
+            return data
         except ValueError as exc:
             raise StorageError("Invalid JSON in {0}: {1}".format(path, exc))
         except IOError as exc:
@@ -134,6 +315,10 @@ class JsonStorage(object):
                 handle.flush()
                 os.fsync(handle.fileno())
             os.replace(temp_path, path)
+            if self.cache_enabled:
+                # Callers hold the exclusive lock, so nobody else can have
+                # replaced the file between the rename and this stat.
+                self._remember(filename, _stat_signature(os.stat(path)), _copy_json(data))
         except (IOError, OSError, TypeError) as exc:
             raise StorageError("Could not write {0}: {1}".format(path, exc))
         finally:
@@ -187,3 +372,209 @@ class JsonStorage(object):
                 if time.time() >= deadline:
                     raise StorageError("Timed out waiting for storage lock")
                 time.sleep(0.05)
+
+
+class JsonLinesActivityLog(object):
+    """Append-only activity log backend: one JSON object per line.
+
+    Appends cost one short write instead of rewriting the whole array. Once
+    the file holds more than ``max_entries + compact_slack`` lines it is
+    compacted to the newest ``max_entries`` on a background thread; the
+    compacted lines go to the storage's archive when it has one (and then
+    ``load`` returns every line still in the file). An existing
+    ``activity_log.json`` array is migrated on first use.
+    """
+
+    filename = RuntimeConfig.ACTIVITY_LOG_JSONL  # type: str
+
+    def __init__(self, storage, max_entries=DEFAULT_MAX_ACTIVITY_ENTRIES, compact_slack=None, background=True):
+        # type: (JsonStorage, int, Optional[int], bool) -> None
+        self.storage = storage
+        self.max_entries = max_entries  # type: int
+        self.compact_slack = compact_slack if compact_slack is not None else max_entries  # type: int
+        self.background = background  # type: bool
+        self._state_lock = threading.Lock()  # type: threading.Lock
+        self._line_count = None  # type: Optional[int]
+        self._compacting = False  # type: bool
+        self._migrated = False  # type: bool
+
+    @property
+    def path(self):  # type: () -> str
+        return self.storage.path_for(self.filename)
+
+    def load(self):  # type: () -> JsonList
+        self._ensure_migrated()
+        with self.storage._locked(self.filename, exclusive=False):
+            entries = self._read_unlocked()
+        return self._hot(entries)
+
+    def append(self, entry, max_entries=None):  # type: (JsonDict, Optional[int]) -> None
+        self._ensure_migrated()
+        if max_entries:
+            self.max_entries = max_entries
+        line = json.dumps(entry) + "\n"
+        with self.storage._locked(self.filename, exclusive=True):
+            try:
+                if not self._ends_with_newline():
+                    # Terminate a torn line left by a crash so this entry stays parseable.
+                    line = "\n" + line
+                with open(self.path, "a") as handle:
+                    handle.write(line)
+                    handle.flush()
+                    os.fsync(handle.fileno())
+            except (IOError, OSError) as exc:
+                raise StorageError("Could not append {0}: {1}".format(self.path, exc))
+            with self._state_lock:
+                if self._line_count is None:
+                    self._line_count = self._count_lines_unlocked()
+                else:
+                    self._line_count += 1
+                needs_compaction = self._line_count > self.max_entries + self.compact_slack
+        if needs_compaction:
+            self._schedule_compaction()
+
+    def save(self, logs):  # type: (JsonList) -> None
+        if not isinstance(logs, list):
+            raise StorageError("activity log must be a JSON list")
+        self._ensure_migrated()
+        with self.storage._locked(self.filename, exclusive=True):
+            self._write_unlocked(logs)
+
+    def update(self, mutator):  # type: (Any) -> Any
+        self._ensure_migrated()
+        with self.storage._locked(self.filename, exclusive=True):
+            logs = self._hot(self._read_unlocked())
+            result = mutator(logs)
+            if result is not False:
+                self._write_unlocked(logs)
+            return result
+
+    def compact(self):  # type: () -> int
+        """Keep only the newest ``max_entries`` lines; returns lines dropped or archived."""
+        with self.storage._locked(self.filename, exclusive=True):
+            entries = self._read_unlocked()
+            if self.storage.activity_archive is not None:
+                archived, retained = split_for_archive(entries, self.max_entries)
+                self.storage.activity_archive.append(archived)
+            else:
+                archived, retained = entries[:-self.max_entries], entries[-self.max_entries:]
+            if archived:
+                self._write_unlocked(retained)
+            else:
+                with self._state_lock:
+                    self._line_count = len(entries)
+            return len(archived)
+
+    def _hot(self, entries):  # type: (JsonList) -> JsonList
+        if not self.max_entries or self.storage.activity_archive is not None:
+            return entries
+        return entries[-self.max_entries:]
+
+    def _schedule_compaction(self):  # type: () -> None
+        with self._state_lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():  # type: () -> None
+            try:
+                self.compact()
+            except Exception as exc:
+                print("Error compacting activity log: {0}".format(exc))
+            finally:
+                with self._state_lock:
+                    self._compacting = False
+
+        if self.background:
+            threading.Thread(target=run, name="activity-log-compaction", daemon=True).start()
+        else:
+            run()
+
+    def _ensure_migrated(self):  # type: () -> None
+        if self._migrated:
+            return
+        legacy_path = self.storage.path_for(RuntimeConfig.ACTIVITY_LOG)
+        with self.storage._locked(self.filename, exclusive=True):
+            if not self._migrated and os.path.exists(legacy_path):
+                self._migrate_unlocked(legacy_path)
+            self._migrated = True
+
+    def _migrate_unlocked(self, legacy_path):  # type: (str) -> None
+        with self.storage._locked(RuntimeConfig.ACTIVITY_LOG, exclusive=True):
+            if not os.path.exists(legacy_path):
+                return
+            legacy = self.storage._read_json_unlocked(RuntimeConfig.ACTIVITY_LOG, DEFAULT_ACTIVITY_LOG)
+            if not isinstance(legacy, list):
+                raise StorageError("activity_log.json must contain a JSON list")
+            self._write_unlocked(cast(JsonList, legacy) + self._read_unlocked())
+            try:
+                os.replace(legacy_path, legacy_path + ".migrated")
+            except OSError as exc:
+                raise StorageError("Could not retire {0}: {1}".format(legacy_path, exc))
+            self.storage.invalidate_cache(RuntimeConfig.ACTIVITY_LOG)
+
+    def _read_unlocked(self):  # type: () -> JsonList
+        entries = []  # type: JsonList
+        try:
+            with open(self.path, "r") as handle:
+                for line in handle:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn final line from an interrupted append.
+                        continue
+                    if isinstance(entry, dict):
+                        entries.append(entry)
+        except (IOError, OSError) as exc:
+            if exc.errno != errno.ENOENT:
+                raise StorageError("Could not read {0}: {1}".format(self.path, exc))
+        with self._state_lock:
+            self._line_count = len(entries)
+        return entries
+
+    def _ends_with_newline(self):  # type: () -> bool
+        """True for a missing/empty file or one whose last byte is ``\n``."""
+        try:
+            with open(self.path, "rb") as handle:
+                handle.seek(0, os.SEEK_END)
+                if handle.tell() == 0:
+                    return True
+                handle.seek(-1, os.SEEK_END)
+                return handle.read(1) == b"\n"
+        except (IOError, OSError) as exc:
+            if exc.errno == errno.ENOENT:
+                return True
+            raise
+
+    def _count_lines_unlocked(self):  # type: () -> int
+        try:
+            with open(self.path, "rb") as handle:
+                return sum(1 for _line in handle)
+        except (IOError, OSError):
+            return 0
+
+    def _write_unlocked(self, logs):  # type: (JsonList) -> None
+        path = self.path
+        directory = os.path.dirname(path)
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(prefix=".{0}.".format(self.filename), suffix=".tmp", dir=directory or None)
+            with os.fdopen(fd, "w") as handle:
+                for entry in logs:
+                    handle.write(json.dumps(entry) + "\n")
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temp_path, path)
+        except (IOError, OSError, TypeError) as exc:
+            raise StorageError("Could not write {0}: {1}".format(path, exc))
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+        with self._state_lock:
+            self._line_count = len(logs)
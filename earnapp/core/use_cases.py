@@ -6,9 +6,12 @@ import time
 import re
 import threading
 import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from earnapp.core.executors import run_device_command_result
+from earnapp.core.activity_log import COUNT_GROUPS
+from earnapp.core.executors import CommandStream, run_device_command_result, run_device_command_stream
+from earnapp.core.export import EXPORT_FORMATS, EXPORT_MIMETYPES, export_filename, iter_export, write_export
 from earnapp.core.models import CommandResult
 from earnapp.core.runtime import RuntimeConfig
 from earnapp.core.storage import DEFAULT_ACTIVITY_LOG, DEFAULT_AUTO_RESTART, DEFAULT_DEVICES, DEFAULT_SCHEDULES
@@ -19,8 +22,40 @@ EARN_APP_ACTIVITY = "com.brd.earnrewards/.ConsentActivity"
 DEVICE_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_. -]{0,63}$")
 VALID_DEVICE_TYPES = {"local", "ssh", "adb"}
 VALID_SCHEDULE_ACTIONS = {"start", "stop", "restart"}
+FANOUT_MAX_WORKERS = 8
+FANOUT_POOL_MAX_WORKERS = 32
+STATUS_FANOUT_DEADLINE = 60.0
+ACTION_FANOUT_DEADLINE = 300.0
+FANOUT_TIMEOUT_MESSAGE = "⏱️ Timeout: device tidak merespons dalam {0} detik"
+BULK_CANCELLED_MESSAGE = "⛔ Dibatalkan sebelum dijalankan"
+ROLLING_BATCH_SIZE = 4
+ROLLING_HEALTH_TIMEOUT = 120.0
+ROLLING_HEALTH_POLL_INTERVAL = 5.0
+ROLLING_MAX_FAILURES = 1
+ROLLING_ABORTED_MESSAGE = "⏭️ Dilewati: rolling restart dihentikan setelah {0} device gagal"
+ROLLING_UNHEALTHY_MESSAGE = "⚠️ Tidak kembali 🟢 Running dalam {0} detik (status terakhir: {1})"
+STREAM_COMMAND_TIMEOUT = 600
+STREAMABLE_OPERATIONS = {
+    "status": "earnapp status",
+    "uninstall": "earnapp uninstall",
+}
+STATUS_PROBE_MARKER = "__EARNAPP_PROBE__"
+SSH_STATUS_PROBE_SECTIONS = (
+    ("health", "echo 'health_check'"),
+    ("status", "earnapp status"),
+    ("processes", "pgrep -f earnapp || ps aux | grep -i earnapp | grep -v grep"),
+    ("binary", "which earnapp || command -v earnapp"),
+)
+ADB_STATUS_PROBE_SECTIONS = (
+    ("health", "getprop ro.build.version.release"),
+    ("pid", "pidof {0}".format(EARN_APP_PACKAGE)),
+    ("package", "pm list packages | grep {0}".format(EARN_APP_PACKAGE)),
+)
 _OPERATION_LOCKS = {}
 _OPERATION_LOCKS_LOCK = threading.RLock()
+_OPERATION_LISTENERS = []
+_FANOUT_POOL = None
+_FANOUT_POOL_LOCK = threading.Lock()
 
 
 def _operation_lock_for(device_name):
@@ -31,11 +66,98 @@ def _operation_lock_for(device_name):
         return _OPERATION_LOCKS[lock_key]
 
 
+def add_device_operation_listener(listener):
+    """Call ``listener(device_name)`` after every start/stop/restart finishes."""
+    with _OPERATION_LOCKS_LOCK:
+        _OPERATION_LISTENERS.append(listener)
+
+
+def remove_device_operation_listener(listener):
+    with _OPERATION_LOCKS_LOCK:
+        if listener in _OPERATION_LISTENERS:
+            _OPERATION_LISTENERS.remove(listener)
+
+
+def _notify_device_operation(device_name):
+    with _OPERATION_LOCKS_LOCK:
+        listeners = list(_OPERATION_LISTENERS)
+    for listener in listeners:
+        try:
+            listener(device_name)
+        except Exception as exc:
+            print("Error in device operation listener: {0}".format(exc))
+
+
 @contextlib.contextmanager
 def _device_operation(device_name):
     lock = _operation_lock_for(device_name)
-    with lock:
-        yield
+    try:
+        with lock:
+            yield
+    finally:
+        _notify_device_operation(device_name)
+
+
+def _fan_out_pool():
+    global _FANOUT_POOL
+    with _FANOUT_POOL_LOCK:
+        if _FANOUT_POOL is None:
+            _FANOUT_POOL = ThreadPoolExecutor(max_workers=FANOUT_POOL_MAX_WORKERS, thread_name_prefix="fan-out")
+        return _FANOUT_POOL
+
+
+def _fan_out(device_names, task, timeout_result, max_workers=FANOUT_MAX_WORKERS, deadline=None):
+    """Run ``task(device_name)`` on the shared pool and return results in input order.
+
+    At most ``max_workers`` tasks of this call run at once; the next one is
+    submitted as each finishes. Devices still pending or running when
+    ``deadline`` seconds have passed are reported through
+    ``timeout_result(device_name)``. Their tasks are left to finish in the
+    background so one dead host cannot stall the reply, but they keep a
+    slot of the shared pool (``FANOUT_POOL_MAX_WORKERS`` threads in total),
+    so hosts that keep hanging cannot grow the thread count without bound.
+    """
+    device_names = list(device_names)
+    if not device_names:
+        return []
+
+    pool = _fan_out_pool()
+    futures = [None] * len(device_names)
+    state = {"next": 0, "finished": 0, "closed": False}
+    cond = threading.Condition()
+
+    def on_done(_future):
+        with cond:
+            state["finished"] += 1
+            cond.notify_all()
+        submit_next()
+
+    def submit_next():
+        with cond:
+            if state["closed"] or state["next"] >= len(device_names):
+                return
+            index = state["next"]
+            state["next"] += 1
+            future = pool.submit(task, device_names[index])
+            futures[index] = future
+        future.add_done_callback(on_done)
+
+    for _ in range(max(1, min(int(max_workers or 1), len(device_names)))):
+        submit_next()
+    with cond:
+        cond.wait_for(lambda: state["finished"] >= len(device_names), timeout=deadline)
+        state["closed"] = True
+        submitted = list(futures)
+
+    results = []
+    for device_name, future in zip(device_names, submitted):
+        if future is not None and future.done() and not future.cancelled():
+            results.append(future.result())
+        else:
+            if future is not None:
+                future.cancel()
+            results.append(timeout_result(device_name))
+    return results
 
 
 def _failure(message):
@@ -201,6 +323,39 @@ def _run_device_command(storage, device_name, cmd, runner=None):
     return _command_text(_run_device_command_result(storage, device_name, cmd, runner))
 
 
+def _classify_earnapp_status(status_result, process_result_fn, status_result2_fn, check_result_fn):
+    if status_result and "error" not in status_result.lower():
+        status_lower = status_result.lower()
+        if "status: enabled" in status_lower or "status: running" in status_lower or "enabled" in status_lower:
+            return "🟢 Running"
+        elif "status: disabled" in status_lower or "status: stopped" in status_lower or "disabled" in status_lower:
+            return "🔴 Stopped"
+        elif "checking" in status_lower or "- checking status" in status_lower:
+            pass
+        elif "running" in status_lower and "not" not in status_lower:
+            return "🟢 Running"
+        elif "stopped" in status_lower or "stop" in status_lower:
+            return "🔴 Stopped"
+
+    result = process_result_fn()
+
+    if result and result.strip() and "error" not in result.lower():
+        status_result2 = status_result2_fn()
+        if status_result2:
+            status_lower2 = status_result2.lower()
+            if "disabled" in status_lower2:
+                return "🔴 Stopped"
+            elif "enabled" in status_lower2 or "running" in status_lower2:
+                return "🟢 Running"
+
+    check_result = check_result_fn()
+
+    if check_result and "earnapp" in check_result and "error" not in check_result.lower():
+        return "🔴 Stopped"
+    else:
+        return "❌ Not installed"
+
+
 def _get_ssh_earnapp_status(storage, device_name, runner=None):
     devices = storage.load_devices()
     if device_name not in devices:
@@ -213,42 +368,25 @@ def _get_ssh_earnapp_status(storage, device_name, runner=None):
     try:
         status_cmd = "earnapp status"
         status_result = _run_device_command(storage, device_name, status_cmd, runner)
+        return _classify_earnapp_status(
+            status_result,
+            lambda: _run_device_command(storage, device_name, "pgrep -f earnapp || ps aux | grep -i earnapp | grep -v grep", runner),
+            lambda: _run_device_command(storage, device_name, "earnapp status 2>&1", runner),
+            lambda: _run_device_command(storage, device_name, "which earnapp || command -v earnapp", runner),
+        )
+    except Exception as exc:
+        return "❌ Error: {0}".format(str(exc)[:50])
 
-        if status_result and "error" not in status_result.lower():
-            status_lower = status_result.lower()
-            if "status: enabled" in status_lower or "status: running" in status_lower or "enabled" in status_lower:
-                return "🟢 Running"
-            elif "status: disabled" in status_lower or "status: stopped" in status_lower or "disabled" in status_lower:
-                return "🔴 Stopped"
-            elif "checking" in status_lower or "- checking status" in status_lower:
-                pass
-            elif "running" in status_lower and "not" not in status_lower:
-                return "🟢 Running"
-            elif "stopped" in status_lower or "stop" in status_lower:
-                return "🔴 Stopped"
-
-        cmd = "pgrep -f earnapp || ps aux | grep -i earnapp | grep -v grep"
-        result = _run_device_command(storage, device_name, cmd, runner)
-
-        if result and result.strip() and "error" not in result.lower():
-            status_cmd2 = "earnapp status 2>&1"
-            status_result2 = _run_device_command(storage, device_name, status_cmd2, runner)
-            if status_result2:
-                status_lower2 = status_result2.lower()
-                if "disabled" in status_lower2:
-                    return "🔴 Stopped"
-                elif "enabled" in status_lower2 or "running" in status_lower2:
-                    return "🟢 Running"
-
-        check_cmd = "which earnapp || command -v earnapp"
-        check_result = _run_device_command(storage, device_name, check_cmd, runner)
 
-        if check_result and "earnapp" in check_result and "error" not in check_result.lower():
+def _classify_adb_status(pid_result, package_result_fn):
+    if pid_result and pid_result.strip() and not "error" in pid_result.lower() and pid_result.strip().isdigit():
+        return "🟢 Running"
+    else:
+        check_result = package_result_fn()
+        if EARN_APP_PACKAGE in check_result:
             return "🔴 Stopped"
         else:
             return "❌ Not installed"
-    except Exception as exc:
-        return "❌ Error: {0}".format(str(exc)[:50])
 
 
 def _get_adb_app_status(storage, device_name, runner=None):
@@ -263,18 +401,82 @@ def _get_adb_app_status(storage, device_name, runner=None):
     try:
         cmd = "pidof {0}".format(EARN_APP_PACKAGE)
         result = _run_device_command(storage, device_name, cmd, runner)
+        check_cmd = "pm list packages | grep {0}".format(EARN_APP_PACKAGE)
+        return _classify_adb_status(result, lambda: _run_device_command(storage, device_name, check_cmd, runner))
+    except Exception as exc:
+        return "❌ Error: {0}".format(str(exc)[:50])
 
-        if result and result.strip() and not "error" in result.lower() and result.strip().isdigit():
-            return "🟢 Running"
-        else:
-            check_cmd = "pm list packages | grep {0}".format(EARN_APP_PACKAGE)
-            check_result = _run_device_command(storage, device_name, check_cmd, runner)
-            if EARN_APP_PACKAGE in check_result:
-                return "🔴 Stopped"
+
+def _build_status_probe(sections):
+    parts = []
+    for name, cmd in sections:
+        parts.append("echo '{0} {1}'; {{ {2}; }} 2>&1; echo \"{0} rc $?\"".format(STATUS_PROBE_MARKER, name, cmd))
+    return "; ".join(parts)
+
+
+def _parse_status_probe(output):
+    """Split probe output into ``{section: (text, exit_code)}``."""
+    sections = {}
+    current = None
+    lines = []
+    for line in (output or "").splitlines():
+        if line.startswith(STATUS_PROBE_MARKER + " "):
+            token = line[len(STATUS_PROBE_MARKER) + 1:].strip()
+            if token.startswith("rc ") and current is not None:
+                try:
+                    exit_code = int(token[3:].strip())
+                except ValueError:
+                    exit_code = 1
+                sections[current] = ("\n".join(lines).strip(), exit_code)
+                current = None
             else:
-                return "❌ Not installed"
+                current = token
+                lines = []
+        elif current is not None:
+            lines.append(line)
+    return sections
+
+
+def _probe_section_text(sections, name, fallback, failure_message):
+    if name not in sections:
+        return fallback
+    text, exit_code = sections[name]
+    if not text and exit_code != 0 and failure_message:
+        return failure_message.format(exit_code)
+    return text
+
+
+def _probe_device_status(storage, device_name, dev, runner=None):
+    """Health + EarnApp status from one compound command instead of up to five."""
+    is_adb = dev.get("type") == "adb"
+    probe_sections = ADB_STATUS_PROBE_SECTIONS if is_adb else SSH_STATUS_PROBE_SECTIONS
+    try:
+        command_result = _run_device_command_result(storage, device_name, _build_status_probe(probe_sections), runner)
+        output = _command_text(command_result)
+        sections = _parse_status_probe(output)
+        # Without section markers nothing ran on the device; every check
+        # sees the transport error, matching the per-command behaviour.
+        fallback = "" if sections else output
+        failure_message = None if is_adb else "❌ Command failed with exit code {0}"
+
+        def section(name):
+            return _probe_section_text(sections, name, fallback, failure_message)
+
+        health = section("health")
+        is_healthy = bool(health and "error" not in health.lower() and health.strip())
+        if is_adb:
+            earnapp_status = _classify_adb_status(section("pid"), lambda: section("package"))
+        else:
+            status_result = section("status")
+            earnapp_status = _classify_earnapp_status(
+                status_result,
+                lambda: section("processes"),
+                lambda: status_result,
+                lambda: section("binary"),
+            )
+        return is_healthy, earnapp_status
     except Exception as exc:
-        return "❌ Error: {0}".format(str(exc)[:50])
+        return False, "❌ Error: {0}".format(str(exc)[:50])
 
 
 def _format_status_payload(device_name, dev, is_healthy, earnapp_status, include_name):
@@ -426,6 +628,33 @@ def run_device_command_by_name(storage, device_name, cmd, runner=None):
     return _run_device_command(storage, device_name, cmd, runner)
 
 
+def stream_device_command(storage, device_name, cmd, timeout=STREAM_COMMAND_TIMEOUT, streamer=None):
+    """Start ``cmd`` and return a ``CommandStream`` of its output.
+
+    The device's operation lock is held while the stream is consumed, so
+    scheduled jobs for that device wait until the command finishes.
+    """
+    devices = storage.load_devices()
+    if device_name not in devices:
+        return CommandStream.from_result(
+            CommandResult(stdout="", stderr="", exit_code=1, success=False, message="❌ Device '{0}' tidak ditemukan.".format(device_name))
+        )
+    dev = devices[device_name]
+    if streamer is not None:
+        stream = streamer(dev, cmd, timeout)
+    else:
+        stream = run_device_command_stream(dev, cmd, timeout=timeout)
+    return stream.hold(lambda: _device_operation(device_name))
+
+
+def stream_device_operation(storage, device_name, operation, timeout=STREAM_COMMAND_TIMEOUT, streamer=None):
+    if operation not in STREAMABLE_OPERATIONS:
+        return {"success": False, "error": "Operasi tidak dikenali"}, 400
+    if device_name not in storage.load_devices():
+        return {"success": False, "error": "Device tidak ditemukan"}, 404
+    return stream_device_command(storage, device_name, STREAMABLE_OPERATIONS[operation], timeout, streamer), 200
+
+
 def get_ssh_earnapp_status(storage, device_name, runner=None):
     return _get_ssh_earnapp_status(storage, device_name, runner)
 
@@ -501,20 +730,70 @@ def delete_device(storage, device_name):
     }, 200
 
 
-def list_activity_logs(storage, device_filter=None, limit=100):
-    logs = storage.load_activity_log()
+def list_activity_logs(storage, device_filter=None, limit=100, before=None, after=None, since=None, until=None):
+    """Return one page of activity log, oldest first.
+
+    ``since``/``until`` bound the window (inclusive); ``before``/``after`` are
+    exclusive timestamp cursors. Pass ``next_before`` from the previous page
+    as ``before`` to walk back through older history, including entries
+    already rolled into the archive.
+    """
+    return storage.query_activity_log(
+        device=device_filter,
+        since=since,
+        until=until,
+        before=before,
+        after=after,
+        limit=limit,
+    )
+
 
-    filtered_logs = logs
-    if device_filter:
-        filtered_logs = [log for log in logs if log.get("device") == device_filter]
+def count_activity_logs(storage, group_by="device", since=None, until=None):
+    if group_by not in COUNT_GROUPS:
+        return _failure("group_by harus salah satu dari: {0}".format(", ".join(COUNT_GROUPS))), 400
+    payload = storage.count_activity_logs(group_by=group_by, since=since, until=until)
+    payload["group_by"] = group_by
+    return payload, 200
 
-    filtered_logs = filtered_logs[-limit:]
 
-    for log in filtered_logs:
-        timestamp = log.get("timestamp", 0)
-        log["formatted_time"] = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+def _export_request(fmt, since, until):
+    if fmt not in EXPORT_FORMATS:
+        return _failure("format harus salah satu dari: {0}".format(", ".join(EXPORT_FORMATS)))
+    if since is not None and until is not None and since > until:
+        return _failure("since tidak boleh lebih besar dari until")
+    return None
 
-    return {"logs": filtered_logs}
+
+def export_activity_log(storage, fmt="csv", device_filter=None, since=None, until=None, compress=False):
+    """Export matching log entries into a spooled temp file.
+
+    The payload's ``file`` is rewound and owned by the caller (close it
+    after sending). Entries are streamed from storage, so memory stays
+    bounded by the spool size regardless of how long the history is.
+    """
+    error = _export_request(fmt, since, until)
+    if error is not None:
+        return error, 400
+    handle, rows = write_export(storage.iter_activity_log(device_filter, since, until), fmt, compress)
+    return {
+        "success": True,
+        "file": handle,
+        "rows": rows,
+        "filename": export_filename(fmt, device_filter, since, until, compress),
+    }, 200
+
+
+def stream_activity_log_export(storage, fmt="csv", device_filter=None, since=None, until=None, compress=False):
+    """Like ``export_activity_log`` but returns a generator of byte chunks."""
+    error = _export_request(fmt, since, until)
+    if error is not None:
+        return error, 400
+    return {
+        "success": True,
+        "chunks": iter_export(storage.iter_activity_log(device_filter, since, until), fmt, compress),
+        "filename": export_filename(fmt, device_filter, since, until, compress),
+        "mimetype": "application/gzip" if compress else EXPORT_MIMETYPES[fmt],
+    }, 200
 
 
 def clear_activity_log(storage):
@@ -530,6 +809,7 @@ def clear_activity_log(storage):
         return True
 
     storage.update_json(RuntimeConfig.ACTIVITY_LOG, DEFAULT_ACTIVITY_LOG, mutate)
+    result["count"] += storage.clear_activity_archive()
     return {"success": True, "message": "Activity log berhasil dihapus", "count": result["count"]}
 
 
@@ -561,6 +841,7 @@ def add_schedule(storage, data):
             "days": days,
             "enabled": True,
             "timezone": "UTC",
+            "created_at": int(time.time()),
         }
         result["created"] = True
         return True
@@ -637,37 +918,42 @@ def disable_auto_restart(storage, device_name):
     return {"success": False, "message": "Device tidak ditemukan"}, 404
 
 
-def get_device_status(storage, device_name, runner=None):
-    devices = storage.load_devices()
-    if device_name not in devices:
-        return {"error": "Device tidak ditemukan"}, 404
+def _device_status(storage, device_name, dev, runner=None, probe=True):
+    if probe:
+        return _probe_device_status(storage, device_name, dev, runner)
 
-    dev = devices[device_name]
     is_healthy = _check_device_health(storage, device_name, runner)
-
     if dev.get("type") == "adb":
         earnapp_status = _get_adb_app_status(storage, device_name, runner)
     else:
         earnapp_status = _get_ssh_earnapp_status(storage, device_name, runner)
+    return is_healthy, earnapp_status
 
+
+def get_device_status(storage, device_name, runner=None, probe=True):
+    devices = storage.load_devices()
+    if device_name not in devices:
+        return {"error": "Device tidak ditemukan"}, 404
+
+    dev = devices[device_name]
+    is_healthy, earnapp_status = _device_status(storage, device_name, dev, runner, probe)
     return _format_status_payload(device_name, dev, is_healthy, earnapp_status, False), 200
 
 
-def get_all_device_statuses(storage, runner=None):
+def get_all_device_statuses(storage, runner=None, max_workers=FANOUT_MAX_WORKERS, deadline=STATUS_FANOUT_DEADLINE, probe=True):
     devices = storage.load_devices()
-    result = []
 
-    for device_name in devices.keys():
+    def status_for(device_name):
         dev = devices[device_name]
-        is_healthy = _check_device_health(storage, device_name, runner)
-
-        if dev.get("type") == "adb":
-            earnapp_status = _get_adb_app_status(storage, device_name, runner)
-        else:
-            earnapp_status = _get_ssh_earnapp_status(storage, device_name, runner)
+        is_healthy, earnapp_status = _device_status(storage, device_name, dev, runner, probe)
+        return _format_status_payload(device_name, dev, is_healthy, earnapp_status, True)
 
-        result.append(_format_status_payload(device_name, dev, is_healthy, earnapp_status, True))
+    def timed_out(device_name):
+        payload = _format_status_payload(device_name, devices[device_name], False, FANOUT_TIMEOUT_MESSAGE.format(deadline), True)
+        payload["timeout"] = True
+        return payload
 
+    result = _fan_out(devices.keys(), status_for, timed_out, max_workers, deadline)
     return {"devices": result}
 
 
@@ -686,15 +972,20 @@ def get_device_id(storage, device_name, runner=None):
     return {"success": True, "result": result}, 200
 
 
-def health_check_all(storage, runner=None):
+def health_check_all(storage, runner=None, max_workers=FANOUT_MAX_WORKERS, deadline=STATUS_FANOUT_DEADLINE):
     devices = storage.load_devices()
-    results = []
-    for device_name in devices.keys():
+
+    def check(device_name):
         is_healthy = _check_device_health(storage, device_name, runner)
-        results.append({
+        return {
             "device": device_name,
             "health": "online" if is_healthy else "offline",
-        })
+        }
+
+    def timed_out(device_name):
+        return {"device": device_name, "health": "offline", "timeout": True}
+
+    results = _fan_out(devices.keys(), check, timed_out, max_workers, deadline)
     return {"success": True, "results": results}
 
 
@@ -714,68 +1005,203 @@ def stop_device(storage, device_name, runner=None, time_fn=None, log_activity=Tr
     return {"success": success, "result": result}
 
 
-def restart_device(storage, device_name, runner=None, sleep_fn=None, time_fn=None, log_activity=True, log_type="manual", user="web"):
+def _restart_earnapp_device_result(storage, device_name, runner, sleeper):
     with _device_operation(device_name):
         stop_result, stop_success = _stop_earnapp_device_result(storage, device_name, runner)
-        sleeper = sleep_fn if sleep_fn is not None else time.sleep
         if stop_success:
             sleeper(5)
             start_result, start_success = _start_earnapp_device_result(storage, device_name, runner)
         else:
             start_result = "Start dilewati karena stop gagal."
             start_success = False
-    result = "Stop: {0}\n\nStart: {1}".format(stop_result, start_result)
+    return "Stop: {0}\n\nStart: {1}".format(stop_result, start_result), stop_success and start_success
+
+
+def restart_device(storage, device_name, runner=None, sleep_fn=None, time_fn=None, log_activity=True, log_type="manual", user="web"):
+    sleeper = sleep_fn if sleep_fn is not None else time.sleep
+    result, success = _restart_earnapp_device_result(storage, device_name, runner, sleeper)
     if log_activity:
         _log_activity(storage, device_name, "restart", result, log_type, user, time_fn)
-    return {"success": stop_success and start_success, "result": result}
+    return {"success": success, "result": result}
+
+
+def _action_timeout_result(deadline):
+    def timed_out(device_name):
+        return {
+            "device": device_name,
+            "success": False,
+            "result": FANOUT_TIMEOUT_MESSAGE.format(deadline),
+            "timeout": True,
+        }
+    return timed_out
 
 
-def start_all_devices(storage, runner=None, time_fn=None, log_activity=True, log_type="manual", user="web"):
+def _bulk_payload(results):
+    return {"success": all(item.get("success", False) for item in results), "results": results}
+
+
+def _run_bulk_action(device_names, action, max_workers, deadline, on_result=None, cancel_event=None):
+    """Fan ``action`` out over devices for the ``*_all_devices`` use cases.
+
+    ``on_result(item)`` sees each device's result as soon as it is known.
+    Once ``cancel_event`` is set, devices that have not started yet are
+    skipped; devices already running finish normally.
+    """
+    def task(device_name):
+        if cancel_event is not None and cancel_event.is_set():
+            item = {"device": device_name, "success": False, "result": BULK_CANCELLED_MESSAGE, "cancelled": True}
+        else:
+            item = action(device_name)
+        if on_result is not None:
+            on_result(item)
+        return item
+
+    return _bulk_payload(_fan_out(device_names, task, _action_timeout_result(deadline), max_workers, deadline))
+
+
+def start_all_devices(storage, runner=None, time_fn=None, log_activity=True, log_type="manual", user="web",
+                      max_workers=FANOUT_MAX_WORKERS, deadline=ACTION_FANOUT_DEADLINE, on_result=None, cancel_event=None):
     devices = storage.load_devices()
-    results = []
-    all_success = True
-    for device_name in devices.keys():
+
+    def start(device_name):
         with _device_operation(device_name):
             result, success = _start_earnapp_device_result(storage, device_name, runner)
-        all_success = all_success and success
         if log_activity:
             _log_activity(storage, device_name, "start", result, log_type, user, time_fn)
-        results.append({"device": device_name, "success": success, "result": result})
-    return {"success": all_success, "results": results}
+        return {"device": device_name, "success": success, "result": result}
+
+    return _run_bulk_action(devices.keys(), start, max_workers, deadline, on_result, cancel_event)
 
 
-def stop_all_devices(storage, runner=None, time_fn=None, log_activity=True, log_type="manual", user="web"):
+def stop_all_devices(storage, runner=None, time_fn=None, log_activity=True, log_type="manual", user="web",
+                     max_workers=FANOUT_MAX_WORKERS, deadline=ACTION_FANOUT_DEADLINE, on_result=None, cancel_event=None):
     devices = storage.load_devices()
-    results = []
-    all_success = True
-    for device_name in devices.keys():
+
+    def stop(device_name):
         with _device_operation(device_name):
             result, success = _stop_earnapp_device_result(storage, device_name, runner)
-        all_success = all_success and success
         if log_activity:
             _log_activity(storage, device_name, "stop", result, log_type, user, time_fn)
-        results.append({"device": device_name, "success": success, "result": result})
-    return {"success": all_success, "results": results}
+        return {"device": device_name, "success": success, "result": result}
 
+    return _run_bulk_action(devices.keys(), stop, max_workers, deadline, on_result, cancel_event)
 
-def restart_all_devices(storage, runner=None, sleep_fn=None, time_fn=None, log_activity=True, log_type="manual", user="web"):
+
+def restart_all_devices(storage, runner=None, sleep_fn=None, time_fn=None, log_activity=True, log_type="manual", user="web",
+                        max_workers=FANOUT_MAX_WORKERS, deadline=ACTION_FANOUT_DEADLINE, on_result=None, cancel_event=None):
     devices = storage.load_devices()
     sleeper = sleep_fn if sleep_fn is not None else time.sleep
-    results = []
-    all_success = True
-    for device_name in devices.keys():
-        with _device_operation(device_name):
-            stop_result, stop_success = _stop_earnapp_device_result(storage, device_name, runner)
-            if stop_success:
-                sleeper(5)
-                start_result, start_success = _start_earnapp_device_result(storage, device_name, runner)
-            else:
-                start_result = "Start dilewati karena stop gagal."
-                start_success = False
-        result = "Stop: {0}\n\nStart: {1}".format(stop_result, start_result)
-        success = stop_success and start_success
-        all_success = all_success and success
+
+    def restart(device_name):
+        result, success = _restart_earnapp_device_result(storage, device_name, runner, sleeper)
         if log_activity:
             _log_activity(storage, device_name, "restart", result, log_type, user, time_fn)
-        results.append({"device": device_name, "success": success, "result": result})
-    return {"success": all_success, "results": results}
+        return {"device": device_name, "success": success, "result": result}
+
+    return _run_bulk_action(devices.keys(), restart, max_workers, deadline, on_result, cancel_event)
+
+
+def _earnapp_running(storage, device_name, dev, runner=None):
+    _, earnapp_status = _device_status(storage, device_name, dev, runner)
+    payload = _format_status_payload(device_name, dev, True, earnapp_status, False)
+    return payload["status_icon"] == "🟢", payload["earnapp_status"]
+
+
+def _wait_until_running(device_names, status_fn, health_timeout, poll_interval, sleeper, clock):
+    """Poll ``status_fn`` until every device is running or the timeout passes.
+
+    Returns ``{device_name: last_status}`` for devices that never came back.
+    """
+    pending = dict((device_name, "Unknown") for device_name in device_names)
+    deadline = clock() + health_timeout
+    while pending:
+        states = _fan_out(
+            list(pending),
+            lambda device_name: (device_name,) + tuple(status_fn(device_name)),
+            lambda device_name: (device_name, False, "Timeout"),
+            max_workers=len(pending),
+            deadline=max(1.0, deadline - clock()),
+        )
+        for device_name, running, status_text in states:
+            if running:
+                pending.pop(device_name, None)
+            else:
+                pending[device_name] = status_text
+        if not pending or clock() + poll_interval > deadline:
+            break
+        sleeper(poll_interval)
+    return pending
+
+
+def rolling_restart_devices(storage, device_names=None, batch_size=ROLLING_BATCH_SIZE, max_parallel=None,
+                            health_timeout=ROLLING_HEALTH_TIMEOUT, poll_interval=ROLLING_HEALTH_POLL_INTERVAL,
+                            max_failures=ROLLING_MAX_FAILURES, runner=None, sleep_fn=None, time_fn=None, clock=None,
+                            status_fn=None, log_activity=True, log_type="manual", user="web",
+                            on_result=None, on_batch=None, cancel_event=None):
+    """Restart devices in batches and only move on once a batch is healthy.
+
+    Each batch of ``batch_size`` devices is restarted in parallel (at most
+    ``max_parallel`` at once), then polled until every device reports
+    🟢 Running or ``health_timeout`` seconds pass. A device that fails its
+    restart or never comes back counts as a failure; once ``max_failures``
+    is reached the remaining batches are skipped (``0`` never aborts). ``on_batch(index, items)``
+    is called after each batch is gated.
+    """
+    devices = storage.load_devices()
+    names = [name for name in (device_names if device_names is not None else devices.keys()) if name in devices]
+    batch_size = max(1, int(batch_size or 1))
+    max_parallel = max(1, int(max_parallel or batch_size))
+    sleeper = sleep_fn if sleep_fn is not None else time.sleep
+    clock = clock if clock is not None else time.time
+    if status_fn is None:
+        def status_fn(device_name):
+            return _earnapp_running(storage, device_name, devices[device_name], runner)
+
+    def restart(device_name):
+        result, success = _restart_earnapp_device_result(storage, device_name, runner, sleeper)
+        return {"device": device_name, "success": success, "result": result}
+
+    results = []
+    failures = 0
+    aborted = False
+    batches = [names[index:index + batch_size] for index in range(0, len(names), batch_size)]
+    for batch_index, batch in enumerate(batches):
+        if aborted or (cancel_event is not None and cancel_event.is_set()):
+            for device_name in batch:
+                item = {"device": device_name, "success": False, "batch": batch_index + 1}
+                if aborted:
+                    item.update({"result": ROLLING_ABORTED_MESSAGE.format(failures), "skipped": True})
+                else:
+                    item.update({"result": BULK_CANCELLED_MESSAGE, "cancelled": True})
+                results.append(item)
+                if on_result is not None:
+                    on_result(item)
+            continue
+
+        items = _fan_out(batch, restart, _action_timeout_result(ACTION_FANOUT_DEADLINE), max_parallel, ACTION_FANOUT_DEADLINE)
+        unhealthy = _wait_until_running(
+            [item["device"] for item in items if item["success"]], status_fn, health_timeout, poll_interval, sleeper, clock
+        )
+        for item in items:
+            item["batch"] = batch_index + 1
+            if item["device"] in unhealthy:
+                item["success"] = False
+                item["unhealthy"] = True
+                item["result"] = "{0}\n\n{1}".format(
+                    item["result"], ROLLING_UNHEALTHY_MESSAGE.format(int(health_timeout), unhealthy[item["device"]])
+                )
+            if not item["success"]:
+                failures += 1
+            if log_activity:
+                _log_activity(storage, item["device"], "restart", item["result"], log_type, user, time_fn)
+            results.append(item)
+            if on_result is not None:
+                on_result(item)
+        if on_batch is not None:
+            on_batch(batch_index + 1, items)
+        if max_failures and failures >= max_failures:
+            aborted = True
+
+    payload = _bulk_payload(results)
+    payload.update({"batches": len(batches), "failures": failures, "aborted": aborted})
+    return payload
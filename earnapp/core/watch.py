@@ -0,0 +1,258 @@
+"""Change notifications for runtime files in the data directory."""
+
+from __future__ import absolute_import
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+WATCH_POLL_INTERVAL = 1.0
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_CLOEXEC = 0o2000000
+INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+ChangeCallback = Callable[[str], None]
+
+
+def _stat_signature(path):  # type: (str) -> Optional[Tuple[int, int, int, int]]
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ctime_ns)
+
+
+class _Inotify(object):
+    """Minimal ctypes binding: one directory watch on a non-blocking fd."""
+
+    def __init__(self, directory):  # type: (str) -> None
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify requires Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_CLOEXEC)  # type: int
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, "inotify_add_watch failed for {0}".format(directory))
+
+    def read(self, timeout):  # type: (float) -> Optional[List[str]]
+        """Names touched since the last read; None means the queue overflowed."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        buffer = os.read(self.fd, 64 * 1024)
+        names = []  # type: List[str]
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            if mask & IN_Q_OVERFLOW:
+                return None
+            name = buffer[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):  # type: () -> None
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class ChangeTracker(object):
+    """Dirty flags for a set of logical file names.
+
+    Every name starts dirty so the first ``consume`` loads it. ``wait`` lets
+    a worker sleep until one of its names changes or the timeout passes.
+    """
+
+    def __init__(self, names):  # type: (Iterable[str]) -> None
+        self.names = frozenset(names)
+        self._lock = threading.Lock()  # type: threading.Lock
+        self._dirty = set(self.names)  # type: Set[str]
+        self._event = threading.Event()  # type: threading.Event
+        self._event.set()
+
+    def mark(self, name):  # type: (str) -> None
+        if name not in self.names:
+            return
+        with self._lock:
+            self._dirty.add(name)
+            self._event.set()
+
+    def consume(self, name):  # type: (str) -> bool
+        """Return True (and clear the flag) if ``name`` changed since the last call."""
+        with self._lock:
+            if name not in self._dirty:
+                return False
+            self._dirty.discard(name)
+            if not self._dirty:
+                self._event.clear()
+            return True
+
+    def consume_any(self):  # type: () -> bool
+        with self._lock:
+            changed = bool(self._dirty)
+            self._dirty.clear()
+            self._event.clear()
+            return changed
+
+    def wait(self, timeout=None):  # type: (Optional[float]) -> bool
+        return self._event.wait(timeout)
+
+
+class ChangeNotifier(object):
+    """Publish change events for runtime files in one data directory.
+
+    ``files`` maps a file name on disk to the logical names it backs (for
+    the SQLite backend one database file backs every collection). Changes
+    from other processes arrive through inotify on Linux, or a stat poll
+    every ``poll_interval`` seconds elsewhere; writes made through a
+    storage passed to ``attach`` are published synchronously so callers
+    in this process see their own writes on the next ``consume``.
+    """
+
+    def __init__(self, directory, files, poll_interval=WATCH_POLL_INTERVAL, use_inotify=True):
+        # type: (str, Dict[str, Tuple[str, ...]], float, bool) -> None
+        self.directory = directory
+        self.files = dict(files)  # type: Dict[str, Tuple[str, ...]]
+        self.poll_interval = poll_interval  # type: float
+        self.use_inotify = use_inotify  # type: bool
+        self.backend = None  # type: Optional[str]
+        self._lock = threading.Lock()  # type: threading.Lock
+        self._subscribers = []  # type: List[Tuple[ChangeCallback, Optional[frozenset]]]
+        self._signatures = dict((filename, self._signature(filename)) for filename in self.files)
+        self._stop = threading.Event()  # type: threading.Event
+        self._thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def names(self):  # type: () -> Set[str]
+        return set(name for names in self.files.values() for name in names)
+
+    def subscribe(self, callback, names=None):  # type: (ChangeCallback, Optional[Iterable[str]]) -> ChangeCallback
+        with self._lock:
+            self._subscribers.append((callback, frozenset(names) if names is not None else None))
+        return callback
+
+    def unsubscribe(self, callback):  # type: (ChangeCallback) -> None
+        with self._lock:
+            self._subscribers = [entry for entry in self._subscribers if entry[0] is not callback]
+
+    def tracker(self, names):  # type: (Iterable[str]) -> ChangeTracker
+        tracker = ChangeTracker(names)
+        self.subscribe(tracker.mark, tracker.names)
+        return tracker
+
+    def attach(self, storage):  # type: (Any) -> ChangeNotifier
+        storage.change_listeners.append(self.notify)
+        return self
+
+    def notify(self, name):  # type: (str) -> None
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, names in subscribers:
+            if names is not None and name not in names:
+                continue
+            try:
+                callback(name)
+            except Exception as exc:
+                print("Error in change subscriber for {0}: {1}".format(name, exc))
+
+    def poll_once(self):  # type: () -> List[str]
+        """Stat every watched file and publish the ones that changed."""
+        return self._publish([filename for filename in self.files if self._changed(filename)])
+
+    def start(self):  # type: () -> ChangeNotifier
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        inotify = None
+        if self.use_inotify:
+            try:
+                inotify = _Inotify(self.directory)
+            except (OSError, AttributeError) as exc:
+                print("inotify unavailable, polling {0}: {1}".format(self.directory, exc))
+        self.backend = "inotify" if inotify is not None else "poll"
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(inotify,), name="file-watch")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):  # type: () -> None
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(max(1.0, self.poll_interval * 2))
+            self._thread = None
+
+    def _run(self, inotify):  # type: (Optional[_Inotify]) -> None
+        try:
+            while not self._stop.is_set():
+                if inotify is None:
+                    self.poll_once()
+                    self._stop.wait(self.poll_interval)
+                    continue
+                try:
+                    touched = inotify.read(self.poll_interval)
+                except OSError as exc:
+                    print("inotify read failed, falling back to polling: {0}".format(exc))
+                    inotify.close()
+                    inotify = None
+                    self.backend = "poll"
+                    continue
+                if touched is None:
+                    self.poll_once()
+                    continue
+                # inotify only says a name was touched; the stat check drops
+                # no-op events and our own temp files.
+                self._publish([name for name in set(touched) if name in self.files and self._changed(name)])
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def _signature(self, filename):  # type: (str) -> Optional[Tuple[int, int, int, int]]
+        return _stat_signature(os.path.join(self.directory, filename))
+
+    def _changed(self, filename):  # type: (str) -> bool
+        signature = self._signature(filename)
+        with self._lock:
+            if self._signatures.get(filename) == signature:
+                return False
+            self._signatures[filename] = signature
+            return True
+
+    def _publish(self, filenames):  # type: (List[str]) -> List[str]
+        names = []  # type: List[str]
+        for filename in filenames:
+            for name in self.files.get(filename, ()):
+                if name not in names:
+                    names.append(name)
+        for name in names:
+            self.notify(name)
+        return names
+
+
+def watch_storage(storage, poll_interval=WATCH_POLL_INTERVAL, use_inotify=True, start=True):
+    # type: (Any, float, bool, bool) -> ChangeNotifier
+    """Build a notifier for ``storage.watched_files()`` and hook its writes."""
+    notifier = ChangeNotifier(
+        storage.runtime_config.data_dir, storage.watched_files(), poll_interval=poll_interval, use_inotify=use_inotify
+    )
+    notifier.attach(storage)
+    return notifier.start() if start else notifier
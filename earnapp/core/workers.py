@@ -2,13 +2,41 @@
 
 from __future__ import absolute_import
 
+import collections
+import heapq
+import itertools
+import json
+import random
 import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time, timedelta
 
 from earnapp.core.runtime import RuntimeConfig
 from earnapp.core.storage import DEFAULT_AUTO_RESTART
-from earnapp.core.use_cases import get_device_health, record_activity, restart_device, start_device, stop_device
+from earnapp.core.use_cases import (
+    FANOUT_MAX_WORKERS,
+    STATUS_FANOUT_DEADLINE,
+    _device_operation,
+    _fan_out,
+    get_device_health,
+    record_activity,
+    restart_device,
+    start_device,
+    stop_device,
+)
+
+SCHEDULER_MAX_SLEEP = 60.0
+SCHEDULE_MISFIRE_GRACE = 900
+SCHEDULE_LOOKAHEAD_DAYS = 8
+SCHEDULER_MAX_CONCURRENT_JOBS = 4
+JOB_HISTORY_SIZE = 100
+HEALTH_CHECK_INTERVAL = 60
+HEALTH_MIN_INTERVAL = 15
+HEALTH_MAX_INTERVAL = 600
+HEALTH_BACKOFF_STEP = 3
+HEALTH_FLAP_PENALTY = 3
+HEALTH_JITTER_RATIO = 0.1
 
 
 def _clock(time_fn):
@@ -116,19 +144,75 @@ def _refresh_mapping_from_storage(target, load_fn, label):
     return target
 
 
-def _refresh_device_health(storage, device_health, time_fn, health_check_fn=None):
+def _default_jitter():
+    return random.uniform(-HEALTH_JITTER_RATIO, HEALTH_JITTER_RATIO)
+
+
+def _health_interval(entry, check_interval, max_interval):
+    """Seconds until the next probe of a device, before jitter.
+
+    Offline devices and devices that changed state recently (``flap_score``
+    above zero) stay at half the base interval. A device that keeps
+    answering online doubles its interval every ``HEALTH_BACKOFF_STEP``
+    checks, up to ``max_interval``.
+    """
+    if entry.get("status") != "online" or entry.get("flap_score", 0) > 0:
+        return max(HEALTH_MIN_INTERVAL, check_interval / 2.0)
+    backoff = 2 ** min(entry.get("stable_checks", 0) // HEALTH_BACKOFF_STEP, 10)
+    return max(check_interval, min(max_interval, check_interval * backoff))
+
+
+def _probe_health(storage, device_name, health_check_fn):
+    try:
+        if health_check_fn is not None:
+            return health_check_fn(device_name)
+        return get_device_health(storage, device_name)
+    except Exception as exc:
+        return {"healthy": False, "error": str(exc)}
+
+
+def _refresh_device_health(
+    storage,
+    device_health,
+    time_fn,
+    health_check_fn=None,
+    check_interval=HEALTH_CHECK_INTERVAL,
+    max_interval=HEALTH_MAX_INTERVAL,
+    jitter_fn=None,
+    max_workers=FANOUT_MAX_WORKERS,
+    deadline=STATUS_FANOUT_DEADLINE,
+    on_scheduled=None,
+):
+    """Probe every device whose ``next_check`` has passed, concurrently.
+
+    Devices without a ``next_check`` yet are always due. Each probed entry
+    gets a new ``next_check`` from ``_health_interval`` spread by
+    ``jitter_fn()`` (a fraction of the interval) so probes do not bunch up;
+    ``on_scheduled(device_name, next_check)`` is told about it.
+    """
     current_time = int(time_fn())
     devices = storage.load_devices()
-    seen_devices = set()
+    jitter = jitter_fn if jitter_fn is not None else _default_jitter
+
+    due = [
+        device_name
+        for device_name in devices.keys()
+        if int(device_health.get(device_name, {}).get("next_check", 0) or 0) <= current_time
+    ]
+
+    def timed_out(device_name):
+        return {"healthy": False, "error": "Health check timeout"}
+
+    results = _fan_out(
+        due,
+        lambda device_name: _probe_health(storage, device_name, health_check_fn),
+        timed_out,
+        max_workers,
+        deadline,
+    )
 
-    for device_name in devices.keys():
-        seen_devices.add(device_name)
+    for device_name, health in zip(due, results):
         previous = device_health.get(device_name, {})
-        if health_check_fn is not None:
-            health = health_check_fn(device_name)
-        else:
-            health = get_device_health(storage, device_name)
-
         is_healthy = bool(health.get("healthy", False)) if isinstance(health, dict) else False
         status = "online" if is_healthy else "offline"
         if status == "offline" and previous.get("status") == "offline":
@@ -138,21 +222,47 @@ def _refresh_device_health(storage, device_health, time_fn, health_check_fn=None
             last_check = current_time
             alert_sent_at = None
 
-        device_health[device_name] = {
+        changed = previous.get("status") not in (None, status)
+        flap_score = int(previous.get("flap_score", 0))
+        flap_score = HEALTH_FLAP_PENALTY if changed else max(0, flap_score - 1)
+        stable_checks = int(previous.get("stable_checks", 0)) + 1 if status == "online" and not changed else 0
+
+        entry = {
             "status": status,
             "last_check": last_check,
             "checked_at": current_time,
             "error": None if is_healthy else (health.get("error") if isinstance(health, dict) else "Health check failed"),
             "alert_sent_at": alert_sent_at,
+            "stable_checks": stable_checks,
+            "flap_score": flap_score,
         }
+        interval = _health_interval(entry, check_interval, max_interval)
+        entry["interval"] = interval
+        entry["next_check"] = current_time + max(1, int(round(interval * (1 + jitter()))))
+        device_health[device_name] = entry
+        if on_scheduled is not None:
+            on_scheduled(device_name, entry["next_check"])
 
     for stale_device in list(device_health.keys()):
-        if stale_device not in seen_devices:
+        if stale_device not in devices:
             del device_health[stale_device]
 
     return device_health
 
 
+def _seconds_until_next_health_check(device_health, time_fn, check_interval):
+    """Sleep until the earliest ``next_check``, never longer than ``check_interval``."""
+    current_time = time_fn()
+    pending = [
+        int(entry["next_check"]) - current_time
+        for entry in device_health.values()
+        if entry.get("next_check") is not None
+    ]
+    if not pending:
+        return check_interval
+    return max(1, min(check_interval, min(pending)))
+
+
 def _check_alerts(notify_admin, alert_settings, device_health, time_fn):
     if not alert_settings.get("enabled", False):
         return
@@ -175,217 +285,524 @@ def _check_alerts(notify_admin, alert_settings, device_health, time_fn):
                 health_info["alert_sent_at"] = current_time
 
 
-def background_monitor(storage, notify_admin, alert_settings, device_health, sleep_fn=None, time_fn=None, health_check_fn=None):
-    """Background task untuk monitoring dan alert."""
+def background_monitor(
+    storage,
+    notify_admin,
+    alert_settings,
+    device_health,
+    sleep_fn=None,
+    time_fn=None,
+    health_check_fn=None,
+    status_service=None,
+    jitter_fn=None,
+    max_workers=FANOUT_MAX_WORKERS,
+    notifier=None,
+):
+    """Background task untuk monitoring dan alert.
+
+    Device diperiksa paralel, masing-masing sesuai ``next_check`` miliknya;
+    loop tidur sampai device berikutnya jatuh tempo. Dengan
+    ``status_service``, hasil probe sekaligus mengisi snapshot cache sehingga
+    dashboard/status cukup membaca cache; snapshot itu berlaku sampai probe
+    berikutnya untuk device tersebut, walaupun interval probe melebihi TTL. Dengan ``notifier``, perubahan
+    ``devices.json`` membangunkan loop sehingga device baru langsung dicek.
+    """
     sleeper = _sleep(sleep_fn)
     now = _clock(time_fn)
+    if notifier is not None:
+        device_changes = notifier.tracker((RuntimeConfig.DEVICES,))
+        sleeper = device_changes.wait
+
+    check_fn = health_check_fn
+    on_scheduled = None
+    if status_service is not None and check_fn is None:
+        check_fn = status_service.probe_health
+        on_scheduled = status_service.keep_until
 
     while True:
         try:
-            _refresh_device_health(storage, device_health, now, health_check_fn)
+            if notifier is not None:
+                device_changes.consume_any()
+            check_interval = _positive_int(alert_settings.get("check_interval", HEALTH_CHECK_INTERVAL), HEALTH_CHECK_INTERVAL)
+            _refresh_device_health(
+                storage,
+                device_health,
+                now,
+                check_fn,
+                check_interval=check_interval,
+                max_interval=max(check_interval, HEALTH_MAX_INTERVAL),
+                jitter_fn=jitter_fn,
+                max_workers=max_workers,
+                on_scheduled=on_scheduled,
+            )
             _check_alerts(notify_admin, alert_settings, device_health, now)
-            sleeper(alert_settings.get("check_interval", 60))
+            sleeper(_seconds_until_next_health_check(device_health, now, check_interval))
         except Exception as exc:
             print("Error in background monitor: {0}".format(exc))
             sleeper(60)
 
 
-def background_auto_restart(
+def _parse_schedule_time(time_str):
+    try:
+        hour, minute = map(int, str(time_str).split(":"))
+    except (TypeError, ValueError):
+        return None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return hour, minute
+
+
+def _local_timestamp(slot):
+    # Naive datetimes carry tm_isdst=-1, so mktime resolves DST itself:
+    # a wall time inside the spring-forward gap maps to just after it.
+    return time.mktime(slot.timetuple())
+
+
+def _next_schedule_slot(task, not_before, after_slot=None):
+    """Return ``(fire_ts, slot_key)`` for the next wall-clock slot of ``task``.
+
+    ``slot_key`` is the local ``YYYY-MM-DDTHH:MM`` the user asked for. Slots
+    at or before ``after_slot`` and slots firing before ``not_before`` are
+    skipped, so a repeated wall-clock hour (DST fall-back) fires once.
+    """
+    parsed = _parse_schedule_time(task.get("time", ""))
+    days = task.get("days", [])
+    if parsed is None or not isinstance(days, list) or not days:
+        return None
+
+    start_date = datetime.fromtimestamp(not_before).date()
+    for offset in range(-1, SCHEDULE_LOOKAHEAD_DAYS):
+        day = start_date + timedelta(days=offset)
+        if day.weekday() not in days:
+            continue
+        slot = datetime.combine(day, dt_time(parsed[0], parsed[1]))
+        slot_key = slot.strftime("%Y-%m-%dT%H:%M")
+        if after_slot and slot_key <= after_slot:
+            continue
+        fire_ts = _local_timestamp(slot)
+        if fire_ts < not_before:
+            continue
+        return fire_ts, slot_key
+    return None
+
+
+def _claim_schedule_slot(storage, task_id, slot_key, current_time):
+    """Persist ``slot_key`` as fired; False if this or a later slot already ran."""
+    claimed = []
+
+    def mutate(state):
+        schedules = state.setdefault("schedules", {})
+        previous = schedules.get(task_id)
+        if isinstance(previous, dict) and str(previous.get("last_slot", "")) >= slot_key:
+            return False
+        schedules[task_id] = {"last_slot": slot_key, "last_fire": current_time}
+        claimed.append(slot_key)
+        return True
+
+    storage.update_json(RuntimeConfig.SCHEDULER_STATE, {}, mutate)
+    return bool(claimed)
+
+
+def _run_schedule_task(
     storage,
     notify_admin,
-    auto_restart_settings,
-    sleep_fn=None,
-    time_fn=None,
-    start_device_fn=None,
-    stop_device_fn=None,
-    restart_device_fn=None,
-    record_activity_fn=None,
+    task_id,
+    task,
+    sleep_fn,
+    time_fn,
+    start_device_fn,
+    stop_device_fn,
+    restart_device_fn,
+    record_activity_fn,
 ):
-    """Background task untuk auto restart EarnApp setiap beberapa jam."""
-    sleeper = _sleep(sleep_fn)
-    now = _clock(time_fn)
+    device_name = task.get("device")
+    action = task.get("action", "restart")
+    time_str = task.get("time", "")
+
+    print("Time schedule: {0} - Executing {1} on {2}".format(task_id, action, device_name))
+
+    if action == "restart":
+        result = _restart_device(storage, device_name, restart_device_fn, sleep_fn, 5, time_fn)
+        _record_activity(storage, device_name, "restart", result[:500], "scheduled", "system", record_activity_fn, time_fn)
+        icon = "🔄"
+    elif action == "start":
+        result = _start_device(storage, device_name, start_device_fn, time_fn)
+        _record_activity(storage, device_name, "start", result, "scheduled", "system", record_activity_fn, time_fn)
+        icon = "🟢"
+    elif action == "stop":
+        result = _stop_device(storage, device_name, stop_device_fn, time_fn)
+        _record_activity(storage, device_name, "stop", result, "scheduled", "system", record_activity_fn, time_fn)
+        icon = "🔴"
+    else:
+        print("Time schedule: {0} - Unknown action {1}".format(task_id, action))
+        return
 
-    while True:
+    _notify(
+        notify_admin,
+        "{0} *TIME SCHEDULE*\n\n"
+        "Task: **{1}**\n"
+        "Device: **{2}**\n"
+        "Action: {3}\n"
+        "Waktu: {4}\n\n"
+        "**Result:**\n```\n{5}\n```".format(icon, task_id, device_name, action.upper(), time_str, result),
+        "Error sending time schedule notification",
+    )
+    print("Time schedule: {0} - Completed".format(task_id))
+
+
+def _run_auto_restart(storage, notify_admin, device_name, settings, sleep_fn, time_fn, restart_device_fn, record_activity_fn):
+    interval_hours = settings.get("interval_hours", 0)
+    delay_seconds = settings.get("delay_seconds", 5)
+
+    print("Auto restart: {0} - Executing stop → wait {1}s → start".format(device_name, delay_seconds))
+    restart_result = _restart_device(storage, device_name, restart_device_fn, sleep_fn, delay_seconds, time_fn)
+    print("Auto restart: {0} - Restart executed".format(device_name))
+
+    _record_activity(storage, device_name, "restart", restart_result[:500], "auto", "system", record_activity_fn, time_fn)
+
+    _notify(
+        notify_admin,
+        "🔄 *AUTO RESTART*\n\n"
+        "Device: **{0}**\n"
+        "Interval: {1} jam\n"
+        "Delay: {2} detik\n\n"
+        "**Result:**\n```\n{3}\n```".format(
+            device_name,
+            interval_hours,
+            delay_seconds,
+            restart_result,
+        ),
+        "Error sending auto restart notification",
+    )
+    print("Auto restart: {0} - Completed (stop → wait → start)".format(device_name))
+
+
+class JobExecutor(object):
+    """Run due jobs on a bounded pool, one job at a time per device.
+
+    Jobs for a busy device wait in that device's queue instead of holding a
+    pool slot, and each run takes the same ``_device_operation`` lock as
+    manual actions from the bot and Web UI. Every finished job is kept in
+    ``history`` with its queue delay (start minus due time) and run time.
+    """
+
+    def __init__(self, max_workers=SCHEDULER_MAX_CONCURRENT_JOBS, time_fn=None, history_size=JOB_HISTORY_SIZE):
+        self.max_workers = _positive_int(max_workers, SCHEDULER_MAX_CONCURRENT_JOBS)
+        self.time_fn = _clock(time_fn)
+        self.history = collections.deque(maxlen=history_size)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = {}
+        self._active = set()
+        self._outstanding = 0
+
+    def submit(self, device_name, label, fn, due_at=None):
+        now = self.time_fn()
+        job = {
+            "key": str(device_name) if device_name else label,
+            "device": device_name,
+            "label": label,
+            "fn": fn,
+            "due_at": due_at if due_at is not None else now,
+            "queued_at": now,
+        }
+        with self._lock:
+            self._outstanding += 1
+            if job["key"] in self._active:
+                self._pending.setdefault(job["key"], collections.deque()).append(job)
+                return
+            self._active.add(job["key"])
+        self._pool.submit(self._run, job)
+
+    def wait_idle(self, timeout=None):
+        with self._idle:
+            return self._idle.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def _run(self, job):
+        started_at = self.time_fn()
+        error = None
         try:
-            _refresh_mapping_from_storage(auto_restart_settings, storage.load_auto_restart, "auto_restart.json")
-            current_time = int(now())
-
-            for device_name, settings in list(auto_restart_settings.items()):
-                if not settings.get("enabled", False):
-                    continue
-
-                interval_hours = _positive_float(settings.get("interval_hours", 0), 0)
-                if interval_hours <= 0:
-                    continue
-
-                last_run = _positive_int(settings.get("last_run", 0), 0)
-                interval_seconds = int(interval_hours * 3600)
-                delay_seconds = settings.get("delay_seconds", 5)
-
-                if current_time - last_run >= interval_seconds:
-                    claimed_settings = _claim_due_auto_restart(storage, device_name, current_time)
-                    if not claimed_settings:
-                        continue
-
-                    interval_hours = claimed_settings.get("interval_hours", interval_hours)
-                    delay_seconds = claimed_settings.get("delay_seconds", delay_seconds)
-
-                    print("Auto restart: {0} - Executing stop → wait {1}s → start".format(device_name, delay_seconds))
-
-                    restart_result = _restart_device(storage, device_name, restart_device_fn, sleep_fn, delay_seconds, now)
-                    print("Auto restart: {0} - Restart executed".format(device_name))
-
-                    _record_activity(
-                        storage,
-                        device_name,
-                        "restart",
-                        restart_result[:500],
-                        "auto",
-                        "system",
-                        record_activity_fn,
-                        now,
-                    )
-
-                    _refresh_mapping_from_storage(auto_restart_settings, storage.load_auto_restart, "auto_restart.json")
-
-                    _notify(
-                        notify_admin,
-                        "🔄 *AUTO RESTART*\n\n"
-                        "Device: **{0}**\n"
-                        "Interval: {1} jam\n"
-                        "Delay: {2} detik\n\n"
-                        "**Result:**\n```\n{3}\n```".format(
-                            device_name,
-                            interval_hours,
-                            delay_seconds,
-                            restart_result,
-                        ),
-                        "Error sending auto restart notification",
-                    )
-
-                    print("Auto restart: {0} - Completed (stop → wait → start)".format(device_name))
-
-            sleeper(60)
+            if job["device"]:
+                with _device_operation(job["device"]):
+                    job["fn"]()
+            else:
+                job["fn"]()
         except Exception as exc:
-            print("Error in background auto restart: {0}".format(exc))
-            sleeper(60)
+            error = str(exc)
+            print("Error in scheduled job {0}: {1}".format(job["label"], exc))
+        finished_at = self.time_fn()
+
+        record = {
+            "label": job["label"],
+            "device": job["device"],
+            "due_at": job["due_at"],
+            "queued_at": job["queued_at"],
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "queue_delay": round(max(0.0, started_at - job["due_at"]), 3),
+            "run_time": round(max(0.0, finished_at - started_at), 3),
+            "error": error,
+        }
+        print("Scheduled job {0}: queue delay {1:.1f}s, run time {2:.1f}s".format(job["label"], record["queue_delay"], record["run_time"]))
+
+        next_job = None
+        with self._lock:
+            self.history.append(record)
+            pending = self._pending.get(job["key"])
+            if pending:
+                next_job = pending.popleft()
+            if not pending:
+                self._pending.pop(job["key"], None)
+            if next_job is None:
+                self._active.discard(job["key"])
+            self._outstanding -= 1
+            if self._outstanding == 0:
+                self._idle.notify_all()
+        if next_job is not None:
+            self._pool.submit(self._run, next_job)
+
+
+class Scheduler(object):
+    """Fire time schedules and auto-restart policies from one heap.
+
+    The heap holds the next fire timestamp of every enabled job and is only
+    rebuilt when ``schedules.json`` or ``auto_restart.json`` change. The
+    loop sleeps until the earliest entry (capped at ``max_sleep`` so clock
+    jumps are noticed). Fired schedule slots are claimed in
+    ``scheduler_state.json``, which survives restarts and stops two bot
+    instances, a DST repeat or a backwards clock jump from firing a slot
+    twice. Slots missed by at most ``misfire_grace`` seconds (downtime,
+    forward jumps) still fire once; older ones are skipped. The grace never
+    reaches back before the task's ``created_at`` or its last claim, so a
+    new task whose time already passed today waits for its next slot.
+
+    Claims happen on the scheduler thread; the actions themselves run on a
+    ``JobExecutor`` so jobs due at the same minute on different devices run
+    concurrently.
+
+    With a ``change_tracker`` (see ``earnapp.core.watch``) the storage is
+    only re-read after ``schedules.json``/``auto_restart.json`` change, and
+    a change wakes the sleeping loop immediately.
+    """
+
+    def __init__(
+        self,
+        storage,
+        notify_admin,
+        scheduled_tasks,
+        auto_restart_settings,
+        sleep_fn=None,
+        time_fn=None,
+        start_device_fn=None,
+        stop_device_fn=None,
+        restart_device_fn=None,
+        record_activity_fn=None,
+        misfire_grace=SCHEDULE_MISFIRE_GRACE,
+        max_sleep=SCHEDULER_MAX_SLEEP,
+        max_concurrent_jobs=SCHEDULER_MAX_CONCURRENT_JOBS,
+        executor=None,
+        change_tracker=None,
+    ):
+        self.storage = storage
+        self.notify_admin = notify_admin
+        self.scheduled_tasks = scheduled_tasks
+        self.auto_restart_settings = auto_restart_settings
+        self.sleep_fn = sleep_fn
+        self.time_fn = _clock(time_fn)
+        self.start_device_fn = start_device_fn
+        self.stop_device_fn = stop_device_fn
+        self.restart_device_fn = restart_device_fn
+        self.record_activity_fn = record_activity_fn
+        self.misfire_grace = misfire_grace
+        self.max_sleep = max_sleep
+        self.executor = executor if executor is not None else JobExecutor(max_concurrent_jobs, time_fn)
+        self.change_tracker = change_tracker
+        self._heap = []
+        self._sequence = itertools.count()
+        self._signature = None
+
+    def reload(self):
+        """Refresh schedules/policies; rebuild the heap only if they changed."""
+        _refresh_mapping_from_storage(self.scheduled_tasks, self.storage.load_schedules, "schedules.json")
+        _refresh_mapping_from_storage(self.auto_restart_settings, self.storage.load_auto_restart, "auto_restart.json")
+        signature = json.dumps([self.scheduled_tasks, self.auto_restart_settings], sort_keys=True, default=str)
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        self._rebuild(self.time_fn())
+        return True
 
+    def reload_if_changed(self):
+        """``reload`` only when the tracker saw a change (always without one)."""
+        changed = self.change_tracker is None or self.change_tracker.consume_any()
+        if changed or self._signature is None:
+            return self.reload()
+        return False
+
+    def next_fire_time(self):
+        return self._heap[0][0] if self._heap else None
+
+    def seconds_until_next(self):
+        next_fire = self.next_fire_time()
+        if next_fire is None:
+            return self.max_sleep
+        return max(0.0, min(self.max_sleep, next_fire - self.time_fn()))
+
+    def run_pending(self):
+        """Dispatch every entry that is due now; return how many jobs were queued."""
+        fired = 0
+        while self._heap and self._heap[0][0] <= self.time_fn():
+            entry = heapq.heappop(self._heap)
+            if self._fire(entry):
+                fired += 1
+        return fired
+
+    def run_forever(self):
+        sleeper = _sleep(self.sleep_fn)
+        if self.change_tracker is not None:
+            sleeper = self.change_tracker.wait
+        while True:
+            try:
+                self.reload_if_changed()
+                self.run_pending()
+                sleeper(self.seconds_until_next())
+            except Exception as exc:
+                print("Error in background scheduler: {0}".format(exc))
+                sleeper(60)
+
+    def _push(self, fire_ts, kind, key, slot_key=None):
+        heapq.heappush(self._heap, (fire_ts, next(self._sequence), kind, key, slot_key))
+
+    def _rebuild(self, now):
+        self._heap = []
+        try:
+            state = self.storage.read_json(RuntimeConfig.SCHEDULER_STATE, {})
+        except Exception as exc:
+            print("Error loading scheduler_state.json: {0}".format(exc))
+            state = {}
+        fired_slots = state.get("schedules", {}) if isinstance(state, dict) else {}
+
+        for task_id, task in self.scheduled_tasks.items():
+            if not isinstance(task, dict) or not task.get("enabled", True):
+                continue
+            previous = fired_slots.get(task_id) if isinstance(fired_slots.get(task_id), dict) else {}
+            self._push_next_slot(task_id, task, now, previous.get("last_slot"), previous.get("last_fire"))
+
+        for device_name, settings in self.auto_restart_settings.items():
+            if not isinstance(settings, dict) or not settings.get("enabled", False):
+                continue
+            interval_hours = _positive_float(settings.get("interval_hours", 0), 0)
+            if interval_hours <= 0:
+                continue
+            last_run = _positive_int(settings.get("last_run", 0), 0)
+            self._push(last_run + int(interval_hours * 3600), "auto_restart", device_name)
+
+    def _push_next_slot(self, task_id, task, now, after_slot, claimed_at=None):
+        not_before = now - self.misfire_grace
+        anchor = _positive_int(claimed_at, 0) or _positive_int(task.get("created_at", 0), 0)
+        if anchor:
+            not_before = max(not_before, anchor)
+        upcoming = _next_schedule_slot(task, not_before, after_slot)
+        if upcoming is not None:
+            self._push(upcoming[0], "schedule", task_id, upcoming[1])
+
+    def _fire(self, entry):
+        fire_ts, _sequence, kind, key, slot_key = entry
+        current_time = int(self.time_fn())
+        if kind == "auto_restart":
+            return self._fire_auto_restart(key, fire_ts, current_time)
+
+        task = self.scheduled_tasks.get(key)
+        if not isinstance(task, dict):
+            return False
+        self._push_next_slot(key, task, current_time, slot_key)
+        if current_time - fire_ts > self.misfire_grace:
+            print("Time schedule: {0} - Skipping slot {1} (missed by {2}s)".format(key, slot_key, int(current_time - fire_ts)))
+            return False
+        if not _claim_schedule_slot(self.storage, key, slot_key, current_time):
+            return False
+        self.executor.submit(
+            task.get("device"),
+            "schedule:{0}".format(key),
+            lambda: _run_schedule_task(
+                self.storage,
+                self.notify_admin,
+                key,
+                task,
+                self.sleep_fn,
+                self.time_fn,
+                self.start_device_fn,
+                self.stop_device_fn,
+                self.restart_device_fn,
+                self.record_activity_fn,
+            ),
+            fire_ts,
+        )
+        return True
 
-def background_time_schedule(
+    def _fire_auto_restart(self, device_name, fire_ts, current_time):
+        try:
+            claimed_settings = _claim_due_auto_restart(self.storage, device_name, current_time)
+        finally:
+            # last_run moved (here or in another process), or the claim
+            # failed with this entry already popped: either way the next
+            # reload must rebuild, re-reading the policy from storage.
+            self._signature = None
+        if claimed_settings:
+            self.executor.submit(
+                device_name,
+                "auto_restart:{0}".format(device_name),
+                lambda: _run_auto_restart(
+                    self.storage,
+                    self.notify_admin,
+                    device_name,
+                    claimed_settings,
+                    self.sleep_fn,
+                    self.time_fn,
+                    self.restart_device_fn,
+                    self.record_activity_fn,
+                ),
+                fire_ts,
+            )
+        return bool(claimed_settings)
+
+
+def background_scheduler(
     storage,
     notify_admin,
     scheduled_tasks,
+    auto_restart_settings,
     sleep_fn=None,
     time_fn=None,
     start_device_fn=None,
     stop_device_fn=None,
     restart_device_fn=None,
     record_activity_fn=None,
+    max_concurrent_jobs=SCHEDULER_MAX_CONCURRENT_JOBS,
+    notifier=None,
 ):
-    """Background task untuk menjalankan time-based schedule."""
-    sleeper = _sleep(sleep_fn)
-    now = _clock(time_fn)
-    last_executions = {}
-
-    while True:
-        try:
-            _refresh_mapping_from_storage(scheduled_tasks, storage.load_schedules, "schedules.json")
-            current_time = datetime.fromtimestamp(now())
-            current_hour = current_time.hour
-            current_minute = current_time.minute
-            current_weekday = current_time.weekday()
-
-            for task_id, task in list(scheduled_tasks.items()):
-                if not task.get("enabled", True):
-                    continue
-
-                time_str = task.get("time", "")
-                if not time_str:
-                    continue
-
-                try:
-                    task_hour, task_minute = map(int, time_str.split(":"))
-                except (ValueError, IndexError):
-                    continue
-
-                task_days = task.get("days", [])
-                if current_weekday not in task_days:
-                    continue
-
-                if current_hour == task_hour and current_minute == task_minute:
-                    last_exec = last_executions.get(task_id, 0)
-                    if int(now()) - last_exec < 60:
-                        continue
-
-                    device_name = task.get("device")
-                    action = task.get("action", "restart")
-
-                    print("Time schedule: {0} - Executing {1} on {2}".format(task_id, action, device_name))
-
-                    if action == "restart":
-                        restart_result = _restart_device(storage, device_name, restart_device_fn, sleep_fn, 5, now)
-
-                        _record_activity(
-                            storage,
-                            device_name,
-                            "restart",
-                            restart_result[:500],
-                            "scheduled",
-                            "system",
-                            record_activity_fn,
-                            now,
-                        )
-
-                        _notify(
-                            notify_admin,
-                            "🔄 *TIME SCHEDULE*\n\n"
-                            "Task: **{0}**\n"
-                            "Device: **{1}**\n"
-                            "Action: RESTART\n"
-                            "Waktu: {2}\n\n"
-                            "**Result:**\n```\n{3}\n```".format(task_id, device_name, time_str, restart_result),
-                            "Error sending time schedule notification",
-                        )
-
-                    elif action == "start":
-                        result = _start_device(storage, device_name, start_device_fn, now)
-
-                        _record_activity(storage, device_name, "start", result, "scheduled", "system", record_activity_fn, now)
-
-                        _notify(
-                            notify_admin,
-                            "🟢 *TIME SCHEDULE*\n\n"
-                            "Task: **{0}**\n"
-                            "Device: **{1}**\n"
-                            "Action: START\n"
-                            "Waktu: {2}\n\n"
-                            "**Result:**\n```\n{3}\n```".format(task_id, device_name, time_str, result),
-                            "Error sending time schedule notification",
-                        )
-
-                    elif action == "stop":
-                        result = _stop_device(storage, device_name, stop_device_fn, now)
-
-                        _record_activity(storage, device_name, "stop", result, "scheduled", "system", record_activity_fn, now)
-
-                        _notify(
-                            notify_admin,
-                            "🔴 *TIME SCHEDULE*\n\n"
-                            "Task: **{0}**\n"
-                            "Device: **{1}**\n"
-                            "Action: STOP\n"
-                            "Waktu: {2}\n\n"
-                            "**Result:**\n```\n{3}\n```".format(task_id, device_name, time_str, result),
-                            "Error sending time schedule notification",
-                        )
-
-                    last_executions[task_id] = int(now())
-                    print("Time schedule: {0} - Completed".format(task_id))
-
-            sleeper(30)
-        except Exception as exc:
-            print("Error in background time schedule: {0}".format(exc))
-            sleeper(60)
+    """Background task untuk time-based schedule dan auto restart."""
+    change_tracker = None
+    if notifier is not None:
+        change_tracker = notifier.tracker((RuntimeConfig.SCHEDULES, RuntimeConfig.AUTO_RESTART))
+    Scheduler(
+        storage,
+        notify_admin,
+        scheduled_tasks,
+        auto_restart_settings,
+        sleep_fn=sleep_fn,
+        time_fn=time_fn,
+        start_device_fn=start_device_fn,
+        stop_device_fn=stop_device_fn,
+        restart_device_fn=restart_device_fn,
+        record_activity_fn=record_activity_fn,
+        max_concurrent_jobs=max_concurrent_jobs,
+        change_tracker=change_tracker,
+    ).run_forever()
 
 
 def start_workers(
@@ -401,31 +818,21 @@ def start_workers(
     stop_device_fn=None,
     restart_device_fn=None,
     record_activity_fn=None,
+    status_service=None,
+    max_concurrent_jobs=SCHEDULER_MAX_CONCURRENT_JOBS,
+    notifier=None,
 ):
     """Start Telegram background worker threads and return them by name."""
     workers = {
         "monitor": threading.Thread(
             target=background_monitor,
             args=(storage, notify_admin, alert_settings, device_health),
-            kwargs={"sleep_fn": sleep_fn, "time_fn": time_fn},
+            kwargs={"sleep_fn": sleep_fn, "time_fn": time_fn, "status_service": status_service, "notifier": notifier},
             daemon=True,
         ),
-        "auto_restart": threading.Thread(
-            target=background_auto_restart,
-            args=(storage, notify_admin, auto_restart_settings),
-            kwargs={
-                "sleep_fn": sleep_fn,
-                "time_fn": time_fn,
-                "start_device_fn": start_device_fn,
-                "stop_device_fn": stop_device_fn,
-                "restart_device_fn": restart_device_fn,
-                "record_activity_fn": record_activity_fn,
-            },
-            daemon=True,
-        ),
-        "time_schedule": threading.Thread(
-            target=background_time_schedule,
-            args=(storage, notify_admin, scheduled_tasks),
+        "scheduler": threading.Thread(
+            target=background_scheduler,
+            args=(storage, notify_admin, scheduled_tasks, auto_restart_settings),
             kwargs={
                 "sleep_fn": sleep_fn,
                 "time_fn": time_fn,
@@ -433,6 +840,8 @@ def start_workers(
                 "stop_device_fn": stop_device_fn,
                 "restart_device_fn": restart_device_fn,
                 "record_activity_fn": record_activity_fn,
+                "max_concurrent_jobs": max_concurrent_jobs,
+                "notifier": notifier,
             },
             daemon=True,
         ),
@@ -441,10 +850,7 @@ def start_workers(
     workers["monitor"].start()
     print("🔍 Background monitoring started...")
 
-    workers["auto_restart"].start()
-    print("🔄 Background auto restart started...")
-
-    workers["time_schedule"].start()
-    print("🕐 Background time-based schedule started...")
+    workers["scheduler"].start()
+    print("🕐 Background scheduler (time schedule + auto restart) started...")
 
     return workers
@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 import os
-import json
 import telebot
 import subprocess
 import sys
@@ -8,34 +7,53 @@ from telebot import types
 import time
 import threading
 
-from earnapp.core.executors import AdbExecutor, LocalExecutor, SshExecutor
-from earnapp.core.storage import JsonStorage
+from earnapp.adapters.telegram.dispatch import HANDLER_MAX_WORKERS, AnswerTracker, ChatExecutor
+from earnapp.adapters.telegram.routing import Router
+from earnapp.core.executors import AdbExecutor, LocalExecutor, SshExecutor, close_ssh_connections
+from earnapp.core.notifications import NotificationQueue
+from earnapp.core.state import StateStore
+from earnapp.core.status_cache import StatusSnapshotService
+from earnapp.core.storage import open_storage
 from earnapp.core.use_cases import (
+    ROLLING_BATCH_SIZE,
+    ROLLING_HEALTH_TIMEOUT,
+    ROLLING_MAX_FAILURES,
     add_device as add_device_use_case,
     clear_activity_log as clear_activity_log_use_case,
+    count_activity_logs as count_activity_logs_use_case,
     delete_device as delete_device_use_case,
     add_schedule as add_schedule_use_case,
     delete_schedule as delete_schedule_use_case,
     disable_auto_restart as disable_auto_restart_use_case,
+    export_activity_log as export_activity_log_use_case,
     format_adb_result as format_adb_result_use_case,
     get_adb_app_status as get_adb_app_status_use_case,
-    get_all_device_statuses as get_all_device_statuses_use_case,
     get_device_health as get_device_health_use_case,
     get_device_id as get_device_id_use_case,
     get_ssh_earnapp_status as get_ssh_earnapp_status_use_case,
+    list_activity_logs as list_activity_logs_use_case,
     record_activity as record_activity_use_case,
-    restart_all_devices as restart_all_devices_use_case,
     restart_device as restart_device_use_case,
+    rolling_restart_devices as rolling_restart_devices_use_case,
     run_device_command_by_name as run_device_command_by_name_use_case,
     set_auto_restart as set_auto_restart_use_case,
     start_all_devices as start_all_devices_use_case,
     start_device as start_device_use_case,
     stop_all_devices as stop_all_devices_use_case,
     stop_device as stop_device_use_case,
+    stream_device_command as stream_device_command_use_case,
 )
-from earnapp.core.workers import start_workers
-
-storage = JsonStorage()
+from earnapp.core.watch import watch_storage
+from earnapp.core.workers import SCHEDULER_MAX_CONCURRENT_JOBS, start_workers
+
+storage = open_storage()
+status_service = StatusSnapshotService(storage)
+# inotify (atau polling) di data directory: state bot hanya dibaca ulang
+# setelah file runtime benar-benar berubah.
+storage_notifier = watch_storage(storage)
+# View devices/schedules/auto restart/activity log di memori; hanya dibaca
+# ulang dari storage setelah notifier melaporkan perubahan.
+state_store = StateStore(storage, storage_notifier)
 
 # Load konfigurasi dari file
 def load_config():
@@ -89,7 +107,35 @@ if not ADMIN_ID:
     print("📝 Gunakan nilai numeric Telegram ID yang valid, bukan placeholder.")
     exit(1)
 
-bot = telebot.TeleBot(TOKEN)
+# threaded=False: polling thread hanya meneruskan update ke handler_executor
+# (lihat router.attach), jadi handler lambat tidak menahan chat lain.
+bot = telebot.TeleBot(TOKEN, threaded=False)
+BUSY_ACK_TEXT = "⏳ Masih memproses perintah sebelumnya, perintah ini dijalankan setelahnya..."
+handler_executor = ChatExecutor(config.get("telegram_handler_workers", HANDLER_MAX_WORKERS))
+# Handler berjalan di thread pool; exit code diteruskan ke main thread lewat
+# request_shutdown karena sys.exit di thread worker tidak menghentikan proses.
+shutdown_exit_code = [None]
+callback_answers = AnswerTracker()
+# Semua notifikasi admin lewat satu antrian: worker tidak pernah menunggu
+# HTTP Telegram, burst digabung jadi satu digest, dan 429 dihormati.
+admin_notifications = NotificationQueue(
+    lambda text: bot.send_message(ADMIN_ID, text, parse_mode="Markdown"),
+    plain_send_fn=lambda text: bot.send_message(ADMIN_ID, text),
+)
+# Export log dikirim sebagai dokumen; aktifkan gzip untuk history yang besar.
+ACTIVITY_EXPORT_GZIP = bool(config.get("activity_export_gzip", False))
+
+def answer_callback(call, text=None, **kwargs):
+    """Jawab callback query sekali saja (ack ⏳ dari dispatcher mungkin sudah terkirim)."""
+    if callback_answers.first(call.id):
+        bot.answer_callback_query(call.id, text, **kwargs)
+
+def acknowledge_busy(update):
+    """Balas langsung saat update harus menunggu perintah sebelumnya di chat yang sama."""
+    if hasattr(update, "data"):
+        answer_callback(update, BUSY_ACK_TEXT)
+    else:
+        bot.reply_to(update, BUSY_ACK_TEXT)
 
 # -----------------------
 # ADB Configuration
@@ -125,15 +171,14 @@ remove_device_state = {}  # chat_id -> True
 
 # Menyimpan scheduled tasks (time-based)
 SCHEDULE_FILE = storage.path_for("schedules.json")
-scheduled_tasks = {}  # task_id -> {"device": "name", "action": "restart/start/stop", "time": "HH:MM", "days": [0,1,2,3,4,5,6], "enabled": True, "timezone": "UTC"}
+scheduled_tasks = {}  # task_id -> {"device": "name", "action": "restart/start/stop", "time": "HH:MM", "days": [0,1,2,3,4,5,6], "enabled": True, "timezone": "UTC", "created_at": 1700000000}
 
-# Load scheduled tasks dari file
-if os.path.exists(SCHEDULE_FILE):
-    try:
-        scheduled_tasks = storage.load_schedules()
-    except Exception as e:
-        print(f"Error loading schedules.json: {e}")
-        scheduled_tasks = {}
+# Load scheduled tasks dari storage
+try:
+    scheduled_tasks = storage.load_schedules()
+except Exception as e:
+    print(f"Error loading schedules.json: {e}")
+    scheduled_tasks = {}
 
 # Menyimpan state sementara saat user menambah time-based schedule
 schedule_state = {}  # chat_id -> {"step": 1..5, "data": {}}
@@ -145,13 +190,12 @@ filter_date_state = {}  # chat_id -> True
 AUTO_RESTART_FILE = storage.path_for("auto_restart.json")
 auto_restart_settings = {}  # device_name -> {"enabled": True/False, "interval_hours": 6, "delay_seconds": 5, "last_run": timestamp}
 
-# Load auto restart settings dari file
-if os.path.exists(AUTO_RESTART_FILE):
-    try:
-        auto_restart_settings = storage.load_auto_restart()
-    except Exception as e:
-        print(f"Error loading auto_restart.json: {e}")
-        auto_restart_settings = {}
+# Load auto restart settings dari storage
+try:
+    auto_restart_settings = storage.load_auto_restart()
+except Exception as e:
+    print(f"Error loading auto_restart.json: {e}")
+    auto_restart_settings = {}
 
 # Menyimpan state sementara saat user mengatur auto restart
 auto_restart_state = {}  # chat_id -> {"step": 1..3, "data": {}}
@@ -167,74 +211,38 @@ alert_settings = {
 }
 
 # Activity Log & History
+# Log: [{"timestamp": timestamp, "device": "name", "action": "start/stop/restart", "result": "result", "user": "admin", "type": "manual/auto/scheduled"}]
+# dibaca lewat refresh_activity_logs() (view di state_store).
 ACTIVITY_LOG_FILE = storage.path_for("activity_log.json")
-activity_logs = []  # List of logs: [{"timestamp": timestamp, "device": "name", "action": "start/stop/restart", "result": "result", "user": "admin", "type": "manual/auto/scheduled"}]
-
-# Load activity logs dari file
-if os.path.exists(ACTIVITY_LOG_FILE):
-    try:
-        activity_logs = storage.load_activity_log()
-    except Exception as e:
-        print(f"Error loading activity_log.json: {e}")
-        activity_logs = []
 
 # Limit jumlah log (keep last 1000 entries)
 MAX_LOG_ENTRIES = 1000
 
 
-def _replace_mapping(target, source):
-    if source is None:
-        source = {}
-    target.clear()
-    target.update(source)
-    return target
-
-
-def _replace_list(target, source):
-    if source is None:
-        source = []
-    target[:] = source
-    return target
-
-
-def _load_mapping_into(target, load_fn, label):
-    try:
-        loaded = load_fn()
-        if not isinstance(loaded, dict):
-            print(f"Error loading {label}: expected object")
-            return target
-        return _replace_mapping(target, loaded)
-    except Exception as e:
-        print(f"Error loading {label}: {e}")
-        return target
-
-
-def _load_list_into(target, load_fn, label):
-    try:
-        loaded = load_fn()
-        if not isinstance(loaded, list):
-            print(f"Error loading {label}: expected list")
-            return target
-        return _replace_list(target, loaded)
-    except Exception as e:
-        print(f"Error loading {label}: {e}")
-        return target
-
-
+# devices/scheduled_tasks/auto_restart_settings di-rebind ke view state_store
+# (tidak pernah diisi ulang di tempat), jadi handler lain yang sedang
+# mengiterasi dict lama tidak ikut berubah. Jangan ubah view ini langsung.
 def refresh_devices():
-    return _load_mapping_into(devices, storage.load_devices, "devices.json")
+    global devices
+    devices = state_store.get("devices.json")
+    return devices
 
 
 def refresh_schedules():
-    return _load_mapping_into(scheduled_tasks, storage.load_schedules, "schedules.json")
+    global scheduled_tasks
+    scheduled_tasks = state_store.get("schedules.json")
+    return scheduled_tasks
 
 
 def refresh_auto_restart_settings():
-    return _load_mapping_into(auto_restart_settings, storage.load_auto_restart, "auto_restart.json")
+    global auto_restart_settings
+    auto_restart_settings = state_store.get("auto_restart.json")
+    return auto_restart_settings
 
 
 def refresh_activity_logs():
-    return _load_list_into(activity_logs, storage.load_activity_log, "activity_log.json")
+    """View activity log dari state_store; jangan diubah langsung."""
+    return state_store.get("activity_log.json")
 
 
 def refresh_runtime_state():
@@ -254,8 +262,8 @@ def _text_result(value):
 
 
 def is_known_device_message(message):
-    refresh_devices()
-    return message.text in devices
+    # Predikat router: cek admin dulu agar pesan non-admin tidak menyentuh state.
+    return is_admin_message(message) and message.text in refresh_devices()
 
 
 def is_admin_user(user_id):
@@ -275,7 +283,7 @@ def deny_non_admin_message(message, response="❌ Anda tidak memiliki akses ke b
 
 
 def deny_non_admin_call(call, response="❌ Anda tidak memiliki akses ke bot ini."):
-    bot.answer_callback_query(call.id, response)
+    answer_callback(call, response)
 
 
 def require_admin_message(message):
@@ -320,6 +328,31 @@ def run_cmd_device_by_name(device_name, cmd):
     """Jalankan command di device tertentu berdasarkan nama"""
     return run_device_command_by_name_use_case(storage, device_name, cmd)
 
+# Batas edit pesan progress (Telegram membatasi edit per chat) dan panjang
+# output yang ditampilkan (pesan maksimal 4096 karakter).
+PROGRESS_EDIT_INTERVAL = 2.0
+PROGRESS_TAIL_CHARS = 3000
+
+def stream_cmd_to_message(chat_id, message_id, title, device_name, cmd):
+    """Jalankan command panjang dan tampilkan outputnya di satu pesan yang di-edit berkala."""
+    stream = stream_device_command_use_case(storage, device_name, cmd)
+    last_edit = 0.0
+    last_text = None
+    for _chunk in stream:
+        now = time.time()
+        if now - last_edit < PROGRESS_EDIT_INTERVAL:
+            continue
+        last_edit = now
+        text = f"{title}\n```\n{stream.buffer.text()[-PROGRESS_TAIL_CHARS:]}\n```\n\n⏳ Masih berjalan..."
+        if text == last_text:
+            continue
+        try:
+            bot.edit_message_text(text, chat_id, message_id, parse_mode="Markdown")
+            last_text = text
+        except Exception as e:
+            print(f"Error updating progress message: {e}")
+    return stream.result.message[-PROGRESS_TAIL_CHARS:]
+
 def get_ssh_earnapp_status(device_name):
     """Cek status EarnApp via SSH (return simple status)"""
     return get_ssh_earnapp_status_use_case(storage, device_name)
@@ -359,11 +392,11 @@ def check_device_health(device_name):
     }
     return is_healthy
 
-def get_dashboard_data():
-    """Kumpulkan data untuk dashboard"""
+def get_dashboard_data(fresh=False):
+    """Kumpulkan data untuk dashboard (dari snapshot cache kecuali fresh=True)"""
     dashboard_data = []
 
-    statuses = get_all_device_statuses_use_case(storage).get("devices", [])
+    statuses = status_service.get_all_statuses(fresh=fresh).get("devices", [])
     for device_status in statuses:
         device_name = device_status.get("name")
         is_healthy = device_status.get("health") == "online"
@@ -379,32 +412,35 @@ def get_dashboard_data():
             "name": device_name,
             "health": status_icon,
             "earnapp": earnapp_icon,
-            "status": status_text
+            "status": status_text,
+            "snapshot_age": device_status.get("snapshot_age", 0)
         })
     
     return dashboard_data
 
+def format_snapshot_age(age):
+    """Keterangan umur data status dari snapshot cache."""
+    if not age or age < 1:
+        return "🕒 Data: live"
+    return f"🕒 Data: {int(age)} detik lalu"
+
 def send_alert(chat_id, message):
     """Kirim alert ke admin"""
-    if ADMIN_ID:
-        try:
-            bot.send_message(ADMIN_ID, f"🚨 *ALERT*\n\n{message}", parse_mode="Markdown")
-        except Exception as e:
-            print(f"Error sending alert: {e}")
+    notify_admin(f"🚨 *ALERT*\n\n{message}")
 
 def log_activity(device_name, action, result, log_type="manual", user="admin"):
     """Log aktivitas ke activity log"""
     try:
         saved_logs = record_activity_use_case(storage, device_name, action, result, log_type, user)
         if saved_logs is not None:
-            activity_logs[:] = saved_logs
+            state_store.put("activity_log.json", saved_logs)
     except Exception as e:
         print(f"Error logging activity: {e}")
 
 def notify_admin(message):
-    """Kirim notifikasi Markdown ke admin."""
+    """Antrikan notifikasi Markdown ke admin; dikirim oleh thread sender."""
     if ADMIN_ID:
-        bot.send_message(ADMIN_ID, message, parse_mode="Markdown")
+        admin_notifications.enqueue(message)
 
 def check_alerts():
     """Cek dan kirim alert jika diperlukan"""
@@ -465,7 +501,26 @@ def show_device_menu(chat_id):
 # -----------------------
 # Handlers
 # -----------------------
-@bot.message_handler(commands=['start'])
+# Urutan state percakapan per chat; chat hanya berada di satu flow sekaligus.
+CONVERSATION_STATES = (
+    ("add_device", add_device_state),
+    ("schedule", schedule_state),
+    ("auto_restart", auto_restart_state),
+    ("filter_date", filter_date_state),
+)
+
+def conversation_state(chat_id):
+    """(nama flow, step) untuk chat ini, atau None jika tidak sedang dalam flow."""
+    for name, states in CONVERSATION_STATES:
+        state = states.get(chat_id)
+        if state is not None:
+            return name, state.get("step") if isinstance(state, dict) else None
+    return None
+
+# Semua message/callback lewat satu handler telebot; route dicari lewat dict.
+router = Router(state_lookup=conversation_state).attach(bot, handler_executor, acknowledge_busy)
+
+@router.command('start')
 def start_cmd(msg):
     # Cek apakah user adalah admin
     if not require_admin_message(msg):
@@ -475,7 +530,7 @@ def start_cmd(msg):
     show_device_menu(msg.chat.id)
 
 # Pilih device
-@bot.message_handler(func=is_known_device_message)
+@router.text_match(is_known_device_message)
 def select_device(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -507,8 +562,8 @@ def select_device(m):
     show_main_menu(m.chat.id)
 
 # Tambah device via Telegram
-@bot.message_handler(commands=['adddevice'])
-@bot.message_handler(func=lambda m: m.text == "➕ Add Device")
+@router.command('adddevice')
+@router.text("➕ Add Device")
 def add_device_start(msg):
     # Cek apakah user adalah admin
     if not require_admin_message(msg):
@@ -526,7 +581,7 @@ def add_device_start(msg):
     bot.send_message(chat_id, "📱 *TAMBAH DEVICE BARU*\n\nPilih tipe device yang ingin ditambahkan:", 
                      parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("add_device_type:"))
+@router.callback_prefix("add_device_type:")
 def add_device_type_callback(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -541,7 +596,7 @@ def add_device_type_callback(call):
     add_device_state[chat_id]["data"]["device_type"] = device_type
     add_device_state[chat_id]["step"] = 1
     
-    bot.answer_callback_query(call.id, f"✅ Tipe device: {device_type.upper()}")
+    answer_callback(call, f"✅ Tipe device: {device_type.upper()}")
     bot.edit_message_text(
         f"📱 *TAMBAH DEVICE BARU*\n\nTipe: **{device_type.upper()}**\n\nMasukkan IP address device:",
         chat_id,
@@ -549,7 +604,7 @@ def add_device_type_callback(call):
         parse_mode="Markdown"
     )
 
-@bot.message_handler(func=lambda m: m.chat.id in add_device_state)
+@router.state("add_device")
 def add_device_process(msg):
     # Cek apakah user adalah admin
     if not require_admin_message(msg):
@@ -631,7 +686,7 @@ def add_device_process(msg):
         show_main_menu(chat_id)
 
 # Menu kontrol
-@bot.message_handler(func=lambda m: m.text == "🟡 Status")
+@router.text("🟡 Status")
 def handler_status(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -660,7 +715,7 @@ def handler_status(m):
     
     bot.reply_to(m, f"📊 *Status ({device_name}):*\n```\n{out}\n```", parse_mode="Markdown")
 
-@bot.message_handler(func=lambda m: m.text == "🟢 Start EarnApp")
+@router.text("🟢 Start EarnApp")
 def handler_start(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -679,22 +734,16 @@ def handler_start(m):
     log_activity(device_name, "start", status_out, "manual", str(m.from_user.id))
     
     # Kirim notifikasi ke admin
-    if ADMIN_ID:
-        try:
-            bot.send_message(
-                ADMIN_ID,
-                f"🟢 *MANUAL START*\n\n"
-                f"Device: **{device_name}**\n"
-                f"User: {m.from_user.first_name} (@{m.from_user.username or 'N/A'})\n\n"
-                f"**Result:**\n```\n{status_out}\n```",
-                parse_mode="Markdown"
-            )
-        except Exception as e:
-            print(f"Error sending notification: {e}")
+    notify_admin(
+        f"🟢 *MANUAL START*\n\n"
+        f"Device: **{device_name}**\n"
+        f"User: {m.from_user.first_name} (@{m.from_user.username or 'N/A'})\n\n"
+        f"**Result:**\n```\n{status_out}\n```"
+    )
     
     bot.reply_to(m, f"🟢 *Menjalankan EarnApp ({device_name}):*\n```\n{status_out}\n```", parse_mode="Markdown")
 
-@bot.message_handler(func=lambda m: m.text == "🔴 Stop EarnApp")
+@router.text("🔴 Stop EarnApp")
 def handler_stop(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -713,22 +762,16 @@ def handler_stop(m):
     log_activity(device_name, "stop", status_out, "manual", str(m.from_user.id))
     
     # Kirim notifikasi ke admin
-    if ADMIN_ID:
-        try:
-            bot.send_message(
-                ADMIN_ID,
-                f"🔴 *MANUAL STOP*\n\n"
-                f"Device: **{device_name}**\n"
-                f"User: {m.from_user.first_name} (@{m.from_user.username or 'N/A'})\n\n"
-                f"**Result:**\n```\n{status_out}\n```",
-                parse_mode="Markdown"
-            )
-        except Exception as e:
-            print(f"Error sending notification: {e}")
+    notify_admin(
+        f"🔴 *MANUAL STOP*\n\n"
+        f"Device: **{device_name}**\n"
+        f"User: {m.from_user.first_name} (@{m.from_user.username or 'N/A'})\n\n"
+        f"**Result:**\n```\n{status_out}\n```"
+    )
     
     bot.reply_to(m, f"🔴 *Menghentikan EarnApp ({device_name}):*\n```\n{status_out}\n```", parse_mode="Markdown")
 
-@bot.message_handler(func=lambda m: m.text == "🆔 Show ID")
+@router.text("🆔 Show ID")
 def handler_showid(m):
     if not require_admin_message(m):
         return
@@ -745,7 +788,7 @@ def handler_showid(m):
         out = payload.get("error", "Device tidak ditemukan")
     bot.reply_to(m, f"🆔 *Device ID ({dev_name}):*\n```\n{out}\n```", parse_mode="Markdown")
 
-@bot.message_handler(func=lambda m: m.text == "💣 Uninstall")
+@router.text("💣 Uninstall")
 def handler_uninstall(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -760,38 +803,47 @@ def handler_uninstall(m):
     bot.reply_to(m, "⚠️ *Konfirmasi Uninstall EarnApp*\n\nApakah Anda yakin ingin menghapus EarnApp dari device ini?\n\n**Peringatan:** Tindakan ini tidak dapat dibatalkan!", 
                  parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "confirm_uninstall")
+@router.callback("confirm_uninstall")
 def confirm_uninstall(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
     
-    bot.answer_callback_query(call.id, "🔄 Memproses uninstall...")
+    answer_callback(call, "🔄 Memproses uninstall...")
     
-    # Jalankan uninstall
-    out = run_cmd_device(call.message.chat.id, "earnapp uninstall")
+    # Jalankan uninstall, output ditampilkan bertahap di pesan konfirmasi
+    chat_id = call.message.chat.id
+    dev_name = user_device.get(chat_id)
+    refresh_devices()
+    title = f"💣 *Uninstall EarnApp ({dev_name or '—'}):*"
+    if not dev_name:
+        out = "❌ Device belum dipilih. Gunakan /start untuk memilih device."
+    elif dev_name not in devices:
+        out = f"❌ Device '{dev_name}' tidak ditemukan."
+    else:
+        out = stream_cmd_to_message(chat_id, call.message.message_id, title, dev_name, "earnapp uninstall")
     
     # Edit pesan dengan hasil
     bot.edit_message_text(
-        f"💣 *Uninstall EarnApp ({user_device.get(call.message.chat.id, '—')}):*\n```\n{out}\n```\n\n✅ Uninstall selesai!",
+        f"{title}\n```\n{out}\n```\n\n✅ Uninstall selesai!",
         call.message.chat.id, 
         call.message.message_id, 
         parse_mode="Markdown"
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == "cancel_uninstall")
+@router.callback("cancel_uninstall")
 def cancel_uninstall(call):
     if not require_admin_call(call):
         return
 
-    bot.answer_callback_query(call.id, "❌ Uninstall dibatalkan")
+    answer_callback(call, "❌ Uninstall dibatalkan")
     bot.edit_message_text(
         "❌ Uninstall dibatalkan.\n\nGunakan menu lain untuk mengontrol EarnApp.",
         call.message.chat.id, 
         call.message.message_id
     )
 
-@bot.message_handler(func=lambda m: m.text == "🔄 Ganti Device")
+@router.text("🔄 Ganti Device")
 def handler_change_device(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -802,7 +854,7 @@ def handler_change_device(m):
     show_device_menu(m.chat.id)
 
 # Status All Devices
-@bot.message_handler(func=lambda m: m.text == "📊 Status All")
+@router.text("📊 Status All")
 def handler_status_all(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -822,11 +874,13 @@ def handler_status_all(m):
     
     if not dashboard_data:
         message += "❌ Tidak ada device yang dikonfigurasi."
+    else:
+        message += format_snapshot_age(max(device.get("snapshot_age", 0) for device in dashboard_data))
     
     bot.reply_to(m, message, parse_mode="Markdown")
 
 # Bulk Operations - Start All
-@bot.message_handler(func=lambda m: m.text == "🚀 Start All")
+@router.text("🚀 Start All")
 def handler_start_all(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -850,21 +904,15 @@ def handler_start_all(m):
     bot.reply_to(m, message, parse_mode="Markdown")
     
     # Kirim notifikasi ke admin
-    if ADMIN_ID:
-        try:
-            bot.send_message(
-                ADMIN_ID,
-                f"🚀 *START ALL DEVICES*\n\n"
-                f"User: {m.from_user.first_name} (@{m.from_user.username or 'N/A'})\n"
-                f"Total devices: {len(devices)}\n\n"
-                f"**Results:**\n" + "\n".join(results),
-                parse_mode="Markdown"
-            )
-        except Exception as e:
-            print(f"Error sending notification: {e}")
+    notify_admin(
+        f"🚀 *START ALL DEVICES*\n\n"
+        f"User: {m.from_user.first_name} (@{m.from_user.username or 'N/A'})\n"
+        f"Total devices: {len(devices)}\n\n"
+        f"**Results:**\n" + "\n".join(results)
+    )
 
 # Bulk Operations - Stop All
-@bot.message_handler(func=lambda m: m.text == "🛑 Stop All")
+@router.text("🛑 Stop All")
 def handler_stop_all(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -879,7 +927,7 @@ def handler_stop_all(m):
     bot.reply_to(m, "⚠️ *Konfirmasi Stop All*\n\nApakah Anda yakin ingin menghentikan EarnApp di semua device?", 
                  parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "confirm_stop_all")
+@router.callback("confirm_stop_all")
 def confirm_stop_all(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -887,7 +935,7 @@ def confirm_stop_all(call):
 
     refresh_devices()
     
-    bot.answer_callback_query(call.id, "🛑 Menghentikan semua device...")
+    answer_callback(call, "🛑 Menghentikan semua device...")
     
     stop_payload = stop_all_devices_use_case(storage, log_activity=False)
     results = []
@@ -903,30 +951,24 @@ def confirm_stop_all(call):
     bot.edit_message_text(message, call.message.chat.id, call.message.message_id, parse_mode="Markdown")
     
     # Kirim notifikasi ke admin
-    if ADMIN_ID:
-        try:
-            bot.send_message(
-                ADMIN_ID,
-                f"🛑 *STOP ALL DEVICES*\n\n"
-                f"User: {call.from_user.first_name} (@{call.from_user.username or 'N/A'})\n"
-                f"Total devices: {len(devices)}\n\n"
-                f"**Results:**\n" + "\n".join(results),
-                parse_mode="Markdown"
-            )
-        except Exception as e:
-            print(f"Error sending notification: {e}")
+    notify_admin(
+        f"🛑 *STOP ALL DEVICES*\n\n"
+        f"User: {call.from_user.first_name} (@{call.from_user.username or 'N/A'})\n"
+        f"Total devices: {len(devices)}\n\n"
+        f"**Results:**\n" + "\n".join(results)
+    )
 
-@bot.callback_query_handler(func=lambda call: call.data == "cancel_stop_all")
+@router.callback("cancel_stop_all")
 def cancel_stop_all(call):
     if not require_admin_call(call):
         return
 
-    bot.answer_callback_query(call.id, "❌ Stop all dibatalkan")
+    answer_callback(call, "❌ Stop all dibatalkan")
     bot.edit_message_text("❌ Stop all dibatalkan.", call.message.chat.id, call.message.message_id)
 
 
 # Callback: konfirmasi hapus device
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("confirm_remove:"))
+@router.callback_prefix("confirm_remove:")
 def confirm_remove_device(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -935,7 +977,7 @@ def confirm_remove_device(call):
     device_name = call.data.split(":", 1)[1]
     refresh_devices()
     if device_name not in devices:
-        bot.answer_callback_query(call.id, f"❌ Device '{device_name}' tidak ditemukan.")
+        answer_callback(call, f"❌ Device '{device_name}' tidak ditemukan.")
         try:
             bot.edit_message_text(f"❌ Device '{device_name}' tidak ditemukan.", call.message.chat.id, call.message.message_id)
         except Exception:
@@ -947,7 +989,7 @@ def confirm_remove_device(call):
     try:
         payload, status_code = delete_device_use_case(storage, device_name)
         if status_code != 200:
-            bot.answer_callback_query(call.id, "❌ Gagal menghapus device")
+            answer_callback(call, "❌ Gagal menghapus device")
             bot.edit_message_text(payload.get("message", "❌ Device tidak ditemukan"), call.message.chat.id, call.message.message_id)
             remove_device_state.pop(call.message.chat.id, None)
             return
@@ -960,21 +1002,21 @@ def confirm_remove_device(call):
         for k in to_remove:
             user_device.pop(k, None)
 
-        bot.answer_callback_query(call.id, "✅ Device dihapus")
+        answer_callback(call, "✅ Device dihapus")
         bot.edit_message_text(f"✅ Device '*{device_name}*' berhasil dihapus dari konfigurasi.", call.message.chat.id, call.message.message_id, parse_mode="Markdown")
     except Exception as e:
-        bot.answer_callback_query(call.id, "❌ Gagal menghapus device")
+        answer_callback(call, "❌ Gagal menghapus device")
         bot.edit_message_text(f"❌ Gagal menghapus device '{device_name}': {e}", call.message.chat.id, call.message.message_id)
 
     remove_device_state.pop(call.message.chat.id, None)
 
 
-@bot.callback_query_handler(func=lambda call: call.data == "cancel_remove")
+@router.callback("cancel_remove")
 def cancel_remove(call):
     if not require_admin_call(call):
         return
 
-    bot.answer_callback_query(call.id, "❌ Hapus device dibatalkan")
+    answer_callback(call, "❌ Hapus device dibatalkan")
     try:
         bot.edit_message_text("❌ Hapus device dibatalkan.", call.message.chat.id, call.message.message_id)
     except Exception:
@@ -982,7 +1024,7 @@ def cancel_remove(call):
     remove_device_state.pop(call.message.chat.id, None)
 
 # Health Check
-@bot.message_handler(func=lambda m: m.text == "🔍 Health Check")
+@router.text("🔍 Health Check")
 def handler_health_check(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -1007,7 +1049,7 @@ def handler_health_check(m):
 
 
 # Mulai flow hapus device
-@bot.message_handler(func=lambda m: m.text == "🗑️ Remove Device")
+@router.text("🗑️ Remove Device")
 def handler_remove_device(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -1021,7 +1063,7 @@ def handler_remove_device(m):
     show_device_menu(chat_id)
 
 # Quick Actions
-@bot.message_handler(func=lambda m: m.text == "⚡ Quick Actions")
+@router.text("⚡ Quick Actions")
 def handler_quick_actions(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -1044,7 +1086,7 @@ def handler_quick_actions(m):
     bot.reply_to(m, "⚡ *QUICK ACTIONS*\n\nPilih aksi cepat di bawah ini:", 
                  parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "quick_restart")
+@router.callback("quick_restart")
 def quick_restart(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1052,7 +1094,7 @@ def quick_restart(call):
 
     refresh_devices()
     
-    bot.answer_callback_query(call.id, "🔄 Quick Restart...")
+    answer_callback(call, "🔄 Quick Restart...")
     
     # Tampilkan pilihan device
     if not devices:
@@ -1077,7 +1119,7 @@ def quick_restart(call):
         reply_markup=markup
     )
 
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("quick_restart_device:"))
+@router.callback_prefix("quick_restart_device:")
 def quick_restart_device(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1086,9 +1128,9 @@ def quick_restart_device(call):
     device_name = call.data.split(":", 1)[1]
     refresh_devices()
     if device_name not in devices:
-        bot.answer_callback_query(call.id, "❌ Device tidak ditemukan")
+        answer_callback(call, "❌ Device tidak ditemukan")
         return
-    bot.answer_callback_query(call.id, f"🔄 Restarting {device_name}...")
+    answer_callback(call, f"🔄 Restarting {device_name}...")
     
     bot.edit_message_text(
         f"🔄 *QUICK RESTART*\n\nDevice: **{device_name}**\n\n⏳ Memproses restart...",
@@ -1101,18 +1143,12 @@ def quick_restart_device(call):
     restart_result = _text_result(restart_payload.get("result", ""))
     
     # Kirim notifikasi ke admin
-    if ADMIN_ID:
-        try:
-            bot.send_message(
-                ADMIN_ID,
-                f"🔄 *QUICK RESTART*\n\n"
-                f"Device: **{device_name}**\n"
-                f"User: {call.from_user.first_name} (@{call.from_user.username or 'N/A'})\n\n"
-                f"**Result:**\n```\n{restart_result}\n```",
-                parse_mode="Markdown"
-            )
-        except Exception as e:
-            print(f"Error sending notification: {e}")
+    notify_admin(
+        f"🔄 *QUICK RESTART*\n\n"
+        f"Device: **{device_name}**\n"
+        f"User: {call.from_user.first_name} (@{call.from_user.username or 'N/A'})\n\n"
+        f"**Result:**\n```\n{restart_result}\n```"
+    )
     
     bot.edit_message_text(
         f"✅ *QUICK RESTART SELESAI*\n\nDevice: **{device_name}**\n\n"
@@ -1122,7 +1158,7 @@ def quick_restart_device(call):
         parse_mode="Markdown"
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == "quick_restart_all")
+@router.callback("quick_restart_all")
 def quick_restart_all(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1130,7 +1166,7 @@ def quick_restart_all(call):
 
     refresh_devices()
     
-    bot.answer_callback_query(call.id, "🔄 Restarting all devices...")
+    answer_callback(call, "🔄 Restarting all devices...")
     
     bot.edit_message_text(
         "🔄 *QUICK RESTART ALL*\n\n⏳ Memproses restart semua device...",
@@ -1139,31 +1175,49 @@ def quick_restart_all(call):
         parse_mode="Markdown"
     )
     
-    restart_payload = restart_all_devices_use_case(storage, user=str(call.from_user.id))
+    batch_size = config.get("rolling_restart_batch_size", ROLLING_BATCH_SIZE)
+    total_batches = max(1, -(-len(devices) // max(1, int(batch_size or 1))))
+
+    def report_batch(batch_index, items):
+        healthy = sum(1 for item in items if item.get("success"))
+        try:
+            bot.edit_message_text(
+                f"🔄 *QUICK RESTART ALL*\n\n⏳ Batch {batch_index}/{total_batches} selesai "
+                f"({healthy}/{len(items)} device 🟢 Running)...",
+                call.message.chat.id,
+                call.message.message_id,
+                parse_mode="Markdown"
+            )
+        except Exception as e:
+            print(f"Error updating restart progress: {e}")
+
+    restart_payload = rolling_restart_devices_use_case(
+        storage,
+        batch_size=batch_size,
+        health_timeout=config.get("rolling_restart_health_timeout", ROLLING_HEALTH_TIMEOUT),
+        max_failures=config.get("rolling_restart_max_failures", ROLLING_MAX_FAILURES),
+        user=str(call.from_user.id),
+        on_batch=report_batch,
+    )
     results = []
     for item in restart_payload.get("results", []):
         device_name = item.get("device", "Unknown")
         restart_result = _text_result(item.get("result", ""))
         results.append(f"**{device_name}**\n{restart_result[:120]}...")
     
-    message = "✅ *QUICK RESTART ALL SELESAI*\n\n" + "\n\n".join(results)
+    title = "⚠️ *QUICK RESTART ALL DIHENTIKAN*" if restart_payload.get("aborted") else "✅ *QUICK RESTART ALL SELESAI*"
+    message = title + "\n\n" + "\n\n".join(results)
     bot.edit_message_text(message, call.message.chat.id, call.message.message_id, parse_mode="Markdown")
     
     # Kirim notifikasi ke admin
-    if ADMIN_ID:
-        try:
-            bot.send_message(
-                ADMIN_ID,
-                f"🔄 *QUICK RESTART ALL*\n\n"
-                f"User: {call.from_user.first_name} (@{call.from_user.username or 'N/A'})\n"
-                f"Total devices: {len(devices)}\n\n"
-                f"**Results:**\n" + "\n\n".join(results),
-                parse_mode="Markdown"
-            )
-        except Exception as e:
-            print(f"Error sending notification: {e}")
+    notify_admin(
+        f"🔄 *QUICK RESTART ALL*\n\n"
+        f"User: {call.from_user.first_name} (@{call.from_user.username or 'N/A'})\n"
+        f"Total devices: {len(devices)}\n\n"
+        f"**Results:**\n" + "\n\n".join(results)
+    )
 
-@bot.callback_query_handler(func=lambda call: call.data == "quick_status")
+@router.callback("quick_status")
 def quick_status(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1171,7 +1225,7 @@ def quick_status(call):
 
     refresh_devices()
     
-    bot.answer_callback_query(call.id, "📊 Checking status...")
+    answer_callback(call, "📊 Checking status...")
     
     bot.edit_message_text(
         "📊 *QUICK STATUS*\n\n⏳ Mengumpulkan status semua device...",
@@ -1180,7 +1234,7 @@ def quick_status(call):
         parse_mode="Markdown"
     )
     
-    statuses = get_all_device_statuses_use_case(storage).get("devices", [])
+    statuses = status_service.get_all_statuses().get("devices", [])
     results = []
     for status in statuses:
         device_name = status.get("name", "Unknown")
@@ -1190,9 +1244,11 @@ def quick_status(call):
         results.append(f"{icon} **{device_name}**: {earnapp_status}\nHealth: {health}")
     
     message = "📊 *QUICK STATUS ALL DEVICES*\n\n" + "\n\n".join(results)
+    if statuses:
+        message += "\n\n" + format_snapshot_age(max(status.get("snapshot_age", 0) for status in statuses))
     bot.edit_message_text(message, call.message.chat.id, call.message.message_id, parse_mode="Markdown")
 
-@bot.callback_query_handler(func=lambda call: call.data == "enable_auto_restart_all")
+@router.callback("enable_auto_restart_all")
 def enable_auto_restart_all(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1201,7 +1257,7 @@ def enable_auto_restart_all(call):
     refresh_devices()
     refresh_auto_restart_settings()
     
-    bot.answer_callback_query(call.id, "✅ Enabling auto restart all...")
+    answer_callback(call, "✅ Enabling auto restart all...")
     
     enabled_count = 0
     for device_name in devices.keys():
@@ -1218,7 +1274,7 @@ def enable_auto_restart_all(call):
         parse_mode="Markdown"
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == "disable_auto_restart_all")
+@router.callback("disable_auto_restart_all")
 def disable_auto_restart_all(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1227,7 +1283,7 @@ def disable_auto_restart_all(call):
     refresh_devices()
     refresh_auto_restart_settings()
     
-    bot.answer_callback_query(call.id, "❌ Disabling auto restart all...")
+    answer_callback(call, "❌ Disabling auto restart all...")
     
     disabled_count = 0
     for device_name in devices.keys():
@@ -1244,13 +1300,13 @@ def disable_auto_restart_all(call):
         parse_mode="Markdown"
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == "back_to_quick_actions")
+@router.callback("back_to_quick_actions")
 def back_to_quick_actions(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
     
-    bot.answer_callback_query(call.id, "🔙 Kembali")
+    answer_callback(call, "🔙 Kembali")
     
     markup = types.InlineKeyboardMarkup()
     markup.add(
@@ -1273,16 +1329,16 @@ def back_to_quick_actions(call):
         reply_markup=markup
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == "back_to_main")
+@router.callback("back_to_main")
 def back_to_main(call):
     if not require_admin_call(call):
         return
 
-    bot.answer_callback_query(call.id, "🔙 Kembali ke menu utama")
+    answer_callback(call, "🔙 Kembali ke menu utama")
     show_main_menu(call.message.chat.id)
 
 # Schedule Tasks
-@bot.message_handler(func=lambda m: m.text == "⏰ Schedule")
+@router.text("⏰ Schedule")
 def handler_schedule(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -1305,7 +1361,7 @@ def handler_schedule(m):
     bot.reply_to(m, "⏰ *SCHEDULED TASKS*\n\nPilih opsi di bawah ini:", 
                  parse_mode="Markdown", reply_markup=markup)
 
-@bot.message_handler(func=lambda m: m.text == "🗑️ Uninstall Bot")
+@router.text("🗑️ Uninstall Bot")
 def handler_uninstall_bot_button(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -1321,7 +1377,7 @@ def handler_uninstall_bot_button(m):
                  parse_mode="Markdown", reply_markup=markup)
 
 # Command untuk uninstall bot
-@bot.message_handler(commands=['uninstallbot'])
+@router.command('uninstallbot')
 def handler_uninstall_bot(msg):
     # Cek apakah user adalah admin
     if not require_admin_message(msg):
@@ -1336,13 +1392,13 @@ def handler_uninstall_bot(msg):
     bot.reply_to(msg, "⚠️ *Konfirmasi Uninstall Bot*\n\nApakah Anda yakin ingin menghapus bot ini dari server?\n\n**Peringatan:** Bot akan berhenti dan semua data akan dihapus!", 
                  parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "confirm_uninstall_bot")
+@router.callback("confirm_uninstall_bot")
 def confirm_uninstall_bot(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
     
-    bot.answer_callback_query(call.id, "🔄 Memproses uninstall bot...")
+    answer_callback(call, "🔄 Memproses uninstall bot...")
     
     # Kirim pesan terakhir
     bot.edit_message_text(
@@ -1362,15 +1418,14 @@ def confirm_uninstall_bot(call):
         print(f"Error running uninstall script: {e}")
     
     # Stop bot
-    import sys
-    sys.exit(0)
+    request_shutdown(0)
 
-@bot.callback_query_handler(func=lambda call: call.data == "cancel_uninstall_bot")
+@router.callback("cancel_uninstall_bot")
 def cancel_uninstall_bot(call):
     if not require_admin_call(call):
         return
 
-    bot.answer_callback_query(call.id, "❌ Uninstall bot dibatalkan")
+    answer_callback(call, "❌ Uninstall bot dibatalkan")
     bot.edit_message_text(
         "❌ Uninstall bot dibatalkan.\n\nBot tetap aktif dan siap digunakan.",
         call.message.chat.id, 
@@ -1378,7 +1433,7 @@ def cancel_uninstall_bot(call):
     )
 
 # Schedule Callback Handlers
-@bot.callback_query_handler(func=lambda call: call.data == "auto_restart_menu")
+@router.callback("auto_restart_menu")
 def auto_restart_menu(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1386,7 +1441,7 @@ def auto_restart_menu(call):
 
     refresh_auto_restart_settings()
     
-    bot.answer_callback_query(call.id, "🔄 Menu Auto Restart")
+    answer_callback(call, "🔄 Menu Auto Restart")
     
     # Tampilkan menu auto restart
     markup = types.InlineKeyboardMarkup()
@@ -1407,7 +1462,7 @@ def auto_restart_menu(call):
         reply_markup=markup
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == "back_to_schedule")
+@router.callback("back_to_schedule")
 def back_to_schedule(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1416,7 +1471,7 @@ def back_to_schedule(call):
     refresh_schedules()
     refresh_auto_restart_settings()
     
-    bot.answer_callback_query(call.id, "🔙 Kembali")
+    answer_callback(call, "🔙 Kembali")
     
     # Tampilkan menu schedule
     markup = types.InlineKeyboardMarkup()
@@ -1438,7 +1493,7 @@ def back_to_schedule(call):
     )
 
 # Time-based Schedule Handlers
-@bot.callback_query_handler(func=lambda call: call.data == "time_schedule_menu")
+@router.callback("time_schedule_menu")
 def time_schedule_menu(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1446,7 +1501,7 @@ def time_schedule_menu(call):
 
     refresh_schedules()
     
-    bot.answer_callback_query(call.id, "🕐 Time Schedule Menu")
+    answer_callback(call, "🕐 Time Schedule Menu")
     
     markup = types.InlineKeyboardMarkup()
     markup.add(
@@ -1466,7 +1521,7 @@ def time_schedule_menu(call):
         reply_markup=markup
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == "add_time_schedule")
+@router.callback("add_time_schedule")
 def add_time_schedule(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1475,7 +1530,7 @@ def add_time_schedule(call):
     refresh_devices()
     refresh_schedules()
     
-    bot.answer_callback_query(call.id, "➕ Add Time Schedule")
+    answer_callback(call, "➕ Add Time Schedule")
     
     if not devices:
         bot.edit_message_text(
@@ -1502,7 +1557,7 @@ def add_time_schedule(call):
         reply_markup=markup
     )
 
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("time_schedule_device:"))
+@router.callback_prefix("time_schedule_device:")
 def time_schedule_device(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1512,7 +1567,7 @@ def time_schedule_device(call):
     chat_id = call.message.chat.id
     refresh_devices()
     if device_name not in devices:
-        bot.answer_callback_query(call.id, "❌ Device tidak ditemukan")
+        answer_callback(call, "❌ Device tidak ditemukan")
         return
     
     if chat_id not in schedule_state:
@@ -1521,7 +1576,7 @@ def time_schedule_device(call):
     schedule_state[chat_id]["data"]["device"] = device_name
     schedule_state[chat_id]["step"] = 2
     
-    bot.answer_callback_query(call.id, f"Device: {device_name}")
+    answer_callback(call, f"Device: {device_name}")
     bot.edit_message_text(
         f"🕐 *ADD TIME SCHEDULE*\n\nDevice: **{device_name}**\n\nPilih action:",
         chat_id,
@@ -1534,7 +1589,7 @@ def time_schedule_device(call):
         ).add(types.InlineKeyboardButton("🔙 Kembali", callback_data="add_time_schedule"))
     )
 
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("time_schedule_action:"))
+@router.callback_prefix("time_schedule_action:")
 def time_schedule_action(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1544,13 +1599,13 @@ def time_schedule_action(call):
     chat_id = call.message.chat.id
     
     if chat_id not in schedule_state:
-        bot.answer_callback_query(call.id, "❌ Session expired")
+        answer_callback(call, "❌ Session expired")
         return
     
     schedule_state[chat_id]["data"]["action"] = action
     schedule_state[chat_id]["step"] = 3
     
-    bot.answer_callback_query(call.id, f"Action: {action}")
+    answer_callback(call, f"Action: {action}")
     bot.edit_message_text(
         f"🕐 *ADD TIME SCHEDULE*\n\nDevice: **{schedule_state[chat_id]['data']['device']}**\n"
         f"Action: **{action.upper()}**\n\n"
@@ -1560,7 +1615,7 @@ def time_schedule_action(call):
         parse_mode="Markdown"
     )
 
-@bot.message_handler(func=lambda m: m.chat.id in schedule_state and schedule_state[m.chat.id]["step"] == 3)
+@router.state("schedule", 3)
 def process_time_schedule_time(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -1603,7 +1658,7 @@ def process_time_schedule_time(m):
     except (ValueError, IndexError):
         bot.reply_to(m, "❌ Format waktu tidak valid. Gunakan format HH:MM (contoh: 08:00):")
 
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("time_schedule_days:"))
+@router.callback_prefix("time_schedule_days:")
 def time_schedule_days(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1613,7 +1668,7 @@ def time_schedule_days(call):
     chat_id = call.message.chat.id
     
     if chat_id not in schedule_state:
-        bot.answer_callback_query(call.id, "❌ Session expired")
+        answer_callback(call, "❌ Session expired")
         return
     
     # Mapping hari: 0=Senin, 1=Selasa, ..., 6=Minggu
@@ -1625,7 +1680,7 @@ def time_schedule_days(call):
         days = [5, 6]  # Sabtu-Minggu
     else:  # manual
         schedule_state[chat_id]["step"] = 5
-        bot.answer_callback_query(call.id, "Pilih hari manual")
+        answer_callback(call, "Pilih hari manual")
         bot.edit_message_text(
             "🕐 *ADD TIME SCHEDULE*\n\nPilih hari (bisa multiple):\n\n"
             "0=Senin, 1=Selasa, 2=Rabu, 3=Kamis, 4=Jumat, 5=Sabtu, 6=Minggu\n\n"
@@ -1639,7 +1694,7 @@ def time_schedule_days(call):
     schedule_state[chat_id]["data"]["days"] = days
     result = add_schedule_use_case(storage, schedule_state[chat_id]["data"])
     if not result.get("success"):
-        bot.answer_callback_query(call.id, "❌ Schedule gagal ditambahkan")
+        answer_callback(call, "❌ Schedule gagal ditambahkan")
         bot.edit_message_text(
             "❌ {0}".format(result.get("message", "Schedule gagal ditambahkan")),
             chat_id,
@@ -1654,7 +1709,7 @@ def time_schedule_days(call):
     schedule_state.pop(chat_id, None)
     
     days_str = "Setiap hari" if days_type == "daily" else ("Hari kerja" if days_type == "weekdays" else "Weekend")
-    bot.answer_callback_query(call.id, "✅ Schedule ditambahkan")
+    answer_callback(call, "✅ Schedule ditambahkan")
     bot.edit_message_text(
         f"✅ *TIME SCHEDULE DITAMBAHKAN*\n\n"
         f"Device: **{task['device']}**\n"
@@ -1667,7 +1722,7 @@ def time_schedule_days(call):
         parse_mode="Markdown"
     )
 
-@bot.message_handler(func=lambda m: m.chat.id in schedule_state and schedule_state[m.chat.id]["step"] == 5)
+@router.state("schedule", 5)
 def process_time_schedule_days_manual(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -1707,7 +1762,7 @@ def process_time_schedule_days_manual(m):
     except (ValueError, IndexError):
         bot.reply_to(m, "❌ Format tidak valid. Masukkan angka 0-6 dipisah koma (contoh: 0,1,2,3,4):")
 
-@bot.callback_query_handler(func=lambda call: call.data == "list_time_schedule")
+@router.callback("list_time_schedule")
 def list_time_schedule(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1715,7 +1770,7 @@ def list_time_schedule(call):
 
     refresh_schedules()
     
-    bot.answer_callback_query(call.id, "📋 List Time Schedule")
+    answer_callback(call, "📋 List Time Schedule")
     
     if not scheduled_tasks:
         message = "🕐 *TIME-BASED SCHEDULES*\n\n❌ Tidak ada schedule yang dikonfigurasi."
@@ -1738,7 +1793,7 @@ def list_time_schedule(call):
     
     bot.edit_message_text(message, call.message.chat.id, call.message.message_id, parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "delete_time_schedule")
+@router.callback("delete_time_schedule")
 def delete_time_schedule(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1746,7 +1801,7 @@ def delete_time_schedule(call):
 
     refresh_schedules()
     
-    bot.answer_callback_query(call.id, "🗑️ Delete Time Schedule")
+    answer_callback(call, "🗑️ Delete Time Schedule")
     
     if not scheduled_tasks:
         bot.edit_message_text(
@@ -1770,7 +1825,7 @@ def delete_time_schedule(call):
         reply_markup=markup
     )
 
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("delete_schedule_task:"))
+@router.callback_prefix("delete_schedule_task:")
 def delete_schedule_task(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1782,7 +1837,7 @@ def delete_schedule_task(call):
     if task_id in scheduled_tasks:
         payload, status_code = delete_schedule_use_case(storage, task_id)
         if status_code != 200 or not payload.get("success"):
-            bot.answer_callback_query(call.id, "❌ Schedule gagal dihapus")
+            answer_callback(call, "❌ Schedule gagal dihapus")
             bot.edit_message_text(
                 "❌ {0}".format(payload.get("message", "Schedule gagal dihapus")),
                 call.message.chat.id,
@@ -1791,7 +1846,7 @@ def delete_schedule_task(call):
             return
         refresh_schedules()
         
-        bot.answer_callback_query(call.id, "✅ Schedule dihapus")
+        answer_callback(call, "✅ Schedule dihapus")
         bot.edit_message_text(
             f"✅ Schedule **{task_id}** berhasil dihapus.",
             call.message.chat.id,
@@ -1799,14 +1854,14 @@ def delete_schedule_task(call):
             parse_mode="Markdown"
         )
     else:
-        bot.answer_callback_query(call.id, "❌ Schedule tidak ditemukan")
+        answer_callback(call, "❌ Schedule tidak ditemukan")
         bot.edit_message_text(
             "❌ Schedule tidak ditemukan.",
             call.message.chat.id,
             call.message.message_id
         )
 
-@bot.callback_query_handler(func=lambda call: call.data == "set_auto_restart")
+@router.callback("set_auto_restart")
 def set_auto_restart(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1815,7 +1870,7 @@ def set_auto_restart(call):
     refresh_devices()
     refresh_auto_restart_settings()
     
-    bot.answer_callback_query(call.id, "📝 Set Auto Restart")
+    answer_callback(call, "📝 Set Auto Restart")
     
     # Tampilkan pilihan device
     if not devices:
@@ -1840,7 +1895,7 @@ def set_auto_restart(call):
         reply_markup=markup
     )
 
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("select_device_restart:"))
+@router.callback_prefix("select_device_restart:")
 def select_device_restart(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1850,13 +1905,13 @@ def select_device_restart(call):
     chat_id = call.message.chat.id
     refresh_devices()
     if device_name not in devices:
-        bot.answer_callback_query(call.id, "❌ Device tidak ditemukan")
+        answer_callback(call, "❌ Device tidak ditemukan")
         return
     
     # Mulai flow input interval
     auto_restart_state[chat_id] = {"step": 1, "data": {"device": device_name}}
     
-    bot.answer_callback_query(call.id, f"📝 Device: {device_name}")
+    answer_callback(call, f"📝 Device: {device_name}")
     bot.edit_message_text(
         f"🔄 *SET AUTO RESTART*\n\nDevice: **{device_name}**\n\nMasukkan interval dalam jam (contoh: 6 untuk setiap 6 jam):",
         chat_id,
@@ -1864,7 +1919,7 @@ def select_device_restart(call):
         parse_mode="Markdown"
     )
 
-@bot.message_handler(func=lambda m: m.chat.id in auto_restart_state and auto_restart_state[m.chat.id]["step"] == 1)
+@router.state("auto_restart", 1)
 def process_auto_restart_interval(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -1905,7 +1960,7 @@ def process_auto_restart_interval(m):
     except ValueError:
         bot.reply_to(m, "❌ Format tidak valid. Masukkan angka (contoh: 6 untuk 6 jam):")
 
-@bot.callback_query_handler(func=lambda call: call.data == "list_auto_restart")
+@router.callback("list_auto_restart")
 def list_auto_restart(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1913,7 +1968,7 @@ def list_auto_restart(call):
 
     refresh_auto_restart_settings()
     
-    bot.answer_callback_query(call.id, "📋 List Auto Restart")
+    answer_callback(call, "📋 List Auto Restart")
     
     if not auto_restart_settings:
         message = "🔄 *AUTO RESTART SETTINGS*\n\n❌ Tidak ada auto restart yang dikonfigurasi."
@@ -1946,7 +2001,7 @@ def list_auto_restart(call):
     
     bot.edit_message_text(message, call.message.chat.id, call.message.message_id, parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "disable_auto_restart")
+@router.callback("disable_auto_restart")
 def disable_auto_restart(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1954,7 +2009,7 @@ def disable_auto_restart(call):
 
     refresh_auto_restart_settings()
     
-    bot.answer_callback_query(call.id, "❌ Disable Auto Restart")
+    answer_callback(call, "❌ Disable Auto Restart")
     
     # Tampilkan pilihan device untuk disable
     active_devices = [name for name, settings in auto_restart_settings.items() if settings.get("enabled", False)]
@@ -1980,7 +2035,7 @@ def disable_auto_restart(call):
         reply_markup=markup
     )
 
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("disable_device_restart:"))
+@router.callback_prefix("disable_device_restart:")
 def disable_device_restart(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -1992,7 +2047,7 @@ def disable_device_restart(call):
     if device_name in auto_restart_settings:
         payload, status_code = disable_auto_restart_use_case(storage, device_name)
         if status_code != 200 or not payload.get("success"):
-            bot.answer_callback_query(call.id, "❌ Gagal menonaktifkan")
+            answer_callback(call, "❌ Gagal menonaktifkan")
             bot.edit_message_text(
                 "❌ {0}".format(payload.get("message", "Auto restart gagal dinonaktifkan")),
                 call.message.chat.id,
@@ -2001,7 +2056,7 @@ def disable_device_restart(call):
             return
         refresh_auto_restart_settings()
         
-        bot.answer_callback_query(call.id, f"✅ {device_name} dinonaktifkan")
+        answer_callback(call, f"✅ {device_name} dinonaktifkan")
         bot.edit_message_text(
             f"✅ Auto restart untuk device **{device_name}** telah dinonaktifkan.",
             call.message.chat.id,
@@ -2009,14 +2064,14 @@ def disable_device_restart(call):
             parse_mode="Markdown"
         )
     else:
-        bot.answer_callback_query(call.id, "❌ Device tidak ditemukan")
+        answer_callback(call, "❌ Device tidak ditemukan")
         bot.edit_message_text(
             f"❌ Device '{device_name}' tidak ditemukan dalam konfigurasi auto restart.",
             call.message.chat.id,
             call.message.message_id
         )
 
-@bot.callback_query_handler(func=lambda call: call.data == "list_schedule")
+@router.callback("list_schedule")
 def list_schedule(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -2025,7 +2080,7 @@ def list_schedule(call):
     refresh_schedules()
     refresh_auto_restart_settings()
     
-    bot.answer_callback_query(call.id, "📋 List Schedule")
+    answer_callback(call, "📋 List Schedule")
     
     message = "⏰ *SCHEDULED TASKS*\n\n"
     
@@ -2057,13 +2112,13 @@ def list_schedule(call):
     
     bot.edit_message_text(message, call.message.chat.id, call.message.message_id, parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "delete_schedule")
+@router.callback("delete_schedule")
 def delete_schedule(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
     
-    bot.answer_callback_query(call.id, "📝 Fitur delete schedule akan segera tersedia")
+    answer_callback(call, "📝 Fitur delete schedule akan segera tersedia")
     bot.edit_message_text(
         "⏰ *DELETE SCHEDULE*\n\nFitur ini akan segera tersedia dalam update berikutnya.\n\nGunakan menu lain untuk mengontrol EarnApp.",
         call.message.chat.id, 
@@ -2071,7 +2126,7 @@ def delete_schedule(call):
         parse_mode="Markdown"
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == "schedule_settings")
+@router.callback("schedule_settings")
 def schedule_settings(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -2086,14 +2141,12 @@ def schedule_settings(call):
     bot.edit_message_text(message, call.message.chat.id, call.message.message_id, parse_mode="Markdown")
 
 # Activity Log & History
-@bot.message_handler(func=lambda m: m.text == "📝 Activity Log")
+@router.text("📝 Activity Log")
 def handler_activity_log(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
         return
 
-    refresh_activity_logs()
-    
     # Tampilkan menu activity log
     markup = types.InlineKeyboardMarkup()
     markup.add(
@@ -2108,21 +2161,20 @@ def handler_activity_log(m):
         types.InlineKeyboardButton("🗑️ Clear Log", callback_data="clear_log")
     )
     
-    total_logs = len(activity_logs)
+    total_logs = count_activity_logs_use_case(storage)[0].get("total", 0)
     bot.reply_to(m, f"📝 *ACTIVITY LOG*\n\nTotal logs: **{total_logs}**\n\nPilih opsi di bawah ini:", 
                  parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "view_activity_log")
+@router.callback("view_activity_log")
 def view_activity_log(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
 
-    refresh_activity_logs()
+    answer_callback(call, "📋 Loading history...")
+    recent_logs = list_activity_logs_use_case(storage, limit=10).get("logs", [])[-10:]
     
-    bot.answer_callback_query(call.id, "📋 Loading history...")
-    
-    if not activity_logs:
+    if not recent_logs:
         bot.edit_message_text(
             "📝 *ACTIVITY LOG*\n\n❌ Tidak ada log yang tersedia.",
             call.message.chat.id,
@@ -2132,12 +2184,10 @@ def view_activity_log(call):
         return
     
     # Tampilkan 10 log terakhir
-    from datetime import datetime
-    recent_logs = activity_logs[-10:]
     message = "📝 *ACTIVITY LOG (10 Terakhir)*\n\n"
     
     for log in reversed(recent_logs):
-        timestamp = datetime.fromtimestamp(log["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = log["formatted_time"]
         action_icon = {"start": "🟢", "stop": "🔴", "restart": "🔄"}.get(log["action"], "⚙️")
         type_icon = {"manual": "👤", "auto": "🤖", "scheduled": "⏰"}.get(log["type"], "❓")
         
@@ -2150,16 +2200,15 @@ def view_activity_log(call):
     
     bot.edit_message_text(message, call.message.chat.id, call.message.message_id, parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "filter_log_device")
+@router.callback("filter_log_device")
 def filter_log_device(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
 
     refresh_devices()
-    refresh_activity_logs()
     
-    bot.answer_callback_query(call.id, "🔍 Filter by Device")
+    answer_callback(call, "🔍 Filter by Device")
     
     if not devices:
         bot.edit_message_text(
@@ -2169,10 +2218,11 @@ def filter_log_device(call):
         )
         return
     
+    # Jumlah log per device dihitung sekali dari index, bukan scan per device
+    device_counts = count_activity_logs_use_case(storage, "device")[0].get("counts", {})
     markup = types.InlineKeyboardMarkup()
     for device_name in devices.keys():
-        # Hitung jumlah log per device
-        count = sum(1 for log in activity_logs if log.get("device") == device_name)
+        count = device_counts.get(device_name, 0)
         markup.add(types.InlineKeyboardButton(f"{device_name} ({count})", callback_data=f"view_log_device:{device_name}"))
     markup.add(types.InlineKeyboardButton("🔙 Kembali", callback_data="back_to_activity_log"))
     
@@ -2184,18 +2234,18 @@ def filter_log_device(call):
         reply_markup=markup
     )
 
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("view_log_device:"))
+@router.callback_prefix("view_log_device:")
 def view_log_device(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
     
     device_name = call.data.split(":", 1)[1]
-    refresh_activity_logs()
-    bot.answer_callback_query(call.id, f"Loading {device_name} logs...")
+    answer_callback(call, f"Loading {device_name} logs...")
     
-    # Filter logs by device
-    device_logs = [log for log in activity_logs if log.get("device") == device_name]
+    # Ambil 20 log terakhir device dari index
+    page = list_activity_logs_use_case(storage, device_name, 20)
+    device_logs = page.get("logs", [])
     
     if not device_logs:
         bot.edit_message_text(
@@ -2207,12 +2257,11 @@ def view_log_device(call):
         return
     
     # Tampilkan 20 log terakhir untuk device ini
-    from datetime import datetime
     recent_logs = device_logs[-20:]
-    message = f"📝 *ACTIVITY LOG*\n\nDevice: **{device_name}**\nTotal: {len(device_logs)} logs\n\n"
+    message = f"📝 *ACTIVITY LOG*\n\nDevice: **{device_name}**\nTotal: {page.get('total', len(device_logs))} logs\n\n"
     
     for log in reversed(recent_logs):
-        timestamp = datetime.fromtimestamp(log["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = log["formatted_time"]
         action_icon = {"start": "🟢", "stop": "🔴", "restart": "🔄"}.get(log["action"], "⚙️")
         type_icon = {"manual": "👤", "auto": "🤖", "scheduled": "⏰"}.get(log["type"], "❓")
         
@@ -2220,17 +2269,20 @@ def view_log_device(call):
         message += f"   📅 {timestamp}\n\n"
     
     markup = types.InlineKeyboardMarkup()
+    export_button = export_log_button(device_name)
+    if export_button is not None:
+        markup.add(export_button)
     markup.add(types.InlineKeyboardButton("🔙 Kembali", callback_data="filter_log_device"))
     
     bot.edit_message_text(message, call.message.chat.id, call.message.message_id, parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "filter_log_date")
+@router.callback("filter_log_date")
 def filter_log_date(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
     
-    bot.answer_callback_query(call.id, "📅 Filter by Date")
+    answer_callback(call, "📅 Filter by Date")
     filter_date_state[call.message.chat.id] = True
     
     bot.edit_message_text(
@@ -2240,15 +2292,13 @@ def filter_log_date(call):
         parse_mode="Markdown"
     )
 
-@bot.message_handler(func=lambda m: m.chat.id in filter_date_state)
+@router.state("filter_date")
 def process_filter_date(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
         filter_date_state.pop(m.chat.id, None)
         return
 
-    refresh_activity_logs()
-    
     date_input = m.text.strip().lower()
     from datetime import datetime, timedelta
     days_ago = None
@@ -2270,7 +2320,8 @@ def process_filter_date(m):
         if days_ago:
             # Filter untuk N hari terakhir
             cutoff_time = int((datetime.now() - timedelta(days=days_ago)).timestamp())
-            filtered_logs = [log for log in activity_logs if log["timestamp"] >= cutoff_time]
+            page = list_activity_logs_use_case(storage, limit=30, since=cutoff_time)
+            export_range = (cutoff_time, None)
             date_str = f"{days_ago} hari terakhir"
         else:
             # Filter untuk tanggal tertentu
@@ -2278,9 +2329,12 @@ def process_filter_date(m):
                 raise ValueError("Tanggal tidak valid")
             start_time = int(datetime.combine(target_date, datetime.min.time()).timestamp())
             end_time = int(datetime.combine(target_date, datetime.max.time()).timestamp())
-            filtered_logs = [log for log in activity_logs if start_time <= log["timestamp"] <= end_time]
+            page = list_activity_logs_use_case(storage, limit=30, since=start_time, until=end_time)
+            export_range = (start_time, end_time)
             date_str = target_date.strftime("%Y-%m-%d")
         
+        filtered_logs = page.get("logs", [])
+        total_logs = page.get("total", len(filtered_logs))
         if not filtered_logs:
             bot.reply_to(m, f"📅 *FILTER BY DATE*\n\nTanggal: **{date_str}**\n\n❌ Tidak ada log untuk tanggal tersebut.",
                        parse_mode="Markdown")
@@ -2289,21 +2343,26 @@ def process_filter_date(m):
         
         # Tampilkan hasil (maksimal 30 log)
         display_logs = filtered_logs[-30:]
-        message = f"📅 *FILTER BY DATE*\n\nTanggal: **{date_str}**\nTotal: **{len(filtered_logs)}** logs\n\n"
+        message = f"📅 *FILTER BY DATE*\n\nTanggal: **{date_str}**\nTotal: **{total_logs}** logs\n\n"
         
         for log in reversed(display_logs):
-            timestamp = datetime.fromtimestamp(log["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+            timestamp = log["formatted_time"]
             action_icon = {"start": "🟢", "stop": "🔴", "restart": "🔄"}.get(log["action"], "⚙️")
             type_icon = {"manual": "👤", "auto": "🤖", "scheduled": "⏰"}.get(log["type"], "❓")
             
             message += f"{action_icon} {type_icon} **{log['device']}** - {log['action'].upper()}\n"
             message += f"   📅 {timestamp}\n\n"
         
-        if len(filtered_logs) > 30:
-            message += f"\n_*Menampilkan 30 dari {len(filtered_logs)} logs_"
+        if total_logs > 30:
+            message += f"\n_*Menampilkan 30 dari {total_logs} logs_"
+        
+        markup = types.InlineKeyboardMarkup()
+        export_button = export_log_button(None, *export_range)
+        if export_button is not None:
+            markup.add(export_button)
         
         filter_date_state.pop(m.chat.id, None)
-        bot.reply_to(m, message, parse_mode="Markdown")
+        bot.reply_to(m, message, parse_mode="Markdown", reply_markup=markup)
         
     except ValueError:
         bot.reply_to(m, "❌ Format tanggal tidak valid. Gunakan format YYYY-MM-DD (contoh: 2024-01-15) atau 'today'/'yesterday'/'week':")
@@ -2311,76 +2370,90 @@ def process_filter_date(m):
         bot.reply_to(m, f"❌ Error: {e}")
         filter_date_state.pop(m.chat.id, None)
 
-@bot.callback_query_handler(func=lambda call: call.data == "export_log")
+def export_log_button(device=None, since=None, until=None):
+    """Tombol export untuk filter tertentu; None bila callback_data > 64 byte."""
+    data = "export_log:{0}:{1}:{2}".format(
+        device or "", "" if since is None else since, "" if until is None else until
+    )
+    if len(data.encode("utf-8")) > 64:
+        return None
+    return types.InlineKeyboardButton("💾 Export", callback_data=data)
+
+def parse_export_callback(data):
+    """``export_log:<device>:<since>:<until>`` -> (device, since, until)."""
+    if ":" not in data:
+        return None, None, None
+    device, since, until = (data.split(":", 1)[1].rsplit(":", 2) + ["", ""])[:3]
+    return device or None, int(since) if since else None, int(until) if until else None
+
+@router.callback("export_log")
+@router.callback_prefix("export_log:")
 def export_log(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
 
-    refresh_activity_logs()
-    
-    bot.answer_callback_query(call.id, "💾 Exporting log...")
-    
-    if not activity_logs:
-        bot.edit_message_text(
-            "❌ Tidak ada log yang tersedia untuk diekspor.",
-            call.message.chat.id,
-            call.message.message_id
-        )
+    try:
+        device, since, until = parse_export_callback(call.data)
+    except ValueError:
+        answer_callback(call, "❌ Filter export tidak valid")
         return
-    
-    # Export ke JSON
+
+    answer_callback(call, "💾 Exporting log...")
+    chat_id = call.message.chat.id
+    sent = []
+
+    # Entry di-stream dari storage ke file sementara, lalu dikirim sebagai dokumen
     try:
-        export_file = "activity_log_export.json"
-        with open(export_file, "w") as f:
-            json.dump(activity_logs, f, indent=2)
-        
-        # Export ke CSV juga
-        import csv
-        csv_file = "activity_log_export.csv"
-        with open(csv_file, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["Timestamp", "Date", "Time", "Device", "Action", "Type", "User", "Result"])
-            
-            from datetime import datetime
-            for log in activity_logs:
-                dt = datetime.fromtimestamp(log["timestamp"])
-                writer.writerow([
-                    log["timestamp"],
-                    dt.strftime("%Y-%m-%d"),
-                    dt.strftime("%H:%M:%S"),
-                    log.get("device", ""),
-                    log.get("action", ""),
-                    log.get("type", ""),
-                    log.get("user", ""),
-                    log.get("result", "")[:200]  # Limit result length
-                ])
-        
-        bot.edit_message_text(
-            f"✅ *EXPORT LOG SELESAI*\n\n"
-            f"File yang dibuat:\n"
-            f"• `{export_file}` (JSON)\n"
-            f"• `{csv_file}` (CSV)\n\n"
-            f"Total logs: **{len(activity_logs)}**\n\n"
-            f"File tersimpan di direktori bot.",
-            call.message.chat.id,
-            call.message.message_id,
-            parse_mode="Markdown"
-        )
+        for fmt in ("csv", "json"):
+            payload, status_code = export_activity_log_use_case(
+                storage, fmt, device, since, until, ACTIVITY_EXPORT_GZIP
+            )
+            if status_code != 200:
+                bot.send_message(chat_id, f"❌ {payload.get('message', 'Export gagal')}")
+                return
+            handle = payload["file"]
+            try:
+                if not payload["rows"]:
+                    bot.send_message(chat_id, "❌ Tidak ada log yang tersedia untuk diekspor.")
+                    return
+                bot.send_document(
+                    chat_id,
+                    handle,
+                    visible_file_name=payload["filename"],
+                    caption=f"💾 {fmt.upper()} • {payload['rows']} logs",
+                )
+                sent.append(payload)
+            finally:
+                handle.close()
     except Exception as e:
-        bot.edit_message_text(
-            f"❌ Error saat export log: {e}",
-            call.message.chat.id,
-            call.message.message_id
-        )
+        bot.send_message(chat_id, f"❌ Error saat export log: {e}")
+        return
 
-@bot.callback_query_handler(func=lambda call: call.data == "clear_log")
+    from datetime import datetime
+    filters = []
+    if device:
+        filters.append(f"Device: **{device}**")
+    if since is not None or until is not None:
+        start_text = datetime.fromtimestamp(since).strftime("%Y-%m-%d") if since is not None else "awal"
+        end_text = datetime.fromtimestamp(until).strftime("%Y-%m-%d") if until is not None else "sekarang"
+        filters.append(f"Periode: **{start_text}** s/d **{end_text}**")
+    bot.send_message(
+        chat_id,
+        "✅ *EXPORT LOG SELESAI*\n\n"
+        + "".join(f"{line}\n" for line in filters)
+        + f"Total logs: **{sent[0]['rows']}**\n"
+        + "".join(f"• `{payload['filename']}`\n" for payload in sent),
+        parse_mode="Markdown",
+    )
+
+@router.callback("clear_log")
 def clear_log(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
 
-    refresh_activity_logs()
+    activity_logs = refresh_activity_logs()
     
     # Konfirmasi clear
     markup = types.InlineKeyboardMarkup()
@@ -2397,7 +2470,7 @@ def clear_log(call):
         reply_markup=markup
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == "confirm_clear_log")
+@router.callback("confirm_clear_log")
 def confirm_clear_log(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
@@ -2405,9 +2478,8 @@ def confirm_clear_log(call):
     
     payload = clear_activity_log_use_case(storage)
     count = payload.get("count", 0)
-    activity_logs[:] = []
     
-    bot.answer_callback_query(call.id, "✅ Log dihapus")
+    answer_callback(call, "✅ Log dihapus")
     bot.edit_message_text(
         f"✅ *CLEAR LOG SELESAI*\n\nBerhasil menghapus **{count}** log entries.",
         call.message.chat.id,
@@ -2415,15 +2487,13 @@ def confirm_clear_log(call):
         parse_mode="Markdown"
     )
 
-@bot.callback_query_handler(func=lambda call: call.data == "back_to_activity_log")
+@router.callback("back_to_activity_log")
 def back_to_activity_log(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
 
-    refresh_activity_logs()
-    
-    bot.answer_callback_query(call.id, "🔙 Kembali")
+    answer_callback(call, "🔙 Kembali")
     
     markup = types.InlineKeyboardMarkup()
     markup.add(
@@ -2438,7 +2508,7 @@ def back_to_activity_log(call):
         types.InlineKeyboardButton("🗑️ Clear Log", callback_data="clear_log")
     )
     
-    total_logs = len(activity_logs)
+    total_logs = count_activity_logs_use_case(storage)[0].get("total", 0)
     bot.edit_message_text(
         f"📝 *ACTIVITY LOG*\n\nTotal logs: **{total_logs}**\n\nPilih opsi di bawah ini:",
         call.message.chat.id,
@@ -2448,7 +2518,7 @@ def back_to_activity_log(call):
     )
 
 # Handler untuk restart bot
-@bot.message_handler(func=lambda m: m.text == "🔄 Restart Bot")
+@router.text("🔄 Restart Bot")
 def handler_restart_bot(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -2463,13 +2533,13 @@ def handler_restart_bot(m):
     bot.reply_to(m, "⚠️ *Konfirmasi Restart Bot*\n\nApakah Anda yakin ingin me-restart bot?\n\nBot akan berhenti sebentar dan memuat ulang konfigurasi.", 
                  parse_mode="Markdown", reply_markup=markup)
 
-@bot.callback_query_handler(func=lambda call: call.data == "confirm_restart")
+@router.callback("confirm_restart")
 def confirm_restart(call):
     # Cek apakah user adalah admin
     if not require_admin_call(call):
         return
     
-    bot.answer_callback_query(call.id, "🔄 Memulai restart bot...")
+    answer_callback(call, "🔄 Memulai restart bot...")
     
     # Kirim pesan restart
     bot.edit_message_text(
@@ -2499,14 +2569,14 @@ def confirm_restart(call):
     except Exception as e:
         print(f"Error restarting: {e}")
         # Jika gagal restart, coba exit saja (service manager akan restart)
-        sys.exit(1)
+        request_shutdown(1)
 
-@bot.callback_query_handler(func=lambda call: call.data == "cancel_restart")
+@router.callback("cancel_restart")
 def cancel_restart(call):
     if not require_admin_call(call):
         return
 
-    bot.answer_callback_query(call.id, "❌ Restart dibatalkan")
+    answer_callback(call, "❌ Restart dibatalkan")
     bot.edit_message_text(
         "❌ Restart bot dibatalkan.",
         call.message.chat.id,
@@ -2514,7 +2584,7 @@ def cancel_restart(call):
     )
 
 # Fallback
-@bot.message_handler(func=lambda m: True)
+@router.default
 def fallback(m):
     # Cek apakah user adalah admin
     if not require_admin_message(m):
@@ -2526,6 +2596,14 @@ def fallback(m):
 # -----------------------
 # Cleanup dan Shutdown
 # -----------------------
+def request_shutdown(exit_code):
+    """Hentikan polling; main thread lalu menjalankan cleanup dan keluar dengan ``exit_code``."""
+    shutdown_exit_code[0] = exit_code
+    try:
+        bot.stop_polling()
+    except Exception as e:
+        print(f"Error stopping bot: {e}")
+
 def cleanup():
     """Cleanup sebelum shutdown/restart"""
     try:
@@ -2538,6 +2616,13 @@ def cleanup():
         auto_restart_state.clear()
         schedule_state.clear()
         filter_date_state.clear()
+
+        storage_notifier.stop()
+        admin_notifications.stop()
+        handler_executor.shutdown(wait=False)
+
+        # Tutup koneksi SSH yang masih tersimpan di pool
+        close_ssh_connections()
         
         # Stop bot polling
         try:
@@ -2553,17 +2638,23 @@ def cleanup():
 # -----------------------
 if __name__ == "__main__":
     print("🤖 Bot EarnApp multi-device aktif dan mendengarkan perintah Telegram...")
+    admin_notifications.start()
     start_workers(
         storage,
         notify_admin,
         alert_settings,
         device_health,
-        auto_restart_settings,
-        scheduled_tasks,
+        # Scheduler mengisi ulang dict miliknya sendiri dari storage; jangan
+        # berikan view state_store yang dibaca handler.
+        {},
+        {},
         start_device_fn=start_earnapp_device,
         stop_device_fn=stop_earnapp_device,
         restart_device_fn=restart_earnapp_device_for_worker,
         record_activity_fn=log_activity,
+        status_service=status_service,
+        max_concurrent_jobs=config.get("scheduler_max_concurrent_jobs", SCHEDULER_MAX_CONCURRENT_JOBS),
+        notifier=storage_notifier,
     )
     
     # Kirim notifikasi bahwa bot sudah siap (setelah delay untuk memastikan bot sudah ready)
@@ -2590,3 +2681,6 @@ if __name__ == "__main__":
     
     # Start bot
     bot.infinity_polling()
+    if shutdown_exit_code[0] is not None:
+        cleanup()
+        sys.exit(shutdown_exit_code[0])
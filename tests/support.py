@@ -0,0 +1,29 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+"""Shared fixtures for tests that need a scratch data directory."""
+import tempfile
+import unittest
+from typing import Any
+
+from earnapp.core.runtime import RuntimeConfig
+from earnapp.core.storage import JsonStorage
+
+
+class TempDirTestCase(unittest.TestCase):
+    """Fresh ``self.temp_dir`` per test, removed after ``tearDown``."""
+
+    temp_dir = None  # type: Any
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+
+class StorageTestCase(TempDirTestCase):
+    """``TempDirTestCase`` plus ``self.runtime_config`` and a ``JsonStorage`` on it."""
+
+    storage = None  # type: Any
+
+    def setUp(self):
+        super(StorageTestCase, self).setUp()
+        self.runtime_config = RuntimeConfig(self.temp_dir.name)
+        self.storage = JsonStorage(self.runtime_config)
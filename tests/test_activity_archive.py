@@ -0,0 +1,151 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import gzip
+import json
+import os
+import time
+import unittest
+from unittest import mock
+
+from earnapp.core import use_cases
+from earnapp.core.activity_archive import ActivityArchive, split_for_archive
+from earnapp.core.activity_log import day_key
+from earnapp.core.runtime import RuntimeConfig
+from earnapp.core.storage import JsonLinesActivityLog, open_storage
+
+from support import TempDirTestCase
+
+NOON = int(time.mktime((2024, 1, 1, 12, 0, 0, 0, 0, -1)))
+
+
+def entry(day, minute, device="A"):
+    return {"timestamp": NOON + day * 86400 + minute * 60, "device": device, "action": "restart"}
+
+
+def make_logs():
+    # 3 days x 4 entries, device B once per day.
+    return [entry(day, minute, "B" if minute == 2 else "A") for day in range(3) for minute in range(4)]
+
+
+class SplitForArchiveTest(unittest.TestCase):
+    def test_equal_timestamps_stay_together_in_hot_log(self):
+        logs = [{"timestamp": t} for t in (1, 2, 3, 3, 4)]
+
+        archived, retained = split_for_archive(logs, 2)
+
+        self.assertEqual([1, 2], [e["timestamp"] for e in archived])
+        self.assertEqual([3, 3, 4], [e["timestamp"] for e in retained])
+        self.assertEqual(([], logs), split_for_archive(logs, 5))
+
+
+class ActivityArchiveTest(TempDirTestCase):
+    def setUp(self):
+        super(ActivityArchiveTest, self).setUp()
+        self.archive = ActivityArchive(os.path.join(self.temp_dir.name, "activity_archive"))
+
+    def test_segments_are_daily_gzip_files_with_index(self):
+        self.assertEqual(6, self.archive.append(make_logs()[:6]))
+        self.archive.append(make_logs()[6:])
+
+        day = day_key(NOON)
+        with gzip.open(self.archive.segment_path(day), "rt") as handle:
+            self.assertEqual(4, len(handle.readlines()))
+        with open(self.archive.index_path) as handle:
+            meta = json.load(handle)["segments"][day_key(NOON + 86400)]
+        self.assertEqual({"A": 3, "B": 1}, meta["devices"])
+        self.assertEqual(4, meta["count"])
+
+    def test_range_reads_only_overlapping_segments(self):
+        self.archive.append(make_logs())
+        loaded = []
+        original = self.archive._load_segment
+
+        def spy(day):
+            loaded.append(day)
+            return original(day)
+
+        with mock.patch.object(self.archive, "_load_segment", side_effect=spy):
+            day_one = [e["timestamp"] for e in self.archive.iter_entries(since=NOON + 86400, until=NOON + 86400 + 90)]
+            counts = self.archive.count("day", since=NOON + 86400 - 3600, until=NOON + 2 * 86400 - 3600)
+
+        self.assertEqual([NOON + 86400, NOON + 86400 + 60], day_one)
+        self.assertEqual({day_key(NOON + 86400): 4}, counts)
+        self.assertEqual([day_key(NOON + 86400)], loaded)
+
+    def test_truncated_member_keeps_complete_entries(self):
+        self.archive.append(make_logs()[:2])
+        path = self.archive.segment_path(day_key(NOON))
+        with open(path, "ab") as handle:
+            handle.write(gzip.compress(b'{"timestamp": 1, "device": "partial"}\n')[:16])
+
+        self.assertEqual(2, len(list(self.archive.iter_entries())))
+
+
+class TieredStorageTest(TempDirTestCase):
+    def fill(self, storage, max_entries=5):
+        for log in make_logs():
+            storage.append_activity_log(log, max_entries=max_entries)
+        return storage
+
+    def check_tiers(self, storage):
+        self.fill(storage)
+        hot = storage.load_activity_log()
+        self.assertLess(len(hot), 12)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir.name, "activity_archive", "index.json")))
+
+        pages = []
+        before = None
+        while True:
+            page = use_cases.list_activity_logs(storage, limit=5, before=before)
+            self.assertEqual(12, page["total"])
+            pages.append([log["timestamp"] for log in page["logs"]])
+            if not page["has_more"]:
+                break
+            before = page["next_before"]
+        walked = [timestamp for page in reversed(pages) for timestamp in page]
+        self.assertEqual([log["timestamp"] for log in make_logs()], walked)
+
+        forward = use_cases.list_activity_logs(storage, limit=3, after=NOON + 60)
+        self.assertEqual([NOON + 120, NOON + 180, NOON + 86400], [log["timestamp"] for log in forward["logs"]])
+        self.assertTrue(forward["has_more"])
+
+        device_page = use_cases.list_activity_logs(storage, "B", limit=10)
+        self.assertEqual(3, device_page["total"])
+        self.assertEqual({"A": 9, "B": 3}, storage.count_activity_logs("device")["counts"])
+        self.assertEqual(12, len(list(storage.iter_activity_log())))
+
+        payload = use_cases.clear_activity_log(storage)
+        self.assertEqual(12, payload["count"])
+        self.assertEqual(0, use_cases.list_activity_logs(storage)["total"])
+
+    def test_json_storage_spans_archive_and_hot_log(self):
+        self.check_tiers(open_storage(RuntimeConfig(self.temp_dir.name)))
+
+    def test_sqlite_storage_spans_archive_and_hot_log(self):
+        self.check_tiers(open_storage(RuntimeConfig(self.temp_dir.name, storage_backend="sqlite")))
+
+    def test_jsonl_compaction_archives_instead_of_dropping(self):
+        storage = open_storage(RuntimeConfig(self.temp_dir.name, activity_log_format="jsonl"))
+        storage.activity_log_backend = JsonLinesActivityLog(storage, max_entries=5, compact_slack=2, background=False)
+
+        self.check_tiers(storage)
+
+    def test_rolls_happen_in_batches_past_ten_percent(self):
+        storage = open_storage(RuntimeConfig(self.temp_dir.name))
+        for minute in range(22):
+            storage.append_activity_log(entry(0, minute), max_entries=20)
+        self.assertEqual(22, len(storage.load_activity_log()))
+
+        storage.append_activity_log(entry(0, 22), max_entries=20)
+        self.assertEqual(20, len(storage.load_activity_log()))
+        self.assertEqual(23, use_cases.list_activity_logs(storage)["total"])
+
+    def test_archive_can_be_disabled(self):
+        storage = open_storage(RuntimeConfig(self.temp_dir.name), archive=False)
+        self.fill(storage)
+
+        self.assertEqual(5, use_cases.list_activity_logs(storage)["total"])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, "activity_archive")))
+
+
+if __name__ == "__main__":
+    unittest.main()
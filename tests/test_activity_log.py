@@ -0,0 +1,88 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import unittest
+from unittest import mock
+
+from earnapp.core import use_cases
+from earnapp.core.activity_log import ActivityLogIndex, day_key
+from earnapp.core.runtime import RuntimeConfig
+from earnapp.core.storage import open_storage
+
+from support import TempDirTestCase
+
+
+def make_logs():
+    logs = []
+    for timestamp in (100, 200, 200, 200, 300, 400):
+        logs.append({"timestamp": timestamp, "device": "A" if timestamp != 300 else "B", "action": "start"})
+    return logs
+
+
+class ActivityLogIndexTest(unittest.TestCase):
+    def test_pages_walk_backwards_without_splitting_equal_timestamps(self):
+        index = ActivityLogIndex(make_logs())
+
+        first = index.query(limit=2)
+        self.assertEqual([300, 400], [log["timestamp"] for log in first["logs"]])
+        self.assertTrue(first["has_more"])
+        self.assertEqual(300, first["next_before"])
+
+        second = index.query(limit=2, before=first["next_before"])
+        self.assertEqual([200, 200, 200], [log["timestamp"] for log in second["logs"]])
+
+        last = index.query(limit=2, before=second["next_before"])
+        self.assertEqual([100], [log["timestamp"] for log in last["logs"]])
+        self.assertFalse(last["has_more"])
+        self.assertIsNone(last["next_before"])
+
+    def test_after_cursor_and_range_filters(self):
+        index = ActivityLogIndex(make_logs())
+
+        newer = index.query(after=200, limit=10)
+        self.assertEqual([300, 400], [log["timestamp"] for log in newer["logs"]])
+        self.assertEqual(400, newer["next_after"])
+
+        device_page = index.query(device="A", since=150, until=350, limit=10)
+        self.assertEqual(3, device_page["total"])
+        self.assertIn("formatted_time", device_page["logs"][0])
+
+    def test_counts_by_device_and_day(self):
+        index = ActivityLogIndex(make_logs())
+
+        self.assertEqual({"A": 5, "B": 1}, index.count("device")["counts"])
+        self.assertEqual({"A": 3}, index.count("device", since=150, until=250)["counts"])
+        self.assertEqual({day_key(100): 6}, index.count("day")["counts"])
+
+
+class ActivityLogBackendTest(TempDirTestCase):
+    def assert_backend_queries(self, storage):
+        storage.save_activity_log(make_logs())
+
+        page = use_cases.list_activity_logs(storage, limit=2)
+        self.assertEqual([300, 400], [log["timestamp"] for log in page["logs"]])
+        older = use_cases.list_activity_logs(storage, limit=2, before=page["next_before"])
+        self.assertEqual(3, len(older["logs"]))
+        self.assertTrue(older["has_more"])
+
+        payload, status_code = use_cases.count_activity_logs(storage, "device", since=150)
+        self.assertEqual(200, status_code)
+        self.assertEqual({"A": 4, "B": 1}, payload["counts"])
+        self.assertEqual(400, use_cases.count_activity_logs(storage, "week")[1])
+
+    def test_json_backend_reuses_index_until_log_changes(self):
+        storage = open_storage(RuntimeConfig(self.temp_dir.name))
+        self.assert_backend_queries(storage)
+
+        with mock.patch.object(storage.activity_log_index, "load_fn", side_effect=AssertionError("reloaded")):
+            storage.query_activity_log(device="A")
+
+        storage.append_activity_log({"timestamp": 500, "device": "A"})
+        self.assertEqual(500, storage.query_activity_log(limit=1)["logs"][0]["timestamp"])
+
+    def test_sqlite_backend_matches_index(self):
+        storage = open_storage(RuntimeConfig(self.temp_dir.name, storage_backend="sqlite"))
+        self.assert_backend_queries(storage)
+        self.assertEqual({day_key(100): 6}, storage.count_activity_logs("day")["counts"])
+
+
+if __name__ == "__main__":
+    unittest.main()
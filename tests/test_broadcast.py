@@ -0,0 +1,73 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import unittest
+
+from earnapp.core.broadcast import StatusBroadcaster, Subscription
+
+from support import StorageTestCase
+
+
+def drain(subscription):
+    events = []
+    while True:
+        event = subscription.get(timeout=0)
+        if event is None:
+            return events
+        events.append(event)
+
+
+class StatusBroadcasterTest(StorageTestCase):
+    def setUp(self):
+        super(StatusBroadcasterTest, self).setUp()
+        self.statuses = {"A": {"name": "A", "health": "online", "earnapp_status": "Running"}}
+        self.probe_calls = []
+
+        def status_fn():
+            self.probe_calls.append(1)
+            return {"devices": [dict(payload) for payload in self.statuses.values()]}
+
+        self.broadcaster = StatusBroadcaster(self.storage, status_fn=status_fn, background=False)
+
+    def test_one_cycle_feeds_every_subscriber_with_deltas_only(self):
+        first = self.broadcaster.subscribe()
+        second = self.broadcaster.subscribe()
+        self.broadcaster.collect_once()
+        self.assertEqual(1, len(self.probe_calls))
+        for subscription in (first, second):
+            topics = [event["event"] for event in drain(subscription)]
+            self.assertEqual(["schedules", "auto_restart", "status"], topics)
+
+        self.statuses["A"]["health"] = "offline"
+        self.storage.save_schedules({"t": {"device": "A"}})
+        self.storage.append_activity_log({"timestamp": 10, "device": "A", "action": "stop"})
+        self.broadcaster.collect_once()
+
+        events = dict((event["event"], event["data"]) for event in drain(first))
+        self.assertEqual({"t": {"device": "A"}}, events["schedules"]["changed"])
+        self.assertEqual(["A"], [device["name"] for device in events["status"]["devices"]])
+        self.assertEqual([{"name": "A", "health": "offline"}], events["health"]["devices"])
+        self.assertEqual(10, events["activity_log"]["logs"][0]["timestamp"])
+
+        self.broadcaster.collect_once()
+        self.assertEqual([], drain(first))
+
+    def test_late_subscriber_gets_snapshot_without_new_probe(self):
+        self.broadcaster.subscribe()
+        self.broadcaster.collect_once()
+
+        late = self.broadcaster.subscribe()
+        topics = [event["event"] for event in drain(late)]
+        self.assertIn("status", topics)
+        self.assertEqual(1, len(self.probe_calls))
+
+    def test_slow_subscriber_is_dropped_instead_of_blocking(self):
+        subscription = self.broadcaster.subscribe()
+        subscription._queue.maxsize = 1
+        self.broadcaster.collect_once()
+
+        self.assertTrue(subscription.closed)
+        self.assertEqual(0, self.broadcaster.subscriber_count())
+        self.assertIsInstance(subscription, Subscription)
+
+
+if __name__ == "__main__":
+    unittest.main()
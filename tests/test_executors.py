@@ -0,0 +1,596 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import asyncio
+import io
+import os
+import shutil
+import stat
+import threading
+import time
+import unittest
+from typing import Any, List
+
+from earnapp.core.executors import (
+    AdbConnectionRegistry,
+    AdbExecutor,
+    BinaryResolver,
+    CommandStream,
+    LocalExecutor,
+    OutputRingBuffer,
+    SshConnectionPool,
+    SshExecutor,
+    iter_fleet_commands,
+    run_fleet_commands,
+)
+from earnapp.core.models import CommandResult
+
+from support import TempDirTestCase
+
+
+def run_async(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class FakeChannel(object):
+    def __init__(self, exit_code=0):
+        self.exit_code = exit_code
+        self.closed = False
+
+    def settimeout(self, _timeout):
+        pass
+
+    def recv_exit_status(self):
+        return self.exit_code
+
+    def close(self):
+        self.closed = True
+
+
+class FakeStream(io.BytesIO):
+    def __init__(self, data=b""):
+        io.BytesIO.__init__(self, data)
+        self.channel = FakeChannel()
+
+
+class FakeTransport(object):
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+
+class FakeSshClient(object):
+    def __init__(self, registry):
+        self.registry = registry
+        self.transport = FakeTransport()
+        self.commands = []  # type: List[str]
+        self.exec_timeouts = []  # type: List[Any]
+        self.streams = []  # type: List[FakeStream]
+        self.closed = False
+
+    def set_missing_host_key_policy(self, _policy):
+        pass
+
+    def connect(self, **kwargs):
+        self.registry.connects.append(kwargs)
+
+    def get_transport(self):
+        return self.transport
+
+    def exec_command(self, cmd, timeout=None):
+        self.commands.append(cmd)
+        self.exec_timeouts.append(timeout)
+        stdout = FakeStream(cmd.encode())
+        self.streams.append(stdout)
+        return None, stdout, FakeStream()
+
+    def close(self):
+        self.closed = True
+        self.transport.active = False
+
+
+class FakeParamiko(object):
+    def __init__(self):
+        self.connects = []  # type: List[Any]
+        self.clients = []  # type: List[FakeSshClient]
+
+    def SSHClient(self):
+        client = FakeSshClient(self)
+        self.clients.append(client)
+        return client
+
+    def AutoAddPolicy(self):
+        return None
+
+
+class SshConnectionPoolTest(unittest.TestCase):
+    def test_commands_reuse_one_authenticated_transport(self):
+        fake = FakeParamiko()
+        pool = SshConnectionPool()
+        executor = SshExecutor("10.0.0.2", 22, "pi", "secret", paramiko_module=fake, pool=pool)
+
+        first = executor.execute_result("echo one")
+        second = SshExecutor("10.0.0.2", "22", "pi", "secret", paramiko_module=fake, pool=pool).execute_result("echo two")
+
+        self.assertTrue(first.success)
+        self.assertEqual("echo two", second.stdout)
+        self.assertEqual(1, len(fake.connects))
+        self.assertEqual(["echo one", "echo two"], fake.clients[0].commands)
+
+    def test_dead_or_idle_transport_is_redialed(self):
+        fake = FakeParamiko()
+        clock = [1000.0]
+        pool = SshConnectionPool(idle_timeout=60, time_fn=lambda: clock[0])
+        executor = SshExecutor("10.0.0.2", 22, "pi", "secret", paramiko_module=fake, pool=pool)
+
+        executor.execute_result("echo one")
+        fake.clients[0].transport.active = False
+        executor.execute_result("echo two")
+        clock[0] += 61
+        executor.execute_result("echo three")
+
+        self.assertEqual(3, len(fake.connects))
+        self.assertTrue(fake.clients[1].closed)
+        self.assertEqual(1, len(pool))
+
+    def test_channel_limit_times_out_instead_of_opening_more_channels(self):
+        fake = FakeParamiko()
+        pool = SshConnectionPool(max_channels=1)
+        executor = SshExecutor("10.0.0.2", 22, "pi", "secret", paramiko_module=fake, pool=pool)
+
+        with pool.connection(executor._pool_key(), "secret", lambda: executor._connect(1), timeout=1):
+            result = executor.execute_result("echo blocked", timeout=0.05)
+
+        self.assertFalse(result.success)
+        self.assertIn("channel SSH", result.message)
+
+    def test_replaced_client_closes_when_its_own_users_finish(self):
+        fake = FakeParamiko()
+        pool = SshConnectionPool()
+        key = ("10.0.0.2", 22, "pi")
+
+        with pool.connection(key, "old", fake.SSHClient) as (old_client, _):
+            with pool.connection(key, "new", fake.SSHClient) as (new_client, reused):
+                self.assertFalse(reused)
+                self.assertIsNot(old_client, new_client)
+                with pool.connection(key, "new", fake.SSHClient):
+                    pass
+                self.assertFalse(old_client.closed)
+            # The new client is idle but pooled; the old one is still held.
+            self.assertFalse(old_client.closed)
+            with pool.connection(key, "new", fake.SSHClient):
+                pass
+        self.assertTrue(old_client.closed)
+        self.assertFalse(new_client.closed)
+
+    def test_slow_dial_does_not_block_checkin(self):
+        fake = FakeParamiko()
+        pool = SshConnectionPool()
+        key = ("10.0.0.2", 22, "pi")
+        dialing = threading.Event()
+        release = threading.Event()
+
+        def slow_dial():
+            dialing.set()
+            release.wait(5)
+            return fake.SSHClient()
+
+        held = pool.connection(key, "old", fake.SSHClient)
+        held.__enter__()
+        thread = threading.Thread(target=lambda: pool.connection(key, "new", slow_dial).__enter__())
+        thread.start()
+        self.assertTrue(dialing.wait(5))
+        finished = threading.Event()
+        threading.Thread(target=lambda: (held.__exit__(None, None, None), finished.set())).start()
+
+        self.assertTrue(finished.wait(1))
+        release.set()
+        thread.join(5)
+
+    def test_channel_is_closed_when_read_fails(self):
+        fake = FakeParamiko()
+        executor = SshExecutor("10.0.0.2", 22, "pi", "secret", paramiko_module=fake, pool=SshConnectionPool())
+        executor.execute_result("echo ok")
+
+        def timed_out():
+            raise OSError("timed out")
+
+        fake.clients[0].exec_command = lambda cmd, timeout=None: (None, stalled, FakeStream())
+        stalled = FakeStream()
+        stalled.read = timed_out
+        result = executor.execute_result("sleep 60")
+
+        self.assertFalse(result.success)
+        self.assertTrue(fake.clients[0].streams[0].channel.closed)
+        self.assertTrue(stalled.channel.closed)
+
+    def test_dial_and_exec_share_one_deadline(self):
+        class SlowParamiko(FakeParamiko):
+            def SSHClient(self):
+                client = FakeParamiko.SSHClient(self)
+                client.connect = lambda **kwargs: (self.connects.append(kwargs), time.sleep(0.2))
+                return client
+
+        fake = SlowParamiko()
+        executor = SshExecutor("10.0.0.2", 22, "pi", "secret", paramiko_module=fake, pool=SshConnectionPool())
+        executor.execute_result("echo ok", timeout=1)
+
+        self.assertLessEqual(fake.connects[0]["timeout"], 1)
+        self.assertLess(fake.clients[0].exec_timeouts[0], 0.85)
+
+    def test_prune_drops_idle_empty_entries(self):
+        fake = FakeParamiko()
+        clock = [1000.0]
+        pool = SshConnectionPool(idle_timeout=60, time_fn=lambda: clock[0])
+        for host in ("10.0.0.2", "10.0.0.3"):
+            SshExecutor(host, 22, "pi", "secret", paramiko_module=fake, pool=pool).execute_result("echo ok")
+        self.assertEqual(2, len(pool._entries))
+
+        clock[0] += 61
+        pool.prune()
+
+        self.assertEqual({}, pool._entries)
+        self.assertTrue(all(client.closed for client in fake.clients))
+
+
+class FakeCompleted(object):
+    def __init__(self, returncode=0, stdout="", stderr=""):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+class FakeAdbSubprocess(object):
+    TimeoutExpired = TimeoutError
+
+    def __init__(self, shell_results=None, devices_output="List of devices attached\n"):
+        self.calls = []  # type: List[List[str]]
+        self.shell_results = list(shell_results or [])
+        self.devices_output = devices_output
+
+    def run(self, command, **_kwargs):
+        self.calls.append(command)
+        if command[1] == "devices":
+            return FakeCompleted(stdout=self.devices_output)
+        if command[1] == "connect":
+            return FakeCompleted(stdout="connected to {0}".format(command[2]))
+        if self.shell_results:
+            return self.shell_results.pop(0)
+        return FakeCompleted(stdout="ok")
+
+
+class AdbConnectionRegistryTest(unittest.TestCase):
+    def test_connected_serial_skips_connect(self):
+        fake = FakeAdbSubprocess()
+        registry = AdbConnectionRegistry()
+        executor = AdbExecutor("192.168.1.5", 5555, subprocess_module=fake, registry=registry)
+
+        executor.execute_result("getprop ro.build.version.release")
+        executor.execute_result("pidof com.brd.earnrewards")
+
+        verbs = [call[1] if call[1] != "-s" else call[3] for call in fake.calls]
+        self.assertEqual(["devices", "connect", "shell", "shell"], verbs)
+
+    def test_devices_snapshot_marks_existing_connection(self):
+        fake = FakeAdbSubprocess(devices_output="List of devices attached\n192.168.1.5:5555\tdevice\n")
+        executor = AdbExecutor("192.168.1.5", 5555, subprocess_module=fake, registry=AdbConnectionRegistry())
+
+        result = executor.execute_result("echo hi")
+
+        self.assertTrue(result.success)
+        self.assertNotIn("connect", [call[1] for call in fake.calls])
+
+    def test_offline_error_reconnects_and_retries_once(self):
+        fake = FakeAdbSubprocess(shell_results=[FakeCompleted(returncode=1, stderr="error: device offline")])
+        registry = AdbConnectionRegistry()
+        registry.mark_connected("192.168.1.5:5555")
+        executor = AdbExecutor("192.168.1.5", 5555, subprocess_module=fake, registry=registry)
+
+        result = executor.execute_result("echo hi")
+
+        self.assertTrue(result.success)
+        self.assertEqual(["-s", "connect", "-s"], [call[1] for call in fake.calls])
+
+
+class BinaryResolverTest(TempDirTestCase):
+    def setUp(self):
+        super(BinaryResolverTest, self).setUp()
+        self.bin_dir = os.path.join(self.temp_dir.name, "bin")
+        os.mkdir(self.bin_dir)
+        self.lookups = []
+
+        def counting_which(name, path=None):
+            self.lookups.append(path)
+            return shutil.which(name, path=path)
+
+        self.resolver = BinaryResolver(which_fn=counting_which, environ={"PATH": self.bin_dir})
+
+    def install(self, directory=None):
+        path = os.path.join(directory or self.bin_dir, "earnapp")
+        with open(path, "w") as handle:
+            handle.write("#!/bin/sh\necho installed\n")
+        os.chmod(path, stat.S_IRWXU)
+        return path
+
+    def test_hit_skips_lookup_until_binary_changes(self):
+        path = self.install()
+
+        self.assertEqual(path, self.resolver.resolve("earnapp"))
+        self.assertEqual(path, self.resolver.resolve("earnapp"))
+        self.assertEqual(1, len(self.lookups))
+
+        os.unlink(path)
+        self.install()
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        self.resolver.resolve("earnapp")
+        self.assertEqual(2, len(self.lookups))
+
+        os.unlink(path)
+        self.assertIsNone(self.resolver.resolve("earnapp"))
+
+    def test_misses_are_not_cached_and_keys_include_path(self):
+        self.assertIsNone(self.resolver.resolve("earnapp"))
+        path = self.install()
+        self.assertEqual(path, self.resolver.resolve("earnapp"))
+
+        self.resolver.environ["PATH"] = os.pathsep.join([self.bin_dir, "/nonexistent"])
+        self.resolver.resolve("earnapp")
+        self.assertEqual(3, len(self.lookups))
+
+    def test_relative_path_entries_resolve_against_base_path(self):
+        device_dir = os.path.join(self.temp_dir.name, "device")
+        os.makedirs(os.path.join(device_dir, "tools"))
+        path = self.install(os.path.join(device_dir, "tools"))
+        self.resolver.environ["PATH"] = "tools"
+
+        self.assertEqual(path, self.resolver.resolve("earnapp", device_dir))
+
+    def test_local_executor_rewrites_without_spawning_which(self):
+        path = self.install()
+        commands = []
+
+        class RecordingSubprocess(object):
+            STDOUT = -2
+            TimeoutExpired = TimeoutError
+            CalledProcessError = RuntimeError
+
+            def check_output(self, cmd, **_kwargs):
+                commands.append(cmd)
+                return "ok"
+
+        executor = LocalExecutor(subprocess_module=RecordingSubprocess(), resolver=self.resolver)
+        executor.execute_result("earnapp status")
+        executor.execute_result("earnapp status")
+
+        self.assertEqual(["{0} status".format(path)] * 2, commands)
+        self.assertEqual(1, len(self.lookups))
+
+        os.unlink(path)
+        missing = executor.execute_result("earnapp status")
+        self.assertFalse(missing.success)
+        self.assertIn("tidak ditemukan", missing.message)
+
+
+class StreamChannel(object):
+    def __init__(self, chunks, exit_code=0):
+        self.chunks = list(chunks)
+        self.exit_code = exit_code
+        self.closed = False
+
+    def recv_ready(self):
+        return bool(self.chunks) and self.chunks[0][0] == "out"
+
+    def recv_stderr_ready(self):
+        return bool(self.chunks) and self.chunks[0][0] == "err"
+
+    def recv(self, _size):
+        return self.chunks.pop(0)[1]
+
+    def recv_stderr(self, _size):
+        return self.chunks.pop(0)[1]
+
+    def exit_status_ready(self):
+        return not self.chunks
+
+    def recv_exit_status(self):
+        return self.exit_code
+
+    def close(self):
+        self.closed = True
+
+
+class StreamingExecutorTest(unittest.TestCase):
+    def test_ring_buffer_keeps_tail(self):
+        buffer = OutputRingBuffer(limit=5)
+        for text in ("abc", "defg", "h"):
+            buffer.append(text)
+
+        self.assertEqual("defgh", buffer.text())
+        self.assertEqual(3, buffer.dropped)
+
+    def test_local_stream_yields_lines_before_exit(self):
+        stream = LocalExecutor().execute_stream("echo one; sleep 0.3; echo two; exit 2", timeout=5)
+        started = time.time()
+        chunks = iter(stream)
+
+        self.assertEqual("one\n", next(chunks))
+        self.assertLess(time.time() - started, 0.25)
+        self.assertEqual(["two\n"], list(chunks))
+        self.assertEqual((False, 2, "one\ntwo"), (stream.result.success, stream.result.exit_code, stream.result.message))
+
+    def test_local_stream_caps_output_and_times_out(self):
+        capped = LocalExecutor().execute_stream("seq 1 2000", limit=100).wait()
+        slow = LocalExecutor().execute_stream("echo start; sleep 5", timeout=0.3).wait()
+
+        self.assertTrue(capped.success)
+        self.assertTrue(capped.extra["truncated"])
+        self.assertTrue(capped.stdout.endswith("2000"))
+        self.assertLessEqual(len(capped.stdout), 100)
+        self.assertEqual(124, slow.exit_code)
+        self.assertIn("timeout", slow.message)
+
+    def test_ssh_stream_reads_channel_incrementally(self):
+        channel = StreamChannel([("out", b"downloading\n"), ("err", b"warn\n"), ("out", "\u00e9".encode()[:1]), ("out", "\u00e9 done\n".encode()[1:])])
+
+        class StreamingClient(FakeSshClient):
+            def exec_command(self, cmd, timeout=None):
+                stdout = FakeStream()
+                stdout.channel = channel
+                return None, stdout, FakeStream()
+
+        class StreamingParamiko(FakeParamiko):
+            def SSHClient(self):
+                client = StreamingClient(self)
+                self.clients.append(client)
+                return client
+
+        executor = SshExecutor("10.0.0.2", 22, "root", "secret", paramiko_module=StreamingParamiko(), pool=SshConnectionPool())
+        stream = executor.execute_stream("earnapp uninstall")
+        chunks = [chunk for chunk in stream]
+
+        self.assertEqual(["downloading\n", "warn\n", "\u00e9 done\n"], chunks)
+        self.assertTrue(stream.result.success)
+
+    def test_ssh_stream_closed_early_closes_channel(self):
+        channel = StreamChannel([("out", b"step 1\n"), ("out", b"step 2\n")])
+
+        class StreamingClient(FakeSshClient):
+            def exec_command(self, cmd, timeout=None):
+                stdout = FakeStream()
+                stdout.channel = channel
+                return None, stdout, FakeStream()
+
+        class StreamingParamiko(FakeParamiko):
+            def SSHClient(self):
+                client = StreamingClient(self)
+                self.clients.append(client)
+                return client
+
+        executor = SshExecutor("10.0.0.2", 22, "root", "secret", paramiko_module=StreamingParamiko(), pool=SshConnectionPool())
+        chunks = iter(executor.execute_stream("earnapp uninstall"))
+        self.assertEqual("step 1\n", next(chunks))
+        chunks.close()
+
+        self.assertTrue(channel.closed)
+
+    def test_stream_from_result_is_already_finished(self):
+        result = CommandResult(exit_code=1, success=False, message="nope")
+        stream = CommandStream.from_result(result)
+
+        self.assertEqual([], list(stream))
+        self.assertIs(result, stream.wait())
+
+
+class FakeAsyncAdbExecutor(AdbExecutor):
+    async def _run_async(self, command, timeout):
+        return self.subprocess.run(command)
+
+
+class AsyncExecutorTest(unittest.TestCase):
+    def test_local_async_success_failure_and_timeout(self):
+        executor = LocalExecutor()
+
+        ok = run_async(executor.execute_result_async("echo hi; echo err 1>&2"))
+        failed = run_async(executor.execute_result_async("echo nope; exit 3"))
+        started = time.time()
+        slow = run_async(executor.execute_result_async("sleep 5", timeout=0.2))
+
+        self.assertTrue(ok.success)
+        self.assertEqual("hi\nerr", ok.stdout)
+        self.assertEqual((False, 3, "nope"), (failed.success, failed.exit_code, failed.message))
+        self.assertEqual(124, slow.exit_code)
+        self.assertLess(time.time() - started, 3)
+
+    def test_adb_async_uses_registry_like_sync_path(self):
+        fake = FakeAdbSubprocess()
+        executor = FakeAsyncAdbExecutor("192.168.1.5", 5555, subprocess_module=fake, registry=AdbConnectionRegistry())
+
+        first = run_async(executor.execute_result_async("echo hi"))
+        run_async(executor.execute_result_async("echo again"))
+
+        self.assertTrue(first.success)
+        verbs = [call[1] if call[1] != "-s" else call[3] for call in fake.calls]
+        self.assertEqual(["devices", "connect", "shell", "shell"], verbs)
+
+    def test_ssh_async_offloads_blocking_call(self):
+        fake = FakeParamiko()
+        executor = SshExecutor("10.0.0.2", 22, "root", "secret", paramiko_module=fake, pool=SshConnectionPool())
+
+        result = run_async(executor.execute_result_async("uptime"))
+
+        self.assertTrue(result.success)
+
+    def test_fleet_runner_limits_concurrency_and_reports_as_completed(self):
+        state = {"running": 0, "peak": 0}
+        reported = []
+
+        class SleepyExecutor(object):
+            def __init__(self, device):
+                self.delay = device["delay"]
+
+            async def execute_result_async(self, cmd, timeout=20):
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+                await asyncio.sleep(self.delay)
+                state["running"] -= 1
+                return CommandResult(stdout=cmd, exit_code=0)
+
+        def factory(device):
+            if device.get("broken"):
+                raise ValueError("❌ Tipe device tidak dikenali.")
+            return SleepyExecutor(device)
+
+        devices = {"slow": {"delay": 0.05}, "fast": {"delay": 0.0}, "mid": {"delay": 0.02}, "bad": {"broken": True}}
+        results = run_async(
+            run_fleet_commands(devices, "status", limit=2, executor_factory=factory, on_result=lambda name, _: reported.append(name))
+        )
+
+        self.assertEqual(2, state["peak"])
+        self.assertEqual(list(results.keys()), reported)
+        self.assertEqual("slow", reported[-1])
+        self.assertFalse(results["bad"].success)
+        self.assertTrue(results["fast"].success)
+
+    def test_fleet_iterator_yields_early_and_cancels_on_callback_error(self):
+        cancelled = []
+
+        class SleepyExecutor(object):
+            def __init__(self, device):
+                self.delay = device["delay"]
+
+            async def execute_result_async(self, cmd, timeout=20):
+                try:
+                    await asyncio.sleep(self.delay)
+                except asyncio.CancelledError:
+                    cancelled.append(cmd)
+                    raise
+                return CommandResult(stdout=cmd, exit_code=0)
+
+        devices = {"slow": {"delay": 5}, "fast": {"delay": 0.0}}
+
+        async def first_result():
+            fleet = iter_fleet_commands(devices, "status", executor_factory=SleepyExecutor)
+            try:
+                async for name, result in fleet:
+                    return name, result.success
+            finally:
+                await fleet.aclose()
+
+        def boom(name, result):
+            raise RuntimeError("callback failed")
+
+        started = time.time()
+        self.assertEqual(("fast", True), run_async(first_result()))
+        with self.assertRaises(RuntimeError):
+            run_async(run_fleet_commands(devices, "status", executor_factory=SleepyExecutor, on_result=boom))
+
+        self.assertLess(time.time() - started, 2)
+        self.assertEqual(["status", "status"], cancelled)
+
+
+if __name__ == "__main__":
+    unittest.main()
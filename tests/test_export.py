@@ -0,0 +1,110 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import csv
+import gzip
+import io
+import json
+import unittest
+
+from earnapp.core import sqlite_storage
+from earnapp.core import use_cases
+from earnapp.core.export import CSV_HEADER, iter_export, write_export
+from earnapp.core.runtime import RuntimeConfig
+from earnapp.core.storage import open_storage
+
+from support import TempDirTestCase
+
+
+def make_logs():
+    logs = []
+    for timestamp in (100, 200, 200, 300, 400):
+        logs.append({
+            "timestamp": timestamp,
+            "device": "B" if timestamp == 300 else "A",
+            "action": "restart",
+            "type": "manual",
+            "user": "admin",
+            "result": "ok, \"done\"",
+        })
+    return logs
+
+
+class ExportFormatTest(unittest.TestCase):
+    def test_csv_has_header_and_quoted_rows(self):
+        data = b"".join(iter_export(make_logs(), "csv")).decode("utf-8")
+        rows = list(csv.reader(io.StringIO(data)))
+
+        self.assertEqual(list(CSV_HEADER), rows[0])
+        self.assertEqual(6, len(rows))
+        self.assertEqual(["100", "A", "restart", "manual", "admin", "ok, \"done\""], [rows[1][0]] + rows[1][3:])
+
+    def test_json_round_trips_and_handles_empty_input(self):
+        self.assertEqual(make_logs(), json.loads(b"".join(iter_export(make_logs(), "json")).decode("utf-8")))
+        self.assertEqual([], json.loads(b"".join(iter_export([], "json")).decode("utf-8")))
+
+    def test_gzip_output_decompresses_and_small_chunks_are_split(self):
+        logs = make_logs() * 50
+        plain_chunks = list(iter_export(logs, "csv", chunk_bytes=64))
+        self.assertGreater(len(plain_chunks), 1)
+        self.assertTrue(all(len(chunk) < 200 for chunk in plain_chunks))
+
+        compressed = b"".join(iter_export(logs, "csv", compress=True, chunk_bytes=64))
+        self.assertEqual(b"".join(plain_chunks), gzip.decompress(compressed))
+
+    def test_write_export_counts_rows_and_rewinds(self):
+        handle, rows = write_export(iter(make_logs()), "json", spool_bytes=16)
+        try:
+            self.assertEqual(5, rows)
+            self.assertEqual(make_logs(), json.loads(handle.read().decode("utf-8")))
+        finally:
+            handle.close()
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            list(iter_export(make_logs(), "xml"))
+
+
+class ExportStorageTest(TempDirTestCase):
+    def check_filters(self, storage):
+        for entry in make_logs():
+            storage.append_activity_log(entry, max_entries=100)
+
+        self.assertEqual([100, 200, 200, 300, 400], [e["timestamp"] for e in storage.iter_activity_log()])
+        self.assertEqual([100, 200, 200, 400], [e["timestamp"] for e in storage.iter_activity_log("A")])
+        self.assertEqual([200, 200, 300], [e["timestamp"] for e in storage.iter_activity_log(since=150, until=300)])
+        self.assertEqual([200, 200], [e["timestamp"] for e in storage.iter_activity_log("A", 150, 300)])
+
+    def test_json_storage_filters_by_device_and_range(self):
+        self.check_filters(open_storage(RuntimeConfig(self.temp_dir.name)))
+
+    def test_sqlite_storage_pages_through_batches(self):
+        original = sqlite_storage.ACTIVITY_EXPORT_BATCH
+        sqlite_storage.ACTIVITY_EXPORT_BATCH = 2
+        try:
+            self.check_filters(open_storage(RuntimeConfig(self.temp_dir.name, storage_backend="sqlite")))
+        finally:
+            sqlite_storage.ACTIVITY_EXPORT_BATCH = original
+
+    def test_use_case_returns_file_and_validates_request(self):
+        storage = open_storage(RuntimeConfig(self.temp_dir.name))
+        for entry in make_logs():
+            storage.append_activity_log(entry, max_entries=100)
+
+        payload, status_code = use_cases.export_activity_log(storage, "csv", "A", 150, 500, compress=True)
+        try:
+            self.assertEqual(200, status_code)
+            self.assertEqual(3, payload["rows"])
+            self.assertTrue(payload["filename"].startswith("activity_log_A_"))
+            self.assertTrue(payload["filename"].endswith(".csv.gz"))
+            self.assertEqual(4, len(gzip.decompress(payload["file"].read()).decode("utf-8").splitlines()))
+        finally:
+            payload["file"].close()
+
+        self.assertEqual(400, use_cases.export_activity_log(storage, "xml")[1])
+        self.assertEqual(400, use_cases.stream_activity_log_export(storage, "csv", since=10, until=5)[1])
+        stream, status_code = use_cases.stream_activity_log_export(storage, "json")
+        self.assertEqual("application/json", stream["mimetype"])
+        self.assertEqual(5, len(json.loads(b"".join(stream["chunks"]).decode("utf-8"))))
+
+
+if __name__ == "__main__":
+    unittest.main()
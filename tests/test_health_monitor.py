@@ -0,0 +1,116 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import threading
+import time
+import unittest
+
+from earnapp.core import workers
+
+from support import StorageTestCase
+
+
+class HealthMonitorTest(StorageTestCase):
+    def setUp(self):
+        super(HealthMonitorTest, self).setUp()
+        self.storage.save_devices({"A": {"type": "local"}, "B": {"type": "local"}, "C": {"type": "local"}})
+        self.now = [1000.0]
+        self.online = {"A": True, "B": True, "C": True}
+        self.calls = []
+        self.health = {}
+
+    def check(self, device_name):
+        self.calls.append(device_name)
+        return {"healthy": self.online[device_name], "error": None if self.online[device_name] else "down"}
+
+    def refresh(self, **kwargs):
+        kwargs.setdefault("jitter_fn", lambda: 0.0)
+        return workers._refresh_device_health(self.storage, self.health, lambda: self.now[0], self.check, **kwargs)
+
+    def test_probes_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=2)
+
+        def slow_check(device_name):
+            barrier.wait()
+            return {"healthy": True, "error": None}
+
+        started = time.time()
+        workers._refresh_device_health(self.storage, self.health, lambda: self.now[0], slow_check, jitter_fn=lambda: 0.0)
+
+        self.assertLess(time.time() - started, 2)
+        self.assertEqual({"online"}, set(entry["status"] for entry in self.health.values()))
+
+    def test_only_due_devices_are_probed(self):
+        self.refresh(check_interval=60)
+        self.assertEqual(["A", "B", "C"], sorted(self.calls))
+        self.assertEqual(1060, self.health["A"]["next_check"])
+
+        self.calls[:] = []
+        self.now[0] = 1030
+        self.refresh(check_interval=60)
+        self.assertEqual([], self.calls)
+
+        self.now[0] = 1060
+        self.refresh(check_interval=60)
+        self.assertEqual(["A", "B", "C"], sorted(self.calls))
+
+    def test_stable_online_backs_off_until_max_interval(self):
+        intervals = []
+        for _ in range(12):
+            self.refresh(check_interval=60, max_interval=300)
+            intervals.append(self.health["A"]["interval"])
+            self.now[0] = self.health["A"]["next_check"]
+
+        self.assertEqual(60, intervals[0])
+        self.assertEqual(120, intervals[3])
+        self.assertEqual(300, intervals[-1])
+
+    def test_offline_and_flapping_devices_are_checked_sooner(self):
+        self.online["B"] = False
+        self.refresh(check_interval=60)
+        self.assertEqual(30, self.health["B"]["interval"])
+
+        self.now[0] = 1030
+        self.online["B"] = True
+        self.refresh(check_interval=60)
+        self.assertEqual(["B"], self.calls[-1:])
+        self.assertEqual("online", self.health["B"]["status"])
+        self.assertEqual(30, self.health["B"]["interval"])
+        self.assertGreater(self.health["B"]["flap_score"], 0)
+
+    def test_jitter_spreads_next_check(self):
+        self.refresh(check_interval=100, jitter_fn=lambda: 0.1)
+        self.assertEqual(1110, self.health["A"]["next_check"])
+
+    def test_failing_probe_marks_device_offline(self):
+        def broken(device_name):
+            raise RuntimeError("ssh exploded")
+
+        workers._refresh_device_health(self.storage, self.health, lambda: self.now[0], broken, jitter_fn=lambda: 0.0)
+
+        self.assertEqual("offline", self.health["A"]["status"])
+        self.assertEqual("ssh exploded", self.health["A"]["error"])
+
+    def test_monitor_sleeps_until_next_due_device(self):
+        self.online["C"] = False
+        sleeps = []
+
+        def stop_after_first_cycle(seconds):
+            sleeps.append(seconds)
+            raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            workers.background_monitor(
+                self.storage,
+                None,
+                {"enabled": False, "check_interval": 60},
+                self.health,
+                sleep_fn=stop_after_first_cycle,
+                time_fn=lambda: self.now[0],
+                health_check_fn=self.check,
+                jitter_fn=lambda: 0.0,
+            )
+
+        self.assertEqual([30], sleeps)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import threading
+import time
+import unittest
+
+from earnapp.core import use_cases
+from earnapp.core.jobs import JOB_CANCELLED, JOB_FAILED, JOB_SUCCEEDED, JobRunner
+from earnapp.core.models import CommandResult
+
+from support import StorageTestCase
+
+
+def wait_for(job, timeout=2):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+class JobRunnerTest(StorageTestCase):
+    def setUp(self):
+        super(JobRunnerTest, self).setUp()
+        self.storage.save_devices({name: {"type": "local", "path": "/usr/bin"} for name in ("A", "B", "C")})
+        self.runner = JobRunner(max_workers=1)
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def test_bulk_restart_runs_in_background_with_progress(self):
+        release = threading.Event()
+
+        def command_runner(device, cmd):
+            release.wait(2)
+            return CommandResult(stdout="ok", exit_code=0, success=True, message="ok")
+
+        job = self.runner.submit(
+            "restart_all",
+            ["A", "B", "C"],
+            lambda on_result, cancel_event: use_cases.restart_all_devices(
+                self.storage,
+                runner=command_runner,
+                sleep_fn=lambda _seconds: None,
+                log_activity=False,
+                max_workers=1,
+                on_result=on_result,
+                cancel_event=cancel_event,
+            ),
+        )
+
+        self.assertFalse(job.finished)
+        self.assertEqual(0, job.to_dict()["completed"])
+        release.set()
+        payload = wait_for(job).to_dict()
+
+        self.assertEqual(JOB_SUCCEEDED, payload["status"])
+        self.assertEqual(3, payload["completed"])
+        self.assertEqual({"A": "done", "B": "done", "C": "done"}, payload["progress"])
+        self.assertEqual(["A", "B", "C"], [item["device"] for item in payload["results"]])
+
+    def test_cancel_skips_devices_not_started(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def command_runner(device, cmd):
+            started.set()
+            release.wait(2)
+            return CommandResult(stdout="ok", exit_code=0, success=True, message="ok")
+
+        job = self.runner.submit(
+            "start_all",
+            ["A", "B", "C"],
+            lambda on_result, cancel_event: use_cases.start_all_devices(
+                self.storage, runner=command_runner, log_activity=False, max_workers=1, on_result=on_result, cancel_event=cancel_event
+            ),
+        )
+        self.assertTrue(started.wait(2))
+        self.runner.cancel(job.id)
+        release.set()
+        payload = wait_for(job).to_dict()
+
+        self.assertEqual(JOB_CANCELLED, payload["status"])
+        self.assertEqual("done", payload["progress"]["A"])
+        self.assertEqual(JOB_CANCELLED, payload["progress"]["C"])
+
+    def test_failures_and_exceptions_mark_job_failed(self):
+        failing = self.runner.submit("x", ["A"], lambda *_: {"success": False, "results": [{"device": "A", "success": False}]})
+        broken = self.runner.submit("x", ["A"], lambda *_: 1 / 0)
+
+        self.assertEqual(JOB_FAILED, wait_for(failing).status)
+        self.assertEqual(JOB_FAILED, wait_for(broken).status)
+        self.assertIn("division", broken.error)
+
+    def test_retention_keeps_newest_finished_jobs(self):
+        now = [1000.0]
+        runner = JobRunner(max_workers=1, retention=2, max_age=60, time_fn=lambda: now[0])
+        try:
+            jobs = [wait_for(runner.submit("x", [], lambda *_: {"success": True, "results": []})) for _ in range(3)]
+            self.assertIsNone(runner.get(jobs[0].id))
+            self.assertEqual([jobs[2].id, jobs[1].id], [job.id for job in runner.list()])
+
+            now[0] += 61
+            self.assertEqual([], runner.list())
+        finally:
+            runner.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
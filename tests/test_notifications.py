@@ -0,0 +1,173 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import threading
+import time
+import unittest
+
+from earnapp.core.notifications import NotificationQueue, TokenBucket, build_digests, retry_after_seconds
+
+
+class TooManyRequests(Exception):
+    def __init__(self, retry_after):
+        super(TooManyRequests, self).__init__("Error code: 429. Description: Too Many Requests: retry after {0}".format(retry_after))
+        self.error_code = 429
+        self.result_json = {"ok": False, "error_code": 429, "parameters": {"retry_after": retry_after}}
+
+
+class BadRequest(Exception):
+    def __init__(self):
+        super(BadRequest, self).__init__("Error code: 400. Description: Bad Request: can't parse entities")
+        self.error_code = 400
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class NotificationHelpersTest(unittest.TestCase):
+    def test_retry_after_from_telegram_error(self):
+        self.assertEqual(7.0, retry_after_seconds(TooManyRequests(7)))
+        self.assertEqual(12.0, retry_after_seconds(Exception("Too Many Requests: retry after 12")))
+        self.assertIsNone(retry_after_seconds(Exception("Connection reset")))
+
+    def test_token_bucket_limits_rate_after_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, capacity=2, time_fn=clock)
+        for _ in range(4):
+            bucket.acquire(clock.sleep)
+
+        self.assertEqual([0.5, 0.5], clock.sleeps)
+
+    def test_digest_groups_messages_within_limit(self):
+        self.assertEqual(["only"], build_digests(["only"]))
+
+        digests = build_digests(["a" * 30, "b" * 30, "c" * 30], dropped=2, max_chars=100)
+
+        self.assertTrue(all(len(text) <= 100 for text in digests))
+        self.assertIn("2 notifikasi lama dibuang", digests[0])
+        self.assertEqual(1, sum(text.count("c" * 30) for text in digests))
+
+    def test_truncation_closes_open_code_block(self):
+        text = build_digests(["```\n" + "x" * 200 + "\n```"], max_chars=100)[0]
+
+        self.assertLessEqual(len(text), 100)
+        self.assertEqual(0, text.count("```") % 2)
+
+
+class NotificationQueueTest(unittest.TestCase):
+    def test_burst_is_coalesced_into_one_digest(self):
+        sent = []
+        queue = NotificationQueue(sent.append, coalesce_window=0.2)
+        queue.start()
+        try:
+            for index in range(5):
+                queue.enqueue("schedule {0} done".format(index))
+            deadline = time.time() + 2
+            while not sent and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            queue.stop()
+
+        self.assertEqual(1, len(sent))
+        self.assertIn("5 notifikasi", sent[0])
+        self.assertIn("schedule 4 done", sent[0])
+
+    def test_enqueue_does_not_block_on_slow_send(self):
+        release = threading.Event()
+        queue = NotificationQueue(lambda text: release.wait(2), coalesce_window=0)
+        queue.start()
+        try:
+            started = time.time()
+            for index in range(20):
+                queue.enqueue("msg {0}".format(index))
+            self.assertLess(time.time() - started, 0.5)
+        finally:
+            release.set()
+            queue.stop()
+
+    def test_rate_limit_error_pauses_for_retry_after(self):
+        clock = FakeClock()
+        attempts = []
+
+        def send(text):
+            attempts.append((clock.now, text))
+            if len(attempts) == 1:
+                raise TooManyRequests(30)
+
+        queue = NotificationQueue(send, time_fn=clock, sleep_fn=clock.sleep)
+        queue.enqueue("hello")
+
+        self.assertEqual(1, queue.drain())
+        self.assertEqual([(100.0, "hello"), (131.0, "hello")], attempts)
+        self.assertEqual(1, queue.sent)
+
+    def test_failing_send_is_dropped_after_max_attempts(self):
+        clock = FakeClock()
+        calls = []
+
+        def send(text):
+            calls.append(text)
+            raise RuntimeError("network down")
+
+        queue = NotificationQueue(send, max_attempts=2, time_fn=clock, sleep_fn=clock.sleep)
+        queue.enqueue("hello")
+
+        self.assertEqual(0, queue.drain())
+        self.assertEqual(2, len(calls))
+        self.assertEqual(1, queue.failed)
+
+    def test_rate_limit_retries_do_not_use_up_attempts(self):
+        clock = FakeClock()
+        calls = []
+
+        def send(text):
+            calls.append(text)
+            if len(calls) < 3:
+                raise TooManyRequests(5)
+
+        queue = NotificationQueue(send, max_attempts=1, time_fn=clock, sleep_fn=clock.sleep)
+        queue.enqueue("hello")
+
+        self.assertEqual(1, queue.drain())
+        self.assertEqual(3, len(calls))
+
+    def test_bad_digest_is_split_and_bad_part_falls_back_to_plain_text(self):
+        clock = FakeClock()
+        markdown, plain = [], []
+
+        def send(text):
+            markdown.append(text)
+            if "broken" in text:
+                raise BadRequest()
+
+        queue = NotificationQueue(send, plain_send_fn=plain.append, time_fn=clock, sleep_fn=clock.sleep)
+        for message in ("ok 1", "broken *bold", "ok 2"):
+            queue.enqueue(message)
+
+        self.assertEqual(3, queue.drain())
+        self.assertEqual(["ok 1", "broken *bold", "ok 2"], markdown[1:])
+        self.assertEqual(["broken *bold"], plain)
+        self.assertEqual(0, queue.failed)
+
+    def test_overflow_drops_oldest_messages(self):
+        sent = []
+        queue = NotificationQueue(sent.append, max_pending=2)
+        for index in range(4):
+            queue.enqueue("msg {0}".format(index))
+        queue.drain()
+
+        self.assertIn("2 notifikasi lama dibuang", sent[0])
+        self.assertNotIn("msg 1", sent[0])
+        self.assertIn("msg 3", sent[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
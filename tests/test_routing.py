@@ -0,0 +1,115 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import unittest
+from types import SimpleNamespace
+
+from earnapp.adapters.telegram.routing import Router
+
+
+def message(text, chat_id=1):
+    return SimpleNamespace(text=text, chat=SimpleNamespace(id=chat_id))
+
+
+def callback(data):
+    return SimpleNamespace(data=data)
+
+
+class RouterTest(unittest.TestCase):
+    def setUp(self):
+        self.states = {}
+        self.devices = {"Pi"}
+        self.seen = []
+        self.router = Router(state_lookup=self.states.get)
+        router = self.router
+
+        @router.command("start")
+        def start(m):
+            self.seen.append("start")
+
+        @router.command("adddevice")
+        @router.text("➕ Add Device")
+        def add_device(m):
+            self.seen.append("add_device")
+
+        @router.text("🟡 Status")
+        def status(m):
+            self.seen.append("status")
+
+        @router.state("schedule", 3)
+        def schedule_time(m):
+            self.seen.append("schedule_time")
+
+        @router.state("add_device")
+        def add_device_step(m):
+            self.seen.append("add_device_step")
+
+        @router.text_match(lambda m: m.text in self.devices)
+        def select_device(m):
+            self.seen.append("select_device")
+
+        @router.default
+        def fallback(m):
+            self.seen.append("fallback")
+
+        @router.callback("quick_restart")
+        def quick_restart(call):
+            self.seen.append("quick_restart")
+
+        @router.callback_prefix("confirm_remove:")
+        def confirm_remove(call):
+            self.seen.append("confirm_remove")
+
+    def test_messages_resolve_by_command_text_state_then_predicate(self):
+        for text in ("/start", "/adddevice@EarnBot now", "➕ Add Device", "🟡 Status", "Pi", "hello", None):
+            self.router.dispatch_message(message(text))
+
+        self.assertEqual(
+            ["start", "add_device", "add_device", "status", "select_device", "fallback", "fallback"], self.seen
+        )
+
+    def test_conversation_state_uses_step_specific_handler(self):
+        self.states[1] = ("schedule", 3)
+        self.states[2] = ("schedule", 4)
+        self.states[3] = ("add_device", 2)
+
+        self.router.dispatch_message(message("08:30", chat_id=1))
+        self.router.dispatch_message(message("Pi", chat_id=2))
+        self.router.dispatch_message(message("Pi", chat_id=3))
+        self.router.dispatch_message(message("🟡 Status", chat_id=1))
+
+        self.assertEqual(["schedule_time", "select_device", "add_device_step", "status"], self.seen)
+
+    def test_callbacks_resolve_exact_then_prefix(self):
+        self.assertTrue(self.router.dispatch_callback(callback("quick_restart")))
+        self.assertTrue(self.router.dispatch_callback(callback("confirm_remove:Pi: kitchen")))
+        self.assertFalse(self.router.dispatch_callback(callback("confirm_remove")))
+        self.assertFalse(self.router.dispatch_callback(callback("unknown:x")))
+        self.assertFalse(self.router.dispatch_callback(callback(None)))
+
+        self.assertEqual(["quick_restart", "confirm_remove"], self.seen)
+
+    def test_duplicate_routes_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.router.text("🟡 Status")(lambda m: None)
+        with self.assertRaises(ValueError):
+            self.router.callback_prefix("confirm_remove")
+
+    def test_attach_registers_single_catch_all_handlers(self):
+        registered = []
+
+        class FakeBot(object):
+            def message_handler(self, func):
+                return lambda handler: registered.append(("message", func(None), handler))
+
+            def callback_query_handler(self, func):
+                return lambda handler: registered.append(("callback", func(None), handler))
+
+        self.router.attach(FakeBot())
+
+        self.assertEqual(
+            [("message", True, self.router.dispatch_message), ("callback", True, self.router.dispatch_callback)],
+            registered,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
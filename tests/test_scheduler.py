@@ -0,0 +1,219 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+from datetime import datetime
+
+from earnapp.core import use_cases, workers
+from earnapp.core.runtime import RuntimeConfig
+
+from support import StorageTestCase
+
+
+def local_ts(*parts):
+    return time.mktime(datetime(*parts).timetuple())
+
+
+class SchedulerTestCase(StorageTestCase):
+    def setUp(self):
+        super(SchedulerTestCase, self).setUp()
+        self.now = [0.0]
+        self.actions = []
+
+    def make_scheduler(self):
+        return workers.Scheduler(
+            self.storage,
+            None,
+            {},
+            {},
+            time_fn=lambda: self.now[0],
+            start_device_fn=lambda name: self.actions.append(("start", name)) or "started",
+            stop_device_fn=lambda name: self.actions.append(("stop", name)) or "stopped",
+            restart_device_fn=lambda name: self.actions.append(("restart", name)) or "restarted",
+            record_activity_fn=lambda *args: None,
+        )
+
+    def run_due(self, scheduler):
+        fired = scheduler.run_pending()
+        self.assertTrue(scheduler.executor.wait_idle(2))
+        return fired
+
+
+class SchedulerTest(SchedulerTestCase):
+    def test_sleeps_until_next_slot_and_fires_once_across_restarts(self):
+        # 2024-01-01 is a Monday.
+        self.storage.save_schedules({"t1": {"device": "A", "action": "start", "time": "10:30", "days": [0, 1], "enabled": True}})
+        self.now[0] = local_ts(2024, 1, 1, 10, 0)
+        scheduler = self.make_scheduler()
+        scheduler.reload()
+
+        self.assertEqual(60.0, scheduler.seconds_until_next())
+        self.assertEqual(local_ts(2024, 1, 1, 10, 30), scheduler.next_fire_time())
+
+        self.now[0] = local_ts(2024, 1, 1, 10, 30, 5)
+        self.assertEqual(1, self.run_due(scheduler))
+        self.assertEqual(local_ts(2024, 1, 2, 10, 30), scheduler.next_fire_time())
+
+        restarted = self.make_scheduler()
+        restarted.reload()
+        self.assertEqual(0, self.run_due(restarted))
+        self.assertEqual([("start", "A")], self.actions)
+        state = self.storage.read_json(RuntimeConfig.SCHEDULER_STATE, {})
+        self.assertEqual("2024-01-01T10:30", state["schedules"]["t1"]["last_slot"])
+
+    def test_missed_slots_fire_within_grace_and_skip_beyond_it(self):
+        self.storage.save_schedules({
+            "late": {"device": "A", "action": "stop", "time": "09:50", "days": [0], "enabled": True},
+            "stale": {"device": "B", "action": "stop", "time": "08:00", "days": [0], "enabled": True},
+        })
+        self.now[0] = local_ts(2024, 1, 1, 10, 0)
+        scheduler = self.make_scheduler()
+        scheduler.reload()
+        self.run_due(scheduler)
+
+        self.assertEqual([("stop", "A")], self.actions)
+
+    def test_new_task_with_past_time_waits_for_next_slot(self):
+        self.storage.save_schedules({
+            "new": {"device": "A", "action": "stop", "time": "08:00", "days": [0], "enabled": True,
+                    "created_at": int(local_ts(2024, 1, 1, 8, 10))},
+            "old": {"device": "B", "action": "stop", "time": "08:00", "days": [0], "enabled": True,
+                    "created_at": int(local_ts(2023, 12, 1))},
+        })
+        self.now[0] = local_ts(2024, 1, 1, 8, 10)
+        scheduler = self.make_scheduler()
+        scheduler.reload()
+        self.run_due(scheduler)
+
+        self.assertEqual([("stop", "B")], self.actions)
+        self.assertEqual(local_ts(2024, 1, 8, 8, 0), scheduler.next_fire_time())
+
+    def test_add_schedule_records_creation_time(self):
+        self.storage.save_devices({"A": {"type": "local", "path": "/usr/bin"}})
+        before = int(time.time())
+        payload = use_cases.add_schedule(self.storage, {"device": "A", "action": "stop", "time": "08:00", "days": [0]})
+
+        task = self.storage.load_schedules()[payload["task_id"]]
+        self.assertGreaterEqual(task["created_at"], before)
+
+    def test_auto_restart_fires_from_last_run_and_reschedules(self):
+        self.storage.save_auto_restart({"A": {"enabled": True, "interval_hours": 1, "delay_seconds": 0, "last_run": 1000}})
+        self.now[0] = 4000.0
+        scheduler = self.make_scheduler()
+        scheduler.reload()
+        self.assertEqual(4600, scheduler.next_fire_time())
+
+        self.now[0] = 4600.0
+        self.assertEqual(1, self.run_due(scheduler))
+        scheduler.reload()
+        self.assertEqual(8200, scheduler.next_fire_time())
+        self.assertEqual([("restart", "A")], self.actions)
+
+    def test_failed_auto_restart_claim_rebuilds_on_next_reload(self):
+        self.storage.save_auto_restart({"A": {"enabled": True, "interval_hours": 1, "delay_seconds": 0, "last_run": 1000}})
+        self.now[0] = 4600.0
+        scheduler = self.make_scheduler()
+        scheduler.change_tracker = mock.Mock(**{"consume_any.return_value": False})
+        scheduler.reload_if_changed()
+
+        with mock.patch.object(workers, "_claim_due_auto_restart", side_effect=OSError("lock busy")):
+            with self.assertRaises(OSError):
+                scheduler.run_pending()
+        self.assertIsNone(scheduler.next_fire_time())
+
+        self.assertTrue(scheduler.reload_if_changed())
+        self.assertEqual(4600, scheduler.next_fire_time())
+
+    def test_unchanged_files_do_not_rebuild_heap(self):
+        self.storage.save_schedules({"t1": {"device": "A", "action": "start", "time": "10:30", "days": [0], "enabled": True}})
+        scheduler = self.make_scheduler()
+        self.assertTrue(scheduler.reload())
+        self.assertFalse(scheduler.reload())
+        self.storage.save_schedules({})
+        self.assertTrue(scheduler.reload())
+        self.assertIsNone(scheduler.next_fire_time())
+
+
+class JobExecutorTest(unittest.TestCase):
+    def test_devices_run_concurrently_but_each_device_serially(self):
+        executor = workers.JobExecutor(max_workers=4)
+        barrier = threading.Barrier(2, timeout=2)
+        running = {"A": 0}
+        overlaps = []
+        order = []
+
+        def device_job(name):
+            def run():
+                barrier.wait()
+                order.append(name)
+            return run
+
+        def serial_job(index):
+            def run():
+                running["A"] += 1
+                overlaps.append(running["A"])
+                time.sleep(0.01)
+                order.append("A{0}".format(index))
+                running["A"] -= 1
+            return run
+
+        executor.submit("B", "b", device_job("B"))
+        executor.submit("C", "c", device_job("C"))
+        for index in range(3):
+            executor.submit("A", "a{0}".format(index), serial_job(index), due_at=time.time() - 5)
+
+        self.assertTrue(executor.wait_idle(2))
+        executor.shutdown()
+        self.assertEqual(["A0", "A1", "A2"], [item for item in order if item.startswith("A")])
+        self.assertEqual([1, 1, 1], overlaps)
+        records = dict((record["label"], record) for record in executor.history)
+        self.assertGreaterEqual(records["a0"]["queue_delay"], 5)
+        self.assertGreater(records["a2"]["run_time"], 0)
+
+
+@unittest.skipUnless(hasattr(time, "tzset"), "requires time.tzset")
+class SchedulerDstTest(SchedulerTestCase):
+    def setUp(self):
+        super(SchedulerDstTest, self).setUp()
+        self.previous_tz = os.environ.get("TZ")
+        os.environ["TZ"] = "America/New_York"
+        time.tzset()
+
+    def tearDown(self):
+        if self.previous_tz is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = self.previous_tz
+        time.tzset()
+        super(SchedulerDstTest, self).tearDown()
+
+    def test_repeated_hour_fires_once(self):
+        # 2024-11-03 (Sunday): 01:00-02:00 happens twice in New York.
+        self.storage.save_schedules({"t1": {"device": "A", "action": "start", "time": "01:30", "days": [6], "enabled": True}})
+        first_pass = local_ts(2024, 11, 3, 0, 0)
+        self.now[0] = first_pass
+        scheduler = self.make_scheduler()
+        scheduler.reload()
+
+        for step in range(0, 4 * 3600, 300):
+            self.now[0] = first_pass + step
+            self.run_due(scheduler)
+
+        self.assertEqual([("start", "A")], self.actions)
+
+    def test_slot_in_spring_gap_fires_after_the_jump(self):
+        # 2024-03-10 (Sunday): clocks jump from 02:00 straight to 03:00.
+        self.storage.save_schedules({"t1": {"device": "A", "action": "start", "time": "02:30", "days": [6], "enabled": True}})
+        self.now[0] = local_ts(2024, 3, 10, 1, 0)
+        scheduler = self.make_scheduler()
+        scheduler.reload()
+
+        self.assertEqual(local_ts(2024, 3, 10, 3, 30), scheduler.next_fire_time())
+        self.now[0] = scheduler.next_fire_time()
+        self.assertEqual(1, self.run_due(scheduler))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import json
+import os
+import unittest
+
+from earnapp.core.runtime import RuntimeConfig
+from earnapp.core.state import StateStore
+from earnapp.core.watch import watch_storage
+
+from support import StorageTestCase
+
+
+class StateStoreTest(StorageTestCase):
+    def setUp(self):
+        super(StateStoreTest, self).setUp()
+        self.storage.save_devices({"A": {"type": "local"}})
+        self.loads = []
+        original = self.storage.load_devices
+        self.storage.load_devices = lambda: self.loads.append(1) or original()
+
+    def test_reads_from_memory_until_storage_changes(self):
+        store = StateStore(self.storage)
+
+        first = store.get(RuntimeConfig.DEVICES)
+        self.assertIs(first, store.get(RuntimeConfig.DEVICES))
+        self.assertEqual(1, len(self.loads))
+        self.assertEqual(1, store.version(RuntimeConfig.DEVICES))
+
+        self.storage.save_devices({"B": {"type": "local"}})
+
+        self.assertEqual({"B": {"type": "local"}}, store.get(RuntimeConfig.DEVICES))
+        self.assertEqual(2, store.version(RuntimeConfig.DEVICES))
+        self.assertEqual({"A": {"type": "local"}}, first)
+        self.assertEqual(2, len(self.loads))
+
+    def test_external_change_reported_by_notifier(self):
+        notifier = watch_storage(self.storage, start=False)
+        store = StateStore(self.storage, notifier)
+        store.get(RuntimeConfig.SCHEDULES)
+
+        path = self.storage.path_for(RuntimeConfig.SCHEDULES)
+        with open(path + ".tmp", "w") as handle:
+            json.dump({"t": {"device": "A"}}, handle)
+        os.replace(path + ".tmp", path)
+        self.assertEqual(1, store.version(RuntimeConfig.SCHEDULES))
+
+        notifier.poll_once()
+        self.assertEqual({"t": {"device": "A"}}, store.get(RuntimeConfig.SCHEDULES))
+        self.assertEqual(2, store.version(RuntimeConfig.SCHEDULES))
+
+    def test_put_adopts_written_value_without_reload(self):
+        store = StateStore(self.storage)
+        logs = self.storage.append_activity_log({"timestamp": 1, "device": "A"})
+        store.put(RuntimeConfig.ACTIVITY_LOG, logs)
+
+        self.assertIs(logs, store.get(RuntimeConfig.ACTIVITY_LOG))
+
+    def test_failed_reload_keeps_previous_value_and_retries(self):
+        store = StateStore(self.storage)
+        store.get(RuntimeConfig.DEVICES)
+
+        with open(self.storage.path_for(RuntimeConfig.DEVICES), "w") as handle:
+            handle.write("[1, 2]")
+        store.invalidate(RuntimeConfig.DEVICES)
+
+        self.assertEqual({"A": {"type": "local"}}, store.get(RuntimeConfig.DEVICES))
+        self.storage.save_devices({"C": {}})
+        self.assertEqual({"C": {}}, store.get(RuntimeConfig.DEVICES))
+
+
+if __name__ == "__main__":
+    unittest.main()
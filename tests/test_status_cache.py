@@ -0,0 +1,117 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import threading
+import time
+import unittest
+from typing import Any
+
+from earnapp.core import use_cases, workers
+from earnapp.core.models import CommandResult
+from earnapp.core.status_cache import StatusSnapshotService
+
+from support import StorageTestCase
+
+
+class StatusSnapshotServiceTest(StorageTestCase):
+    def setUp(self):
+        super(StatusSnapshotServiceTest, self).setUp()
+        self.now = [1000.0]
+        self.calls = []
+        self.gate = None  # type: Any
+
+        def runner(_device, cmd):
+            self.calls.append(cmd)
+            if self.gate is not None:
+                self.gate.wait(2)
+            return CommandResult(stdout="Status: enabled", exit_code=0, success=True, message="Status: enabled")
+
+        self.service = StatusSnapshotService(self.storage, ttl=30, runner=runner, probe=False, time_fn=lambda: self.now[0])
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_reads_within_ttl_reuse_snapshot_and_report_age(self):
+        first, _ = self.service.get_status("Local")
+        probes = len(self.calls)
+        self.now[0] += 12
+        second, _ = self.service.get_status("Local")
+
+        self.assertEqual(probes, len(self.calls))
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+        self.assertEqual(12.0, second["snapshot_age"])
+
+        self.now[0] += 30
+        self.service.get_status("Local")
+        self.assertGreater(len(self.calls), probes)
+
+        fresh, _ = self.service.get_status("Local", fresh=True)
+        self.assertEqual(0.0, fresh["snapshot_age"])
+
+    def test_concurrent_requests_share_one_probe(self):
+        self.gate = threading.Event()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.service.get_all_statuses())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while not self.calls:
+            time.sleep(0.01)
+        self.gate.set()
+        for thread in threads:
+            thread.join(2)
+
+        self.assertEqual(4, len(results))
+        # One legacy status check is a health command plus ``earnapp status``.
+        self.assertEqual(2, len(self.calls))
+
+    def test_device_action_invalidates_snapshot(self):
+        self.service.get_status("Local")
+        use_cases.stop_device(self.storage, "Local", runner=lambda *_: CommandResult(stdout="ok", exit_code=0, success=True, message="ok"), log_activity=False)
+
+        payload, _ = self.service.get_status("Local")
+        self.assertFalse(payload["cached"])
+
+    def test_monitor_feeds_snapshots(self):
+        device_health = {}
+
+        def stop_after_first_cycle(_seconds):
+            raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            workers.background_monitor(
+                self.storage,
+                None,
+                {"enabled": False},
+                device_health,
+                sleep_fn=stop_after_first_cycle,
+                time_fn=lambda: self.now[0],
+                status_service=self.service,
+            )
+
+        self.assertEqual("online", device_health["Local"]["status"])
+        probes = len(self.calls)
+        payload = self.service.get_all_statuses()["devices"][0]
+        self.assertTrue(payload["cached"])
+        self.assertEqual(probes, len(self.calls))
+
+    def test_monitor_snapshot_lives_until_next_probe(self):
+        health = {}
+        workers._refresh_device_health(
+            self.storage,
+            health,
+            lambda: self.now[0],
+            self.service.probe_health,
+            check_interval=600,
+            max_interval=600,
+            jitter_fn=lambda: 0.0,
+            on_scheduled=self.service.keep_until,
+        )
+        probes = len(self.calls)
+
+        self.now[0] += 500
+        self.assertTrue(self.service.get_status("Local")[0]["cached"])
+        self.assertFalse(self.service.get_status("Local", max_age=30)[0]["cached"])
+        self.assertGreater(len(self.calls), probes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import json
+import os
+import unittest
+from unittest import mock
+
+from earnapp.core import storage as storage_module
+from earnapp.core.runtime import RuntimeConfig
+from earnapp.core.sqlite_storage import SqliteStorage
+from earnapp.core.storage import JsonLinesActivityLog, JsonStorage
+
+from support import StorageTestCase
+
+
+class JsonStorageCacheTest(StorageTestCase):
+    def test_repeated_loads_skip_parse_and_return_copies(self):
+        storage = JsonStorage(self.runtime_config)
+        storage.save_devices({"A": {"type": "local", "path": "/usr/bin"}})
+
+        with mock.patch.object(storage_module.json, "load", side_effect=AssertionError("parsed again")):
+            first = storage.load_devices()
+            first["A"]["path"] = "/tmp"
+            second = storage.load_devices()
+
+        self.assertEqual("/usr/bin", second["A"]["path"])
+
+    def test_external_replace_is_detected_by_stat(self):
+        storage = JsonStorage(self.runtime_config)
+        storage.save_devices({"A": {"type": "local"}})
+        self.assertIn("A", storage.load_devices())
+
+        other_process = JsonStorage(self.runtime_config, cache=False)
+        other_process.save_devices({"B": {"type": "local"}})
+
+        self.assertEqual(["B"], list(storage.load_devices().keys()))
+
+    def test_update_json_refreshes_cache_in_place(self):
+        storage = JsonStorage(self.runtime_config)
+        storage.save_schedules({})
+
+        storage.update_json(RuntimeConfig.SCHEDULES, {}, lambda schedules: schedules.update({"t": {"device": "A"}}))
+
+        with mock.patch.object(storage_module.json, "load", side_effect=AssertionError("parsed again")):
+            self.assertEqual({"t": {"device": "A"}}, storage.load_schedules())
+        with open(storage.path_for(RuntimeConfig.SCHEDULES)) as handle:
+            self.assertEqual({"t": {"device": "A"}}, json.load(handle))
+
+
+class JsonLinesActivityLogTest(StorageTestCase):
+    def make_storage(self):
+        return JsonStorage(RuntimeConfig(self.temp_dir.name, activity_log_format="jsonl"))
+
+    def test_append_writes_one_line_and_load_keeps_list_shape(self):
+        storage = self.make_storage()
+
+        self.assertIsNone(storage.append_activity_log({"timestamp": 1, "device": "A"}, max_entries=1000))
+        storage.append_activity_log({"timestamp": 2, "device": "B"}, max_entries=1000)
+
+        with open(storage.path_for(RuntimeConfig.ACTIVITY_LOG_JSONL)) as handle:
+            self.assertEqual(2, len(handle.readlines()))
+        self.assertEqual(["A", "B"], [entry["device"] for entry in storage.load_activity_log()])
+
+    def test_append_after_torn_line_starts_a_new_line(self):
+        storage = self.make_storage()
+        storage.append_activity_log({"timestamp": 1, "device": "A"})
+        with open(storage.path_for(RuntimeConfig.ACTIVITY_LOG_JSONL), "a") as handle:
+            handle.write('{"timestamp": 2, "dev')
+
+        storage.append_activity_log({"timestamp": 3, "device": "C"})
+
+        self.assertEqual(["A", "C"], [entry["device"] for entry in storage.load_activity_log()])
+
+    def test_compaction_keeps_newest_entries_once_threshold_passes(self):
+        storage = self.make_storage()
+        backend = JsonLinesActivityLog(storage, max_entries=3, compact_slack=2, background=False)
+        storage.activity_log_backend = backend
+
+        for timestamp in range(6):
+            storage.append_activity_log({"timestamp": timestamp}, max_entries=3)
+
+        with open(backend.path) as handle:
+            self.assertEqual(3, len(handle.readlines()))
+        self.assertEqual([3, 4, 5], [entry["timestamp"] for entry in storage.load_activity_log()])
+
+    def test_legacy_json_array_is_migrated_once(self):
+        JsonStorage(self.runtime_config).save_activity_log([{"timestamp": 1, "device": "old"}])
+        storage = self.make_storage()
+
+        storage.append_activity_log({"timestamp": 2, "device": "new"})
+        payload = storage.update_json(RuntimeConfig.ACTIVITY_LOG, [], lambda logs: len(logs))
+
+        self.assertEqual(2, payload)
+        self.assertEqual(["old", "new"], [entry["device"] for entry in storage.load_activity_log()])
+        self.assertFalse(os.path.exists(storage.path_for(RuntimeConfig.ACTIVITY_LOG)))
+        self.assertTrue(os.path.exists(storage.path_for(RuntimeConfig.ACTIVITY_LOG) + ".migrated"))
+
+
+class SqliteStorageTest(StorageTestCase):
+    def setUp(self):
+        super(SqliteStorageTest, self).setUp()
+        self.runtime_config = RuntimeConfig(self.temp_dir.name, storage_backend="sqlite")
+
+    def make_storage(self):
+        return storage_module.open_storage(self.runtime_config)
+
+    def test_open_storage_selects_backend_and_returns_defaults(self):
+        storage = self.make_storage()
+        self.assertIsInstance(storage, SqliteStorage)
+        self.assertEqual({"Local": {"type": "local", "path": "/usr/bin"}}, storage.load_devices())
+        self.assertEqual({}, storage.load_schedules())
+        self.assertEqual([], storage.load_activity_log())
+        self.assertIsInstance(storage_module.open_storage(RuntimeConfig(self.temp_dir.name)), JsonStorage)
+
+    def test_update_json_keeps_order_and_skips_false_mutators(self):
+        storage = self.make_storage()
+        storage.save_devices({"B": {"type": "local"}, "A": {"type": "local"}})
+
+        storage.update_json(RuntimeConfig.DEVICES, {}, lambda devices: devices.update({"C": {"type": "adb"}}))
+        storage.update_json(RuntimeConfig.DEVICES, {}, lambda devices: devices.pop("B"))
+
+        def reject(devices):
+            devices.clear()
+            return False
+
+        storage.update_json(RuntimeConfig.DEVICES, {}, reject)
+        self.assertEqual(["A", "C"], list(storage.load_devices().keys()))
+        self.assertEqual({}, storage.load_config())
+
+    def test_interrupted_mutator_rolls_back(self):
+        storage = self.make_storage()
+        storage.save_schedules({"t": {"device": "A"}})
+
+        def interrupted(schedules):
+            schedules.clear()
+            raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            storage.update_json(RuntimeConfig.SCHEDULES, {}, interrupted)
+        storage.update_json(RuntimeConfig.SCHEDULES, {}, lambda schedules: schedules.update({"u": {"device": "B"}}))
+
+        self.assertEqual(["t", "u"], sorted(self.make_storage().load_schedules()))
+
+    def test_activity_log_append_trims_and_is_shared_between_instances(self):
+        storage = self.make_storage()
+        for index in range(5):
+            self.assertIsNone(storage.append_activity_log({"timestamp": index, "device": "A"}, max_entries=3))
+
+        other_process = self.make_storage()
+        self.assertEqual([2, 3, 4], [entry["timestamp"] for entry in other_process.load_activity_log()])
+        other_process.clear_activity_log()
+        self.assertEqual([], storage.load_activity_log())
+
+    def test_existing_json_files_are_imported_once(self):
+        JsonStorage(self.runtime_config).save_schedules({"t": {"device": "A"}})
+        JsonStorage(self.runtime_config).save_activity_log([{"timestamp": 1, "device": "A"}])
+
+        storage = self.make_storage()
+        self.assertEqual({"t": {"device": "A"}}, storage.load_schedules())
+        self.assertEqual(1, len(storage.load_activity_log()))
+        self.assertTrue(os.path.exists(self.runtime_config.sqlite_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from earnapp.adapters.telegram.dispatch import AnswerTracker, ChatExecutor
+from earnapp.adapters.telegram.routing import Router
+
+
+class FakeBot(object):
+    def __init__(self):
+        self.message_dispatch = None
+        self.callback_dispatch = None
+
+    def message_handler(self, func):
+        def register(handler):
+            self.message_dispatch = handler
+        return register
+
+    def callback_query_handler(self, func):
+        def register(handler):
+            self.callback_dispatch = handler
+        return register
+
+
+def message(text, chat_id):
+    return SimpleNamespace(text=text, chat=SimpleNamespace(id=chat_id))
+
+
+class ChatExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = ChatExecutor(max_workers=4)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_same_chat_runs_in_order_other_chats_in_parallel(self):
+        release = threading.Event()
+        other_done = threading.Event()
+        order = []
+
+        def slow():
+            release.wait(2)
+            order.append("first")
+
+        self.assertFalse(self.executor.submit(1, slow))
+        self.assertTrue(self.executor.submit(1, lambda: order.append("second")))
+        self.assertFalse(self.executor.submit(2, other_done.set))
+
+        self.assertTrue(other_done.wait(1))
+        self.assertEqual([], order)
+        release.set()
+
+        deadline = time.time() + 2
+        while self.executor.busy(1) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(["first", "second"], order)
+        self.assertFalse(self.executor.busy(1))
+
+    def test_failing_task_does_not_stall_chat(self):
+        done = threading.Event()
+
+        def broken():
+            raise RuntimeError("boom")
+
+        self.executor.submit(1, broken)
+        self.executor.submit(1, done.set)
+
+        self.assertTrue(done.wait(1))
+
+    def test_system_exit_in_task_releases_chat(self):
+        done = threading.Event()
+
+        def exits():
+            raise SystemExit(0)
+
+        self.executor.submit(1, exits)
+        self.executor.submit(1, done.set)
+
+        self.assertTrue(done.wait(1))
+        deadline = time.time() + 1
+        while self.executor.busy(1) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(self.executor.busy(1))
+
+
+class DispatchTest(unittest.TestCase):
+    def test_router_runs_handlers_on_executor_and_acks_busy_chat(self):
+        executor = ChatExecutor(max_workers=2)
+        release = threading.Event()
+        handled = []
+        acks = []
+        router = Router()
+
+        @router.text("📊 Status All")
+        def status_all(m):
+            release.wait(2)
+            handled.append(m.chat.id)
+
+        bot = FakeBot()
+        router.attach(bot, executor, acks.append)
+        try:
+            first = message("📊 Status All", 1)
+            second = message("📊 Status All", 1)
+            started = time.time()
+            bot.message_dispatch(first)
+            bot.message_dispatch(second)
+            bot.message_dispatch(message("📊 Status All", 2))
+
+            self.assertLess(time.time() - started, 0.5)
+            self.assertEqual([second], acks)
+            release.set()
+        finally:
+            executor.shutdown()
+
+        self.assertEqual([1, 1, 2], sorted(handled))
+
+    def test_callback_key_uses_message_chat(self):
+        call = SimpleNamespace(data="x", message=message("menu", 42), from_user=SimpleNamespace(id=7))
+        inline = SimpleNamespace(data="x", message=None, from_user=SimpleNamespace(id=7))
+
+        self.assertEqual(42, Router.chat_key(call))
+        self.assertEqual(7, Router.chat_key(inline))
+        self.assertEqual(5, Router.chat_key(message("hi", 5)))
+
+    def test_answer_tracker_answers_once(self):
+        tracker = AnswerTracker(limit=2)
+
+        self.assertTrue(tracker.first("a"))
+        self.assertFalse(tracker.first("a"))
+        tracker.first("b")
+        tracker.first("c")
+        self.assertTrue(tracker.first("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
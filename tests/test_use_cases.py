@@ -0,0 +1,258 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import os
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from typing import Optional
+
+from earnapp.core import use_cases
+from earnapp.core.executors import CommandStream
+from earnapp.core.models import CommandResult
+
+from support import StorageTestCase
+
+
+class UseCaseTestCase(StorageTestCase):
+    previous_data_dir = None  # type: Optional[str]
+
+    def setUp(self):
+        super(UseCaseTestCase, self).setUp()
+        self.previous_data_dir = os.environ.get("EARNAPP_DATA_DIR")
+        os.environ["EARNAPP_DATA_DIR"] = self.temp_dir.name
+
+    def tearDown(self):
+        if self.previous_data_dir is None:
+            os.environ.pop("EARNAPP_DATA_DIR", None)
+        else:
+            os.environ["EARNAPP_DATA_DIR"] = self.previous_data_dir
+
+    def add_local_devices(self, *names):
+        for name in names:
+            self.assertTrue(use_cases.add_device(self.storage, {"name": name, "type": "local", "path": "/usr/bin"})["success"])
+
+
+class FanOutTest(UseCaseTestCase):
+    def test_statuses_run_in_parallel_and_keep_device_order(self):
+        self.add_local_devices("A", "B", "C")
+        barrier = threading.Barrier(4, timeout=2)
+
+        def runner(_device, cmd):
+            if "health_check" in cmd:
+                barrier.wait()
+            return CommandResult(stdout="Status: enabled", exit_code=0, success=True, message="Status: enabled")
+
+        payload = use_cases.get_all_device_statuses(self.storage, runner=runner, max_workers=4)
+
+        self.assertEqual(["Local", "A", "B", "C"], [item["name"] for item in payload["devices"]])
+        self.assertTrue(all(item["health"] == "online" for item in payload["devices"]))
+
+    def test_deadline_reports_slow_hosts_as_timeouts(self):
+        self.assertTrue(use_cases.add_device(self.storage, {"name": "Slow", "type": "local", "path": "/opt/slow"})["success"])
+        release = threading.Event()
+
+        def runner(device, _cmd):
+            if device.get("path") == "/opt/slow":
+                release.wait(2)
+            return CommandResult(stdout="ok", exit_code=0, success=True, message="ok")
+
+        started = time.time()
+        payload = use_cases.health_check_all(self.storage, runner=runner, max_workers=2, deadline=0.2)
+        release.set()
+
+        self.assertLess(time.time() - started, 1.5)
+        results = payload["results"]
+        self.assertEqual(["Local", "Slow"], [item["device"] for item in results])
+        self.assertEqual([False, True], [bool(item.get("timeout")) for item in results])
+
+    def test_hung_hosts_do_not_grow_threads_across_calls(self):
+        release = threading.Event()
+        running = []
+        pool = ThreadPoolExecutor(max_workers=2)
+
+        def hang(name):
+            running.append(name)
+            release.wait(2)
+            return name
+
+        try:
+            with mock.patch.object(use_cases, "_FANOUT_POOL", pool):
+                for _ in range(3):
+                    results = use_cases._fan_out(["A", "B", "C"], hang, lambda name: "timeout", max_workers=3, deadline=0.05)
+                    self.assertEqual(["timeout"] * 3, results)
+                self.assertEqual(2, len(running))
+                self.assertLessEqual(len(pool._threads), 2)
+        finally:
+            release.set()
+            pool.shutdown()
+
+    def test_per_call_limit_on_shared_pool(self):
+        state = {"running": 0, "peak": 0}
+        lock = threading.Lock()
+
+        def task(name):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.02)
+            with lock:
+                state["running"] -= 1
+            return name.lower()
+
+        results = use_cases._fan_out(["A", "B", "C", "D", "E"], task, lambda name: None, max_workers=2)
+
+        self.assertEqual(["a", "b", "c", "d", "e"], results)
+        self.assertEqual(2, state["peak"])
+
+
+class StatusProbeTest(UseCaseTestCase):
+    def test_probe_uses_one_command_and_keeps_status_strings(self):
+        bin_dir = os.path.join(self.temp_dir.name, "bin")
+        os.mkdir(bin_dir)
+        earnapp_path = os.path.join(bin_dir, "earnapp")
+        with open(earnapp_path, "w") as handle:
+            handle.write("#!/bin/sh\necho 'Status: disabled'\n")
+        os.chmod(earnapp_path, 0o755)
+        previous_path = os.environ.get("PATH", "")
+        os.environ["PATH"] = bin_dir + os.pathsep + previous_path
+        try:
+            payload, status = use_cases.get_device_status(self.storage, "Local")
+        finally:
+            os.environ["PATH"] = previous_path
+
+        self.assertEqual(200, status)
+        self.assertEqual("online", payload["health"])
+        self.assertEqual("Stopped", payload["earnapp_status"])
+        self.assertEqual("🔴", payload["status_icon"])
+
+    def test_probe_matches_legacy_result_for_unreachable_devices(self):
+        self.assertTrue(use_cases.add_device(self.storage, {"name": "Phone", "type": "adb", "host": "10.0.0.9"})["success"])
+        calls = []
+
+        def unreachable(_device, cmd):
+            calls.append(cmd)
+            return CommandResult(stdout="", exit_code=1, success=False, message="❌ SSH error: timed out")
+
+        for name in ("Local", "Phone"):
+            del calls[:]
+            probed, _ = use_cases.get_device_status(self.storage, name, runner=unreachable)
+            self.assertEqual(1, len(calls))
+            legacy, _ = use_cases.get_device_status(self.storage, name, runner=unreachable, probe=False)
+            self.assertEqual(legacy, probed)
+            self.assertEqual("offline", probed["health"])
+
+
+class StreamDeviceCommandTest(UseCaseTestCase):
+    def test_stream_holds_device_lock_until_consumed(self):
+        def producer():
+            yield "step 1\n"
+            yield "step 2\n"
+            return 0, None
+
+        stream = use_cases.stream_device_command(
+            self.storage, "Local", "earnapp uninstall", streamer=lambda _dev, _cmd, _timeout: CommandStream(producer())
+        )
+        chunks = iter(stream)
+        next(chunks)
+
+        acquired = []
+        other = threading.Thread(target=lambda: acquired.append(use_cases._operation_lock_for("Local").acquire(timeout=0.1)))
+        other.start()
+        other.join()
+        self.assertEqual([False], acquired)
+
+        list(chunks)
+        self.assertTrue(stream.result.success)
+        self.assertEqual("step 1\nstep 2", stream.result.stdout)
+
+    def test_unknown_operation_or_device(self):
+        self.assertEqual(400, use_cases.stream_device_operation(self.storage, "Local", "rm -rf")[1])
+        self.assertEqual(404, use_cases.stream_device_operation(self.storage, "Nope", "uninstall")[1])
+
+
+class RollingRestartTest(UseCaseTestCase):
+    def setUp(self):
+        super(RollingRestartTest, self).setUp()
+        for name in ("A", "B", "C", "D", "E"):
+            self.assertTrue(use_cases.add_device(self.storage, {"name": name, "type": "local", "path": "/opt/" + name})["success"])
+        self.now = [0.0]
+        self.sleeps = []
+        self.running = {}
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now[0] += seconds
+
+    def status(self, device_name):
+        return self.running.get(device_name, True), "Running" if self.running.get(device_name, True) else "Stopped"
+
+    def rolling_restart(self, runner, **kwargs):
+        return use_cases.rolling_restart_devices(
+            self.storage, ["A", "B", "C", "D", "E"], runner=runner, sleep_fn=self.sleep, clock=lambda: self.now[0],
+            status_fn=self.status, log_activity=False, **kwargs
+        )
+
+    def test_batches_restart_in_parallel_and_wait_for_health(self):
+        barrier = threading.Barrier(2, timeout=2)
+        batches = []
+
+        def runner(device, cmd):
+            if cmd == "earnapp stop" and device.get("path") in ("/opt/A", "/opt/B"):
+                barrier.wait()
+            return CommandResult(stdout="ok", exit_code=0, success=True, message="ok")
+
+        payload = self.rolling_restart(runner, batch_size=2, on_batch=lambda index, items: batches.append(
+            (index, [item["device"] for item in items])))
+
+        self.assertTrue(payload["success"])
+        self.assertEqual(3, payload["batches"])
+        self.assertEqual([(1, ["A", "B"]), (2, ["C", "D"]), (3, ["E"])], batches)
+        self.assertEqual([1, 1, 2, 2, 3], [item["batch"] for item in payload["results"]])
+
+    def test_unhealthy_batch_aborts_remaining_devices(self):
+        self.running["B"] = False
+
+        def runner(device, cmd):
+            return CommandResult(stdout="ok", exit_code=0, success=True, message="ok")
+
+        payload = self.rolling_restart(runner, batch_size=2, health_timeout=20, poll_interval=4)
+        results = dict((item["device"], item) for item in payload["results"])
+
+        self.assertFalse(payload["success"])
+        self.assertTrue(payload["aborted"])
+        self.assertTrue(results["A"]["success"])
+        self.assertTrue(results["B"]["unhealthy"])
+        self.assertIn("Stopped", results["B"]["result"])
+        self.assertEqual({"C", "D", "E"}, set(name for name, item in results.items() if item.get("skipped")))
+        self.assertEqual(20, sum(seconds for seconds in self.sleeps if seconds == 4))
+
+    def test_health_polls_share_one_deadline(self):
+        deadlines = []
+        original = use_cases._fan_out
+
+        def spy(items, fn, on_timeout, max_workers, deadline):
+            deadlines.append(deadline)
+            return original(items, fn, on_timeout, max_workers, deadline)
+
+        self.running["A"] = False
+        with mock.patch.object(use_cases, "_fan_out", side_effect=spy):
+            pending = use_cases._wait_until_running(["A"], self.status, 20, 4, self.sleep, lambda: self.now[0])
+
+        self.assertEqual({"A": "Stopped"}, pending)
+        self.assertEqual([20, 16, 12, 8, 4, 1.0], deadlines)
+
+    def test_failure_threshold_allows_some_failures(self):
+        def runner(device, cmd):
+            failed = device.get("path") == "/opt/A" and cmd == "earnapp stop"
+            return CommandResult(stdout="boom" if failed else "ok", exit_code=1 if failed else 0, success=not failed, message="ok")
+
+        payload = self.rolling_restart(runner, batch_size=2, max_failures=2)
+
+        self.assertFalse(payload["aborted"])
+        self.assertEqual(1, payload["failures"])
+        self.assertEqual(["B", "C", "D", "E"], [item["device"] for item in payload["results"] if item["success"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+# pyright: reportImplicitOverride=false, reportPrivateUsage=false, reportUnknownMemberType=false, reportMissingParameterType=false, reportUnknownParameterType=false, reportUnknownVariableType=false, reportUnusedCallResult=false, reportDeprecated=false, reportTypeCommentUsage=false, reportExplicitAny=false, reportAny=false, reportAssignmentType=false, reportUnknownLambdaType=false, reportUnknownArgumentType=false
+import json
+import os
+import sys
+import unittest
+
+from earnapp.core import workers
+from earnapp.core.runtime import RuntimeConfig
+from earnapp.core.sqlite_storage import SqliteStorage
+from earnapp.core.watch import ChangeNotifier, ChangeTracker, watch_storage
+
+from support import StorageTestCase
+
+
+def write_external(path, data):
+    # Another process (e.g. the Web UI) replacing the file atomically.
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as handle:
+        json.dump(data, handle)
+    os.replace(temp_path, path)
+
+
+class ChangeTrackerTest(unittest.TestCase):
+    def test_names_start_dirty_and_clear_on_consume(self):
+        tracker = ChangeTracker(["devices.json", "schedules.json"])
+
+        self.assertTrue(tracker.consume("devices.json"))
+        self.assertFalse(tracker.consume("devices.json"))
+        self.assertTrue(tracker.wait(0))
+
+        tracker.consume("schedules.json")
+        self.assertFalse(tracker.wait(0))
+        tracker.mark("devices.json")
+        tracker.mark("unrelated.json")
+        self.assertTrue(tracker.wait(0))
+        self.assertTrue(tracker.consume_any())
+        self.assertFalse(tracker.consume_any())
+
+
+class ChangeNotifierTest(StorageTestCase):
+    def setUp(self):
+        super(ChangeNotifierTest, self).setUp()
+        self.storage.save_devices({"A": {"type": "local"}})
+
+    def test_poll_publishes_external_changes_once(self):
+        notifier = watch_storage(self.storage, start=False)
+        tracker = notifier.tracker(["devices.json", "schedules.json"])
+        tracker.consume_any()
+
+        write_external(self.storage.path_for("schedules.json"), {"t": {}})
+
+        self.assertEqual(["schedules.json"], notifier.poll_once())
+        self.assertEqual([], notifier.poll_once())
+        self.assertTrue(tracker.consume("schedules.json"))
+        self.assertFalse(tracker.consume("devices.json"))
+
+    def test_storage_writes_are_published_synchronously(self):
+        notifier = watch_storage(self.storage, start=False)
+        seen = []
+        notifier.subscribe(seen.append, ["devices.json", "activity_log.json"])
+
+        self.storage.save_devices({"B": {"type": "local"}})
+        self.storage.append_activity_log({"timestamp": 1, "device": "B"})
+        self.storage.update_json("devices.json", {}, lambda data: False)
+
+        self.assertEqual(["devices.json", "activity_log.json"], seen)
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+    def test_inotify_backend_wakes_tracker(self):
+        notifier = ChangeNotifier(self.temp_dir.name, self.storage.watched_files(), poll_interval=0.2)
+        tracker = notifier.tracker(["auto_restart.json"])
+        tracker.consume_any()
+        notifier.start()
+        try:
+            self.assertEqual("inotify", notifier.backend)
+            write_external(self.storage.path_for("auto_restart.json"), {"A": {"enabled": True}})
+            self.assertTrue(tracker.wait(2))
+            self.assertTrue(tracker.consume("auto_restart.json"))
+        finally:
+            notifier.stop()
+
+    def test_poll_backend_when_inotify_disabled(self):
+        notifier = ChangeNotifier(self.temp_dir.name, self.storage.watched_files(), poll_interval=0.05, use_inotify=False)
+        tracker = notifier.tracker(["devices.json"])
+        tracker.consume_any()
+        notifier.start()
+        try:
+            self.assertEqual("poll", notifier.backend)
+            write_external(self.storage.path_for("devices.json"), {"C": {}})
+            self.assertTrue(tracker.wait(2))
+        finally:
+            notifier.stop()
+
+    def test_sqlite_database_changes_mark_every_collection(self):
+        storage = SqliteStorage(RuntimeConfig(self.temp_dir.name, storage_backend="sqlite"))
+        try:
+            files = storage.watched_files()
+            self.assertIn("devices.json", files["earnapp.db-wal"])
+            self.assertIn("activity_log.json", files["earnapp.db"])
+
+            seen = []
+            storage.change_listeners.append(seen.append)
+            storage.save_schedules({"t": {}})
+            storage.save_config({"bot_token": "x"})
+            self.assertEqual(["schedules.json", "config.json"], seen)
+        finally:
+            storage.close()
+
+
+class SchedulerChangeTrackerTest(StorageTestCase):
+    def test_reload_only_after_change(self):
+        tracker = ChangeTracker([RuntimeConfig.SCHEDULES, RuntimeConfig.AUTO_RESTART])
+        scheduler = workers.Scheduler(self.storage, None, {}, {}, time_fn=lambda: 0.0, change_tracker=tracker)
+        loads = []
+        original = self.storage.load_schedules
+        self.storage.load_schedules = lambda: loads.append(1) or original()
+
+        self.assertTrue(scheduler.reload_if_changed())
+        self.assertFalse(scheduler.reload_if_changed())
+        self.assertEqual(1, len(loads))
+
+        tracker.mark(RuntimeConfig.SCHEDULES)
+        scheduler.reload_if_changed()
+        self.assertEqual(2, len(loads))
+        scheduler.executor.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,11 +5,12 @@ Web interface untuk mengontrol EarnApp di multiple device
 """
 import binascii
 import base64
+import json
 import os
 import secrets
 import sys
 
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 from flask_cors import CORS
 
 # Get webui directory for Flask templates/static
@@ -18,34 +19,43 @@ ROOT_DIR = os.path.dirname(WEBUI_DIR)
 if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
-from earnapp.core.storage import JsonStorage
+from earnapp.core.broadcast import StatusBroadcaster
+from earnapp.core.jobs import JobRunner
+from earnapp.core.status_cache import StatusSnapshotService
+from earnapp.core.storage import open_storage
 from earnapp.core.use_cases import (
     add_device as add_device_use_case,
     add_schedule as add_schedule_use_case,
+    count_activity_logs as count_activity_logs_use_case,
     delete_device as delete_device_use_case,
     delete_schedule as delete_schedule_use_case,
     disable_auto_restart as disable_auto_restart_use_case,
-    get_all_device_statuses as get_all_device_statuses_use_case,
     get_device_id as get_device_id_use_case,
-    get_device_status as get_device_status_use_case,
     health_check_all as health_check_all_use_case,
     list_activity_logs as list_activity_logs_use_case,
     list_auto_restart as list_auto_restart_use_case,
     list_devices as list_devices_use_case,
     list_schedules as list_schedules_use_case,
     restart_device as restart_device_use_case,
+    rolling_restart_devices as rolling_restart_devices_use_case,
     restart_all_devices as restart_all_devices_use_case,
     set_auto_restart as set_auto_restart_use_case,
     start_all_devices as start_all_devices_use_case,
     start_device as start_device_use_case,
     stop_all_devices as stop_all_devices_use_case,
     stop_device as stop_device_use_case,
+    stream_activity_log_export as stream_activity_log_export_use_case,
+    stream_device_operation as stream_device_operation_use_case,
 )
 
 app = Flask(__name__, template_folder=os.path.join(WEBUI_DIR, 'templates'), 
             static_folder=os.path.join(WEBUI_DIR, 'static'))
 
-storage = JsonStorage()
+storage = open_storage()
+status_service = StatusSnapshotService(storage)
+broadcaster = StatusBroadcaster(storage, status_fn=status_service.get_all_statuses)
+STREAM_HEARTBEAT_SECONDS = 15
+job_runner = JobRunner()
 
 # Load konfigurasi
 def load_config():
@@ -145,6 +155,7 @@ def _scrub_sensitive_values(value):
 
 
 def _jsonify_action(payload, failure_status=500):
+    broadcaster.request_refresh()
     if isinstance(payload, dict) and not payload.get('message') and payload.get('result'):
         payload = dict(payload)
         payload['message'] = payload.get('result')
@@ -193,16 +204,28 @@ def delete_device(device_name):
         return jsonify(payload)
     return jsonify(payload), status_code
 
+def _status_cache_args():
+    fresh = request.args.get('fresh', '').lower() in {'1', 'true', 'yes'}
+    max_age = request.args.get('max_age')
+    try:
+        max_age = float(max_age) if max_age not in (None, '') else None
+    except ValueError:
+        max_age = None
+    return fresh, max_age
+
+
 @app.route('/api/devices/<device_name>/status', methods=['GET'])
 def get_device_status(device_name):
-    payload, status_code = get_device_status_use_case(storage, device_name)
+    fresh, max_age = _status_cache_args()
+    payload, status_code = status_service.get_status(device_name, max_age=max_age, fresh=fresh)
     if status_code == 200:
         return jsonify(payload)
     return jsonify(payload), status_code
 
 @app.route('/api/devices/all/status', methods=['GET'])
 def get_all_devices_status():
-    return jsonify(get_all_device_statuses_use_case(storage))
+    fresh, max_age = _status_cache_args()
+    return jsonify(status_service.get_all_statuses(max_age=max_age, fresh=fresh))
 
 @app.route('/api/devices/<device_name>/start', methods=['POST'])
 def start_device(device_name):
@@ -216,17 +239,65 @@ def stop_device(device_name):
 def restart_device(device_name):
     return _jsonify_action(restart_device_use_case(storage, device_name))
 
+def _submit_bulk_job(kind, use_case):
+    """Start a bulk action in the background and answer 202 with the job id."""
+    job = job_runner.submit(
+        kind,
+        list(storage.load_devices().keys()),
+        lambda on_result, cancel_event: use_case(storage, on_result=on_result, cancel_event=cancel_event),
+        on_finish=lambda _job: broadcaster.request_refresh(),
+    )
+    payload = {'success': True, 'job_id': job.id, 'status_url': '/api/jobs/{0}'.format(job.id), 'job': job.to_dict()}
+    return jsonify(payload), 202
+
 @app.route('/api/devices/all/restart', methods=['POST'])
 def restart_all_devices():
-    return _jsonify_action(restart_all_devices_use_case(storage))
+    return _submit_bulk_job('restart_all', restart_all_devices_use_case)
+
+@app.route('/api/devices/all/rolling-restart', methods=['POST'])
+def rolling_restart_all_devices():
+    """Restart per batch; body opsional: batch_size, max_parallel, health_timeout, max_failures."""
+    data = request.get_json(silent=True) or {}
+    options = {}
+    for name in ('batch_size', 'max_parallel', 'health_timeout', 'max_failures'):
+        if data.get(name) in (None, ''):
+            continue
+        try:
+            options[name] = int(data[name])
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': "Parameter '{0}' harus berupa angka".format(name)}), 400
+        if options[name] < 0:
+            return jsonify({'success': False, 'error': "Parameter '{0}' tidak boleh negatif".format(name)}), 400
+    return _submit_bulk_job(
+        'rolling_restart',
+        lambda storage, **kwargs: rolling_restart_devices_use_case(storage, **dict(options, **kwargs)),
+    )
 
 @app.route('/api/devices/all/start', methods=['POST'])
 def start_all_devices():
-    return _jsonify_action(start_all_devices_use_case(storage))
+    return _submit_bulk_job('start_all', start_all_devices_use_case)
 
 @app.route('/api/devices/all/stop', methods=['POST'])
 def stop_all_devices():
-    return _jsonify_action(stop_all_devices_use_case(storage))
+    return _submit_bulk_job('stop_all', stop_all_devices_use_case)
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({'jobs': [job.to_dict() for job in job_runner.list()]})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job tidak ditemukan'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_runner.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job tidak ditemukan'}), 404
+    return jsonify(job.to_dict())
 
 @app.route('/api/devices/<device_name>/id', methods=['GET'])
 def get_device_id(device_name):
@@ -235,11 +306,117 @@ def get_device_id(device_name):
         return jsonify(payload)
     return jsonify(payload), status_code
 
+@app.route('/api/devices/<device_name>/operations/<operation>/stream', methods=['POST'])
+def stream_device_operation(device_name, operation):
+    """Output operasi panjang (mis. uninstall) sebagai NDJSON: satu baris per chunk, lalu hasil akhir."""
+    stream, status_code = stream_device_operation_use_case(storage, device_name, operation)
+    if status_code != 200:
+        return jsonify(stream), status_code
+
+    def generate():
+        for chunk in stream:
+            yield json.dumps({'chunk': chunk}) + '\n'
+        result = stream.result
+        broadcaster.request_refresh()
+        yield json.dumps({
+            'done': True,
+            'success': result.success,
+            'exit_code': result.exit_code,
+            'message': result.message[-4000:],
+            'truncated': result.extra.get('truncated', False),
+        }) + '\n'
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(generate(), mimetype='application/x-ndjson', headers=headers)
+
+def _int_args(*names):
+    values = {}
+    for name in names:
+        raw = request.args.get(name)
+        if raw is None or raw == '':
+            values[name] = None
+            continue
+        try:
+            values[name] = int(raw)
+        except ValueError:
+            return None, (jsonify({'success': False, 'error': "Parameter '{0}' harus berupa angka".format(name)}), 400)
+    return values, None
+
+
 @app.route('/api/activity-logs', methods=['GET'])
 def get_activity_logs():
     device_filter = request.args.get('device')
-    limit = int(request.args.get('limit', 100))
-    return jsonify(list_activity_logs_use_case(storage, device_filter, limit))
+    args, error_response = _int_args('limit', 'before', 'after', 'since', 'until')
+    if error_response:
+        return error_response
+    limit = args['limit'] if args['limit'] is not None else 100
+    return jsonify(list_activity_logs_use_case(
+        storage,
+        device_filter,
+        limit,
+        before=args['before'],
+        after=args['after'],
+        since=args['since'],
+        until=args['until'],
+    ))
+
+@app.route('/api/activity-logs/counts', methods=['GET'])
+def get_activity_log_counts():
+    args, error_response = _int_args('since', 'until')
+    if error_response:
+        return error_response
+    group_by = request.args.get('group_by', 'device')
+    payload, status_code = count_activity_logs_use_case(storage, group_by, args['since'], args['until'])
+    if status_code == 200:
+        return jsonify(payload)
+    return jsonify(payload), status_code
+
+@app.route('/api/activity-logs/export', methods=['GET'])
+def export_activity_logs():
+    """Download log (format=csv|json, device, since, until, gzip=1) sebagai stream."""
+    args, error_response = _int_args('since', 'until')
+    if error_response:
+        return error_response
+    compress = request.args.get('gzip', '').lower() in {'1', 'true', 'yes'}
+    payload, status_code = stream_activity_log_export_use_case(
+        storage,
+        request.args.get('format', 'csv').lower(),
+        request.args.get('device') or None,
+        args['since'],
+        args['until'],
+        compress,
+    )
+    if status_code != 200:
+        return jsonify(payload), status_code
+    headers = {
+        'Content-Disposition': 'attachment; filename="{0}"'.format(payload['filename']),
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    }
+    return Response(payload['chunks'], mimetype=payload['mimetype'], headers=headers)
+
+def _format_sse(event):
+    return 'id: {0}\nevent: {1}\ndata: {2}\n\n'.format(event['id'], event['event'], json.dumps(event['data']))
+
+
+@app.route('/api/stream', methods=['GET'])
+def stream_events():
+    subscription = broadcaster.subscribe()
+
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while not subscription.closed:
+                event = subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield _format_sse(event)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(generate(), mimetype='text/event-stream', headers=headers)
 
 @app.route('/api/schedules', methods=['GET'])
 def get_schedules():
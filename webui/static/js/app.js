@@ -64,6 +64,8 @@ function sanitizeClassToken(value, fallback = 'unknown') {
 let devicesData = {};
 let schedulesData = {};
 let autoRestartData = {};
+let deviceStatuses = {};
+let pollingTimer = null;
 
 // Load devices and display them
 async function loadDevices() {
@@ -87,8 +89,12 @@ async function loadDevices() {
             container.appendChild(card);
         }
         
-        // Load status for all devices
-        await refreshAll();
+        // Status datang dari /api/stream; probe langsung hanya jika SSE tidak tersedia
+        if (typeof EventSource === 'undefined') {
+            await refreshAll();
+        } else {
+            applyStatuses(Object.values(deviceStatuses));
+        }
         // Load schedules and auto restart
         await loadSchedules();
         await loadAutoRestart();
@@ -167,6 +173,9 @@ function createDeviceCard(name, device) {
                     <button class="btn btn-info btn-sm" onclick="showDeviceId('${handlerName}')" title="Show Device ID">
                         <i class="bi bi-info-circle"></i> ID
                     </button>
+                    <button class="btn btn-outline-warning btn-sm" onclick="uninstallEarnApp('${handlerName}')" title="Uninstall EarnApp">
+                        <i class="bi bi-x-octagon"></i> Uninstall
+                    </button>
                     <button class="btn btn-outline-danger btn-sm" onclick="deleteDevice('${handlerName}')" title="Delete Device">
                         <i class="bi bi-trash"></i> Delete
                     </button>
@@ -179,26 +188,11 @@ function createDeviceCard(name, device) {
 }
 
 // Refresh all device statuses and update stats
-async function refreshAll() {
+async function refreshAll(fresh = false) {
     try {
-        const response = await fetch(`${API_BASE}/devices/all/status`);
+        const response = await fetch(buildApiUrl(['devices', 'all', 'status'], { fresh: fresh ? 1 : '' }));
         const data = await response.json();
-        const devices = data.devices || [];
-        
-        let running = 0, stopped = 0, online = 0;
-        
-        devices.forEach(device => {
-            updateDeviceStatus(device.name, device);
-            
-            if (device.earnapp_status === 'Running') running++;
-            if (device.earnapp_status === 'Stopped') stopped++;
-            if (device.health === 'online') online++;
-        });
-        
-        // Update stats
-        document.getElementById('stats-running').textContent = running;
-        document.getElementById('stats-stopped').textContent = stopped;
-        document.getElementById('stats-online').textContent = online;
+        applyStatuses(data.devices || [], [], true);
         
         showToast('Status refreshed', 'success');
     } catch (error) {
@@ -206,6 +200,30 @@ async function refreshAll() {
     }
 }
 
+// Apply status payloads (full list or delta) and update stats
+function applyStatuses(devices, removed = [], full = false) {
+    if (full) {
+        deviceStatuses = {};
+    }
+    removed.forEach(name => delete deviceStatuses[name]);
+    devices.forEach(device => {
+        deviceStatuses[device.name] = device;
+        updateDeviceStatus(device.name, device);
+    });
+    
+    let running = 0, stopped = 0, online = 0;
+    Object.values(deviceStatuses).forEach(device => {
+        if (device.earnapp_status === 'Running') running++;
+        if (device.earnapp_status === 'Stopped') stopped++;
+        if (device.health === 'online') online++;
+    });
+    
+    // Update stats
+    document.getElementById('stats-running').textContent = running;
+    document.getElementById('stats-stopped').textContent = stopped;
+    document.getElementById('stats-online').textContent = online;
+}
+
 // Update device status display
 function updateDeviceStatus(name, status) {
     const healthEl = document.getElementById(`health-${safeDomId(name)}`);
@@ -315,24 +333,51 @@ async function restartDevice(name) {
     }
 }
 
+const JOB_POLL_INTERVAL = 1500;
+
+// Start a bulk job and poll /api/jobs/<id> until it finishes
+async function runBulkJob(path, label) {
+    const response = await fetch(buildApiUrl(path), {
+        method: 'POST',
+        headers: withCsrfHeaders()
+    });
+    const data = await response.json();
+    if (!response.ok || !data.job_id) {
+        throw new Error(data.error || data.message || `HTTP ${response.status}`);
+    }
+
+    let job = data.job;
+    showToast(`${label}: job started (${job.total} devices)`, 'info');
+    while (!['succeeded', 'failed', 'cancelled'].includes(job.status)) {
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+        const jobResponse = await fetch(buildApiUrl(['jobs', data.job_id]));
+        if (!jobResponse.ok) throw new Error(`Job ${data.job_id} not found`);
+        const next = await jobResponse.json();
+        if (next.completed !== job.completed && next.status === 'running') {
+            showToast(`${label}: ${next.completed}/${next.total} devices`, 'info');
+        }
+        job = next;
+    }
+
+    const failed = job.results.filter(item => !item.success).map(item => item.device);
+    if (job.status === 'succeeded') {
+        showToast(`${label}: all ${job.total} devices done`, 'success');
+    } else if (job.status === 'cancelled') {
+        showToast(`${label}: cancelled after ${job.completed}/${job.total} devices`, 'warning');
+    } else {
+        showToast(`${label}: failed on ${failed.join(', ') || job.error || 'unknown'}`, 'error');
+    }
+    await refreshAll();
+    await loadActivityLogs();
+    return job;
+}
+
 // Quick restart all
 async function quickRestartAll() {
-    if (!confirm('Quick restart all devices? (Stop → Wait 5s → Start)')) return;
+    if (!confirm('Quick restart all devices? (Rolling per batch, waits for 🟢 Running before the next batch)')) return;
     
     try {
-        const response = await fetch(buildApiUrl(['devices', 'all', 'restart']), {
-            method: 'POST',
-            headers: withCsrfHeaders()
-        });
-        const data = await response.json();
-        
-        if (data.success) {
-            showToast('All devices restarted', 'success');
-            await refreshAll();
-            await loadActivityLogs();
-        } else {
-            showToast(`Error: ${data.message || 'Unknown error'}`, 'error');
-        }
+        await runBulkJob(['devices', 'all', 'rolling-restart'], 'Restart all');
     } catch (error) {
         showToast('Error: ' + error.message, 'error');
     }
@@ -361,17 +406,7 @@ async function startAllDevices() {
     if (!confirm('Start all devices?')) return;
     
     try {
-        const response = await fetch(`${API_BASE}/devices/all/start`, {
-            method: 'POST',
-            headers: withCsrfHeaders()
-        });
-        const data = await response.json();
-        
-        if (data.success) {
-            showToast('All devices started', 'success');
-            await refreshAll();
-            await loadActivityLogs();
-        }
+        await runBulkJob(['devices', 'all', 'start'], 'Start all');
     } catch (error) {
         showToast('Error: ' + error.message, 'error');
     }
@@ -382,17 +417,7 @@ async function stopAllDevices() {
     if (!confirm('Stop all devices?')) return;
     
     try {
-        const response = await fetch(`${API_BASE}/devices/all/stop`, {
-            method: 'POST',
-            headers: withCsrfHeaders()
-        });
-        const data = await response.json();
-        
-        if (data.success) {
-            showToast('All devices stopped', 'success');
-            await refreshAll();
-            await loadActivityLogs();
-        }
+        await runBulkJob(['devices', 'all', 'stop'], 'Stop all');
     } catch (error) {
         showToast('Error: ' + error.message, 'error');
     }
@@ -414,6 +439,68 @@ async function showDeviceId(name) {
     }
 }
 
+// Run a long device operation and show its output as it streams in (NDJSON)
+async function streamDeviceOperation(name, operation, title) {
+    const output = document.getElementById('operation-output');
+    const status = document.getElementById('operation-output-status');
+    document.getElementById('operation-output-title').textContent = title;
+    output.textContent = '';
+    status.textContent = 'Running...';
+    new bootstrap.Modal(document.getElementById('operationOutputModal')).show();
+
+    const response = await fetch(buildApiUrl(['devices', name, 'operations', operation, 'stream']), {
+        method: 'POST',
+        headers: withCsrfHeaders()
+    });
+    if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let pending = '';
+    let result = null;
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        pending += decoder.decode(value, { stream: true });
+        const lines = pending.split('\n');
+        pending = lines.pop();
+        for (const line of lines) {
+            if (!line) continue;
+            const message = JSON.parse(line);
+            if (message.done) {
+                result = message;
+            } else {
+                output.textContent += message.chunk;
+                output.scrollTop = output.scrollHeight;
+            }
+        }
+    }
+    if (result) {
+        status.textContent = result.success ? 'Selesai' : `Gagal (exit code ${result.exit_code})`;
+        if (!result.success && !output.textContent) output.textContent = result.message;
+    }
+    return result;
+}
+
+// Uninstall EarnApp from a device
+async function uninstallEarnApp(name) {
+    if (!confirm(`Uninstall EarnApp from "${name}"? This cannot be undone.`)) return;
+
+    try {
+        const result = await streamDeviceOperation(name, 'uninstall', `Uninstall EarnApp (${name})`);
+        if (result && result.success) {
+            showToast(`EarnApp uninstalled from ${name}`, 'success');
+        } else {
+            showToast(`Uninstall failed on ${name}`, 'error');
+        }
+    } catch (error) {
+        showToast('Error: ' + error.message, 'error');
+    }
+}
+
 // Delete device
 async function deleteDevice(name) {
     if (!confirm(`Delete device "${name}"?`)) return;
@@ -496,6 +583,25 @@ async function submitAddDevice() {
     }
 }
 
+// Download activity logs (streamed by the server) with the current device/date filter
+function exportActivityLogs(format) {
+    const deviceFilter = document.getElementById('log-device-filter').value;
+    const dateFilter = document.getElementById('log-date-filter').value;
+    let since = null;
+    let until = null;
+    if (dateFilter) {
+        const start = new Date(`${dateFilter}T00:00:00`);
+        since = Math.floor(start.getTime() / 1000);
+        until = since + 86399;
+    }
+    window.location.href = buildApiUrl(['activity-logs', 'export'], {
+        format: format,
+        device: deviceFilter,
+        since: since,
+        until: until
+    });
+}
+
 // Load activity logs with filters
 async function loadActivityLogs() {
     try {
@@ -866,11 +972,58 @@ document.addEventListener('DOMContentLoaded', function() {
     loadDevices();
     loadActivityLogs();
     
-    // Auto refresh every 30 seconds
-    setInterval(() => {
+    // Live updates via SSE, fallback ke polling jika tidak tersedia
+    startLiveUpdates();
+});
+
+// Polling fallback: refresh every 30 seconds
+function startPolling() {
+    if (pollingTimer) {
+        return;
+    }
+    pollingTimer = setInterval(() => {
         refreshAll();
         loadActivityLogs();
         loadSchedules();
         loadAutoRestart();
     }, 30000);
-});
+}
+
+function stopPolling() {
+    if (pollingTimer) {
+        clearInterval(pollingTimer);
+        pollingTimer = null;
+    }
+}
+
+// Subscribe to /api/stream; one shared server-side collector feeds all tabs
+function startLiveUpdates() {
+    if (typeof EventSource === 'undefined') {
+        startPolling();
+        return;
+    }
+    
+    const source = new EventSource(`${API_BASE}/stream`);
+    const parse = event => JSON.parse(event.data || '{}');
+    
+    source.onopen = () => stopPolling();
+    source.onerror = () => {
+        // EventSource reconnects by itself; poll until the stream is back
+        startPolling();
+    };
+    source.addEventListener('status', event => {
+        const data = parse(event);
+        applyStatuses(data.devices || [], data.removed || [], data.full);
+    });
+    source.addEventListener('health', event => {
+        const data = parse(event);
+        (data.devices || []).forEach(device => {
+            if (deviceStatuses[device.name]) {
+                applyStatuses([{ ...deviceStatuses[device.name], health: device.health }]);
+            }
+        });
+    });
+    source.addEventListener('activity_log', () => loadActivityLogs());
+    source.addEventListener('schedules', () => loadSchedules());
+    source.addEventListener('auto_restart', () => loadAutoRestart());
+}